@@ -1,11 +1,9 @@
-from math import sqrt
+from ..calculations.geodesy import distance_nm
 
 
 def calculate_distance(point1, point2):
-    """Calculate Euclidean distance between two QgsPointXY points."""
-    dx = point2.x() - point1.x()
-    dy = point2.y() - point1.y()
-    return sqrt(dx ** 2 + dy ** 2)
+    """Great-circle distance in nautical miles between two QgsPointXY (lon, lat) points."""
+    return float(distance_nm(point1.y(), point1.x(), point2.y(), point2.x()))
 
 
 def calculate_area(size):
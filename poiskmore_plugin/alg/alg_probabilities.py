@@ -1,8 +1,47 @@
-from qgis.core import QgsRasterLayer, QgsProject
+import os
+import tempfile
+
+from ..calculations.leeway_particles import ConstantForcing, LeewayCoefficients, LeewayParticleEngine
+from ..calculations.poc_grid import PocGrid
+
+
+def compute_probability_map(datum, radius_nm, cell_nm, wind_speed, wind_dir, current_speed, current_dir,
+                            time_hours, object_type='Человек в спасжилете', n_particles=20000,
+                            method='histogram', initial_error_nm=1.0, seed=0):
+    """Drift a particle cloud from the datum and return its POC grid.
+
+    The grid is a square of 2 * radius_nm centred on the drifted cloud with
+    cells of cell_nm in a local equal-area projection (see PocGrid).
+    Wind direction is "from", current direction is "to", speeds in knots.
+    Returns the PocGrid; its ``values`` array is the probability matrix.
+    """
+    if cell_nm <= 0:
+        raise ValueError("Grid resolution must be positive")
+    if radius_nm <= 0:
+        raise ValueError("Grid radius must be positive")
+    size = max(int(round(2 * radius_nm / cell_nm)), 1)
+
+    engine = LeewayParticleEngine(LeewayCoefficients.default(object_type),
+                                  ConstantForcing(wind_speed, wind_dir, current_speed, current_dir))
+    cloud = engine.simulate(tuple(datum), time_hours, n_particles, seed=seed,
+                            initial_error_nm=initial_error_nm)
+    center = cloud.datum_points()[0]
+    half = size * cell_nm / 2
+    grid = PocGrid.empty((center['lat'], center['lon']), -half, -half, cell_nm, (size, size))
+    return grid.add_particles(cloud.lat, cloud.lon, method=method)
 
 
 def generate_probability_map(layer_name, data):
-    """Generate a probability raster layer and add it to the project."""
+    """Generate a probability raster layer and add it to the project.
+
+    ``data`` is a raster path or a PocGrid (written to a temporary GeoTIFF).
+    """
+    from qgis.core import QgsRasterLayer, QgsProject
+
+    if isinstance(data, PocGrid):
+        handle, path = tempfile.mkstemp(prefix='poc_', suffix='.tif')
+        os.close(handle)
+        data = data.write_geotiff(path)
     layer = QgsRasterLayer(data, layer_name)
     if layer.isValid():
         QgsProject.instance().addMapLayer(layer)
@@ -1,8 +1,33 @@
-from qgis.core import QgsGeometry, QgsPointXY
+from qgis.core import Qgis, QgsGeometry, QgsMessageLog, QgsPointXY
 
+from ..calculations.sea_routing import region_graph
 
-def calculate_sru_route(start, end):
-    """Calculate a simple route between two points."""
+
+def calculate_sru_route(start, end, region=None):
+    """Calculate a route between two points.
+
+    With a region whose graph is cached (calculations.sea_routing.region_graph)
+    the route goes around land and active obstacle layers; without a region,
+    or if its graph has not been built yet, it is a straight line. A leg the
+    graph cannot route (an endpoint on land or the target cut off) is
+    reported to the message log and an empty geometry is returned.
+    """
     points = [start, end]
+    if region is not None:
+        try:
+            graph = region_graph(region)
+        except KeyError:
+            graph = None
+        if graph is not None:
+            try:
+                route = graph.route((start.y(), start.x()), (end.y(), end.x()))
+            except ValueError as error:
+                route, reason = None, str(error)
+            else:
+                reason = "цель недостижима в обход препятствий"
+            if route is None:
+                QgsMessageLog.logMessage(f"Маршрут SRU не построен: {reason}", "Поиск-Море", Qgis.Warning)
+                return QgsGeometry()
+            points = [QgsPointXY(lon, lat) for lat, lon in route.waypoints]
     route = QgsGeometry.fromPolylineXY(points)
     return route
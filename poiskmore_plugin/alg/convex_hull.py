@@ -1,33 +1,29 @@
 from typing import List
-from qgis.core import QgsGeometry, QgsPointXY, QgsPolygon, QgsLineString, QgsPoint, QgsGeometryCollection
-from qgis.PyQt.QtCore import QPointF  # Для совместимости
+
+import numpy as np
+from qgis.core import QgsGeometry, QgsLineString, QgsPoint, QgsPointXY, QgsPolygon
+
+from ..calculations.particle_hull import convex_hull
+
+
 class ConvexHull:
-    def __init__(self, pts: List[QgsPointXY], geom_factory):
+    def __init__(self, pts: List[QgsPointXY]):
         self.input_pts = self._unique_points(pts)
-        self.geom_factory = geom_factory
+
     def _unique_points(self, pts):
-        return list(set(pts))  # Удаление дубликатов
+        # Удаление дубликатов с сохранением порядка
+        if not pts:
+            return np.empty((0, 2))
+        xy = np.array([(p.x(), p.y()) for p in pts], dtype=float)
+        _, first = np.unique(xy, axis=0, return_index=True)
+        return xy[np.sort(first)]
+
     def get_convex_hull(self) -> QgsGeometry:
-        if not self.input_pts:
-            return self.geom_factory.createGeometryCollection()
-        if len(self.input_pts) == 1:
-            return self.geom_factory.createPoint(self.input_pts[0])
-        if len(self.input_pts) == 2:
-            return self.geom_factory.createLineString([self.input_pts[0], self.input_pts[1]])
-        sorted_pts = sorted(self.input_pts, key=lambda p: (p.x(), p.y()))
-        hull = self._graham_scan(sorted_pts)
+        if not len(self.input_pts):
+            return QgsGeometry()
+        hull = [QgsPoint(x, y) for x, y in self.input_pts[convex_hull(self.input_pts)]]
         return self._line_or_polygon(hull)
-    def _graham_scan(self, pts):
-        if len(pts) < 3:
-            return pts
-        hull = [pts[0], pts[1]]
-        for pt in pts[2:]:
-            while len(hull) >= 2 and self._cross_product(hull[-2], hull[-1], pt) <= 0:
-                hull.pop()
-            hull.append(pt)
-        return hull
-    def _cross_product(self, o, a, b):
-        return (a.x() - o.x()) * (b.y() - o.y()) - (a.y() - o.y()) * (b.x() - o.x())
+
     def _line_or_polygon(self, hull):
         if len(hull) > 2:
             poly = QgsPolygon()
@@ -36,4 +32,4 @@ class ConvexHull:
         elif len(hull) == 2:
             return QgsGeometry(QgsLineString(hull))
         else:
-            return QgsGeometry(QgsPoint(hull[0]))
\ No newline at end of file
+            return QgsGeometry(hull[0])
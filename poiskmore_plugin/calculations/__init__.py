@@ -8,3 +8,150 @@ try:
 except Exception:
     # Оставляем проект работоспособным даже при временном отсутствии файла
     DriftCalculatorPM = None
+
+try:
+    from .leeway_particles import LeewayParticleEngine, LeewayCoefficients
+except Exception:
+    LeewayParticleEngine = None
+    LeewayCoefficients = None
+
+try:
+    from .drift_integrator import DriftIntegrator, WeatherSchedule
+except Exception:
+    DriftIntegrator = None
+    WeatherSchedule = None
+
+try:
+    from .ensemble_runner import EnsembleRunner, EnsembleCancelled
+except Exception:
+    EnsembleRunner = None
+    EnsembleCancelled = None
+
+try:
+    from .field_store import FieldStore, GriddedField
+except Exception:
+    FieldStore = None
+    GriddedField = None
+
+try:
+    from .result_cache import CacheKey, ResultCache, get_result_cache
+except Exception:
+    CacheKey = None
+    ResultCache = None
+    get_result_cache = None
+
+try:
+    from .drift_checkpoints import IncrementalDrift, CheckpointedRun
+except Exception:
+    IncrementalDrift = None
+    CheckpointedRun = None
+
+try:
+    from . import geodesy
+except Exception:
+    geodesy = None
+
+try:
+    from . import ring_utils
+except Exception:
+    ring_utils = None
+
+try:
+    from .backtrack import BacktrackEngine, Sighting
+except Exception:
+    BacktrackEngine = None
+    Sighting = None
+
+try:
+    from .trajectory_store import TrajectoryStore
+except Exception:
+    TrajectoryStore = None
+
+try:
+    from .land_mask import LandMask
+except Exception:
+    LandMask = None
+
+try:
+    from .sub_area_grid import SubAreaGrid
+except Exception:
+    SubAreaGrid = None
+
+try:
+    from .clustering import SpatialHash, complete_linkage, dbscan
+except Exception:
+    SpatialHash = None
+    complete_linkage = None
+    dbscan = None
+
+try:
+    from .line_buffer import LineBuffer, buffer_line
+except Exception:
+    LineBuffer = None
+    buffer_line = None
+
+try:
+    from .poc_grid import PocGrid
+except Exception:
+    PocGrid = None
+
+try:
+    from .effort_allocation import EffortAllocation, allocate, assign_units
+except Exception:
+    EffortAllocation = None
+    allocate = None
+    assign_units = None
+
+try:
+    from .search_history import SearchHistory, Sortie
+except Exception:
+    SearchHistory = None
+    Sortie = None
+
+try:
+    from .search_patterns import PATTERNS, SearchPattern, generate_pattern
+except Exception:
+    PATTERNS = ()
+    SearchPattern = None
+    generate_pattern = None
+
+try:
+    from .coverage_grid import CoverageGrid, detection_probability
+except Exception:
+    CoverageGrid = None
+    detection_probability = None
+
+try:
+    from .sru_assignment import SruAssignment, assign_srus, linear_sum_assignment
+except Exception:
+    SruAssignment = None
+    assign_srus = None
+    linear_sum_assignment = None
+
+try:
+    from .sea_routing import Route, RouteGraph, region_graph
+except Exception:
+    Route = None
+    RouteGraph = None
+    region_graph = None
+
+try:
+    from .deconfliction import Conflict, Track, find_conflicts
+except Exception:
+    Conflict = None
+    Track = None
+    find_conflicts = None
+
+try:
+    from .sortie_scheduler import SortiePlan, SortieScheduler, solar_elevation_deg
+except Exception:
+    SortiePlan = None
+    SortieScheduler = None
+    solar_elevation_deg = None
+
+try:
+    from .particle_hull import ParticleHull, convex_hull, particle_hull
+except Exception:
+    ParticleHull = None
+    convex_hull = None
+    particle_hull = None
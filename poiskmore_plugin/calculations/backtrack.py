@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Обратный дрейф: оценка места и времени бедствия по обнаружениям
+Частицы запускаются из точки последнего обнаружения и дрейфуют назад
+по расписанию погоды. Каждая частица получает вес по тому, насколько
+близко она проходит от остальных обнаружений в моменты их фиксации
+(индивидуальные коэффициенты ливея и ветвь частицы при этом сохраняются).
+Взвешенные положения частиц в возможные моменты бедствия дают
+вероятность места и времени начала дрейфа. Время бедствия по одному
+дрейфу не определяется - для него задается априорное распределение,
+например, по маршруту судна (route_prior).
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .ensemble_runner import GridSpec
+from .leeway_particles import (
+    NM_PER_DEGREE,
+    Forcing,
+    LeewayCoefficients,
+    LeewayParticleEngine,
+    ParticleCloud,
+)
+
+
+# Априорное распределение: (время, lat[], lon[]) -> вес каждой точки
+OriginPrior = Callable[[float, np.ndarray, np.ndarray], np.ndarray]
+
+
+@dataclass
+class Sighting:
+    """Обнаружение объекта дрейфа"""
+    lat: float
+    lon: float
+    time_hours: float                 # Время обнаружения, часы от начала расписания
+    position_error_nm: float = 0.5    # СКО места обнаружения по каждой оси
+
+
+@dataclass
+class OriginSurface:
+    """Вероятность места и времени начала дрейфа на сетке"""
+    grid: GridSpec
+    times: np.ndarray           # Возможные моменты бедствия, часы от начала расписания
+    probability: np.ndarray     # [время, строка (широта с юга), столбец], сумма = 1
+    effective_particles: float  # Эффективное число частиц после взвешивания
+
+    def position_probability(self) -> np.ndarray:
+        """Вероятность места (сумма по времени), [строка, столбец]"""
+        return self.probability.sum(axis=0)
+
+    def time_probability(self) -> np.ndarray:
+        """Вероятность момента бедствия по self.times"""
+        return self.probability.sum(axis=(1, 2))
+
+    def cell_centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Широты строк и долготы столбцов (центры ячеек)"""
+        grid = self.grid
+        dlat = (grid.lat_max - grid.lat_min) / grid.rows
+        dlon = (grid.lon_max - grid.lon_min) / grid.cols
+        return (grid.lat_min + dlat * (np.arange(grid.rows) + 0.5),
+                grid.lon_min + dlon * (np.arange(grid.cols) + 0.5))
+
+    def most_likely(self) -> Tuple[float, float, float]:
+        """Наиболее вероятные (lat, lon, время) начала дрейфа"""
+        t, row, col = np.unravel_index(int(np.argmax(self.probability)), self.probability.shape)
+        lats, lons = self.cell_centers()
+        return float(lats[row]), float(lons[col]), float(self.times[t])
+
+
+class BacktrackEngine:
+    """Обратный дрейф частиц и объединение нескольких обнаружений"""
+
+    def __init__(self,
+                 coefficients: LeewayCoefficients,
+                 forcing: Forcing,
+                 time_step_hours: float = 0.25,
+                 chunk_size: int = LeewayParticleEngine.DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            coefficients: Коэффициенты ливея объекта
+            forcing: Условия в прямом времени (например, WeatherSchedule)
+            time_step_hours: Шаг интегрирования, часы
+            chunk_size: Размер блока частиц
+        """
+        self.engine = LeewayParticleEngine(coefficients, forcing, time_step_hours, chunk_size)
+
+    def backtrack(self,
+                  sighting: Sighting,
+                  hours_back: float,
+                  n_particles: int,
+                  seed: Union[int, np.random.SeedSequence, None] = None,
+                  output_hours: Sequence[float] = ()) -> ParticleCloud:
+        """
+        Обратный дрейф от одного обнаружения
+
+        Args:
+            sighting: Обнаружение
+            hours_back: На сколько часов назад вести дрейф
+            n_particles: Число частиц
+            seed: Начальное значение генератора
+            output_hours: Сколько часов назад сохранять положения
+
+        Returns:
+            Облако на момент sighting.time_hours - hours_back
+        """
+        engine = self.engine.backward(sighting.time_hours)
+        return engine.simulate((sighting.lat, sighting.lon), hours_back, n_particles, seed,
+                               initial_error_nm=sighting.position_error_nm,
+                               output_hours=output_hours)
+
+    def origin_surface(self,
+                       sightings: Sequence[Sighting],
+                       earliest_hours: float,
+                       latest_hours: Optional[float] = None,
+                       time_resolution_hours: float = 1.0,
+                       n_particles: int = 20_000,
+                       prior: Optional[OriginPrior] = None,
+                       model_error_nm: float = 1.0,
+                       cell_nm: float = 1.0,
+                       smoothing_cells: float = 1.0,
+                       max_cells: int = 400,
+                       seed: Union[int, np.random.SeedSequence, None] = None) -> OriginSurface:
+        """
+        Вероятность места и времени начала дрейфа по нескольким обнаружениям
+
+        Частицы ведутся назад от последнего обнаружения; вес частицы -
+        произведение гауссовых правдоподобий ее положений в моменты
+        остальных обнаружений (СКО = ошибка места и model_error_nm).
+        Все обнаружения обрабатываются одним прогоном, поэтому десяток
+        обнаружений стоит почти столько же, сколько одно.
+
+        Args:
+            sightings: Обнаружения одного объекта
+            earliest_hours: Самый ранний возможный момент бедствия
+            latest_hours: Самый поздний; по умолчанию - первое обнаружение
+            time_resolution_hours: Шаг перебора момента бедствия
+            n_particles: Число частиц
+            prior: Априорный вес места в момент бедствия (route_prior);
+                None - равномерное распределение
+            model_error_nm: Дополнительная СКО модели дрейфа, мили
+            cell_nm: Размер ячейки сетки, мили
+            smoothing_cells: Ширина гауссова сглаживания, ячейки
+            max_cells: Предельное число ячеек по оси (ячейка укрупняется)
+            seed: Начальное значение генератора
+
+        Returns:
+            Поверхность вероятности начала дрейфа
+        """
+        if not sightings:
+            raise ValueError("Нужно хотя бы одно обнаружение")
+        last = max(sightings, key=lambda s: s.time_hours)
+        first_time = min(s.time_hours for s in sightings)
+        latest_hours = first_time if latest_hours is None else min(latest_hours, first_time)
+        if latest_hours < earliest_hours:
+            raise ValueError("Самый поздний момент бедствия раньше самого раннего")
+        times = np.arange(earliest_hours, latest_hours + 1e-9, time_resolution_hours)
+
+        # Один обратный прогон с сохранением положений на все нужные моменты
+        others = [s for s in sightings if s is not last]
+        hours_back = np.unique(np.round(np.concatenate(
+            [last.time_hours - times, [last.time_hours - s.time_hours for s in others]]), 9))
+        cloud = self.backtrack(last, float(hours_back.max()), n_particles, seed,
+                               output_hours=hours_back)
+
+        def positions(time_hours):
+            index = int(np.searchsorted(hours_back, round(last.time_hours - time_hours, 9)))
+            return cloud.track_lat[index], cloud.track_lon[index]
+
+        log_weight = np.zeros(n_particles)
+        for sighting in others:
+            lat, lon = positions(sighting.time_hours)
+            dy = (lat - sighting.lat) * NM_PER_DEGREE
+            dx = (lon - sighting.lon) * NM_PER_DEGREE * math.cos(math.radians(sighting.lat))
+            variance = sighting.position_error_nm ** 2 + model_error_nm ** 2
+            log_weight -= (dx * dx + dy * dy) / (2 * variance)
+        weight = np.exp(log_weight - log_weight.max())
+
+        stack_lat = np.stack([positions(t)[0] for t in times])
+        stack_lon = np.stack([positions(t)[1] for t in times])
+        weights = np.broadcast_to(weight, stack_lat.shape)
+        if prior is not None:
+            weights = weights * np.stack([np.asarray(prior(float(t), stack_lat[i], stack_lon[i]))
+                                          for i, t in enumerate(times)])
+        total = weights.sum()
+        if not total > 0:
+            raise ValueError("Обнаружения несовместимы с дрейфом и априорным распределением")
+
+        grid = _covering_grid(stack_lat, stack_lon, cell_nm, max_cells)
+        counts = _histogram_stack(grid, stack_lat, stack_lon, weights / total)
+        probability = (_gaussian_matrix(grid.rows, smoothing_cells) @ counts
+                       @ _gaussian_matrix(grid.cols, smoothing_cells).T)
+        probability /= probability.sum()
+        effective = float(weight.sum() ** 2 / np.square(weight).sum())
+        return OriginSurface(grid, times, probability, effective)
+
+
+def route_prior(waypoints: Sequence[Tuple[float, float, float]], sigma_nm: float) -> OriginPrior:
+    """
+    Априорное распределение по маршруту судна
+
+    Args:
+        waypoints: Плановые точки маршрута (время, lat, lon), по возрастанию времени
+        sigma_nm: СКО отклонения от маршрута, мили
+
+    Returns:
+        Вес положения в момент t: гауссиана вокруг планового места
+        (вне маршрута - крайние точки)
+    """
+    route = np.asarray(waypoints, dtype=np.float64)
+
+    def prior(t_hours: float, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        route_lat = np.interp(t_hours, route[:, 0], route[:, 1])
+        route_lon = np.interp(t_hours, route[:, 0], route[:, 2])
+        dy = (lat - route_lat) * NM_PER_DEGREE
+        dx = (lon - route_lon) * NM_PER_DEGREE * math.cos(math.radians(route_lat))
+        return np.exp(-(dx * dx + dy * dy) / (2 * sigma_nm ** 2))
+
+    return prior
+
+
+def _covering_grid(lat: np.ndarray, lon: np.ndarray, cell_nm: float, max_cells: int) -> GridSpec:
+    """Сетка, покрывающая все частицы с запасом в три ячейки"""
+    lat_min, lat_max = float(np.nanmin(lat)), float(np.nanmax(lat))
+    lon_min, lon_max = float(np.nanmin(lon)), float(np.nanmax(lon))
+
+    cos_lat = math.cos(math.radians((lat_min + lat_max) / 2))
+    span_nm = max((lat_max - lat_min) * NM_PER_DEGREE, (lon_max - lon_min) * NM_PER_DEGREE * cos_lat)
+    cell_nm = max(cell_nm, span_nm / (max_cells - 6))
+    dlat = cell_nm / NM_PER_DEGREE
+    dlon = cell_nm / (NM_PER_DEGREE * cos_lat)
+
+    rows = int(math.ceil((lat_max - lat_min) / dlat)) + 6
+    cols = int(math.ceil((lon_max - lon_min) / dlon)) + 6
+    lat0 = lat_min - 3 * dlat
+    lon0 = lon_min - 3 * dlon
+    return GridSpec(lat0, lat0 + rows * dlat, lon0, lon0 + cols * dlon, rows, cols)
+
+
+def _histogram_stack(grid: GridSpec, lat: np.ndarray, lon: np.ndarray,
+                     weights: np.ndarray) -> np.ndarray:
+    """Взвешенные гистограммы [время, строка, столбец] одним вызовом bincount"""
+    n_times = lat.shape[0]
+    row = ((lat - grid.lat_min) * (grid.rows / (grid.lat_max - grid.lat_min))).astype(np.intp)
+    col = ((lon - grid.lon_min) * (grid.cols / (grid.lon_max - grid.lon_min))).astype(np.intp)
+    np.clip(row, 0, grid.rows - 1, out=row)
+    np.clip(col, 0, grid.cols - 1, out=col)
+    flat = (np.arange(n_times)[:, None] * grid.rows + row) * grid.cols + col
+    counts = np.bincount(flat.ravel(), weights=np.ravel(weights),
+                         minlength=n_times * grid.rows * grid.cols)
+    return counts.reshape(n_times, grid.rows, grid.cols)
+
+
+def _gaussian_matrix(n: int, sigma_cells: float) -> np.ndarray:
+    """Матрица гауссова сглаживания вдоль оси из n ячеек (столбцы нормированы)"""
+    if sigma_cells <= 0:
+        return np.eye(n)
+    index = np.arange(n)
+    kernel = np.exp(-0.5 * ((index[:, None] - index[None, :]) / sigma_cells) ** 2)
+    return kernel / kernel.sum(axis=0, keepdims=True)
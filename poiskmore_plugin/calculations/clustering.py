@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+Группировка точек по расстоянию с пространственным индексом
+Точки хэшируются по ячейкам в геоцентрических координатах (сфера
+EARTH_RADIUS_NM, как в distance_nm): ячейка не меньше хорды радиуса
+поиска, поэтому соседи точки лежат в 27 окрестных ячейках. Расстояние
+сравнивается по скалярному произведению единичных векторов, у самого
+порога - по distance_nm. Полюса и линия перемены дат не требуют особой
+обработки.
+
+Два способа группировки:
+- complete: жадная полная связь, как в прежнем SearchAreaCalculator -
+  точка входит в группу, если она не дальше max_distance от всех ее точек;
+- dbscan: связные компоненты ядерных точек (не меньше min_samples соседей
+  в радиусе eps), граничная точка - к группе соседнего ядра с наименьшим
+  номером, остальные - шум.
+"""
+
+import math
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from .geodesy import EARTH_RADIUS_NM, distance_nm
+
+
+# Метка шума DBSCAN
+NOISE = -1
+
+# Предельное число пар-кандидатов, обрабатываемых за раз
+PAIR_BUDGET = 4_000_000
+
+# Наибольшая окрестность, для которой полная связь строит матрицу близости
+MATRIX_LIMIT = 2048
+
+# Соседние ячейки: 9 пар смещений (dx, dy); по z три ячейки подряд имеют
+# соседние ключи и образуют один непрерывный диапазон отсортированных точек
+_OFFSETS = np.array([(dx, dy, 0) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+
+# Относительная ширина полосы у порога, где решение принимается по distance_nm
+_EDGE_TOLERANCE = 1e-9
+
+
+class SpatialHash:
+    """Пространственный хэш точек на сфере для поиска соседей в радиусе"""
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, radius_nm: float):
+        """
+        Args:
+            lat, lon: Координаты точек, градусы
+            radius_nm: Радиус поиска соседей, морские мили
+        """
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.radius_nm = float(radius_nm)
+        phi, lmb = np.radians(self.lat), np.radians(self.lon)
+        # Единичные векторы по осям: (x[], y[], z[])
+        self.xyz = np.stack([np.cos(phi) * np.cos(lmb), np.cos(phi) * np.sin(lmb), np.sin(phi)])
+
+        # Сравнение по хорде единичной сферы: скалярное произведение не меньше cos(угла)
+        angle = min(self.radius_nm / EARTH_RADIUS_NM, math.pi)
+        self._min_dot = math.cos(angle)
+
+        # Ячейка - хорда радиуса поиска с запасом на округление; не мельче,
+        # чем нужно, чтобы ключ ячейки поместился в int64
+        chord = 2 * math.sin(angle / 2)
+        low = self.xyz.min(axis=1) if len(self) else np.zeros(3)
+        span = float(np.ptp(self.xyz, axis=1).max()) if len(self) else 0.0
+        cell = max(chord * (1 + 1e-6), span / 2e6, 1e-12)
+        # Сдвиг на 1, чтобы у соседних ячеек индексы не уходили в минус
+        index = np.floor((self.xyz.T - low) / cell).astype(np.int64) + 1
+        size = index.max(axis=0) + 2 if len(self) else np.ones(3, dtype=np.int64)
+        self._strides = np.array([size[1] * size[2], size[2], 1], dtype=np.int64)
+        self.keys = index @ self._strides
+        self.order = np.argsort(self.keys, kind='stable')
+        self._sorted_keys = self.keys[self.order]
+        self._offset_keys = _OFFSETS @ self._strides
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def cell_ranges(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Диапазоны self.order с точками соседних ячеек: start, stop [точка, 9]"""
+        keys = self.keys[points][:, None] + self._offset_keys[None, :]
+        return (np.searchsorted(self._sorted_keys, keys - 1, side='left'),
+                np.searchsorted(self._sorted_keys, keys + 1, side='right'))
+
+    def candidates(self, point: int, ranges: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> np.ndarray:
+        """
+        Номера точек в соседних ячейках точки point (включая ее саму), по возрастанию
+
+        Args:
+            ranges: Заранее найденные cell_ranges всех точек
+        """
+        start, stop = ranges if ranges is not None else self.cell_ranges(np.array([point]))
+        row = point if ranges is not None else 0
+        return np.sort(np.concatenate([self.order[a:b] for a, b in zip(start[row], stop[row]) if b > a]))
+
+    def within(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """Признак "точки i и j не дальше радиуса" (как distance_nm <= radius_nm)"""
+        return self._within(self.xyz, self.lat, self.lon, i, j)
+
+    def _within(self, xyz, lat, lon, i, j) -> np.ndarray:
+        dot = xyz[0][i] * xyz[0][j] + xyz[1][i] * xyz[1][j] + xyz[2][i] * xyz[2][j]
+        close = dot >= self._min_dot
+        edge = np.abs(dot - self._min_dot) <= _EDGE_TOLERANCE * (1 - self._min_dot) + 1e-14
+        if np.any(edge):
+            i, j = np.broadcast_arrays(i, j)
+            close[edge] = distance_nm(lat[i[edge]], lon[i[edge]], lat[j[edge]], lon[j[edge]]) <= self.radius_nm
+        return close
+
+    def neighbors(self, point: int, ranges: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> np.ndarray:
+        """Точки не дальше радиуса от точки point (включая ее саму), по возрастанию номера"""
+        candidates = self.candidates(point, ranges)
+        return candidates[self.within(point, candidates)]
+
+    def pairs(self, budget: int = PAIR_BUDGET) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Все пары соседей порциями не больше budget кандидатов
+
+        Каждая пара выдается один раз: просматриваются только "передние"
+        соседние ячейки (с большим ключом), внутри ячейки - пары i < j.
+
+        Yields:
+            (i, j) - массивы номеров точек
+        """
+        n = len(self)
+        if n < 2:
+            return
+        keys = self._sorted_keys
+        forward = self._offset_keys[self._offset_keys > 0]
+        start = np.concatenate([np.searchsorted(keys, keys[:, None] + forward - 1, side='left'),
+                                np.searchsorted(keys, keys, side='left')[:, None]], axis=1)
+        stop = np.concatenate([np.searchsorted(keys, keys[:, None] + forward + 1, side='right'),
+                               np.searchsorted(keys, keys + 1, side='right')[:, None]], axis=1)
+        # В своей ячейке - только точки после текущей в порядке сортировки
+        start[:, -1] = np.maximum(start[:, -1], np.arange(1, n + 1))
+        stop = np.maximum(stop, start)
+        for point, other in self._scan(np.arange(n), start, stop, budget):
+            yield self.order[point], self.order[other]
+
+    def neighbor_counts(self, points: Optional[np.ndarray] = None,
+                        budget: int = PAIR_BUDGET) -> np.ndarray:
+        """
+        Число точек в радиусе (включая саму точку)
+
+        Args:
+            points: Номера точек; None - все точки
+        """
+        if points is None:
+            counts = np.ones(len(self), dtype=np.int64)
+            for i, j in self.pairs(budget):
+                counts += np.bincount(i, minlength=len(self)) + np.bincount(j, minlength=len(self))
+            return counts
+        rank = np.empty(len(self), dtype=np.int64)
+        rank[self.order] = np.arange(len(self))
+        points = rank[np.asarray(points, dtype=np.int64)]
+        position = np.sort(points)
+        start, stop = self.cell_ranges(self.order[position])
+        counts = np.zeros(len(self), dtype=np.int64)
+        for point, _ in self._scan(position, start, stop, budget):
+            counts += np.bincount(point, minlength=len(self))
+        return counts[points]
+
+    def dense_cells(self, min_points: int) -> np.ndarray:
+        """
+        Точки, у которых заведомо не меньше min_points соседей
+
+        Мелкие ячейки с диагональю в радиус поиска: все точки такой ячейки -
+        соседи друг друга, поэтому ячейка из min_points точек дает их сразу.
+        """
+        if not len(self):
+            return np.zeros(0, dtype=bool)
+        angle = min(self.radius_nm / EARTH_RADIUS_NM, math.pi)
+        side = 2 * math.sin(angle / 2) / math.sqrt(3) * (1 - 1e-6)
+        index = np.floor((self.xyz.T - self.xyz.min(axis=1)) / max(side, 1e-12)).astype(np.int64)
+        size = index.max(axis=0) + 1
+        if np.prod(size.astype(np.float64)) >= 2 ** 62:
+            return np.zeros(len(self), dtype=bool)
+        keys = index @ np.array([size[1] * size[2], size[2], 1], dtype=np.int64)
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        return counts[inverse] >= min_points
+
+    def _scan(self, positions: np.ndarray, start: np.ndarray, stop: np.ndarray,
+              budget: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Проверка кандидатов порциями в порядке сортировки (соседние ячейки памяти)
+
+        Args:
+            positions: Позиции точек в self.order
+            start, stop: Диапазоны кандидатов (позиции в self.order) для каждой точки
+
+        Yields:
+            Позиции (точка, сосед) близких пар
+        """
+        xyz, lat, lon = self.xyz[:, self.order], self.lat[self.order], self.lon[self.order]
+        load = np.cumsum((stop - start).sum(axis=1))
+        first = 0
+        while first < len(positions):
+            offset = load[first - 1] if first else 0
+            last = max(int(np.searchsorted(load, offset + budget, side='right')), first + 1)
+            counts = (stop[first:last] - start[first:last]).ravel()
+            total = int(counts.sum())
+            point = np.repeat(np.repeat(positions[first:last], start.shape[1]), counts)
+            other = (np.repeat(start[first:last].ravel(), counts)
+                     + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+            close = self._within(xyz, lat, lon, point, other)
+            yield point[close], other[close]
+            first = last
+
+
+def complete_linkage(lat: np.ndarray, lon: np.ndarray, max_distance_nm: float) -> np.ndarray:
+    """
+    Жадная полная связь (результат совпадает с прежним перебором всех пар)
+
+    Очередная свободная точка открывает группу; остальные свободные точки
+    по возрастанию номера добавляются, если они не дальше max_distance_nm
+    от всех точек группы. Кандидаты - только соседи первой точки группы.
+
+    Returns:
+        Номер группы каждой точки; группы пронумерованы по первой точке
+    """
+    index = SpatialHash(lat, lon, max_distance_nm)
+    n = len(index)
+    labels = np.full(n, -1, dtype=np.int64)
+    if not n:
+        return labels
+    ranges = index.cell_ranges(np.arange(n))
+    alone = (ranges[1] - ranges[0]).sum(axis=1) == 1
+    group = 0
+    for seed in range(n):
+        if labels[seed] >= 0:
+            continue
+        labels[seed] = group
+        group += 1
+        if alone[seed]:
+            continue
+        candidates = index.neighbors(seed, ranges)
+        candidates = candidates[(candidates > seed) & (labels[candidates] < 0)]
+        if not len(candidates):
+            continue
+        # Попарная близость кандидатов - одним вызовом (для большой
+        # окрестности - строка на каждую добавленную точку)
+        close = None
+        if len(candidates) <= MATRIX_LIMIT:
+            close = index.within(candidates[:, None], candidates[None, :])
+        compatible = np.ones(len(candidates), dtype=bool)
+        position = 0
+        while position < len(candidates):
+            position += int(np.argmax(compatible[position:]))
+            if not compatible[position]:
+                break
+            labels[candidates[position]] = labels[seed]
+            compatible &= close[position] if close is not None else index.within(candidates[position], candidates)
+            compatible[position] = False
+    return labels
+
+
+def dbscan(lat: np.ndarray, lon: np.ndarray, eps_nm: float, min_samples: int = 1) -> np.ndarray:
+    """
+    Группировка DBSCAN (min_samples = 1 - одиночная связь)
+
+    Args:
+        lat, lon: Координаты точек
+        eps_nm: Радиус соседства, мили
+        min_samples: Минимальное число точек в радиусе ядерной точки (включая ее)
+
+    Returns:
+        Номер группы каждой точки (NOISE - шум); группы пронумерованы по
+        первой точке
+    """
+    index = SpatialHash(lat, lon, eps_nm)
+    n = len(index)
+    if not n:
+        return np.empty(0, dtype=np.int64)
+    # Точки плотных мелких ячеек - ядра без подсчета соседей
+    core = index.dense_cells(min_samples)
+    rest = np.flatnonzero(~core)
+    core[rest] = index.neighbor_counts(rest) >= min_samples
+
+    # Связные компоненты ядерных точек: объединение корней с указателями
+    parent = np.arange(n)
+    border_i, border_j = [], []
+    for i, j in index.pairs():
+        both = core[i] & core[j]
+        _union(parent, i[both], j[both])
+        # Граничная точка - пара с ядром
+        one = core[i] ^ core[j]
+        border_i.append(np.where(core[i[one]], j[one], i[one]))
+        border_j.append(np.where(core[i[one]], i[one], j[one]))
+    root = _find(parent, np.arange(n))
+
+    labels = np.where(core, root, NOISE)
+    if border_i:
+        point = np.concatenate(border_i)
+        owner = np.concatenate(border_j)
+        # Ядро с наименьшим номером среди соседей граничной точки
+        first = np.full(n, n, dtype=np.int64)
+        np.minimum.at(first, point, owner)
+        attached = ~core & (first < n)
+        labels[attached] = root[first[attached]]
+    return _renumber(labels)
+
+
+def group_labels(lat: np.ndarray, lon: np.ndarray, max_distance_nm: float,
+                 method: str = 'complete', min_samples: int = 1) -> np.ndarray:
+    """
+    Номера групп для SearchAreaCalculator: шум DBSCAN - отдельные группы из одной точки
+
+    Args:
+        method: 'complete' или 'dbscan'
+        min_samples: Только для 'dbscan'
+    """
+    if method == 'complete':
+        return complete_linkage(lat, lon, max_distance_nm)
+    if method == 'dbscan':
+        labels = dbscan(lat, lon, max_distance_nm, min_samples)
+        noise = labels == NOISE
+        labels[noise] = labels.max(initial=-1) + 1 + np.arange(noise.sum())
+        return _renumber(labels)
+    raise ValueError(f"Неизвестный способ группировки: {method}")
+
+
+def _find(parent: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Корни точек (со сжатием путей)"""
+    roots = parent[points]
+    while True:
+        up = parent[roots]
+        if np.array_equal(up, roots):
+            break
+        roots = up
+    parent[points] = roots
+    return roots
+
+
+def _union(parent: np.ndarray, i: np.ndarray, j: np.ndarray):
+    """Объединить множества пар (i, j); меньший корень становится родителем"""
+    while len(i):
+        ri, rj = _find(parent, i), _find(parent, j)
+        differ = ri != rj
+        if not differ.any():
+            break
+        ri, rj = ri[differ], rj[differ]
+        # При нескольких записях в один корень выживает минимум - остальные пары повторяются
+        np.minimum.at(parent, np.maximum(ri, rj), np.minimum(ri, rj))
+        i, j = i[differ], j[differ]
+
+
+def _renumber(labels: np.ndarray) -> np.ndarray:
+    """Перенумеровать группы по порядку первых точек (шум не меняется)"""
+    result = np.full(len(labels), NOISE, dtype=np.int64)
+    grouped = labels != NOISE
+    if grouped.any():
+        _, first, inverse = np.unique(labels[grouped], return_index=True, return_inverse=True)
+        rank = np.empty(len(first), dtype=np.int64)
+        rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+        result[grouped] = rank[inverse]
+    return result
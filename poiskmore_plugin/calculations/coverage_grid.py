@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Растр покрытия: обследованная площадь маршрутов SRU по ячейкам сетки POC
+Каждый отрезок маршрута - полоса шириной обзора W, представленная
+параллельными линиями с шагом не больше половины ячейки (каждая несет
+свою долю ширины). Линии делятся пересечениями с границами ячеек, и
+длины частей всех линий всех маршрутов раскладываются по ячейкам одним
+np.bincount - вдоль маршрута разложение точное. Значение ячейки -
+коэффициент покрытия C = обследованная площадь / площадь ячейки, из него
+POD ячейки по экспоненциальному закону (1 - exp(-C)) или закону обратных
+кубов (erf(sqrt(pi) / 2 * C)). Сетка совпадает с PocGrid, поэтому
+POS = sum(POC * POD) считается поэлементно.
+"""
+
+import math
+from dataclasses import dataclass, replace
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from .geodesy import laea_forward
+from .poc_grid import PocGrid, erf
+
+
+DETECTION_LAWS = ('exponential', 'inverse_cube')
+SAMPLES_PER_CELL = 2            # Линий полосы на размер ячейки поперек маршрута
+CHUNK_SAMPLES = 4_000_000       # Частей линий за один проход (ограничение памяти)
+
+
+@dataclass
+class CoverageGrid:
+    """Коэффициент покрытия по ячейкам сетки POC"""
+    grid: PocGrid               # Привязка (значения POC не используются)
+    coverage: np.ndarray        # [строка, столбец], как grid.values
+
+    @classmethod
+    def for_grid(cls, grid: PocGrid) -> 'CoverageGrid':
+        """Пустой растр покрытия на сетке grid"""
+        return cls(grid, np.zeros(grid.shape))
+
+    @property
+    def effort(self) -> np.ndarray:
+        """Обследованная площадь по ячейкам, кв. мили"""
+        return self.coverage * self.grid.cell_area_nm2
+
+    def burn(self,
+             tracks: Sequence,
+             sweep_width_nm,
+             step_nm: Optional[float] = None) -> 'CoverageGrid':
+        """
+        Добавить маршруты к покрытию
+
+        Args:
+            tracks: Маршруты - массивы точек (lat, lon) или SearchPattern
+                (учитываются только поисковые галсы, без переходов)
+            sweep_width_nm: Ширина обзора - одна на все маршруты или по маршруту
+            step_nm: Шаг линий полосы; по умолчанию - ячейка / SAMPLES_PER_CELL
+
+        Returns:
+            self
+        """
+        widths = np.broadcast_to(np.asarray(sweep_width_nm, dtype=np.float64), (len(tracks),))
+        if (widths < 0).any():
+            raise ValueError("Ширина обзора не может быть отрицательной")
+        step = self.grid.cell_nm / SAMPLES_PER_CELL if step_nm is None else float(step_nm)
+        if step <= 0:
+            raise ValueError("Шаг должен быть положительным")
+
+        starts, ends, segment_width = [], [], []
+        for track, width in zip(tracks, widths):
+            start, end = self._segments(track)
+            starts.append(start)
+            ends.append(end)
+            segment_width.append(np.full(len(start), width))
+        if not starts:
+            return self
+        self._accumulate(np.concatenate(starts), np.concatenate(ends), np.concatenate(segment_width), step)
+        return self
+
+    def pod(self, law: str = 'exponential') -> np.ndarray:
+        """POD по ячейкам"""
+        return detection_probability(self.coverage, law)
+
+    def pos(self, poc=None, law: str = 'exponential') -> float:
+        """Вероятность успеха по сетке POC (по умолчанию - по self.grid)"""
+        values = self.grid.values if poc is None else getattr(poc, 'values', poc)
+        return float(np.sum(np.asarray(values) * self.pod(law)))
+
+    def pod_grid(self, law: str = 'exponential') -> PocGrid:
+        """POD как сетка той же привязки (для растрового слоя)"""
+        return replace(self.grid, values=self.pod(law))
+
+    def _segments(self, track) -> Tuple[np.ndarray, np.ndarray]:
+        """Отрезки маршрута в проекции сетки: (начала, концы) [отрезок, (x, y)]"""
+        legs = getattr(track, 'search_legs', None)
+        points = np.asarray(getattr(track, 'waypoints', track), dtype=np.float64).reshape(-1, 2)
+        x, y = laea_forward(points[:, 0], points[:, 1], self.grid.origin[0], self.grid.origin[1],
+                            self.grid.ellipsoid)
+        xy = np.column_stack([x, y])
+        index = np.arange(len(xy) - 1) if legs is None else np.asarray(legs, dtype=np.int64)
+        return xy[index], xy[index + 1]
+
+    def _accumulate(self, start: np.ndarray, end: np.ndarray, width: np.ndarray, step: float):
+        """Разложить полосы отрезков по ячейкам"""
+        delta = end - start
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        keep = (length > 0) & (width > 0)
+        start, delta, length, width = start[keep], delta[keep], length[keep], width[keep]
+        # Полоса - across параллельных линий, каждая несет ширину width / across
+        across = np.maximum(np.ceil(width / step), 1).astype(np.int64)
+        line_segment = np.repeat(np.arange(len(across)), across)
+        line_index = np.arange(len(line_segment)) - np.repeat(np.cumsum(across) - across, across)
+        offset = ((line_index + 0.5) / across[line_segment] - 0.5) * width[line_segment]
+        direction = delta[line_segment] / length[line_segment, None]
+        first = start[line_segment] + offset[:, None] * np.column_stack([direction[:, 1], -direction[:, 0]])
+        # Концы линий в единицах ячейки от угла сетки (ось y - на север)
+        a = (first - [self.grid.x0, self.grid.y0]) / self.grid.cell_nm
+        b = a + delta[line_segment] / self.grid.cell_nm
+        density = (width / across / self.grid.cell_area_nm2 * length)[line_segment]
+
+        pieces = (np.abs(np.floor(b) - np.floor(a)).sum(axis=1) + 1).astype(np.int64)
+        bounds = np.concatenate([[0], np.cumsum(pieces)])
+        lo = 0
+        while lo < len(pieces):
+            hi = int(np.searchsorted(bounds, bounds[lo] + CHUNK_SAMPLES, side='right')) - 1
+            hi = max(hi, lo + 1)
+            self._burn_lines(a[lo:hi], b[lo:hi], density[lo:hi])
+            lo = hi
+
+    def _burn_lines(self, a: np.ndarray, b: np.ndarray, density: np.ndarray):
+        """
+        Точное разложение линий по ячейкам: линия делится пересечениями с
+        границами ячеек, каждая часть дает density * (доля длины) своей ячейке
+        """
+        count = len(a)
+        lines, params = [np.arange(count), np.arange(count)], [np.zeros(count), np.ones(count)]
+        for axis in (0, 1):
+            low = np.floor(np.minimum(a[:, axis], b[:, axis]))
+            crossings = (np.floor(np.maximum(a[:, axis], b[:, axis])) - low).astype(np.int64)
+            line = np.repeat(np.arange(count), crossings)
+            boundary = low[line] + 1 + np.arange(len(line)) - np.repeat(np.cumsum(crossings) - crossings, crossings)
+            lines.append(line)
+            params.append((boundary - a[line, axis]) / (b[line, axis] - a[line, axis]))
+        line = np.concatenate(lines)
+        t = np.concatenate(params)
+        # Порядок по линии, внутри линии - по t (t / 2 < 1, линии не смешиваются)
+        order = np.argsort(line + t / 2)
+        line, t = line[order], t[order]
+        same = line[1:] == line[:-1]
+        line, t0, t1 = line[:-1][same], t[:-1][same], t[1:][same]
+        middle = (t0 + t1) / 2
+        gx = a[line, 0] + middle * (b[line, 0] - a[line, 0])
+        gy = a[line, 1] + middle * (b[line, 1] - a[line, 1])
+        rows, cols = self.grid.shape
+        col = np.floor(gx).astype(np.int64)
+        row = rows - 1 - np.floor(gy).astype(np.int64)
+        inside = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+        cells = row[inside] * cols + col[inside]
+        flat = self.coverage.reshape(-1)
+        flat += np.bincount(cells, weights=((t1 - t0) * density[line])[inside], minlength=flat.size)
+
+
+def detection_probability(coverage, law: str = 'exponential') -> np.ndarray:
+    """
+    POD по коэффициенту покрытия
+
+    Args:
+        coverage: Коэффициент покрытия C (число или массив)
+        law: 'exponential' - 1 - exp(-C) (случайный поиск),
+            'inverse_cube' - erf(sqrt(pi) / 2 * C) (параллельные галсы, зрительный поиск)
+    """
+    coverage = np.asarray(coverage, dtype=np.float64)
+    if law == 'exponential':
+        return -np.expm1(-coverage)
+    if law == 'inverse_cube':
+        return erf(math.sqrt(math.pi) / 2 * coverage)
+    raise ValueError(f"Неизвестный закон обнаружения: {law}")
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Разведение SRU во времени и пространстве (4D)
+Маршруты - точки со временем, координатами и высотой (или эшелоном -
+диапазоном высот); между точками движение равномерное. Конфликт - момент,
+когда две SRU ближе минимума по горизонтали и одновременно ближе минимума
+по вертикали.
+
+Грубый отбор - пространственно-временное хэширование: каждый отрезок
+маршрута (охват, расширенный на половину горизонтального минимума)
+заносится в ячейки (интервал времени, ячейка плоскости), и пары отрезков
+разных SRU берутся только из общих ячеек. Точная проверка пары - на общем
+интервале времени: относительное движение линейно, поэтому интервал
+нарушения по горизонтали - корни квадратного уравнения, по вертикали -
+линейные неравенства. Нарушения соседних отрезков сливаются в один
+конфликт с временем и местом наибольшего сближения.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .geodesy import laea_forward, laea_inverse
+
+
+# Минимумы разделения воздушных судов на поиске (IAMSAR: 500 футов по
+# вертикали для соседних районов)
+DEFAULT_HORIZONTAL_SEPARATION_NM = 1.0
+DEFAULT_VERTICAL_SEPARATION_FT = 500.0
+CHUNK_PAIRS = 2_000_000         # Пар отрезков за один проход точной проверки
+MERGE_GAP = 1e-3                # Нарушения с меньшим разрывом (с) - один конфликт
+
+
+@dataclass
+class Track:
+    """Маршрут SRU с отметками времени"""
+    sru_id: object
+    times: np.ndarray                   # Секунды (возрастают); datetime переводится в POSIX
+    lat: np.ndarray
+    lon: np.ndarray
+    altitude: Optional[np.ndarray] = None   # Высота в точках, футы (None - 0)
+    band: Optional[Tuple[float, float]] = None  # Эшелон (нижняя, верхняя граница), футы
+
+    def __post_init__(self):
+        self.times = _seconds(self.times)
+        self.lat = np.asarray(self.lat, dtype=np.float64)
+        self.lon = np.asarray(self.lon, dtype=np.float64)
+        if not (len(self.times) == len(self.lat) == len(self.lon)):
+            raise ValueError("Число отметок времени не совпадает с числом точек")
+        if (np.diff(self.times) <= 0).any():
+            raise ValueError("Отметки времени должны возрастать")
+        if self.altitude is not None:
+            self.altitude = np.broadcast_to(np.asarray(self.altitude, dtype=np.float64), self.times.shape)
+
+    @classmethod
+    def from_waypoints(cls, sru_id, waypoints: Sequence[Tuple[float, float]], times, **options) -> 'Track':
+        """Маршрут по точкам (lat, lon) и их времени"""
+        points = np.asarray(waypoints, dtype=np.float64).reshape(-1, 2)
+        return cls(sru_id, times, points[:, 0], points[:, 1], **options)
+
+    def vertical_extent(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Нижняя и верхняя граница по точкам, футы"""
+        if self.band is not None:
+            low, high = float(min(self.band)), float(max(self.band))
+            return np.full(len(self.times), low), np.full(len(self.times), high)
+        altitude = np.zeros(len(self.times)) if self.altitude is None else self.altitude
+        return altitude, altitude
+
+
+@dataclass
+class Conflict:
+    """Нарушение разделения двух SRU"""
+    sru_a: object
+    sru_b: object
+    start: float                # Начало нарушения (единицы времени маршрутов)
+    end: float                  # Окончание
+    time: float                 # Момент наибольшего сближения
+    lat: float                  # Середина между SRU в этот момент
+    lon: float
+    distance_nm: float          # Расстояние по горизонтали
+    vertical_ft: float          # Разделение по вертикали (отрицательное - эшелоны перекрываются)
+
+
+def find_conflicts(tracks: Sequence[Track],
+                   horizontal_nm: float = DEFAULT_HORIZONTAL_SEPARATION_NM,
+                   vertical_ft: float = DEFAULT_VERTICAL_SEPARATION_FT,
+                   cell_nm: Optional[float] = None,
+                   time_bin: Optional[float] = None) -> List[Conflict]:
+    """
+    Конфликты между всеми парами маршрутов
+
+    Args:
+        tracks: Маршруты SRU
+        horizontal_nm: Минимум разделения по горизонтали, мили
+        vertical_ft: Минимум разделения по вертикали, футы
+        cell_nm: Размер ячейки хэша; по умолчанию - минимум по горизонтали
+            (не меньше типичной длины отрезка)
+        time_bin: Интервал времени хэша; по умолчанию - время пролета ячейки
+
+    Returns:
+        Конфликты по порядку пар SRU и времени
+    """
+    if horizontal_nm <= 0:
+        raise ValueError("Минимум по горизонтали должен быть положительным")
+    segments = _Segments(tracks)
+    if len(segments.owner) == 0 or len(tracks) < 2:
+        return []
+    first, second = _candidate_pairs(segments, horizontal_nm, cell_nm, time_bin)
+    if not len(first):
+        return []
+
+    found = []
+    for lo in range(0, len(first), CHUNK_PAIRS):
+        found.append(_violations(segments, first[lo:lo + CHUNK_PAIRS], second[lo:lo + CHUNK_PAIRS],
+                                 horizontal_nm, vertical_ft))
+    violations = {key: np.concatenate([part[key] for part in found]) for key in found[0]}
+    return _merge(segments, tracks, violations)
+
+
+class _Segments:
+    """Отрезки всех маршрутов в плоскости проекции"""
+
+    def __init__(self, tracks: Sequence[Track]):
+        lat = np.concatenate([track.lat for track in tracks]) if tracks else np.empty(0)
+        lon = np.concatenate([track.lon for track in tracks]) if tracks else np.empty(0)
+        self.origin = (float(np.mean(lat)), float(np.mean(lon))) if len(lat) else (0.0, 0.0)
+        self.epoch = float(min(track.times[0] for track in tracks if len(track.times))) if len(lat) else 0.0
+        parts = {key: [] for key in ('owner', 't0', 't1', 'p0', 'p1', 'low0', 'low1', 'high0', 'high1')}
+        for number, track in enumerate(tracks):
+            if len(track.times) < 2:
+                continue
+            x, y = laea_forward(track.lat, track.lon, *self.origin, ellipsoid=False)
+            xy = np.column_stack([x, y])
+            low, high = track.vertical_extent()
+            t = track.times - self.epoch
+            parts['owner'].append(np.full(len(t) - 1, number))
+            parts['t0'].append(t[:-1])
+            parts['t1'].append(t[1:])
+            parts['p0'].append(xy[:-1])
+            parts['p1'].append(xy[1:])
+            parts['low0'].append(low[:-1])
+            parts['low1'].append(low[1:])
+            parts['high0'].append(high[:-1])
+            parts['high1'].append(high[1:])
+        for key, values in parts.items():
+            if values:
+                setattr(self, key, np.concatenate(values))
+            else:
+                setattr(self, key, np.empty((0, 2) if key in ('p0', 'p1') else 0))
+        duration = self.t1 - self.t0
+        self.velocity = (self.p1 - self.p0) / duration[:, None] if len(duration) else np.empty((0, 2))
+        self.low_rate = (self.low1 - self.low0) / duration if len(duration) else duration
+        self.high_rate = (self.high1 - self.high0) / duration if len(duration) else duration
+
+
+def _candidate_pairs(segments: _Segments, horizontal_nm: float,
+                     cell_nm: Optional[float], time_bin: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Пары отрезков разных SRU с общей ячейкой хэша (без повторов)"""
+    length = np.hypot(*(segments.p1 - segments.p0).T)
+    duration = segments.t1 - segments.t0
+    if cell_nm is None:
+        cell_nm = max(horizontal_nm, float(np.median(length)))
+    if time_bin is None:
+        # Время пролета ячейки, но не больше десятка типичных отрезков
+        step = float(np.median(duration))
+        speed = float(np.median(length / duration))
+        time_bin = max(step, min(cell_nm / speed if speed > 0 else np.inf, 10 * step))
+
+    margin = horizontal_nm / 2
+    low = np.minimum(segments.p0, segments.p1) - margin
+    high = np.maximum(segments.p0, segments.p1) + margin
+    origin = low.min(axis=0)
+    c0 = np.floor((low - origin) / cell_nm).astype(np.int64)
+    c1 = np.floor((high - origin) / cell_nm).astype(np.int64)
+    b0 = np.floor(segments.t0 / time_bin).astype(np.int64)
+    b1 = np.floor(segments.t1 / time_bin).astype(np.int64)
+    nx, ny = c1[:, 0] - c0[:, 0] + 1, c1[:, 1] - c0[:, 1] + 1
+    nt = b1 - b0 + 1
+    counts = nt * nx * ny
+
+    # Записи (отрезок, ячейка): номер внутри отрезка раскладывается на (t, x, y)
+    entry = np.repeat(np.arange(len(counts)), counts)
+    k = np.arange(len(entry)) - np.repeat(np.cumsum(counts) - counts, counts)
+    k, dy = np.divmod(k, ny[entry])
+    dt, dx = np.divmod(k, nx[entry])
+    width = int(c1[:, 0].max()) + 1
+    height = int(c1[:, 1].max()) + 1
+    cell = ((b0[entry] + dt) * width + c0[entry, 0] + dx) * height + c0[entry, 1] + dy
+
+    # Внутри ячейки записи упорядочены по SRU; пары - с записями следующих SRU
+    order = np.lexsort((segments.owner[entry], cell))
+    entry, cell = entry[order], cell[order]
+    owner = segments.owner[entry]
+    new_cell = np.concatenate([[True], cell[1:] != cell[:-1]])
+    new_run = new_cell | np.concatenate([[True], owner[1:] != owner[:-1]])
+    cell_end = _run_end(new_cell)
+    run_end = _run_end(new_run)
+    partners = cell_end - run_end
+    first = np.repeat(entry, partners)
+    start = np.repeat(run_end, partners)
+    offset = np.arange(len(first)) - np.repeat(np.cumsum(partners) - partners, partners)
+    second = entry[start + offset]
+
+    # Пара отрезков может встретиться в нескольких ячейках
+    key = np.sort(first * len(segments.owner) + second)
+    key = key[np.concatenate([[True], key[1:] != key[:-1]])] if len(key) else key
+    return np.divmod(key, len(segments.owner))
+
+
+def _run_end(new_run: np.ndarray) -> np.ndarray:
+    """Для каждой позиции - конец (исключительно) ее серии"""
+    starts = np.flatnonzero(new_run)
+    ends = np.append(starts[1:], len(new_run))
+    return np.repeat(ends, np.diff(np.append(starts, len(new_run))))
+
+
+def _violations(segments: _Segments, a: np.ndarray, b: np.ndarray,
+                horizontal_nm: float, vertical_ft: float) -> dict:
+    """Точная проверка пар отрезков: интервалы нарушения и наибольшее сближение"""
+    start = np.maximum(segments.t0[a], segments.t0[b])
+    end = np.minimum(segments.t1[a], segments.t1[b])
+    keep = start < end
+    a, b, start, end = a[keep], b[keep], start[keep], end[keep]
+    span = end - start
+
+    def at(segment, values0, rate):
+        return values0[segment] + rate[segment] * (start - segments.t0[segment])
+
+    pa = segments.p0[a] + segments.velocity[a] * (start - segments.t0[a])[:, None]
+    pb = segments.p0[b] + segments.velocity[b] * (start - segments.t0[b])[:, None]
+    p = pb - pa
+    v = segments.velocity[b] - segments.velocity[a]
+
+    # |p + v * tau| < H: tau между корнями квадратного уравнения
+    qa = np.einsum('ij,ij->i', v, v)
+    qb = 2 * np.einsum('ij,ij->i', p, v)
+    qc = np.einsum('ij,ij->i', p, p) - horizontal_nm ** 2
+    disc = qb ** 2 - 4 * qa * qc
+    moving = qa > 0
+    root = np.sqrt(np.maximum(disc, 0.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lo = np.where(moving, (-qb - root) / (2 * qa), np.where(qc < 0, -np.inf, np.inf))
+        hi = np.where(moving, (-qb + root) / (2 * qa), np.where(qc < 0, np.inf, -np.inf))
+    lo = np.where(moving & (disc <= 0), np.inf, lo)
+    lo, hi = np.maximum(lo, 0.0), np.minimum(hi, span)
+
+    # Вертикаль: (низ b - верх a) < V и (низ a - верх b) < V - линейно по tau
+    for upper, lower in ((a, b), (b, a)):
+        gap0 = at(lower, segments.low0, segments.low_rate) - at(upper, segments.high0, segments.high_rate)
+        slope = segments.low_rate[lower] - segments.high_rate[upper]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bound = (vertical_ft - gap0) / slope
+        lo = np.where(slope < 0, np.maximum(lo, bound), lo)
+        hi = np.where(slope > 0, np.minimum(hi, bound), hi)
+        blocked = (slope == 0) & (gap0 >= vertical_ft)
+        lo = np.where(blocked, np.inf, lo)
+
+    hit = lo < hi
+    a, b, start, lo, hi = a[hit], b[hit], start[hit], lo[hit], hi[hit]
+    p, v, qa, qb = p[hit], v[hit], qa[hit], qb[hit]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        closest = np.where(qa > 0, -qb / (2 * qa), lo)
+    closest = np.clip(closest, lo, hi)
+    offset = p + v * closest[:, None]
+    time = start + closest
+    gaps = []
+    for upper, lower in ((a, b), (b, a)):
+        low = segments.low0[lower] + segments.low_rate[lower] * (time - segments.t0[lower])
+        high = segments.high0[upper] + segments.high_rate[upper] * (time - segments.t0[upper])
+        gaps.append(low - high)
+    middle = (segments.p0[a] + segments.velocity[a] * (time - segments.t0[a])[:, None]) + offset / 2
+    return {'a': a, 'b': b, 'start': start + lo, 'end': start + hi, 'time': time,
+            'distance': np.hypot(*offset.T), 'vertical': np.maximum(*gaps), 'middle': middle}
+
+
+def _merge(segments: _Segments, tracks: Sequence[Track], found: dict) -> List[Conflict]:
+    """Слияние нарушений одной пары SRU, идущих подряд по времени"""
+    if not len(found['a']):
+        return []
+    owner_a, owner_b = segments.owner[found['a']], segments.owner[found['b']]
+    pair = owner_a * len(tracks) + owner_b
+    order = np.lexsort((found['start'], pair))
+    pair = pair[order]
+    start, end = found['start'][order], found['end'][order]
+    # Новый конфликт - другая пара или разрыв после всех предыдущих нарушений пары
+    new_pair = np.concatenate([[True], pair[1:] != pair[:-1]])
+    shift = np.cumsum(new_pair) * (end.max() - start.min() + 1.0)
+    reach = np.maximum.accumulate(end + shift) - shift
+    new_event = new_pair | np.concatenate([[True], start[1:] > reach[:-1] + MERGE_GAP])
+    event = np.cumsum(new_event) - 1
+    first = np.flatnonzero(new_event)
+
+    distance = found['distance'][order]
+    best = np.lexsort((distance, event))
+    best = best[np.concatenate([[True], event[best][1:] != event[best][:-1]])]
+    lat, lon = laea_inverse(*found['middle'][order][best].T, *segments.origin, ellipsoid=False)
+    event_end = np.maximum.reduceat(end, first)
+
+    conflicts = []
+    for number, index in enumerate(best):
+        conflicts.append(Conflict(
+            tracks[int(owner_a[order][index])].sru_id, tracks[int(owner_b[order][index])].sru_id,
+            float(start[first[number]] + segments.epoch), float(event_end[number] + segments.epoch),
+            float(found['time'][order][index] + segments.epoch), float(lat[number]), float(lon[number]),
+            float(distance[index]), float(found['vertical'][order][index])))
+    return conflicts
+
+
+def _seconds(times) -> np.ndarray:
+    """Отметки времени в секундах (datetime - POSIX)"""
+    values = np.asarray(times)
+    if values.dtype == object and len(values) and isinstance(values.flat[0], datetime):
+        values = np.array([value.timestamp() for value in values.ravel()]).reshape(values.shape)
+    elif np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype('datetime64[us]').astype(np.int64) / 1e6
+    return np.asarray(values, dtype=np.float64)
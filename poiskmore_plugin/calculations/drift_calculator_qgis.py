@@ -8,6 +8,9 @@ import math
 from typing import Dict, List, Tuple, Optional
 from qgis.core import QgsPointXY
 
+from .geodesy import destination
+from .search_patterns import EXPANDING_SQUARE_LEGS, expanding_square
+
 class DriftCalculator:
     """Калькулятор дрейфа согласно методике IAMSAR"""
     DRIFT_FACTORS = {
@@ -97,19 +100,9 @@ class DriftCalculator:
         return datum_points
     def calculate_new_position(self, lat: float, lon: float, 
                               distance_nm: float, bearing: float) -> Tuple[float, float]:
-        lat_rad = math.radians(lat)
-        lon_rad = math.radians(lon)
-        bearing_rad = math.radians(bearing)
-        angular_distance = distance_nm / self.earth_radius_nm
-        new_lat_rad = math.asin(
-            math.sin(lat_rad) * math.cos(angular_distance) +
-            math.cos(lat_rad) * math.sin(angular_distance) * math.cos(bearing_rad)
-        )
-        new_lon_rad = lon_rad + math.atan2(
-            math.sin(bearing_rad) * math.sin(angular_distance) * math.cos(lat_rad),
-            math.cos(angular_distance) - math.sin(lat_rad) * math.sin(new_lat_rad)
-        )
-        return (math.degrees(new_lat_rad), math.degrees(new_lon_rad))
+        new_lat, new_lon = destination(lat, lon, distance_nm, bearing,
+                                       radius_nm=self.earth_radius_nm)
+        return (float(new_lat), float(new_lon))
     def calculate_leeway(self, object_type: str, wind_speed: float) -> float:
         drift_factor = self.DRIFT_FACTORS.get(object_type, 0.03)
         return wind_speed * drift_factor
@@ -132,15 +125,8 @@ class DriftCalculator:
         return error_radius * 1.1
     def calculate_expanding_square_search(self, datum: Dict, 
                                          track_spacing: float,
-                                         first_leg_direction: float = 0) -> List[Tuple[float, float]]:
-        waypoints = []
-        current_pos = (datum['lat'], datum['lon'])
-        waypoints.append(current_pos)
-        legs = [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 7, 7]
-        direction = first_leg_direction
-        for leg_number, leg_length in enumerate(legs):
-            distance = track_spacing * leg_length
-            current_pos = self.calculate_new_position(current_pos[0], current_pos[1], distance, direction)
-            waypoints.append(current_pos)
-            direction = (direction + 90) % 360
-        return waypoints
+                                         first_leg_direction: float = 0,
+                                         legs: int = EXPANDING_SQUARE_LEGS) -> List[Tuple[float, float]]:
+        pattern = expanding_square((datum['lat'], datum['lon']), track_spacing,
+                                   first_leg_direction, legs=legs)
+        return [(float(lat), float(lon)) for lat, lon in pattern.waypoints]
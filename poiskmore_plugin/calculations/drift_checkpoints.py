@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Пересчет дрейфа частиц с контрольных точек
+Во время расчета через заданный интервал сохраняются снимки облака
+(положения, ветви и состояние генераторов блоков). Когда в расписание
+погоды добавляется наблюдение, интегрирование повторяется только с
+последней контрольной точки до первого измененного момента; результат
+совпадает с полным пересчетом побитно.
+"""
+
+import io
+import json
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..db.weather_schedule_db import load_drift_checkpoints, save_drift_checkpoints
+from .drift_integrator import WeatherSchedule
+from .leeway_particles import (
+    LeewayParticleEngine,
+    ParticleCloud,
+    as_seed_sequence,
+    chunk_rng,
+)
+
+
+@dataclass
+class DriftCheckpoint:
+    """Состояние всего облака на момент t_hours"""
+    t_hours: float
+    lat: np.ndarray
+    lon: np.ndarray
+    branch: np.ndarray
+    rng_states: List[Dict]        # Состояние генератора каждого блока
+    stranded_hours: Optional[np.ndarray] = None  # Только при маске суши
+
+    def to_bytes(self) -> bytes:
+        """Сжатое представление для таблицы drift_checkpoints"""
+        buffer = io.BytesIO()
+        arrays = {"lat": self.lat, "lon": self.lon, "branch": self.branch,
+                  "rng_states": np.array(json.dumps(self.rng_states))}
+        if self.stranded_hours is not None:
+            arrays["stranded_hours"] = self.stranded_hours
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, t_hours: float, blob: bytes) -> 'DriftCheckpoint':
+        with np.load(io.BytesIO(blob)) as data:
+            stranded = data["stranded_hours"] if "stranded_hours" in data.files else None
+            return cls(float(t_hours), data["lat"], data["lon"], data["branch"],
+                       json.loads(str(data["rng_states"])), stranded)
+
+
+@dataclass
+class CheckpointedRun:
+    """Расчет облака частиц вместе с контрольными точками"""
+    lkp: Tuple[float, float]
+    duration_hours: float
+    n_particles: int
+    entropy: int
+    spawn_key: Tuple[int, ...]
+    initial_error_nm: float
+    time_step_hours: float
+    chunk_size: int
+    checkpoint_interval_hours: float
+    checkpoints: List[DriftCheckpoint] = field(default_factory=list)
+    cloud: Optional[ParticleCloud] = None   # None после загрузки из БД
+    weather: Optional[Dict] = None          # Записи расписания {'wind', 'current', 'start_time'}
+    coefficients: Optional[Dict] = None     # Коэффициенты ливея движка
+
+    @property
+    def seed(self) -> np.random.SeedSequence:
+        return np.random.SeedSequence(self.entropy, spawn_key=self.spawn_key)
+
+    def checkpoint_before(self, hours: float) -> DriftCheckpoint:
+        """Последняя контрольная точка не позже момента hours"""
+        suitable = [cp for cp in self.checkpoints if cp.t_hours <= hours + 1e-9]
+        return suitable[-1] if suitable else self.checkpoints[0]
+
+    def run_json(self) -> str:
+        """Параметры расчета (без состояний) для строки БД"""
+        return json.dumps({
+            "lkp": list(self.lkp),
+            "duration_hours": self.duration_hours,
+            "n_particles": self.n_particles,
+            "entropy": self.entropy,
+            "spawn_key": list(self.spawn_key),
+            "initial_error_nm": self.initial_error_nm,
+            "time_step_hours": self.time_step_hours,
+            "chunk_size": self.chunk_size,
+            "checkpoint_interval_hours": self.checkpoint_interval_hours,
+            "weather": self.weather,
+            "coefficients": self.coefficients,
+        })
+
+    def save(self, conn, calculation_id: int):
+        """Сохранить контрольные точки рядом с drift_track расчета"""
+        save_drift_checkpoints(conn, calculation_id, self.run_json(),
+                               [(cp.t_hours, cp.to_bytes()) for cp in self.checkpoints])
+
+    @classmethod
+    def load(cls, conn, calculation_id: int) -> Optional['CheckpointedRun']:
+        """Загрузить контрольные точки расчета (None, если их нет)"""
+        rows = load_drift_checkpoints(conn, calculation_id)
+        if not rows:
+            return None
+        params = json.loads(rows[0][1])
+        return cls(
+            lkp=tuple(params["lkp"]),
+            duration_hours=params["duration_hours"],
+            n_particles=params["n_particles"],
+            entropy=params["entropy"],
+            spawn_key=tuple(params["spawn_key"]),
+            initial_error_nm=params["initial_error_nm"],
+            time_step_hours=params["time_step_hours"],
+            chunk_size=params["chunk_size"],
+            checkpoint_interval_hours=params["checkpoint_interval_hours"],
+            checkpoints=[DriftCheckpoint.from_bytes(t_hours, blob) for t_hours, _, blob in rows],
+            weather=params.get("weather"),
+            coefficients=params.get("coefficients")
+        )
+
+
+class IncrementalDrift:
+    """Расчет облака частиц с контрольными точками и частичным пересчетом"""
+
+    def __init__(self, engine: LeewayParticleEngine, checkpoint_interval_hours: float = 6.0):
+        """
+        Args:
+            engine: Движок дрейфа частиц (forcing - текущее расписание погоды)
+            checkpoint_interval_hours: Интервал контрольных точек, часы
+        """
+        if checkpoint_interval_hours <= 0:
+            raise ValueError("Интервал контрольных точек должен быть положительным")
+        self.engine = engine
+        self.checkpoint_interval_hours = checkpoint_interval_hours
+
+    def run(self,
+            lkp: Tuple[float, float],
+            duration_hours: float,
+            n_particles: int,
+            seed: Union[int, np.random.SeedSequence, None] = None,
+            initial_error_nm: float = 0.0,
+            output_hours: Sequence[float] = ()) -> CheckpointedRun:
+        """
+        Полный расчет с сохранением контрольных точек
+
+        Облако совпадает с LeewayParticleEngine.simulate при тех же параметрах.
+        """
+        if n_particles <= 0:
+            raise ValueError("Число частиц должно быть положительным")
+        root = as_seed_sequence(seed)
+        run = CheckpointedRun(
+            lkp=(float(lkp[0]), float(lkp[1])),
+            duration_hours=duration_hours,
+            n_particles=n_particles,
+            entropy=root.entropy,
+            spawn_key=tuple(root.spawn_key),
+            initial_error_nm=initial_error_nm,
+            time_step_hours=self.engine.time_step_hours,
+            chunk_size=self.engine.chunk_size,
+            checkpoint_interval_hours=self.checkpoint_interval_hours
+        )
+        return self._integrate(run, None, duration_hours, output_hours)
+
+    def redrift(self,
+                previous: CheckpointedRun,
+                changed_from_hours: float,
+                duration_hours: Optional[float] = None,
+                output_hours: Sequence[float] = ()) -> CheckpointedRun:
+        """
+        Пересчитать облако с текущими условиями engine.forcing, начиная с
+        контрольной точки не позже changed_from_hours
+
+        Args:
+            previous: Прежний расчет с контрольными точками
+            changed_from_hours: Первый момент, когда условия могли измениться
+                (WeatherSchedule.first_change_hours)
+            duration_hours: Новая продолжительность; по умолчанию - прежняя
+            output_hours: Моменты сохранения положений; треки до точки
+                возобновления заполнены NaN
+
+        Returns:
+            Новый расчет; контрольные точки до возобновления взяты из previous
+        """
+        if (previous.time_step_hours != self.engine.time_step_hours
+                or previous.chunk_size != self.engine.chunk_size):
+            raise ValueError("Шаг и размер блока движка должны совпадать с исходным расчетом")
+        duration_hours = previous.duration_hours if duration_hours is None else duration_hours
+        start = previous.checkpoint_before(max(changed_from_hours, 0.0))
+        run = replace(previous, duration_hours=duration_hours, cloud=None,
+                      checkpoints=[cp for cp in previous.checkpoints
+                                   if cp.t_hours < start.t_hours - 1e-9])
+        return self._integrate(run, start, duration_hours, output_hours)
+
+    def update_schedule(self,
+                        previous: CheckpointedRun,
+                        old_schedule: WeatherSchedule,
+                        new_schedule: WeatherSchedule,
+                        duration_hours: Optional[float] = None) -> CheckpointedRun:
+        """
+        Пересчет после изменения расписания погоды (например, нового
+        наблюдения в wind_schedule); движок переключается на new_schedule
+        """
+        self.engine = LeewayParticleEngine(self.engine.coefficients, new_schedule,
+                                           self.engine.time_step_hours, self.engine.chunk_size,
+                                           self.engine.land_mask)
+        changed = old_schedule.first_change_hours(new_schedule)
+        if changed is None:
+            same_duration = duration_hours is None or duration_hours == previous.duration_hours
+            if same_duration and previous.cloud is not None:
+                return previous
+            # Облако загруженного из БД расчета - с последней контрольной точки
+            changed = previous.duration_hours
+        return self.redrift(previous, changed, duration_hours)
+
+    def resume(self,
+               previous: Optional[CheckpointedRun],
+               lkp: Tuple[float, float],
+               duration_hours: float,
+               n_particles: int,
+               weather: Dict,
+               initial_error_nm: float = 0.0) -> CheckpointedRun:
+        """
+        Расчет по текущему расписанию движка с использованием прежнего
+
+        Если previous посчитан из той же точки, тем же числом частиц и с
+        теми же коэффициентами, интегрирование идет только с первого
+        момента, где расписание отличается от previous.weather; иначе -
+        полный расчет.
+
+        Args:
+            previous: Прежний расчет (например, CheckpointedRun.load) или None
+            lkp: Исходная точка (lat, lon)
+            duration_hours: Продолжительность дрейфа, часы
+            n_particles: Число частиц
+            weather: Записи, по которым построено engine.forcing:
+                {'wind': [...], 'current': [...]} в формате save_*_schedule
+            initial_error_nm: Ошибка исходного места, мили
+
+        Returns:
+            Расчет с записанными weather (и start_time расписания) и коэффициентами
+        """
+        schedule = self.engine.forcing
+        coefficients = asdict(self.engine.coefficients)
+        compatible = (previous is not None and previous.weather is not None
+                      and previous.coefficients == coefficients
+                      and previous.lkp == (float(lkp[0]), float(lkp[1]))
+                      and previous.n_particles == n_particles
+                      and previous.initial_error_nm == initial_error_nm
+                      and previous.time_step_hours == self.engine.time_step_hours
+                      and previous.chunk_size == self.engine.chunk_size)
+        if compatible:
+            start = datetime.fromisoformat(previous.weather['start_time'])
+            old_schedule = WeatherSchedule.from_entries(previous.weather['wind'], previous.weather['current'],
+                                                        start_time=start, year=start.year)
+            run = self.update_schedule(previous, old_schedule, schedule, duration_hours)
+        else:
+            run = self.run(lkp, duration_hours, n_particles, initial_error_nm=initial_error_nm)
+        run.weather = {'wind': list(weather['wind']), 'current': list(weather['current']),
+                       'start_time': schedule.start_time.isoformat()}
+        run.coefficients = coefficients
+        return run
+
+    def _integrate(self, run: CheckpointedRun, start: Optional[DriftCheckpoint],
+                   duration_hours: float, output_hours: Sequence[float]) -> CheckpointedRun:
+        """Интегрирование всех блоков от start (или от LKP) до duration_hours"""
+        engine = self.engine
+        n = run.n_particles
+        root = run.seed
+        output_hours = np.asarray(sorted(output_hours), dtype=np.float64)
+        checkpoint_hours = np.arange(0.0, duration_hours + 1e-9, run.checkpoint_interval_hours)
+
+        lat = np.empty(n)
+        lon = np.empty(n)
+        branch = np.empty(n, dtype=np.int8)
+        stranded_hours = np.empty(n) if engine.land_mask is not None else None
+        track_lat = track_lon = None
+        if len(output_hours):
+            track_lat = np.full((len(output_hours), n), np.nan, dtype=np.float32)
+            track_lon = np.full((len(output_hours), n), np.nan, dtype=np.float32)
+        block_snapshots = []
+
+        for index, first in enumerate(range(0, n, run.chunk_size)):
+            last = min(first + run.chunk_size, n)
+            rng = chunk_rng(root, index)
+            # Начальное состояние воспроизводит индивидуальные наклоны ливея
+            state = engine.initial_state(run.lkp, last - first, rng, run.initial_error_nm)
+            if start is not None:
+                state.t_hours = start.t_hours
+                state.lat = start.lat[first:last].copy()
+                state.lon = start.lon[first:last].copy()
+                state.branch = start.branch[first:last].copy()
+                if state.stranded_hours is not None and start.stranded_hours is not None:
+                    state.stranded_hours = start.stranded_hours[first:last].copy()
+                rng.bit_generator.state = start.rng_states[index]
+
+            block_lat, block_lon, snapshots = engine.advance(state, duration_hours, rng,
+                                                             output_hours, checkpoint_hours)
+            lat[first:last], lon[first:last], branch[first:last] = state.lat, state.lon, state.branch
+            if stranded_hours is not None:
+                stranded_hours[first:last] = state.stranded_hours
+            if track_lat is not None:
+                track_lat[:, first:last] = block_lat
+                track_lon[:, first:last] = block_lon
+            block_snapshots.append(snapshots)
+
+        # Снимки всех блоков сделаны в одни и те же моменты
+        for parts in zip(*block_snapshots):
+            run.checkpoints.append(DriftCheckpoint(
+                t_hours=parts[0].t_hours,
+                lat=np.concatenate([p.lat for p in parts]),
+                lon=np.concatenate([p.lon for p in parts]),
+                branch=np.concatenate([p.branch for p in parts]),
+                rng_states=[p.rng_state for p in parts],
+                stranded_hours=(None if parts[0].stranded_hours is None
+                                else np.concatenate([p.stranded_hours for p in parts]))
+            ))
+
+        run.cloud = ParticleCloud(
+            origin=run.lkp,
+            lat=lat,
+            lon=lon,
+            branch=branch,
+            time_hours=duration_hours,
+            object_type=engine.coefficients.object_type,
+            track_times=output_hours,
+            track_lat=track_lat,
+            track_lon=track_lon,
+            stranded_hours=stranded_hours
+        )
+        return run
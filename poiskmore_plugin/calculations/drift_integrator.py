@@ -0,0 +1,536 @@
+# -*- coding: utf-8 -*-
+"""
+Интегрирование дрейфа по расписанию ветра и течений
+Интерполянты строятся один раз на инцидент (линейно по компонентам u/v,
+направление восстанавливается из вектора, поэтому переход 350°→10°
+обрабатывается корректно), неравномерный шаг расписания допускается
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..db.weather_schedule_db import load_current_schedule, load_wind_schedule
+from .land_mask import LandMask
+from .leeway_particles import KNOTS_PER_MS, NM_PER_DEGREE, LeewayCoefficients
+
+
+# Версия алгоритма (входит в ключ кэша результатов; увеличивать при
+# изменениях, влияющих на результат)
+ENGINE_VERSION = "drift_integrator/1"
+
+# Форматы времени в таблицах расписания (БД и диалог)
+TIME_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M",
+    "%d.%m.%Y %H:%M",
+    "%d.%m %H:%M",
+)
+
+
+def parse_schedule_time(value: Union[str, datetime], year: Optional[int] = None) -> datetime:
+    """
+    Разобрать время строки расписания
+
+    Args:
+        value: Строка времени или datetime
+        year: Год для форматов без года ("dd.MM HH:mm" из диалога)
+
+    Returns:
+        Время UTC (naive datetime)
+    """
+    return _parse_time(value, year)[0]
+
+
+def parse_schedule_times(values: Sequence[Union[str, datetime]], year: Optional[int] = None) -> List[datetime]:
+    """
+    Разобрать времена строк расписания в порядке таблицы
+
+    Время без года относится к году year (по умолчанию - текущему); если
+    месяц очередной такой строки меньше, чем у предыдущей (переход через
+    Новый год: декабрь -> январь), она и следующие строки переносятся на
+    год вперед.
+
+    Args:
+        values: Строки времени или datetime
+        year: Год для форматов без года
+
+    Returns:
+        Время UTC (naive datetime) по строкам
+
+    Raises:
+        ValueError: строка в неизвестном формате
+    """
+    times, shift, previous = [], 0, None
+    for value in values:
+        parsed, has_year = _parse_time(value, year)
+        if not has_year:
+            if previous is not None and parsed.month < previous.month:
+                shift += 1
+            previous = parsed
+            parsed = _parse_time(value, parsed.year + shift)[0] if shift else parsed
+        times.append(parsed)
+    return times
+
+
+def _parse_time(value: Union[str, datetime], year: Optional[int]) -> Tuple[datetime, bool]:
+    """(время, был ли в строке год)"""
+    if isinstance(value, datetime):
+        return value, True
+    text = str(value).strip()
+    for fmt in TIME_FORMATS:
+        # Год подставляется до разбора: без него strptime берет 1900 и
+        # не принимает 29.02
+        with_year = "%Y" in fmt
+        try:
+            if with_year:
+                return datetime.strptime(text, fmt), True
+            return datetime.strptime(f"{year or datetime.utcnow().year} {text}", "%Y " + fmt), False
+        except ValueError:
+            continue
+    raise ValueError(f"Неизвестный формат времени: {value}")
+
+
+class VectorInterpolant:
+    """Линейный интерполянт вектора (u, v) по времени"""
+
+    def __init__(self, hours: Sequence[float], u: Sequence[float], v: Sequence[float]):
+        """
+        Args:
+            hours: Моменты наблюдений, часы от начала расчета (в любом порядке)
+            u: Восточная компонента
+            v: Северная компонента
+        """
+        hours = np.asarray(hours, dtype=np.float64)
+        u = np.asarray(u, dtype=np.float64)
+        v = np.asarray(v, dtype=np.float64)
+
+        # Сортировка и удаление повторов времени (остается последнее значение)
+        order = np.argsort(hours, kind='stable')
+        hours, u, v = hours[order], u[order], v[order]
+        keep = np.append(hours[1:] != hours[:-1], True) if len(hours) else np.empty(0, dtype=bool)
+        self.hours = hours[keep]
+        self.u = u[keep]
+        self.v = v[keep]
+
+    @classmethod
+    def from_speed_direction(cls, hours: Sequence[float], speed: Sequence[float],
+                             direction_to_deg: Sequence[float]) -> 'VectorInterpolant':
+        """Создать из скорости и направления «куда»"""
+        direction = np.radians(np.asarray(direction_to_deg, dtype=np.float64))
+        speed = np.asarray(speed, dtype=np.float64)
+        return cls(hours, speed * np.sin(direction), speed * np.cos(direction))
+
+    def __len__(self) -> int:
+        return len(self.hours)
+
+    def __call__(self, t_hours) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Значение вектора в моменты t_hours (за пределами расписания -
+        крайние значения, при пустом расписании - нулевой вектор)
+        """
+        t = np.asarray(t_hours, dtype=np.float64)
+        if len(self.hours) == 0:
+            return np.zeros_like(t), np.zeros_like(t)
+        return np.interp(t, self.hours, self.u), np.interp(t, self.hours, self.v)
+
+    def speed_direction(self, t_hours) -> Tuple[np.ndarray, np.ndarray]:
+        """Скорость и направление «куда» (градусы) в моменты t_hours"""
+        u, v = self(t_hours)
+        return np.hypot(u, v), direction_deg(u, v)
+
+
+class WeatherSchedule:
+    """Расписание ветра и течений инцидента с готовыми интерполянтами"""
+
+    def __init__(self, start_time: datetime, wind: VectorInterpolant, current: VectorInterpolant):
+        """
+        Args:
+            start_time: Момент отсчета времени (t = 0)
+            wind: Ветер «куда дует», узлы
+            current: Течение «куда течет», узлы
+        """
+        self.start_time = start_time
+        self.wind = wind
+        self.current = current
+
+    @classmethod
+    def from_rows(cls,
+                  wind_rows: Sequence[Sequence],
+                  current_rows: Sequence[Sequence],
+                  start_time: Optional[datetime] = None) -> 'WeatherSchedule':
+        """
+        Создать из строк load_wind_schedule / load_current_schedule
+
+        Args:
+            wind_rows: (t_utc, dir_from_deg, speed_ms, speed_kn, ...)
+            current_rows: (t_utc, dir_to_deg, speed_kn, ...)
+            start_time: Момент отсчета; по умолчанию - первое наблюдение
+        """
+        wind = [(parse_schedule_time(row[0]), float(row[1]),
+                 float(row[3]) if row[3] is not None else float(row[2]) * KNOTS_PER_MS)
+                for row in wind_rows]
+        current = [(parse_schedule_time(row[0]), float(row[2]), float(row[1]))
+                   for row in current_rows]
+        return cls._build(wind, current, start_time)
+
+    @classmethod
+    def from_entries(cls,
+                     wind_data: Sequence[Dict],
+                     current_data: Sequence[Dict],
+                     start_time: Optional[datetime] = None,
+                     year: Optional[int] = None) -> 'WeatherSchedule':
+        """
+        Создать из словарей в формате save_wind_schedule / save_current_schedule
+
+        Args:
+            wind_data: [{'time', 'direction' (откуда), 'speed_ms'[, 'speed_kn']}]
+            current_data: [{'time', 'direction' (куда), 'speed_kn'}]
+            start_time: Момент отсчета; по умолчанию - первое наблюдение
+            year: Год для времени без года (с переходом через Новый год,
+                см. parse_schedule_times)
+        """
+        wind = [(time, float(e['direction']), float(e.get('speed_kn') or float(e['speed_ms']) * KNOTS_PER_MS))
+                for time, e in zip(parse_schedule_times([e['time'] for e in wind_data], year), wind_data)]
+        current = [(time, float(e['speed_kn']), float(e['direction']))
+                   for time, e in zip(parse_schedule_times([e['time'] for e in current_data], year), current_data)]
+        return cls._build(wind, current, start_time)
+
+    @classmethod
+    def from_database(cls, conn, incident_id: int,
+                      start_time: Optional[datetime] = None) -> 'WeatherSchedule':
+        """Загрузить расписание инцидента из таблиц wind_schedule / current_schedule"""
+        return cls.from_rows(load_wind_schedule(conn, incident_id),
+                             load_current_schedule(conn, incident_id),
+                             start_time)
+
+    @classmethod
+    def _build(cls, wind: List[Tuple], current: List[Tuple],
+               start_time: Optional[datetime]) -> 'WeatherSchedule':
+        """wind: (время, откуда°, узлы); current: (время, узлы, куда°)"""
+        if start_time is None:
+            times = [row[0] for row in wind + current]
+            start_time = min(times) if times else datetime.utcnow()
+
+        def hours(rows):
+            return [(row[0] - start_time).total_seconds() / 3600.0 for row in rows]
+
+        wind_interp = VectorInterpolant.from_speed_direction(
+            hours(wind), [row[2] for row in wind], [(row[1] + 180) % 360 for row in wind])
+        current_interp = VectorInterpolant.from_speed_direction(
+            hours(current), [row[1] for row in current], [row[2] for row in current])
+        return cls(start_time, wind_interp, current_interp)
+
+    def hours_since_start(self, moment: datetime) -> float:
+        """Часы от start_time до moment"""
+        return (moment - self.start_time).total_seconds() / 3600.0
+
+    def first_change_hours(self, other: 'WeatherSchedule') -> Optional[float]:
+        """
+        Первый момент, начиная с которого условия other отличаются от текущих
+
+        Интерполяция линейная, поэтому новое наблюдение меняет условия уже
+        после предыдущего узла расписания.
+
+        Returns:
+            Часы от start_time; -inf - условия изменились с самого начала;
+            None - расписания совпадают
+        """
+        if other.start_time != self.start_time:
+            return -math.inf
+        changes = [change for change in (_first_change(self.wind, other.wind),
+                                         _first_change(self.current, other.current))
+                   if change is not None]
+        return min(changes) if changes else None
+
+    def __call__(self, t_hours: float, lat: np.ndarray, lon: np.ndarray):
+        """Внешние условия для LeewayParticleEngine (пространственно однородные)"""
+        wind_u, wind_v = self.wind(t_hours)
+        current_u, current_v = self.current(t_hours)
+        return wind_u, wind_v, current_u, current_v
+
+
+@dataclass
+class DriftTrack:
+    """Траектория левой и правой ветвей дрейфа в узлах сетки по времени"""
+    start_time: datetime
+    hours: np.ndarray             # Время узлов от start_time
+    wind_speed_kn: np.ndarray
+    wind_dir: np.ndarray          # Откуда, градусы
+    dwl_kn: np.ndarray
+    cwl_kn: np.ndarray            # Модуль crosswind (знак - по ветви)
+    leeway_speed_kn: np.ndarray
+    current_speed_kn: np.ndarray
+    current_dir: np.ndarray       # Куда, градусы
+    drift_speed_kn: np.ndarray    # Средний (центральный) дрейф
+    drift_dir: np.ndarray
+    left_lat: np.ndarray
+    left_lon: np.ndarray
+    right_lat: np.ndarray
+    right_lon: np.ndarray
+    divergence_nm: np.ndarray     # Расстояние между ветвями
+    left_stranded_hours: float = math.nan   # Выброс ветви на берег (NaN - нет)
+    right_stranded_hours: float = math.nan
+
+    @property
+    def center_lat(self) -> np.ndarray:
+        return (self.left_lat + self.right_lat) / 2
+
+    @property
+    def center_lon(self) -> np.ndarray:
+        return (self.left_lon + self.right_lon) / 2
+
+    @property
+    def center_distance_nm(self) -> np.ndarray:
+        """Смещение центра от исходной точки в каждом узле, мили"""
+        dx, dy = _offsets_nm(self.center_lat[0], self.center_lon[0],
+                             self.center_lat, self.center_lon)
+        return np.hypot(dx, dy)
+
+    @property
+    def total_drift_nm(self) -> float:
+        """Смещение центра от исходной точки на конец расчета"""
+        return float(self.center_distance_nm[-1])
+
+    @property
+    def total_drift_direction(self) -> float:
+        """Направление смещения центра, градусы"""
+        dx, dy = _offsets_nm(self.center_lat[0], self.center_lon[0],
+                             self.center_lat[-1], self.center_lon[-1])
+        return float(math.degrees(math.atan2(dx, dy)) % 360)
+
+    def datum_points(self) -> List[Dict]:
+        """Исходные пункты на конец расчета (центр, левый, правый)"""
+        hours = float(self.hours[-1])
+        speed = self.total_drift_nm / hours if hours > 0 else 0.0
+        points = []
+        for name, lat, lon in (('Datum Center', self.center_lat[-1], self.center_lon[-1]),
+                               ('Datum Left', self.left_lat[-1], self.left_lon[-1]),
+                               ('Datum Right', self.right_lat[-1], self.right_lon[-1])):
+            points.append({
+                'name': name,
+                'lat': float(lat),
+                'lon': float(lon),
+                'drift_speed': speed,
+                'drift_direction': self.total_drift_direction,
+                'time': hours
+            })
+        return points
+
+    @classmethod
+    def from_track_rows(cls, rows: Sequence[Sequence], start_time: datetime,
+                        left_stranded_hours: float = math.nan,
+                        right_stranded_hours: float = math.nan) -> 'DriftTrack':
+        """
+        Восстановить траекторию из строк load_drift_track
+
+        Args:
+            rows: (t_utc, wind_speed_ms, wind_dir, dwl_kn, cwl_kn, leeway_speed_kn,
+                   leeway_dir, current_speed_kn, current_dir, drift_speed_kn, drift_dir,
+                   left_lat, left_lon, right_lat, right_lon, divergence_nm)
+            start_time: Момент отсчета времени узлов
+            left_stranded_hours, right_stranded_hours: Выброс ветвей на берег
+                (в drift_track не хранится; NaN - нет)
+        """
+        values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 15)
+        hours = np.array([(parse_schedule_time(row[0]) - start_time).total_seconds() / 3600.0
+                          for row in rows])
+        return cls(
+            start_time=start_time,
+            hours=hours,
+            wind_speed_kn=values[:, 0] * KNOTS_PER_MS,
+            wind_dir=values[:, 1],
+            dwl_kn=values[:, 2],
+            cwl_kn=values[:, 3],
+            leeway_speed_kn=values[:, 4],
+            current_speed_kn=values[:, 6],
+            current_dir=values[:, 7],
+            drift_speed_kn=values[:, 8],
+            drift_dir=values[:, 9],
+            left_lat=values[:, 10],
+            left_lon=values[:, 11],
+            right_lat=values[:, 12],
+            right_lon=values[:, 13],
+            divergence_nm=values[:, 14],
+            left_stranded_hours=left_stranded_hours,
+            right_stranded_hours=right_stranded_hours
+        )
+
+    def to_track_rows(self, calculation_id: int) -> List[Tuple]:
+        """Строки для таблицы drift_track"""
+        rows = []
+        for i, hours in enumerate(self.hours):
+            moment = self.start_time + timedelta(hours=float(hours))
+            rows.append((
+                calculation_id, moment.strftime("%Y-%m-%d %H:%M:%S"),
+                float(self.wind_speed_kn[i] / KNOTS_PER_MS), float(self.wind_dir[i]),
+                float(self.dwl_kn[i]), float(self.cwl_kn[i]),
+                float(self.leeway_speed_kn[i]), float((self.wind_dir[i] + 180) % 360),
+                float(self.current_speed_kn[i]), float(self.current_dir[i]),
+                float(self.drift_speed_kn[i]), float(self.drift_dir[i]),
+                float(self.left_lat[i]), float(self.left_lon[i]),
+                float(self.right_lat[i]), float(self.right_lon[i]),
+                float(self.divergence_nm[i])
+            ))
+        return rows
+
+
+class DriftIntegrator:
+    """Детерминированный расчет левой/правой ветвей дрейфа по расписанию"""
+
+    def __init__(self,
+                 schedule: WeatherSchedule,
+                 coefficients: LeewayCoefficients,
+                 time_step_hours: float = 1.0 / 6.0,
+                 land_mask: Optional[LandMask] = None):
+        """
+        Args:
+            schedule: Расписание ветра и течений с интерполянтами
+            coefficients: Коэффициенты ливея объекта
+            time_step_hours: Шаг интегрирования, часы (по умолчанию 10 минут)
+            land_mask: Маска суши; ветвь, вышедшая на сушу, останавливается
+                в последней точке на воде
+        """
+        if time_step_hours <= 0:
+            raise ValueError("Шаг по времени должен быть положительным")
+        self.schedule = schedule
+        self.coefficients = coefficients
+        self.time_step_hours = time_step_hours
+        self.land_mask = land_mask
+
+    def integrate(self,
+                  lkp: Tuple[float, float],
+                  duration_hours: float,
+                  start_time: Optional[datetime] = None) -> DriftTrack:
+        """
+        Рассчитать траекторию дрейфа от исходной точки
+
+        Скорость на каждом шаге берется в середине шага (метод средней
+        точки), все шаги считаются одним векторным проходом.
+
+        Args:
+            lkp: Исходная точка (lat, lon)
+            duration_hours: Продолжительность дрейфа, часы
+            start_time: Момент начала дрейфа; по умолчанию - начало расписания
+
+        Returns:
+            Траектория ветвей дрейфа
+        """
+        if duration_hours < 0:
+            raise ValueError("Продолжительность дрейфа не может быть отрицательной")
+        start_time = start_time or self.schedule.start_time
+        t0 = self.schedule.hours_since_start(start_time)
+
+        steps = max(int(math.ceil(duration_hours / self.time_step_hours - 1e-9)), 0)
+        hours = np.minimum(np.arange(steps + 1) * self.time_step_hours, duration_hours)
+        h = np.diff(hours)
+        mid = t0 + hours[:-1] + h / 2
+
+        # Скорости в серединах шагов
+        left_u, left_v, _ = self._branch_velocity(mid, -1)
+        right_u, right_v, _ = self._branch_velocity(mid, 1)
+        left_lat, left_lon = _integrate_positions(lkp, left_u, left_v, h)
+        right_lat, right_lon = _integrate_positions(lkp, right_u, right_v, h)
+        stranded = (math.nan, math.nan)
+        if self.land_mask is not None:
+            left_lat, left_lon, left_first = self.land_mask.strand_tracks(left_lat, left_lon)
+            right_lat, right_lon, right_first = self.land_mask.strand_tracks(right_lat, right_lon)
+            stranded = tuple(float(hours[first[0]]) if first[0] >= 0 else math.nan
+                             for first in (left_first, right_first))
+
+        # Характеристики в узлах для отчета и таблицы drift_track
+        wind_speed, wind_to = self.schedule.wind.speed_direction(t0 + hours)
+        current_speed, current_dir = self.schedule.current.speed_direction(t0 + hours)
+        center_u, center_v, (dwl, cwl) = self._branch_velocity(t0 + hours, 0)
+        dx, dy = _offsets_nm(left_lat, left_lon, right_lat, right_lon)
+
+        return DriftTrack(
+            start_time=start_time,
+            hours=hours,
+            wind_speed_kn=wind_speed,
+            wind_dir=(wind_to + 180) % 360,
+            dwl_kn=dwl,
+            cwl_kn=np.abs(cwl),
+            leeway_speed_kn=np.hypot(dwl, cwl),
+            current_speed_kn=current_speed,
+            current_dir=current_dir,
+            drift_speed_kn=np.hypot(center_u, center_v),
+            drift_dir=direction_deg(center_u, center_v),
+            left_lat=left_lat,
+            left_lon=left_lon,
+            right_lat=right_lat,
+            right_lon=right_lon,
+            divergence_nm=np.hypot(dx, dy),
+            left_stranded_hours=stranded[0],
+            right_stranded_hours=stranded[1]
+        )
+
+    def _branch_velocity(self, t_hours: np.ndarray, branch: int):
+        """
+        Скорость дрейфа ветви (u, v) в узлах; branch: -1 левая, +1 правая,
+        0 - без crosswind (центр). Третий элемент - (dwl, cwl) в узлах
+        """
+        coeffs = self.coefficients
+        wind_u, wind_v = self.schedule.wind(t_hours)
+        current_u, current_v = self.schedule.current(t_hours)
+        wind_speed = np.hypot(wind_u, wind_v)
+
+        dwl = coeffs.dwl_slope * wind_speed + coeffs.dwl_intercept
+        cwl = coeffs.cwl_slope * wind_speed + coeffs.cwl_intercept
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ex = np.where(wind_speed > 0, wind_u / wind_speed, 0.0)
+            ey = np.where(wind_speed > 0, wind_v / wind_speed, 0.0)
+
+        signed_cwl = cwl * branch
+        u = dwl * ex + signed_cwl * ey + current_u
+        v = dwl * ey - signed_cwl * ex + current_v
+        return u, v, (dwl, cwl)
+
+
+def _first_change(old: VectorInterpolant, new: VectorInterpolant) -> Optional[float]:
+    """Узел, после которого интерполянты расходятся (см. first_change_hours)"""
+    knots = np.union1d(old.hours, new.hours)
+    if len(knots) == 0:
+        return None
+    old_u, old_v = old(knots)
+    new_u, new_v = new(knots)
+    differs = (old_u != new_u) | (old_v != new_v)
+    if not differs.any():
+        return None
+    index = int(np.argmax(differs))
+    return float(knots[index - 1]) if index > 0 else -math.inf
+
+
+def direction_deg(u, v) -> np.ndarray:
+    """Навигационное направление вектора (u, v), градусы в диапазоне [0, 360)"""
+    direction = np.degrees(np.arctan2(u, v)) % 360
+    return np.where(direction >= 360, 0.0, direction)
+
+
+def _integrate_positions(lkp: Tuple[float, float], u: np.ndarray, v: np.ndarray,
+                         h: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Накопить смещения шагов (u, v узлы * h часов) в координаты узлов"""
+    lat = np.empty(len(h) + 1)
+    lat[0] = lkp[0]
+    np.cumsum(v * h / NM_PER_DEGREE, out=lat[1:])
+    lat[1:] += lkp[0]
+
+    # Долготный масштаб - по широте в начале шага
+    lon = np.empty(len(h) + 1)
+    lon[0] = lkp[1]
+    np.cumsum(u * h / (NM_PER_DEGREE * np.cos(np.radians(lat[:-1]))), out=lon[1:])
+    lon[1:] += lkp[1]
+    return lat, lon
+
+
+def _offsets_nm(lat1, lon1, lat2, lon2):
+    """Смещения (dx, dy) в милях от точки 1 к точке 2 (локальная плоскость)"""
+    mean_lat = np.radians((np.asarray(lat1) + np.asarray(lat2)) / 2)
+    dx = (np.asarray(lon2) - lon1) * NM_PER_DEGREE * np.cos(mean_lat)
+    dy = (np.asarray(lat2) - lat1) * NM_PER_DEGREE
+    return dx, dy
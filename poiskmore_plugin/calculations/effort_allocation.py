@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Распределение поисковых усилий по сетке POC
+Экспоненциальная функция обнаружения (случайный поиск Купмана): при
+обследованной площади z в ячейке площадью a вероятность обнаружения
+POD = 1 - exp(-z / a), вклад ячейки в успех POS = POC * POD. Усилие SRU -
+обследуемая площадь W * V * T (ширина полосы обзора, скорость, время).
+
+Оптимум для суммарного усилия находится точно (условия Куна-Таккера,
+«заполнение» по Стоуну): в ячейках с усилием плотность POC/a * exp(-z/a)
+одинакова, и уровень находится одной сортировкой ячеек по плотности.
+Затем ячейки в порядке обхода сетки нарезаются между SRU по их усилию.
+Для назначения SRU целиком на подрайоны - жадный выбор по наибольшему
+приросту POS, вычисляемому сразу для всех подрайонов.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Значения по умолчанию, как в SearchAreaCalculator._calculate_pod
+DEFAULT_SWEEP_WIDTH_NM = 2.0
+DEFAULT_SEARCH_SPEED_KN = 10.0
+DEFAULT_ENDURANCE_HOURS = 4.0
+
+
+@dataclass
+class SruEffort:
+    """Часть плана одной SRU: ячейки и усилие в них"""
+    sru_id: object
+    effort_nm2: float           # Усилие SRU (W * V * T), кв. мили
+    cells: np.ndarray           # Номера ячеек (в развернутой сетке)
+    cell_effort: np.ndarray     # Обследуемая площадь в каждой ячейке, кв. мили
+    pos: float = 0.0            # Вклад SRU в POS (доля прироста по ее ячейкам)
+
+
+@dataclass
+class EffortAllocation:
+    """Оптимальное распределение усилий"""
+    effort: np.ndarray          # Обследуемая площадь по ячейкам, кв. мили (форма сетки POC)
+    pod: np.ndarray             # POD по ячейкам
+    pos: float                  # Суммарная вероятность успеха
+    marginal: float             # Прирост POS на кв. милю дополнительного усилия
+    units: List[SruEffort] = field(default_factory=list)
+
+    @property
+    def coverage(self) -> np.ndarray:
+        """Коэффициент покрытия по ячейкам (-ln(1 - POD))"""
+        return -np.log1p(-self.pod)
+
+
+def sru_effort_nm2(sru: Dict) -> float:
+    """Усилие SRU - обследуемая площадь W * V * T, кв. мили"""
+    return (float(sru.get('sweep_width', DEFAULT_SWEEP_WIDTH_NM))
+            * float(sru.get('search_speed', DEFAULT_SEARCH_SPEED_KN))
+            * float(sru.get('endurance', DEFAULT_ENDURANCE_HOURS)))
+
+
+def optimal_effort(poc, cell_area_nm2, total_effort_nm2: float) -> np.ndarray:
+    """
+    Оптимальное распределение суммарного усилия по ячейкам
+
+    Максимизирует sum(POC * (1 - exp(-z / a))) при sum(z) = total_effort_nm2:
+    z = a * ln(POC / (a * lambda)) в ячейках с плотностью POC / a > lambda,
+    в остальных - 0.
+
+    Args:
+        poc: POC по ячейкам (любой формы)
+        cell_area_nm2: Площадь ячеек (число или массив той же формы)
+        total_effort_nm2: Суммарное усилие, кв. мили
+
+    Returns:
+        Обследуемая площадь по ячейкам (форма poc)
+    """
+    effort, _ = _water_fill(poc, cell_area_nm2, total_effort_nm2)
+    return effort
+
+
+def allocate(poc,
+             srus: Sequence[Dict],
+             cell_area_nm2=None,
+             prior_effort=None) -> EffortAllocation:
+    """
+    Распределить усилия SRU по сетке POC
+
+    Args:
+        poc: Сетка POC (PocGrid) или массив POC по ячейкам
+        srus: Поисковые единицы ('id', 'sweep_width', 'search_speed', 'endurance')
+        cell_area_nm2: Площадь ячеек (для PocGrid берется из сетки)
+        prior_effort: Уже выполненное усилие по ячейкам (учитывается в POD)
+
+    Returns:
+        Распределение: усилие, POD по ячейкам, POS и план каждой SRU
+        (ячейки в порядке обхода сетки построчно)
+    """
+    values, area = _poc_and_area(poc, cell_area_nm2)
+    capacity = np.array([sru_effort_nm2(sru) for sru in srus], dtype=np.float64)
+    if (capacity < 0).any():
+        raise ValueError("Усилие SRU не может быть отрицательным")
+
+    # Выполненное усилие z0 равносильно POC * exp(-z0 / a) для нового поиска
+    prior = None
+    remaining = values
+    if prior_effort is not None:
+        prior = np.broadcast_to(np.asarray(prior_effort, dtype=np.float64), values.shape)
+        remaining = values * np.exp(-prior / area)
+
+    effort, marginal = _water_fill(remaining, area, float(capacity.sum()))
+    total = effort if prior is None else effort + prior
+    pod = -np.expm1(-total / area)
+    gain = remaining * -np.expm1(-effort / area)
+
+    units = []
+    flat_effort = effort.ravel()
+    flat_area = area.ravel()
+    flat_remaining = remaining.ravel()
+    cells = np.flatnonzero(flat_effort > 0)
+    cumulative = np.concatenate([[0.0], np.cumsum(flat_effort[cells])])
+    edges = np.concatenate([[0.0], np.cumsum(capacity)])
+    edges[-1] = cumulative[-1]
+    for index, sru in enumerate(srus):
+        start, stop = edges[index], min(edges[index + 1], cumulative[-1])
+        first = np.searchsorted(cumulative, start, side='right') - 1
+        last = np.searchsorted(cumulative, stop, side='left')
+        part = np.arange(max(first, 0), min(last, len(cells)))
+        # Доля каждой ячейки в интервале [start, stop) накопленного усилия
+        low = np.maximum(cumulative[part], start)
+        high = np.minimum(cumulative[part + 1], stop)
+        share = np.maximum(high - low, 0.0)
+        keep = share > 0
+        part, share = part[keep], share[keep]
+        unit_cells = cells[part]
+        # POS SRU - ее доля усилия от прироста POS ячейки
+        cell_gain = flat_remaining[unit_cells] * -np.expm1(-flat_effort[unit_cells] / flat_area[unit_cells])
+        unit_pos = float(np.sum(cell_gain * share / flat_effort[unit_cells]))
+        units.append(SruEffort(sru.get('id', index), float(capacity[index]), unit_cells, share, unit_pos))
+
+    base = 0.0 if prior is None else float(np.sum(values - remaining))
+    return EffortAllocation(effort, pod, base + float(gain.sum()), marginal, units)
+
+
+def assign_units(poc: Sequence[float],
+                 area_nm2: Sequence[float],
+                 srus: Sequence[Dict],
+                 prior_effort: Optional[Sequence[float]] = None) -> np.ndarray:
+    """
+    Назначить каждую SRU целиком на один подрайон (жадно по приросту POS)
+
+    SRU рассматриваются по убыванию усилия; каждая назначается туда, где
+    прирост POS = POC * exp(-z / a) * (1 - exp(-z_sru / a)) наибольший
+    (вычисляется сразу для всех подрайонов), после чего пересчитывается
+    только выбранный подрайон.
+
+    Args:
+        poc: POC подрайонов
+        area_nm2: Площади подрайонов
+        srus: Поисковые единицы
+        prior_effort: Уже выполненное усилие по подрайонам
+
+    Returns:
+        Номер подрайона для каждой SRU (в порядке srus); -1 - подрайонов нет
+    """
+    poc = np.asarray(poc, dtype=np.float64)
+    area = np.asarray(area_nm2, dtype=np.float64)
+    effort = np.zeros(len(poc)) if prior_effort is None else np.array(prior_effort, dtype=np.float64)
+    safe_area = np.where(area > 0, area, 1.0)
+    remaining = np.where(area > 0, poc * np.exp(-effort / safe_area), 0.0)
+
+    capacity = np.array([sru_effort_nm2(sru) for sru in srus], dtype=np.float64)
+    choice = np.full(len(srus), -1, dtype=np.int64)
+    if not len(poc):
+        return choice
+    for index in np.argsort(-capacity, kind='stable'):
+        gain = remaining * -np.expm1(-capacity[index] / safe_area)
+        best = int(np.argmax(gain))
+        choice[index] = best
+        remaining[best] *= np.exp(-capacity[index] / safe_area[best])
+    return choice
+
+
+def _poc_and_area(poc, cell_area_nm2):
+    """POC и площади ячеек из PocGrid или массивов"""
+    if hasattr(poc, 'values') and hasattr(poc, 'cell_area_nm2'):
+        values = np.asarray(poc.values, dtype=np.float64)
+        area = poc.cell_area_nm2 if cell_area_nm2 is None else cell_area_nm2
+    else:
+        values = np.asarray(poc, dtype=np.float64)
+        if cell_area_nm2 is None:
+            raise ValueError("Не задана площадь ячеек")
+        area = cell_area_nm2
+    area = np.broadcast_to(np.asarray(area, dtype=np.float64), values.shape)
+    if (area <= 0).any():
+        raise ValueError("Площадь ячеек должна быть положительной")
+    return values, area
+
+
+def _water_fill(poc, cell_area_nm2, total_effort_nm2: float):
+    """Оптимальное усилие по ячейкам и уровень lambda (прирост POS на кв. милю)"""
+    values = np.asarray(poc, dtype=np.float64)
+    area = np.broadcast_to(np.asarray(cell_area_nm2, dtype=np.float64), values.shape)
+    effort = np.zeros(values.shape)
+    flat_values, flat_area = values.ravel(), area.ravel()
+    useful = np.flatnonzero(flat_values > 0)
+    if not len(useful):
+        return effort, 0.0
+    if total_effort_nm2 <= 0:
+        return effort, float(np.max(flat_values[useful] / flat_area[useful]))
+
+    log_density = np.log(flat_values[useful] / flat_area[useful])
+    order = np.argsort(-log_density, kind='stable')
+    log_density = log_density[order]
+    a = flat_area[useful][order]
+    # Уровень при усилии в первых k ячейках: ln(lambda_k) = (sum a ln d - Z) / sum a
+    log_level = (np.cumsum(a * log_density) - total_effort_nm2) / np.cumsum(a)
+    # Последняя ячейка, плотность которой выше уровня (уровень монотонен по k)
+    active = int(np.flatnonzero(log_density > log_level).max()) + 1
+    level = log_level[active - 1]
+    cells = useful[order[:active]]
+    effort.reshape(-1)[cells] = a[:active] * (log_density[:active] - level)
+    return effort, float(np.exp(level))
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Параллельный расчет ансамблей дрейфа
+Частицы делятся на блоки фиксированного размера (chunk_size движка),
+блоки распределяются по пулу процессов. Генератор случайных чисел
+привязан к номеру блока, а не к процессу, поэтому при фиксированном seed
+результат побитно совпадает при любом числе процессов и с
+LeewayParticleEngine.simulate
+"""
+
+import os
+import sys
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .leeway_particles import LeewayParticleEngine, ParticleCloud, as_seed_sequence, chunk_rng
+from .trajectory_store import STATUS_ACTIVE, TrajectoryStore
+
+
+# Обратный вызов прогресса: (выполнено блоков, всего блоков)
+ProgressCallback = Callable[[int, int], None]
+
+
+class EnsembleCancelled(Exception):
+    """Расчет ансамбля прерван пользователем"""
+
+
+@dataclass
+class GridSpec:
+    """Регулярная сетка в географических координатах для свертки облака"""
+    lat_min: float
+    lat_max: float
+    lon_min: float
+    lon_max: float
+    rows: int
+    cols: int
+
+    def histogram(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Число частиц в ячейках (строки - широта с юга, столбцы - долгота)"""
+        counts, _, _ = np.histogram2d(
+            lat, lon,
+            bins=(self.rows, self.cols),
+            range=((self.lat_min, self.lat_max), (self.lon_min, self.lon_max))
+        )
+        return counts.astype(np.int64)
+
+    def histogram_store(self, store: TrajectoryStore, index: int = -1,
+                        active_only: bool = False) -> np.ndarray:
+        """Число частиц хранилища траекторий в момент index (active_only - только дрейфующих)"""
+        frame = store.frame(index)
+        if active_only:
+            frame = frame[frame['status'] == STATUS_ACTIVE]
+        return self.histogram(frame['lat'], frame['lon'])
+
+
+class EnsembleRunner:
+    """Распределение расчета облака частиц по нескольким процессам"""
+
+    def __init__(self,
+                 engine: LeewayParticleEngine,
+                 max_workers: Optional[int] = None,
+                 progress_callback: Optional[ProgressCallback] = None):
+        """
+        Args:
+            engine: Движок дрейфа частиц (должен сериализоваться pickle)
+            max_workers: Число процессов; по умолчанию - число ядер,
+                1 - расчет в текущем процессе
+            progress_callback: Функция прогресса (выполнено, всего)
+        """
+        self.engine = engine
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.progress_callback = progress_callback
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Прервать текущий расчет (безопасно вызывать из другого потока)"""
+        self._cancel_event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self,
+            lkp: Tuple[float, float],
+            duration_hours: float,
+            n_particles: int,
+            seed: Union[int, np.random.SeedSequence, None] = None,
+            initial_error_nm: float = 0.0,
+            output_hours: Sequence[float] = ()) -> ParticleCloud:
+        """
+        Рассчитать облако частиц (параметры - как у LeewayParticleEngine.simulate)
+
+        Returns:
+            Облако частиц, побитно совпадающее с engine.simulate при том же seed
+
+        Raises:
+            EnsembleCancelled: если расчет был прерван через cancel()
+        """
+        root = as_seed_sequence(seed)
+        output_hours = np.asarray(sorted(output_hours), dtype=np.float64)
+        lat = np.empty(n_particles)
+        lon = np.empty(n_particles)
+        branch = np.empty(n_particles, dtype=np.int8)
+        track_lat = track_lon = None
+        if len(output_hours):
+            track_lat = np.empty((len(output_hours), n_particles), dtype=np.float32)
+            track_lon = np.empty((len(output_hours), n_particles), dtype=np.float32)
+        stranded_hours = np.empty(n_particles) if self.engine.land_mask is not None else None
+
+        def store(block, result):
+            start, stop = block
+            lat[start:stop], lon[start:stop], branch[start:stop] = result[:3]
+            if track_lat is not None:
+                track_lat[:, start:stop] = result[3]
+                track_lon[:, start:stop] = result[4]
+            if stranded_hours is not None:
+                stranded_hours[start:stop] = result[5]
+
+        tasks = [((start, stop), (0, lkp, duration_hours, stop - start, root.entropy,
+                                  root.spawn_key, index, initial_error_nm, output_hours))
+                 for index, (start, stop) in enumerate(self._blocks(n_particles))]
+        self._execute(_simulate_block, [self.engine], tasks, store)
+
+        return ParticleCloud(
+            origin=tuple(lkp),
+            lat=lat,
+            lon=lon,
+            branch=branch,
+            time_hours=duration_hours,
+            object_type=self.engine.coefficients.object_type,
+            track_times=output_hours,
+            track_lat=track_lat,
+            track_lon=track_lon,
+            stranded_hours=stranded_hours
+        )
+
+    def run_grid(self,
+                 lkp: Tuple[float, float],
+                 duration_hours: float,
+                 n_particles: int,
+                 grid: GridSpec,
+                 seed: Union[int, np.random.SeedSequence, None] = None,
+                 initial_error_nm: float = 0.0) -> np.ndarray:
+        """
+        Рассчитать облако и сразу свернуть его в сетку счетчиков
+
+        Процессы возвращают только гистограммы блоков, поэтому объем
+        передаваемых данных не зависит от числа частиц. Целочисленная
+        сумма не зависит от порядка, результат детерминирован.
+
+        Returns:
+            Массив int64 [grid.rows, grid.cols] с числом частиц в ячейках
+        """
+        root = as_seed_sequence(seed)
+        counts = np.zeros((grid.rows, grid.cols), dtype=np.int64)
+
+        def store(block, result):
+            counts[...] += result
+
+        tasks = [((start, stop), (0, lkp, duration_hours, stop - start, root.entropy,
+                                  root.spawn_key, index, initial_error_nm, grid))
+                 for index, (start, stop) in enumerate(self._blocks(n_particles))]
+        self._execute(_histogram_block, [self.engine], tasks, store)
+        return counts
+
+    def run_scenarios(self,
+                      engines: Sequence[LeewayParticleEngine],
+                      lkp: Tuple[float, float],
+                      duration_hours: float,
+                      n_particles: int,
+                      seed: Union[int, np.random.SeedSequence, None] = None,
+                      initial_error_nm: float = 0.0) -> List[ParticleCloud]:
+        """
+        Рассчитать несколько сценариев (разные объекты, условия) в одном пуле
+
+        Сценарий i использует дочернюю последовательность seed с ключом (i,),
+        блоки внутри сценария - как в run().
+
+        Returns:
+            Облака частиц в порядке engines
+        """
+        root = as_seed_sequence(seed)
+        clouds = []
+        tasks = []
+        for scenario, engine in enumerate(engines):
+            spawn_key = root.spawn_key + (scenario,)
+            cloud = ParticleCloud(origin=tuple(lkp), lat=np.empty(n_particles), lon=np.empty(n_particles),
+                                  branch=np.empty(n_particles, dtype=np.int8), time_hours=duration_hours,
+                                  object_type=engine.coefficients.object_type)
+            if engine.land_mask is not None:
+                cloud.stranded_hours = np.empty(n_particles)
+            clouds.append(cloud)
+            blocks = self._blocks(n_particles, engine.chunk_size)
+            tasks.extend(((scenario, start, stop), (scenario, lkp, duration_hours, stop - start,
+                                                    root.entropy, spawn_key, index, initial_error_nm, ()))
+                         for index, (start, stop) in enumerate(blocks))
+
+        def store(block, result):
+            scenario, start, stop = block
+            cloud = clouds[scenario]
+            cloud.lat[start:stop], cloud.lon[start:stop], cloud.branch[start:stop] = result[:3]
+            if cloud.stranded_hours is not None:
+                cloud.stranded_hours[start:stop] = result[5]
+
+        self._execute(_simulate_block, engines, tasks, store)
+        return clouds
+
+    def _blocks(self, n_particles: int, chunk_size: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Границы блоков частиц"""
+        if n_particles <= 0:
+            raise ValueError("Число частиц должно быть положительным")
+        chunk_size = chunk_size or self.engine.chunk_size
+        return [(start, min(start + chunk_size, n_particles))
+                for start in range(0, n_particles, chunk_size)]
+
+    def _execute(self, function: Callable, engines: Sequence[LeewayParticleEngine],
+                 tasks: List[Tuple[Tuple, Tuple]], store: Callable):
+        """
+        Выполнить задачи в пуле (или в текущем процессе) с прогрессом и отменой
+
+        Движки передаются каждому процессу один раз при его запуске
+        (initializer пула), задачи ссылаются на них по номеру.
+
+        Args:
+            function: Функция уровня модуля function(движок, *аргументы), вызываемая в процессе
+            engines: Движки задач
+            tasks: Пары (ключ, аргументы); первый аргумент - номер движка в engines,
+                ключ передается в store
+            store: Функция store(ключ, результат), вызывается в текущем процессе
+        """
+        self._cancel_event.clear()
+        total = len(tasks)
+        self._report(0, total)
+
+        if self.max_workers <= 1 or total <= 1:
+            for done, (key, (engine, *args)) in enumerate(tasks, start=1):
+                self._check_cancelled()
+                store(key, function(engines[engine], *args))
+                self._report(done, total)
+            return
+
+        executor = ProcessPoolExecutor(max_workers=min(self.max_workers, total),
+                                       mp_context=_mp_context(),
+                                       initializer=_init_worker, initargs=(tuple(engines),))
+        try:
+            pending = {executor.submit(_run_task, function, *args): key for key, args in tasks}
+            done_count = 0
+            while pending:
+                self._check_cancelled()
+                finished, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    store(pending.pop(future), future.result())
+                    done_count += 1
+                    self._report(done_count, total)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise EnsembleCancelled("Расчет ансамбля прерван")
+
+    def _report(self, done: int, total: int):
+        if self.progress_callback:
+            self.progress_callback(done, total)
+
+
+# Движки текущего процесса пула (задаются _init_worker)
+_worker_engines: Tuple[LeewayParticleEngine, ...] = ()
+
+
+def _init_worker(engines: Tuple[LeewayParticleEngine, ...]):
+    """Инициализация процесса пула: движки передаются один раз, а не с каждым блоком"""
+    global _worker_engines
+    _worker_engines = engines
+
+
+def _run_task(function: Callable, engine: int, *args):
+    """Задача процесса пула: function с движком номер engine"""
+    return function(_worker_engines[engine], *args)
+
+
+def _block_rng(entropy, spawn_key: Tuple, index: int) -> np.random.Generator:
+    """Генератор блока - тот же, что в LeewayParticleEngine.simulate"""
+    return chunk_rng(np.random.SeedSequence(entropy, spawn_key=spawn_key), index)
+
+
+def _simulate_block(engine, lkp, duration_hours, n, entropy, spawn_key,
+                    index, initial_error_nm, output_hours):
+    """Задача процесса: блок частиц"""
+    return engine.simulate_chunk(lkp, duration_hours, n,
+                                 _block_rng(entropy, spawn_key, index),
+                                 initial_error_nm, output_hours)
+
+
+def _histogram_block(engine, lkp, duration_hours, n, entropy, spawn_key,
+                     index, initial_error_nm, grid):
+    """Задача процесса: блок частиц, свернутый в гистограмму"""
+    lat, lon = _simulate_block(engine, lkp, duration_hours, n, entropy, spawn_key,
+                               index, initial_error_nm, ())[:2]
+    return grid.histogram(lat, lon)
+
+
+def _mp_context():
+    """
+    Контекст multiprocessing без fork: копия процесса QGIS с его потоками
+    и состоянием Qt небезопасна, поэтому - forkserver, где он есть
+    (сервер запускается один раз, процессы пула порождаются из чистого
+    интерпретатора), иначе (Windows) - spawn. Внутри QGIS
+    sys.executable указывает на исполняемый файл QGIS, поэтому дочерним
+    процессам явно задается python
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    if not os.path.basename(sys.executable).lower().startswith('python'):
+        folders = (sys.exec_prefix, os.path.join(sys.exec_prefix, 'bin'))
+        names = ('pythonw.exe', 'python.exe', 'python3.exe') if sys.platform == 'win32' else (
+            f'python{sys.version_info[0]}.{sys.version_info[1]}', 'python3', 'python')
+        for candidate in (os.path.join(folder, name) for folder in folders for name in names):
+            if os.path.exists(candidate):
+                context.set_executable(candidate)
+                break
+    return context
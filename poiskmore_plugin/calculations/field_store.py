@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище сеточных полей ветра и течений
+Компоненты u/v хранятся на диске как массивы .npy (время × широта × долгота)
+и открываются через memory map. В память поднимаются только тайлы,
+которых касаются частицы расчета, поэтому прогнозы на несколько гигабайт
+используются без полной загрузки в ОЗУ.
+
+Формат каталога:
+    field.json          - метаданные (сетка, времена, единицы)
+    <имя>_u.npy, <имя>_v.npy - компоненты поля «куда», float32
+"""
+
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .leeway_particles import KNOTS_PER_MS
+
+
+METADATA_FILE = "field.json"
+
+# Множители перевода единиц поля в узлы
+UNIT_TO_KNOTS = {
+    "kn": 1.0,
+    "ms": KNOTS_PER_MS,
+}
+
+
+class GriddedField:
+    """Векторное поле на регулярной сетке с ленивой загрузкой тайлов"""
+
+    def __init__(self,
+                 u: np.ndarray,
+                 v: np.ndarray,
+                 hours: Sequence[float],
+                 lat0: float,
+                 dlat: float,
+                 lon0: float,
+                 dlon: float,
+                 units: str = "kn",
+                 tile_size: int = 128,
+                 max_tiles: int = 256):
+        """
+        Args:
+            u, v: Компоненты [время, широта, долгота] (обычно np.memmap)
+            hours: Времена срезов, часы от начала хранилища (по возрастанию)
+            lat0, dlat: Широта первой строки и шаг (шаг может быть отрицательным)
+            lon0, dlon: Долгота первого столбца и шаг
+            units: Единицы компонент ('kn' или 'ms')
+            tile_size: Размер тайла по широте и долготе, узлы сетки
+            max_tiles: Число тайлов, удерживаемых в памяти
+        """
+        if u.shape != v.shape or u.ndim != 3:
+            raise ValueError("Компоненты поля должны иметь одинаковую форму (время, широта, долгота)")
+        if units not in UNIT_TO_KNOTS:
+            raise ValueError(f"Неизвестные единицы поля: {units}")
+        self.u = u
+        self.v = v
+        self.hours = np.asarray(hours, dtype=np.float64)
+        if len(self.hours) != u.shape[0]:
+            raise ValueError("Число времен не совпадает с числом срезов поля")
+        if len(self.hours) > 1 and np.any(np.diff(self.hours) <= 0):
+            raise ValueError("Времена срезов должны возрастать")
+        self.lat0, self.dlat = float(lat0), float(dlat)
+        self.lon0, self.dlon = float(lon0), float(dlon)
+        self.scale = UNIT_TO_KNOTS[units]
+        self.tile_size = int(tile_size)
+        self.max_tiles = int(max_tiles)
+        self._tiles = OrderedDict()
+        self.tile_loads = 0
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.u.shape
+
+    def __getstate__(self):
+        """
+        Состояние для pickle: компоненты, открытые через memory map,
+        передаются путем к файлу (процессу-воркеру не копируется весь
+        прогноз), кэш тайлов не передается
+        """
+        state = self.__dict__.copy()
+        state["_tiles"] = OrderedDict()
+        for name in ("u", "v"):
+            array = state[name]
+            if isinstance(array, np.memmap) and array.filename:
+                state[name] = {"path": array.filename, "dtype": array.dtype.str, "shape": array.shape}
+        return state
+
+    def __setstate__(self, state):
+        for name in ("u", "v"):
+            mapped = state[name]
+            if isinstance(mapped, dict):
+                array = np.load(mapped["path"], mmap_mode="r")
+                if array.shape != tuple(mapped["shape"]) or array.dtype.str != mapped["dtype"]:
+                    raise ValueError(f"Файл поля изменился: {mapped['path']}")
+                state[name] = array
+        self.__dict__.update(state)
+
+    @property
+    def loaded_times(self) -> set:
+        """Индексы временных срезов, тайлы которых сейчас в памяти"""
+        return {key[0] for key in self._tiles}
+
+    def sample(self, t_hours, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Трилинейная интерполяция поля в точках
+
+        За пределами сетки значения берутся с границы (как и в интерполянтах
+        расписания), пропуски (NaN, суша) считаются нулем.
+
+        Args:
+            t_hours: Время, часы от начала хранилища (число или массив)
+            lat, lon: Координаты точек
+
+        Returns:
+            (u, v) в узлах, форма как у широкого из аргументов
+        """
+        t_hours, lat, lon = np.broadcast_arrays(
+            np.asarray(t_hours, dtype=np.float64),
+            np.asarray(lat, dtype=np.float64),
+            np.asarray(lon, dtype=np.float64))
+        shape = lat.shape
+        t_hours, lat, lon = t_hours.ravel(), lat.ravel(), lon.ravel()
+
+        it, wt = self._time_index(t_hours)
+        iy, wy = _cell_index((lat - self.lat0) / self.dlat, self.shape[1])
+        ix, wx = _cell_index((lon - self.lon0) / self.dlon, self.shape[2])
+
+        u0, v0 = self._bilinear(it, iy, wy, ix, wx)
+        if len(self.hours) > 1 and np.any(wt > 0):
+            u1, v1 = self._bilinear(it + 1, iy, wy, ix, wx)
+            u0 += (u1 - u0) * wt
+            v0 += (v1 - v0) * wt
+        return u0.reshape(shape) * self.scale, v0.reshape(shape) * self.scale
+
+    def clear_cache(self):
+        """Выгрузить все тайлы из памяти"""
+        self._tiles.clear()
+
+    def _time_index(self, t_hours: np.ndarray):
+        """Левый срез и вес правого для каждого момента"""
+        hours = self.hours
+        if len(hours) == 1:
+            return np.zeros(t_hours.shape, dtype=np.intp), np.zeros(t_hours.shape)
+        it = np.clip(np.searchsorted(hours, t_hours, side="right") - 1, 0, len(hours) - 2)
+        wt = np.clip((t_hours - hours[it]) / (hours[it + 1] - hours[it]), 0.0, 1.0)
+        return it, wt
+
+    def _bilinear(self, it, iy, wy, ix, wx):
+        """Билинейная интерполяция в срезах it по тайлам"""
+        size = self.tile_size
+        tile_rows = iy // size
+        tile_cols = ix // size
+        n_rows = (self.shape[1] - 2) // size + 1
+        n_cols = (self.shape[2] - 2) // size + 1
+        keys = (it * n_rows + tile_rows) * n_cols + tile_cols
+
+        u = np.empty(len(keys))
+        v = np.empty(len(keys))
+        if len(keys) and keys.min() == keys.max():
+            groups = [slice(None)]
+        else:
+            order = np.argsort(keys, kind="stable")
+            _, starts = np.unique(keys[order], return_index=True)
+            groups = np.split(order, starts[1:])
+
+        for index in groups:
+            first = index[0] if isinstance(index, np.ndarray) else 0
+            row, col = int(tile_rows[first]), int(tile_cols[first])
+            tile = self._tile(int(it[first]), row, col)
+            ly = iy[index] - row * size
+            lx = ix[index] - col * size
+            fy = wy[index]
+            fx = wx[index]
+            for out, component in ((u, tile[0]), (v, tile[1])):
+                top = component[ly, lx] + (component[ly, lx + 1] - component[ly, lx]) * fx
+                bottom = component[ly + 1, lx] + (component[ly + 1, lx + 1] - component[ly + 1, lx]) * fx
+                out[index] = top + (bottom - top) * fy
+        return u, v
+
+    def _tile(self, it: int, row: int, col: int) -> np.ndarray:
+        """
+        Тайл (2, size + 1, size + 1) из кэша или с диска
+
+        Тайлы перекрываются на один узел, чтобы ячейка на границе тайла
+        интерполировалась без обращения к соседу.
+        """
+        key = (it, row, col)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+
+        size = self.tile_size
+        rows = slice(row * size, min((row + 1) * size + 1, self.shape[1]))
+        cols = slice(col * size, min((col + 1) * size + 1, self.shape[2]))
+        tile = np.nan_to_num(np.stack([
+            np.asarray(self.u[it, rows, cols], dtype=np.float32),
+            np.asarray(self.v[it, rows, cols], dtype=np.float32)
+        ]), copy=False)
+        self._tiles[key] = tile
+        self.tile_loads += 1
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+
+class FieldStore:
+    """Каталог с сеточными полями ветра и течений одного прогноза"""
+
+    def __init__(self, path: str, tile_size: int = 128, max_tiles: int = 256):
+        """
+        Args:
+            path: Каталог хранилища
+            tile_size: Размер тайла, узлы сетки
+            max_tiles: Число тайлов в памяти на каждое поле
+        """
+        self.path = path
+        with open(os.path.join(path, METADATA_FILE), encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        self.start_time = datetime.fromisoformat(self.metadata["start_time"])
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self._fields: Dict[str, GriddedField] = {}
+
+    @classmethod
+    def create(cls,
+               path: str,
+               start_time: datetime,
+               hours: Sequence[float],
+               lats: Sequence[float],
+               lons: Sequence[float],
+               units: Optional[Dict[str, str]] = None) -> 'FieldStore':
+        """
+        Создать пустое хранилище; поля заполняются через write_slice
+
+        Args:
+            path: Каталог (создается при необходимости)
+            start_time: Момент отсчета времен (UTC)
+            hours: Времена срезов, часы от start_time
+            lats, lons: Узлы регулярной сетки
+            units: Единицы полей, по умолчанию {'wind': 'ms', 'current': 'kn'}
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if len(lats) < 2 or len(lons) < 2:
+            raise ValueError("Сетка должна содержать не менее двух узлов по каждой оси")
+        units = units or {"wind": "ms", "current": "kn"}
+        os.makedirs(path, exist_ok=True)
+        shape = (len(hours), len(lats), len(lons))
+        for name in units:
+            for component in ("u", "v"):
+                array = np.lib.format.open_memmap(os.path.join(path, f"{name}_{component}.npy"),
+                                                  mode="w+", dtype=np.float32, shape=shape)
+                del array
+
+        metadata = {
+            "start_time": start_time.isoformat(),
+            "hours": [float(h) for h in hours],
+            "lat0": float(lats[0]),
+            "dlat": float(lats[1] - lats[0]),
+            "lon0": float(lons[0]),
+            "dlon": float(lons[1] - lons[0]),
+            "shape": list(shape),
+            "units": units,
+        }
+        with open(os.path.join(path, METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        return cls(path)
+
+    @property
+    def names(self) -> Sequence[str]:
+        return list(self.metadata["units"])
+
+    def write_slice(self, name: str, time_index: int, u: np.ndarray, v: np.ndarray):
+        """Записать один временной срез поля (не требует загрузки остальных)"""
+        for component, values in (("u", u), ("v", v)):
+            array = np.load(self._file(name, component), mmap_mode="r+")
+            array[time_index] = values
+            array.flush()
+            del array
+        if name in self._fields:
+            self._fields[name].clear_cache()
+
+    def field(self, name: str) -> GriddedField:
+        """Поле по имени ('wind', 'current'), открытое через memory map"""
+        if name not in self._fields:
+            if name not in self.metadata["units"]:
+                raise KeyError(f"В хранилище нет поля {name}")
+            meta = self.metadata
+            self._fields[name] = GriddedField(
+                np.load(self._file(name, "u"), mmap_mode="r"),
+                np.load(self._file(name, "v"), mmap_mode="r"),
+                meta["hours"], meta["lat0"], meta["dlat"], meta["lon0"], meta["dlon"],
+                units=meta["units"][name],
+                tile_size=self.tile_size,
+                max_tiles=self.max_tiles
+            )
+        return self._fields[name]
+
+    def forcing(self, start_time: Optional[datetime] = None) -> 'FieldStoreForcing':
+        """
+        Функция воздействия для LeewayParticleEngine / DriftIntegrator
+
+        Args:
+            start_time: Момент t = 0 расчета; по умолчанию - начало хранилища
+        """
+        offset = 0.0
+        if start_time is not None:
+            offset = (start_time - self.start_time).total_seconds() / 3600.0
+        wind = self.field("wind") if "wind" in self.metadata["units"] else None
+        current = self.field("current") if "current" in self.metadata["units"] else None
+        return FieldStoreForcing(wind, current, offset)
+
+    def _file(self, name: str, component: str) -> str:
+        return os.path.join(self.path, f"{name}_{component}.npy")
+
+
+class FieldStoreForcing:
+    """Воздействие из сеточных полей (протокол Forcing, узлы, «куда»)"""
+
+    def __init__(self,
+                 wind: Optional[GriddedField],
+                 current: Optional[GriddedField],
+                 offset_hours: float = 0.0):
+        """
+        Args:
+            wind: Поле ветра (None - штиль)
+            current: Поле течения (None - без течения)
+            offset_hours: Сдвиг времени расчета относительно начала хранилища
+        """
+        self.wind = wind
+        self.current = current
+        self.offset_hours = offset_hours
+
+    def __call__(self, t_hours: float, lat: np.ndarray, lon: np.ndarray):
+        t = t_hours + self.offset_hours
+        zeros = np.zeros(np.shape(lat))
+        wind_u, wind_v = self.wind.sample(t, lat, lon) if self.wind else (zeros, zeros)
+        current_u, current_v = self.current.sample(t, lat, lon) if self.current else (zeros, zeros)
+        return wind_u, wind_v, current_u, current_v
+
+
+def _cell_index(position: np.ndarray, n: int):
+    """Левый узел ячейки и дробная часть для дробного индекса (с прижатием к границе)"""
+    position = np.clip(position, 0.0, n - 1)
+    index = np.minimum(position.astype(np.intp), n - 2)
+    return index, position - index
@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+Векторизованные геодезические расчеты
+Расстояние, азимут, прямая задача, локальная проекция ENU и площади
+полигонов для массивов точек. Две модели Земли: сфера радиусом
+EARTH_RADIUS_NM (как в прежних скалярных функциях плагина) и эллипсоид
+WGS84 (формулы Винсенти, точная площадь).
+Все функции принимают числа или массивы numpy (с broadcasting),
+расстояния - в морских милях, углы - в градусах.
+"""
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+EARTH_RADIUS_NM = 3440.065          # Средний радиус Земли, морские мили
+METERS_PER_NM = 1852.0
+KM_PER_NM = 1.852
+
+# Эллипсоид WGS84
+WGS84_A_NM = 6378137.0 / METERS_PER_NM
+WGS84_F = 1 / 298.257223563
+WGS84_B_NM = WGS84_A_NM * (1 - WGS84_F)
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+
+# Точность и предел итераций формул Винсенти
+VINCENTY_TOLERANCE = 1e-12
+VINCENTY_MAX_ITERATIONS = 200
+
+# Квадратура Гаусса-Лежандра (5 узлов) на [0, 1] для интеграла вдоль ребра
+_GAUSS_NODES, _GAUSS_WEIGHTS = np.polynomial.legendre.leggauss(5)
+_GAUSS_NODES = (_GAUSS_NODES + 1) / 2
+_GAUSS_WEIGHTS = _GAUSS_WEIGHTS / 2
+
+
+def distance_nm(lat1, lon1, lat2, lon2,
+                ellipsoid: bool = False,
+                radius_nm: float = EARTH_RADIUS_NM) -> np.ndarray:
+    """
+    Расстояние между точками
+
+    Args:
+        lat1, lon1: Первая точка (точки)
+        lat2, lon2: Вторая точка (точки)
+        ellipsoid: True - по эллипсоиду WGS84, False - по сфере
+        radius_nm: Радиус сферы (только для сферической модели)
+
+    Returns:
+        Расстояние в морских милях
+    """
+    if ellipsoid:
+        return inverse(lat1, lon1, lat2, lon2, ellipsoid=True)[0]
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dlmb = np.radians(np.subtract(lon2, lon1))
+    # Формула гаверсинуса
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)
+    return radius_nm * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def bearing_deg(lat1, lon1, lat2, lon2, ellipsoid: bool = False) -> np.ndarray:
+    """Начальный азимут с первой точки на вторую, градусы [0, 360)"""
+    if ellipsoid:
+        return inverse(lat1, lon1, lat2, lon2, ellipsoid=True)[1]
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dlmb = np.radians(np.subtract(lon2, lon1))
+    y = np.sin(dlmb) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlmb)
+    return _normalize_azimuth(np.degrees(np.arctan2(y, x)))
+
+
+def inverse(lat1, lon1, lat2, lon2, ellipsoid: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Обратная геодезическая задача
+
+    На эллипсоиде - итерации Винсенти; для почти диаметрально
+    противоположных точек, где они не сходятся, используется сфера.
+
+    Returns:
+        (расстояние, мили; начальный азимут, градусы)
+    """
+    if not ellipsoid:
+        return distance_nm(lat1, lon1, lat2, lon2), bearing_deg(lat1, lon1, lat2, lon2)
+
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64)
+                                                   for v in (lat1, lon1, lat2, lon2)))
+    f = WGS84_F
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(VINCENTY_MAX_ITERATIONS):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma > 0, cos_u1 * cos_u2 * sin_lam / sin_sigma, 0.0)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sm = np.where(cos2_alpha > 0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha, 0.0)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_next = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sm + C * cos_sigma * (-1 + 2 * cos_2sm ** 2)))
+            converged = np.abs(lam_next - lam) < VINCENTY_TOLERANCE
+            lam = lam_next
+            if converged.all():
+                break
+
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        u2 = cos2_alpha * (WGS84_A_NM ** 2 - WGS84_B_NM ** 2) / WGS84_B_NM ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sm + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sm ** 2)
+            - B / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)))
+        distance = WGS84_B_NM * A * (sigma - delta_sigma)
+        azimuth = _normalize_azimuth(np.degrees(np.arctan2(
+            cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)))
+
+    if not converged.all():
+        fallback = ~converged
+        distance = np.where(fallback, distance_nm(lat1, lon1, lat2, lon2), distance)
+        azimuth = np.where(fallback, bearing_deg(lat1, lon1, lat2, lon2), azimuth)
+    return distance, azimuth
+
+
+def destination(lat, lon, distance, bearing,
+                ellipsoid: bool = False,
+                radius_nm: float = EARTH_RADIUS_NM) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Прямая геодезическая задача: точка на заданном расстоянии и азимуте
+
+    Args:
+        lat, lon: Начальная точка (точки)
+        distance: Расстояние, морские мили
+        bearing: Азимут, градусы
+        ellipsoid: True - по эллипсоиду WGS84 (Винсенти), False - по сфере
+        radius_nm: Радиус сферы (только для сферической модели)
+
+    Returns:
+        (lat, lon) конечной точки, градусы
+    """
+    if ellipsoid:
+        return _vincenty_direct(lat, lon, distance, bearing)
+    phi1 = np.radians(lat)
+    lmb1 = np.radians(lon)
+    theta = np.radians(bearing)
+    delta = np.asarray(distance, dtype=np.float64) / radius_nm
+
+    sin_phi1, cos_phi1 = np.sin(phi1), np.cos(phi1)
+    sin_delta, cos_delta = np.sin(delta), np.cos(delta)
+    phi2 = np.arcsin(np.clip(sin_phi1 * cos_delta + cos_phi1 * sin_delta * np.cos(theta), -1.0, 1.0))
+    lmb2 = lmb1 + np.arctan2(np.sin(theta) * sin_delta * cos_phi1,
+                             cos_delta - sin_phi1 * np.sin(phi2))
+    return np.degrees(phi2), np.degrees(lmb2)
+
+
+def path_length_nm(lats: Sequence[float], lons: Sequence[float], ellipsoid: bool = False) -> float:
+    """Длина ломаной по вершинам, морские мили"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if len(lats) < 2:
+        return 0.0
+    return float(np.sum(distance_nm(lats[:-1], lons[:-1], lats[1:], lons[1:], ellipsoid=ellipsoid)))
+
+
+def ring_area_nm2(lats, lons, signed: bool = False, ellipsoid: bool = True) -> np.ndarray:
+    """
+    Площадь кольца (или пачки колец одинаковой длины), кв. морские мили
+
+    Ребра - прямые в координатах lat/lon (как в слоях EPSG:4326), поэтому
+    клетки сетки между параллелями и меридианами считаются точно. Площадь
+    равна -∮ S(φ) dλ, где S - первообразная элемента площади эллипсоида
+    (равновеликая цилиндрическая проекция); интеграл вдоль ребра -
+    квадратура Гаусса-Лежандра. Кольца, охватывающие полюс, не поддерживаются.
+
+    Args:
+        lats, lons: Вершины [..., n]; последняя ось - кольцо (замыкать не нужно)
+        signed: Со знаком: положительная при обходе против часовой стрелки
+        ellipsoid: WGS84; False - сфера EARTH_RADIUS_NM
+
+    Returns:
+        Площади формы lats.shape[:-1]
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    next_lats = np.roll(lats, -1, axis=-1)
+    next_lons = np.roll(lons, -1, axis=-1)
+    area = _edge_integrals(lats, lons, next_lats, next_lons, ellipsoid).sum(axis=-1)
+    return area if signed else np.abs(area)
+
+
+def rings_area_nm2(lats, lons, ring_index, signed: bool = False, ellipsoid: bool = True) -> np.ndarray:
+    """
+    Площади колец разной длины одним вызовом
+
+    Args:
+        lats, lons: Вершины всех колец подряд
+        ring_index: Номер кольца каждой вершины (0..k-1, вершины кольца подряд)
+        signed: Со знаком (см. ring_area_nm2)
+        ellipsoid: WGS84; False - сфера
+
+    Returns:
+        Площади колец [k]
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    ring_index = np.asarray(ring_index, dtype=np.int64)
+    if not len(lats):
+        return np.zeros(0)
+    # Следующая вершина; для последней вершины кольца - первая
+    following = np.arange(1, len(lats) + 1)
+    last = np.flatnonzero(np.append(ring_index[1:] != ring_index[:-1], True))
+    first = np.concatenate(([0], last[:-1] + 1))
+    following[last] = first
+    edges = _edge_integrals(lats, lons, lats[following], lons[following], ellipsoid)
+    area = np.bincount(ring_index, weights=edges, minlength=int(ring_index.max()) + 1)
+    return area if signed else np.abs(area)
+
+
+def polygon_area_nm2(rings: Sequence, ellipsoid: bool = True) -> float:
+    """
+    Площадь полигона с дырами: |внешнее кольцо| - сумма |дыр|
+
+    Args:
+        rings: Кольца [(lat, lon), ...]; первое - внешнее, остальные - дыры
+        ellipsoid: WGS84; False - сфера
+    """
+    rings = [np.asarray(ring, dtype=np.float64).reshape(-1, 2) for ring in rings]
+    rings = [ring for ring in rings if len(ring) >= 3]
+    if not rings:
+        return 0.0
+    index = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+    points = np.concatenate(rings)
+    areas = rings_area_nm2(points[:, 0], points[:, 1], index, ellipsoid=ellipsoid)
+    return float(max(areas[0] - areas[1:].sum(), 0.0))
+
+
+def multipolygon_area_nm2(polygons: Sequence, ellipsoid: bool = True) -> float:
+    """Площадь мультиполигона (полигоны не перекрываются), кв. морские мили"""
+    return float(sum(polygon_area_nm2(rings, ellipsoid) for rings in polygons))
+
+
+def to_enu(lat, lon, origin_lat: float, origin_lon: float,
+           ellipsoid: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Локальные координаты ENU (восток, север, вверх) относительно origin
+
+    Точное преобразование через геоцентрические координаты; для точек
+    на поверхности «вверх» - отрицательное понижение из-за кривизны.
+
+    Returns:
+        (east, north, up) в морских милях
+    """
+    x, y, z = _to_ecef(lat, lon, ellipsoid)
+    x0, y0, z0 = _to_ecef(origin_lat, origin_lon, ellipsoid)
+    dx, dy, dz = x - x0, y - y0, z - z0
+    sin_phi, cos_phi = np.sin(np.radians(origin_lat)), np.cos(np.radians(origin_lat))
+    sin_lmb, cos_lmb = np.sin(np.radians(origin_lon)), np.cos(np.radians(origin_lon))
+    east = -sin_lmb * dx + cos_lmb * dy
+    north = -sin_phi * cos_lmb * dx - sin_phi * sin_lmb * dy + cos_phi * dz
+    up = cos_phi * cos_lmb * dx + cos_phi * sin_lmb * dy + sin_phi * dz
+    return east, north, up
+
+
+def from_enu(east, north, up, origin_lat: float, origin_lon: float,
+             ellipsoid: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Обратное к to_enu преобразование (высота над поверхностью отбрасывается)
+
+    Returns:
+        (lat, lon) в градусах
+    """
+    sin_phi, cos_phi = np.sin(np.radians(origin_lat)), np.cos(np.radians(origin_lat))
+    sin_lmb, cos_lmb = np.sin(np.radians(origin_lon)), np.cos(np.radians(origin_lon))
+    x0, y0, z0 = _to_ecef(origin_lat, origin_lon, ellipsoid)
+    x = x0 - sin_lmb * east - sin_phi * cos_lmb * north + cos_phi * cos_lmb * up
+    y = y0 + cos_lmb * east - sin_phi * sin_lmb * north + cos_phi * sin_lmb * up
+    z = z0 + cos_phi * north + sin_phi * up
+    return _from_ecef(x, y, z, ellipsoid)
+
+
+def surface_from_enu(east, north, origin_lat: float, origin_lon: float,
+                     ellipsoid: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Точка поверхности с координатами (east, north) в системе ENU
+
+    Точное обратное к to_enu для точек на поверхности: «вверх» находится
+    из пересечения вертикали origin с эллипсоидом (квадратное уравнение).
+    Нужна плоским сеткам, чьи узлы должны попадать в те же места, что и
+    спроецированные в плоскость границы.
+
+    Returns:
+        (lat, lon) в градусах
+    """
+    sin_phi, cos_phi = np.sin(np.radians(origin_lat)), np.cos(np.radians(origin_lat))
+    sin_lmb, cos_lmb = np.sin(np.radians(origin_lon)), np.cos(np.radians(origin_lon))
+    x0, y0, z0 = _to_ecef(origin_lat, origin_lon, ellipsoid)
+    x = x0 - sin_lmb * east - sin_phi * cos_lmb * north
+    y = y0 + cos_lmb * east - sin_phi * sin_lmb * north
+    z = z0 + cos_phi * north
+    ux, uy, uz = cos_phi * cos_lmb, cos_phi * sin_lmb, sin_phi
+    a2 = WGS84_A_NM ** 2 if ellipsoid else EARTH_RADIUS_NM ** 2
+    b2 = WGS84_B_NM ** 2 if ellipsoid else EARTH_RADIUS_NM ** 2
+    qa = (ux * ux + uy * uy) / a2 + uz * uz / b2
+    qb = 2 * ((x * ux + y * uy) / a2 + z * uz / b2)
+    qc = (x * x + y * y) / a2 + z * z / b2 - 1
+    # Ближний к плоскости корень в устойчивой форме
+    up = -2 * qc / (qb + np.sqrt(qb * qb - 4 * qa * qc))
+    return _from_ecef(x + up * ux, y + up * uy, z + up * uz, ellipsoid)
+
+
+def laea_forward(lat, lon, origin_lat: float, origin_lon: float,
+                 ellipsoid: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Равновеликая азимутальная проекция Ламберта с центром origin
+
+    Площадь любой фигуры в проекции равна ее площади на эллипсоиде
+    (на сфере при ellipsoid=False); эллипсоид приводится к сфере
+    равной площади через авталическую широту (Снайдер, формулы 24-28).
+
+    Returns:
+        (x, y) - восток, север в морских милях
+    """
+    radius, beta0, scale = _laea_constants(origin_lat, ellipsoid)
+    beta = _authalic_latitude(np.radians(lat), ellipsoid)
+    dlmb = np.radians((np.asarray(lon, dtype=np.float64) - origin_lon + 180) % 360 - 180)
+    sin_b, cos_b = np.sin(beta), np.cos(beta)
+    cos_l = np.cos(dlmb)
+    b = radius * np.sqrt(2 / (1 + np.sin(beta0) * sin_b + np.cos(beta0) * cos_b * cos_l))
+    x = b * scale * cos_b * np.sin(dlmb)
+    y = b / scale * (np.cos(beta0) * sin_b - np.sin(beta0) * cos_b * cos_l)
+    return x, y
+
+
+def laea_inverse(x, y, origin_lat: float, origin_lon: float,
+                 ellipsoid: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Обратное к laea_forward преобразование
+
+    Returns:
+        (lat, lon) в градусах
+    """
+    radius, beta0, scale = _laea_constants(origin_lat, ellipsoid)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    rho = np.hypot(x / scale, scale * y)
+    ce = 2 * np.arcsin(np.clip(rho / (2 * radius), -1.0, 1.0))
+    sin_c, cos_c = np.sin(ce), np.cos(ce)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(rho > 0, scale * y * sin_c / rho, 0.0)
+    beta = np.arcsin(np.clip(cos_c * np.sin(beta0) + ratio * np.cos(beta0), -1.0, 1.0))
+    dlmb = np.arctan2(x * sin_c,
+                      scale * rho * np.cos(beta0) * cos_c - scale ** 2 * y * np.sin(beta0) * sin_c)
+    lon = (origin_lon + np.degrees(dlmb) + 180) % 360 - 180
+    return np.degrees(_geodetic_latitude(beta, ellipsoid)), lon
+
+
+def _area_primitive(phi: np.ndarray, ellipsoid: bool) -> np.ndarray:
+    """Площадь между экватором и параллелью phi на единицу долготы (радиан), кв. мили"""
+    sin_phi = np.sin(phi)
+    if not ellipsoid:
+        return EARTH_RADIUS_NM ** 2 * sin_phi
+    e = np.sqrt(WGS84_E2)
+    return (WGS84_A_NM ** 2 * (1 - WGS84_E2) / 2 *
+            (sin_phi / (1 - WGS84_E2 * sin_phi ** 2) + np.arctanh(e * sin_phi) / e))
+
+
+def _authalic_latitude(phi, ellipsoid: bool) -> np.ndarray:
+    """Авталическая широта (широта на сфере равной площади), радианы"""
+    if not ellipsoid:
+        return np.asarray(phi, dtype=np.float64)
+    pole = _area_primitive(np.pi / 2, True)
+    return np.arcsin(np.clip(_area_primitive(phi, True) / pole, -1.0, 1.0))
+
+
+def _geodetic_latitude(beta, ellipsoid: bool) -> np.ndarray:
+    """Геодезическая широта по авталической (ряд Снайдера, формула 3-18)"""
+    if not ellipsoid:
+        return beta
+    e2 = WGS84_E2
+    return (beta
+            + (e2 / 3 + 31 * e2 ** 2 / 180 + 517 * e2 ** 3 / 5040) * np.sin(2 * beta)
+            + (23 * e2 ** 2 / 360 + 251 * e2 ** 3 / 3780) * np.sin(4 * beta)
+            + 761 * e2 ** 3 / 45360 * np.sin(6 * beta))
+
+
+def _laea_constants(origin_lat: float, ellipsoid: bool) -> Tuple[float, float, float]:
+    """Радиус сферы равной площади, авталическая широта центра, масштаб D"""
+    if not ellipsoid:
+        return EARTH_RADIUS_NM, float(np.radians(origin_lat)), 1.0
+    radius = float(np.sqrt(_area_primitive(np.pi / 2, True)))
+    phi0 = np.radians(origin_lat)
+    beta0 = float(_authalic_latitude(phi0, True))
+    m0 = np.cos(phi0) / np.sqrt(1 - WGS84_E2 * np.sin(phi0) ** 2)
+    scale = 1.0 if abs(np.cos(beta0)) < 1e-12 else float(WGS84_A_NM * m0 / (radius * np.cos(beta0)))
+    return radius, beta0, scale
+
+
+def _edge_integrals(lat1, lon1, lat2, lon2, ellipsoid: bool) -> np.ndarray:
+    """Вклад ребер в площадь: -Δλ * среднее S(φ) вдоль ребра (φ линейна по λ)"""
+    dlon = np.radians((lon2 - lon1 + 180) % 360 - 180)
+    phi = np.radians(lat1[..., None] + (lat2 - lat1)[..., None] * _GAUSS_NODES)
+    mean_s = _area_primitive(phi, ellipsoid) @ _GAUSS_WEIGHTS
+    return -dlon * mean_s
+
+
+def _normalize_azimuth(azimuth: np.ndarray) -> np.ndarray:
+    """Азимут в диапазоне [0, 360)"""
+    azimuth = np.mod(azimuth, 360.0)
+    return np.where(azimuth >= 360.0, 0.0, azimuth)
+
+
+def _to_ecef(lat, lon, ellipsoid: bool):
+    """Геоцентрические координаты точки на поверхности, мили"""
+    phi = np.radians(lat)
+    lmb = np.radians(lon)
+    if ellipsoid:
+        n = WGS84_A_NM / np.sqrt(1 - WGS84_E2 * np.sin(phi) ** 2)
+        return (n * np.cos(phi) * np.cos(lmb),
+                n * np.cos(phi) * np.sin(lmb),
+                n * (1 - WGS84_E2) * np.sin(phi))
+    return (EARTH_RADIUS_NM * np.cos(phi) * np.cos(lmb),
+            EARTH_RADIUS_NM * np.cos(phi) * np.sin(lmb),
+            EARTH_RADIUS_NM * np.sin(phi))
+
+
+def _from_ecef(x, y, z, ellipsoid: bool):
+    """Геодезические координаты по геоцентрическим (итерации по широте)"""
+    p = np.hypot(x, y)
+    lon = np.degrees(np.arctan2(y, x))
+    if not ellipsoid:
+        return np.degrees(np.arctan2(z, p)), lon
+    phi = np.arctan2(z, p * (1 - WGS84_E2))
+    for _ in range(5):
+        n = WGS84_A_NM / np.sqrt(1 - WGS84_E2 * np.sin(phi) ** 2)
+        h = p / np.cos(phi) - n
+        phi = np.arctan2(z, p * (1 - WGS84_E2 * n / (n + h)))
+    return np.degrees(phi), lon
+
+
+def _vincenty_direct(lat, lon, distance, bearing):
+    """Прямая задача Винсенти на эллипсоиде WGS84"""
+    lat, lon, distance, bearing = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64)
+                                                        for v in (lat, lon, distance, bearing)))
+    f = WGS84_F
+    alpha1 = np.radians(bearing)
+    sin_alpha1, cos_alpha1 = np.sin(alpha1), np.cos(alpha1)
+    tan_u1 = (1 - f) * np.tan(np.radians(lat))
+    cos_u1 = 1 / np.sqrt(1 + tan_u1 ** 2)
+    sin_u1 = tan_u1 * cos_u1
+    sigma1 = np.arctan2(tan_u1, cos_alpha1)
+    sin_alpha = cos_u1 * sin_alpha1
+    cos2_alpha = 1 - sin_alpha ** 2
+    u2 = cos2_alpha * (WGS84_A_NM ** 2 - WGS84_B_NM ** 2) / WGS84_B_NM ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+
+    sigma = distance / (WGS84_B_NM * A)
+    for _ in range(VINCENTY_MAX_ITERATIONS):
+        cos_2sm = np.cos(2 * sigma1 + sigma)
+        sin_sigma, cos_sigma = np.sin(sigma), np.cos(sigma)
+        delta_sigma = B * sin_sigma * (cos_2sm + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sm ** 2)
+            - B / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)))
+        sigma_next = distance / (WGS84_B_NM * A) + delta_sigma
+        done = np.all(np.abs(sigma_next - sigma) < VINCENTY_TOLERANCE)
+        sigma = sigma_next
+        if done:
+            break
+
+    cos_2sm = np.cos(2 * sigma1 + sigma)
+    sin_sigma, cos_sigma = np.sin(sigma), np.cos(sigma)
+    x = sin_u1 * sin_sigma - cos_u1 * cos_sigma * cos_alpha1
+    phi2 = np.arctan2(sin_u1 * cos_sigma + cos_u1 * sin_sigma * cos_alpha1,
+                      (1 - f) * np.hypot(sin_alpha, x))
+    lam = np.arctan2(sin_sigma * sin_alpha1, cos_u1 * cos_sigma - sin_u1 * sin_sigma * cos_alpha1)
+    C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+    L = lam - (1 - C) * f * sin_alpha * (
+        sigma + C * sin_sigma * (cos_2sm + C * cos_sigma * (-1 + 2 * cos_2sm ** 2)))
+    return np.degrees(phi2), lon + np.degrees(L)
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Маска суши для выброса частиц на берег
+Полигоны береговой линии растеризуются в регулярную сетку: ячейка целиком
+на воде, целиком на суше или смешанная (ее пересекает граница). Для
+смешанных ячеек хранится индекс отрезков границы, проходящих через
+ячейку, и признак "опорная точка ячейки на суше"; точка в такой ячейке
+проверяется точно - по четности пересечений отрезка "опорная точка - точка"
+с границей. Проверка полностью векторная: миллион точек за один вызов.
+"""
+
+import json
+import math
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+# Состояния ячеек растра
+CELL_WATER = 0
+CELL_LAND = 1
+CELL_MIXED = 2
+
+# Опорная точка ячейки (доли ячейки от юго-западного угла). Смещена от
+# центра, чтобы границы с "круглыми" координатами не проходили через нее
+ANCHOR_X = 0.5123457
+ANCHOR_Y = 0.4876543
+
+Ring = np.ndarray          # [n, 2] - (lon, lat), как в GeoJSON
+Polygon = List[Ring]       # Внешний контур и дыры
+
+
+def polygons_from_geojson(data: Union[dict, str]) -> List[Polygon]:
+    """
+    Полигоны суши из GeoJSON (FeatureCollection, Feature или геометрия)
+
+    Args:
+        data: Разобранный GeoJSON или путь к файлу
+
+    Returns:
+        Список полигонов; каждый - список колец [n, 2] (lon, lat)
+    """
+    if isinstance(data, str):
+        with open(data, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+    geometries = []
+    if data.get('type') == 'FeatureCollection':
+        geometries = [feature.get('geometry') for feature in data.get('features', [])]
+    elif data.get('type') == 'Feature':
+        geometries = [data.get('geometry')]
+    else:
+        geometries = [data]
+
+    polygons = []
+    for geometry in geometries:
+        if not geometry:
+            continue
+        if geometry['type'] == 'Polygon':
+            parts = [geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            parts = geometry['coordinates']
+        else:
+            continue
+        for part in parts:
+            polygons.append([np.asarray(ring, dtype=np.float64)[:, :2] for ring in part])
+    return polygons
+
+
+class LandMask:
+    """Растровая маска суши с точной проверкой в ячейках у берега"""
+
+    def __init__(self,
+                 polygons: Sequence[Polygon],
+                 cell_deg: float = 0.02,
+                 bounds: Optional[Tuple[float, float, float, float]] = None):
+        """
+        Args:
+            polygons: Полигоны суши (кольца (lon, lat)); полигоны не должны
+                перекрываться - принадлежность считается по четности
+            cell_deg: Размер ячейки растра, градусы
+            bounds: Область растра (lat_min, lat_max, lon_min, lon_max);
+                по умолчанию - охват полигонов. Вне области - вода
+        """
+        if cell_deg <= 0:
+            raise ValueError("Размер ячейки должен быть положительным")
+        x0, y0, x1, y1 = _ring_edges(polygons)
+        if bounds is None:
+            if len(x0):
+                bounds = (min(y0.min(), y1.min()) - cell_deg, max(y0.max(), y1.max()) + cell_deg,
+                          min(x0.min(), x1.min()) - cell_deg, max(x0.max(), x1.max()) + cell_deg)
+            else:
+                bounds = (0.0, cell_deg, 0.0, cell_deg)
+        self.lat_min, lat_max, self.lon_min, lon_max = (float(b) for b in bounds)
+        self.cell_deg = float(cell_deg)
+        self.rows = max(int(math.ceil((lat_max - self.lat_min) / cell_deg)), 1)
+        self.cols = max(int(math.ceil((lon_max - self.lon_min) / cell_deg)), 1)
+
+        anchor_land = self._rasterize_anchors(x0, y0, x1, y1)
+        self._build_edge_index(x0, y0, x1, y1)
+
+        self.cells = anchor_land.astype(np.uint8).ravel()
+        self.cells[self.mixed_cells] = CELL_MIXED
+        self.mixed_anchor_land = anchor_land.ravel()[self.mixed_cells]
+        self.mixed_slot = np.full(self.rows * self.cols, -1, dtype=np.int32)
+        self.mixed_slot[self.mixed_cells] = np.arange(len(self.mixed_cells), dtype=np.int32)
+
+    @classmethod
+    def from_geojson(cls, paths: Union[str, Sequence[str]], cell_deg: float = 0.02,
+                     bounds: Optional[Tuple[float, float, float, float]] = None) -> 'LandMask':
+        """Маска по одному или нескольким файлам GeoJSON с полигонами суши"""
+        if isinstance(paths, str):
+            paths = [paths]
+        polygons = []
+        for path in paths:
+            polygons.extend(polygons_from_geojson(path))
+        return cls(polygons, cell_deg, bounds)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.rows, self.cols
+
+    def is_land(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """
+        Проверка "точка на суше" для массива точек
+
+        Args:
+            lat, lon: Координаты точек (любой формы)
+
+        Returns:
+            Булев массив той же формы
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        shape = np.broadcast(lat, lon).shape
+        lat = np.broadcast_to(lat, shape).ravel()
+        lon = np.broadcast_to(lon, shape).ravel()
+
+        fx = (lon - self.lon_min) / self.cell_deg
+        fy = (lat - self.lat_min) / self.cell_deg
+        inside = (fx >= 0) & (fx < self.cols) & (fy >= 0) & (fy < self.rows)
+        cell = np.zeros(len(lat), dtype=np.intp)
+        cell[inside] = fy[inside].astype(np.intp) * self.cols + fx[inside].astype(np.intp)
+        state = np.where(inside, self.cells[cell], CELL_WATER)
+        land = state == CELL_LAND
+
+        mixed = np.flatnonzero(state == CELL_MIXED)
+        if len(mixed):
+            land[mixed] = self._exact(lon[mixed], lat[mixed], cell[mixed])
+        return land.reshape(shape)
+
+    def strand_tracks(self, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Остановить траектории у берега
+
+        Args:
+            lat, lon: Траектории [время, частица] (или [время] для одной)
+
+        Returns:
+            (lat, lon, first_land): копии траекторий, где после выхода на
+            сушу частица остается в последней точке на воде; first_land -
+            индекс момента выхода на сушу (-1 - частица не выброшена)
+        """
+        lat = np.array(lat, copy=True)
+        lon = np.array(lon, copy=True)
+        single = lat.ndim == 1
+        if single:
+            lat, lon = lat[:, None], lon[:, None]
+        land = self.is_land(lat, lon)
+        hit = land.any(axis=0)
+        first = np.where(hit, land.argmax(axis=0), -1)
+
+        particles = np.flatnonzero(hit)
+        if len(particles):
+            keep = np.maximum(first[particles] - 1, 0)
+            after = np.arange(lat.shape[0])[:, None] >= first[particles][None, :]
+            lat[:, particles] = np.where(after, lat[keep, particles][None, :], lat[:, particles])
+            lon[:, particles] = np.where(after, lon[keep, particles][None, :], lon[:, particles])
+        if single:
+            return lat[:, 0], lon[:, 0], first[:1]
+        return lat, lon, first
+
+    def strand_store(self, store) -> np.ndarray:
+        """
+        Отметить выброшенные частицы в TrajectoryStore (на месте)
+
+        Returns:
+            Время выброса каждой частицы, часы (NaN - не выброшена)
+        """
+        from .trajectory_store import STATUS_STRANDED
+
+        lat, lon, first = self.strand_tracks(store.lat, store.lon)
+        store.lat[...] = lat
+        store.lon[...] = lon
+        stranded = np.full(store.n_particles, np.nan)
+        hit = first >= 0
+        stranded[hit] = store.times[first[hit]]
+        after = np.arange(len(store))[:, None] >= np.where(hit, first, len(store))[None, :]
+        store.status[after] = STATUS_STRANDED
+        return stranded
+
+    def _exact(self, x: np.ndarray, y: np.ndarray, cell: np.ndarray) -> np.ndarray:
+        """Точная проверка точек смешанных ячеек по четности пересечений"""
+        slot = self.mixed_slot[cell]
+        counts = self.edge_offsets[slot + 1] - self.edge_offsets[slot]
+        point = np.repeat(np.arange(len(x)), counts)
+        first = np.repeat(self.edge_offsets[slot], counts)
+        edge = self.edge_index[first + (np.arange(len(point)) - np.repeat(np.cumsum(counts) - counts, counts))]
+
+        # Отрезок от опорной точки ячейки до проверяемой
+        row, col = np.divmod(cell, self.cols)
+        cx = (self.lon_min + (col + ANCHOR_X) * self.cell_deg)[point]
+        cy = (self.lat_min + (row + ANCHOR_Y) * self.cell_deg)[point]
+        px, py = x[point], y[point]
+        ax, ay = self.edge_x0[edge], self.edge_y0[edge]
+        bx, by = self.edge_x1[edge], self.edge_y1[edge]
+
+        # Полуоткрытое правило (> 0 против <= 0): вершина на отрезке
+        # засчитывается ровно одному из смежных ребер
+        side_c = _cross(ax, ay, bx, by, cx, cy) > 0
+        side_p = _cross(ax, ay, bx, by, px, py) > 0
+        side_a = _cross(cx, cy, px, py, ax, ay) > 0
+        side_b = _cross(cx, cy, px, py, bx, by) > 0
+        crossing = (side_c != side_p) & (side_a != side_b)
+
+        parity = np.bincount(point[crossing], minlength=len(x)) % 2 == 1
+        return self.mixed_anchor_land[slot] ^ parity
+
+    def _rasterize_anchors(self, x0, y0, x1, y1) -> np.ndarray:
+        """Признак "опорная точка ячейки на суше" (четность пересечений построчно)"""
+        toggles = np.zeros((self.rows, self.cols + 1), dtype=np.int32)
+        ylo, yhi = np.minimum(y0, y1), np.maximum(y0, y1)
+        # Строки, опорные точки которых попадают в [ylo, yhi) ребра
+        first = np.ceil((ylo - self.lat_min) / self.cell_deg - ANCHOR_Y).astype(np.int64)
+        last = np.ceil((yhi - self.lat_min) / self.cell_deg - ANCHOR_Y).astype(np.int64)
+        first = np.clip(first, 0, self.rows)
+        last = np.clip(last, 0, self.rows)
+        counts = np.maximum(last - first, 0)
+        if counts.sum():
+            edge = np.repeat(np.arange(len(x0)), counts)
+            row = first[edge] + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+            yc = self.lat_min + (row + ANCHOR_Y) * self.cell_deg
+            t = (yc - y0[edge]) / (y1[edge] - y0[edge])
+            xc = x0[edge] + t * (x1[edge] - x0[edge])
+            # Первый столбец, опорная точка которого правее пересечения
+            col = np.floor((xc - self.lon_min) / self.cell_deg - ANCHOR_X).astype(np.int64) + 1
+            np.add.at(toggles, (row, np.clip(col, 0, self.cols)), 1)
+        return (np.cumsum(toggles[:, :self.cols], axis=1) % 2).astype(bool)
+
+    def _build_edge_index(self, x0, y0, x1, y1):
+        """Отрезки границы по смешанным ячейкам (CSR: edge_offsets, edge_index)"""
+        # Дробление ребер: каждый кусок короче ячейки по каждой оси
+        pieces = np.floor(np.maximum(np.abs(x1 - x0), np.abs(y1 - y0)) / self.cell_deg).astype(np.int64) + 1
+        edge = np.repeat(np.arange(len(x0)), pieces)
+        k = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        t0 = k / pieces[edge]
+        t1 = (k + 1) / pieces[edge]
+        dx, dy = (x1 - x0)[edge], (y1 - y0)[edge]
+        self.edge_x0 = x0[edge] + t0 * dx
+        self.edge_y0 = y0[edge] + t0 * dy
+        self.edge_x1 = np.where(k + 1 == pieces[edge], x1[edge], x0[edge] + t1 * dx)
+        self.edge_y1 = np.where(k + 1 == pieces[edge], y1[edge], y0[edge] + t1 * dy)
+
+        # Охват куска - не более 2x2 ячеек (3x3 - с запасом на округление)
+        col0 = np.floor((np.minimum(self.edge_x0, self.edge_x1) - self.lon_min) / self.cell_deg).astype(np.int64)
+        col1 = np.floor((np.maximum(self.edge_x0, self.edge_x1) - self.lon_min) / self.cell_deg).astype(np.int64)
+        row0 = np.floor((np.minimum(self.edge_y0, self.edge_y1) - self.lat_min) / self.cell_deg).astype(np.int64)
+        row1 = np.floor((np.maximum(self.edge_y0, self.edge_y1) - self.lat_min) / self.cell_deg).astype(np.int64)
+        cells = []
+        owners = []
+        piece = np.arange(len(col0))
+        for dr in range(3):
+            for dc in range(3):
+                row, col = row0 + dr, col0 + dc
+                valid = ((row <= row1) & (col <= col1) & (row >= 0) & (row < self.rows)
+                         & (col >= 0) & (col < self.cols))
+                cells.append((row * self.cols + col)[valid])
+                owners.append(piece[valid])
+        cells = np.concatenate(cells)
+        owners = np.concatenate(owners)
+
+        order = np.argsort(cells, kind='stable')
+        cells, owners = cells[order], owners[order]
+        self.mixed_cells, starts = np.unique(cells, return_index=True)
+        self.edge_offsets = np.append(starts, len(cells)).astype(np.int64)
+        self.edge_index = owners.astype(np.int64)
+
+
+def _ring_edges(polygons: Sequence[Polygon]) -> Tuple[np.ndarray, ...]:
+    """Все ребра всех колец: x0, y0, x1, y1 (кольца замыкаются при необходимости)"""
+    starts, ends = [], []
+    for polygon in polygons:
+        for ring in polygon:
+            ring = np.asarray(ring, dtype=np.float64)[:, :2]
+            if len(ring) < 3:
+                continue
+            if not np.array_equal(ring[0], ring[-1]):
+                ring = np.vstack([ring, ring[:1]])
+            starts.append(ring[:-1])
+            ends.append(ring[1:])
+    if not starts:
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+    a = np.concatenate(starts)
+    b = np.concatenate(ends)
+    return a[:, 0], a[:, 1], b[:, 0], b[:, 1]
+
+
+def _cross(ax, ay, bx, by, px, py):
+    """Векторное произведение (b - a) x (p - a)"""
+    return (bx - ax) * (py - ay) - (by - ay) * (px - ax)
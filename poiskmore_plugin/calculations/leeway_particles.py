@@ -0,0 +1,502 @@
+# -*- coding: utf-8 -*-
+"""
+Стохастическая модель дрейфа (метод Монте-Карло)
+Частицы с индивидуальным ливеем по коэффициентам IAMSAR Vol.II App.N
+(таблица leeway_coefficients), левая/правая ветви с перекладкой (jibing)
+и векторизованный шаг по времени
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..db.weather_schedule_db import LEEWAY_COEFFICIENTS, load_leeway_coefficients
+from .land_mask import LandMask
+from .trajectory_store import STATUS_STRANDED, TrajectoryStore
+
+
+KNOTS_PER_MS = 1.94384  # м/с -> узлы
+NM_PER_DEGREE = 60.0    # Морских миль в градусе широты
+
+# Функция внешних условий: (t_hours, lat, lon) -> (wind_u, wind_v, current_u, current_v)
+# Все компоненты в узлах, u - на восток, v - на север; ветер задан вектором
+# «куда дует», течение - «куда течет»
+Forcing = Callable[[float, np.ndarray, np.ndarray],
+                   Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]
+
+
+@dataclass
+class LeewayCoefficients:
+    """Коэффициенты ливея объекта поиска (IAMSAR Vol.II App.N)"""
+    object_type: str
+    dwl_slope: float        # Наклон downwind-составляющей (доля скорости ветра)
+    dwl_intercept: float    # Свободный член downwind, узлы
+    cwl_slope: float        # Наклон crosswind-составляющей
+    cwl_intercept: float    # Свободный член crosswind, узлы
+    sigma_dwl: float = 0.0  # СКО downwind, узлы (при ветре REFERENCE_WIND_KN)
+    sigma_cwl: float = 0.0  # СКО crosswind, узлы
+    divergence_rate: float = 0.0  # Интенсивность перекладки ветвей, 1/час
+
+    @classmethod
+    def from_row(cls, row: Sequence) -> 'LeewayCoefficients':
+        """Создать из строки таблицы leeway_coefficients (без поля reference)"""
+        object_type, dwl_s, dwl_i, cwl_s, cwl_i, sigma_dwl, sigma_cwl, divergence = row[:8]
+        return cls(object_type, dwl_s, dwl_i, cwl_s, cwl_i,
+                   sigma_dwl or 0.0, sigma_cwl or 0.0, divergence or 0.0)
+
+    @classmethod
+    def default(cls, object_type: str) -> 'LeewayCoefficients':
+        """Стандартные коэффициенты; неизвестный тип - как 'Обломки'"""
+        rows = {row[0]: row for row in LEEWAY_COEFFICIENTS}
+        return cls.from_row(rows.get(object_type, rows['Обломки']))
+
+    @classmethod
+    def from_database(cls, conn, object_type: str) -> 'LeewayCoefficients':
+        """Загрузить коэффициенты из таблицы leeway_coefficients"""
+        row = load_leeway_coefficients(conn, object_type)
+        if row is None:
+            return cls.default(object_type)
+        return cls.from_row(row)
+
+
+class ConstantForcing:
+    """Постоянные ветер и течение на всём интервале дрейфа"""
+
+    def __init__(self,
+                 wind_speed_kn: float,
+                 wind_from_deg: float,
+                 current_speed_kn: float = 0.0,
+                 current_to_deg: float = 0.0):
+        """
+        Args:
+            wind_speed_kn: Скорость ветра, узлы
+            wind_from_deg: Направление ветра «откуда», градусы
+            current_speed_kn: Скорость течения, узлы
+            current_to_deg: Направление течения «куда», градусы
+        """
+        wind_to = math.radians((wind_from_deg + 180) % 360)
+        current_to = math.radians(current_to_deg)
+        self.wind_u = wind_speed_kn * math.sin(wind_to)
+        self.wind_v = wind_speed_kn * math.cos(wind_to)
+        self.current_u = current_speed_kn * math.sin(current_to)
+        self.current_v = current_speed_kn * math.cos(current_to)
+
+    def __call__(self, t_hours: float, lat: np.ndarray, lon: np.ndarray):
+        return self.wind_u, self.wind_v, self.current_u, self.current_v
+
+
+class ReverseForcing:
+    """
+    Условия для обратного дрейфа: время отсчитывается назад от reference_hours,
+    векторы ветра и течения обращены, поэтому скорость дрейфа частицы
+    (ливей по ветру, crosswind и течение) меняет знак
+    """
+
+    def __init__(self, forcing: Forcing, reference_hours: float):
+        """
+        Args:
+            forcing: Условия в прямом времени
+            reference_hours: Момент начала обратного дрейфа (время forcing)
+        """
+        self.forcing = forcing
+        self.reference_hours = reference_hours
+
+    def __call__(self, t_hours: float, lat: np.ndarray, lon: np.ndarray):
+        wind_u, wind_v, current_u, current_v = self.forcing(self.reference_hours - t_hours, lat, lon)
+        return (np.negative(wind_u), np.negative(wind_v),
+                np.negative(current_u), np.negative(current_v))
+
+
+@dataclass
+class ParticleCloud:
+    """Облако частиц на момент окончания дрейфа"""
+    origin: Tuple[float, float]   # Исходная точка (lat, lon)
+    lat: np.ndarray
+    lon: np.ndarray
+    branch: np.ndarray            # int8: -1 - левая ветвь, +1 - правая
+    time_hours: float             # Время дрейфа от исходной точки
+    object_type: str
+    track_times: np.ndarray = field(default_factory=lambda: np.empty(0))
+    track_lat: Optional[np.ndarray] = None  # float32 [время, частица]
+    track_lon: Optional[np.ndarray] = None
+    stranded_hours: Optional[np.ndarray] = None  # Время выброса на берег (NaN - дрейфует)
+
+    @property
+    def size(self) -> int:
+        """Число частиц"""
+        return len(self.lat)
+
+    @property
+    def stranded(self) -> np.ndarray:
+        """Маска частиц, выброшенных на берег"""
+        if self.stranded_hours is None:
+            return np.zeros(self.size, dtype=bool)
+        return ~np.isnan(self.stranded_hours)
+
+    def to_store(self) -> TrajectoryStore:
+        """
+        Треки и конечное положение облака в хранилище траекторий
+
+        Ветвь известна только на конец дрейфа; в промежуточных моментах - 0.
+        """
+        store = TrajectoryStore(self.size, len(self.track_times) + 1,
+                                origin=self.origin, object_type=self.object_type)
+        if len(self.track_times):
+            store.extend(self.track_times, self.track_lat, self.track_lon)
+        if len(store) and store.times[-1] >= self.time_hours - 1e-9:
+            store.branch[-1] = self.branch
+        else:
+            store.append(self.time_hours, self.lat, self.lon, self.branch)
+        if self.stranded_hours is not None:
+            store.status[store.times[:, None] >= self.stranded_hours[None, :] - 1e-9] = STATUS_STRANDED
+        return store
+
+    def datum_points(self) -> List[Dict]:
+        """
+        Исходные пункты по облаку: центр, левая и правая ветви
+
+        Формат совместим с SearchAreaCalculator (calculate_from_two_points,
+        calculate_distant_areas): 'lat', 'lon', 'drift_speed', 'drift_direction',
+        дополнительно 'spread_nm' - СКО положения частиц вокруг пункта.
+
+        Returns:
+            Список исходных пунктов [центр, левый, правый]
+        """
+        points = []
+        for name, mask in (('Datum Center', slice(None)),
+                           ('Datum Left', self.branch < 0),
+                           ('Datum Right', self.branch > 0)):
+            lat = self.lat[mask]
+            lon = self.lon[mask]
+            if len(lat) == 0:
+                continue
+            center_lat = float(lat.mean())
+            center_lon = float(lon.mean())
+
+            dx, dy = _local_offsets_nm(self.origin, center_lat, center_lon)
+            distance = math.hypot(dx, dy)
+            px, py = _local_offsets_nm((center_lat, center_lon), lat, lon)
+
+            points.append({
+                'name': name,
+                'lat': center_lat,
+                'lon': center_lon,
+                'drift_speed': distance / self.time_hours if self.time_hours > 0 else 0.0,
+                'drift_direction': math.degrees(math.atan2(dx, dy)) % 360,
+                'distance_nm': distance,
+                'spread_nm': float(np.sqrt(np.mean(px * px + py * py))),
+                'particles': int(len(lat)),
+                'time': self.time_hours
+            })
+        return points
+
+
+@dataclass
+class ParticleState:
+    """Текущее состояние блока частиц при интегрировании"""
+    t_hours: float
+    lat: np.ndarray
+    lon: np.ndarray
+    branch: np.ndarray
+    dwl_slope: np.ndarray     # Индивидуальные наклоны ливея (не меняются)
+    cwl_slope: np.ndarray
+    stranded_hours: Optional[np.ndarray] = None  # Только при маске суши
+
+
+@dataclass
+class ParticleSnapshot:
+    """Снимок состояния блока: положения, ветви и состояние генератора"""
+    t_hours: float
+    lat: np.ndarray
+    lon: np.ndarray
+    branch: np.ndarray
+    rng_state: Dict
+    stranded_hours: Optional[np.ndarray] = None
+
+
+class LeewayParticleEngine:
+    """Модель дрейфа частиц с ливеем по IAMSAR App.N"""
+
+    DEFAULT_CHUNK_SIZE = 100_000
+    # Ветер, к которому отнесены СКО ливея (20 м/с, как в AP98/OpenDrift):
+    # возмущение наклона частицы = sigma * N(0, 1) / REFERENCE_WIND_KN
+    REFERENCE_WIND_KN = 20 * KNOTS_PER_MS
+
+    def __init__(self,
+                 coefficients: LeewayCoefficients,
+                 forcing: Forcing,
+                 time_step_hours: float = 0.25,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 land_mask: Optional[LandMask] = None):
+        """
+        Args:
+            coefficients: Коэффициенты ливея объекта
+            forcing: Функция ветра и течения (см. Forcing)
+            time_step_hours: Шаг интегрирования, часы
+            chunk_size: Число частиц, обрабатываемых за один проход
+            land_mask: Маска суши; частица, вышедшая на сушу, остается
+                в последней точке на воде (выброшена на берег)
+        """
+        if time_step_hours <= 0:
+            raise ValueError("Шаг по времени должен быть положительным")
+        if chunk_size <= 0:
+            raise ValueError("Размер блока частиц должен быть положительным")
+        self.coefficients = coefficients
+        self.forcing = forcing
+        self.time_step_hours = time_step_hours
+        self.chunk_size = chunk_size
+        self.land_mask = land_mask
+
+    def backward(self, reference_hours: float) -> 'LeewayParticleEngine':
+        """
+        Движок обратного дрейфа от момента reference_hours
+
+        Время simulate() у него - часы назад от reference_hours;
+        output_hours задают, на сколько часов назад сохранять положения.
+        """
+        return LeewayParticleEngine(self.coefficients, ReverseForcing(self.forcing, reference_hours),
+                                    self.time_step_hours, self.chunk_size, self.land_mask)
+
+    def simulate(self,
+                 lkp: Tuple[float, float],
+                 duration_hours: float,
+                 n_particles: int,
+                 seed: Union[int, np.random.SeedSequence, None] = None,
+                 initial_error_nm: float = 0.0,
+                 output_hours: Sequence[float] = ()) -> ParticleCloud:
+        """
+        Рассчитать дрейф облака частиц от исходной точки
+
+        Частицы обрабатываются блоками по chunk_size, поэтому расход памяти
+        определяется размером блока, а не общим числом частиц. Блок k
+        использует собственный генератор SeedSequence(seed, spawn_key=(k,)):
+        при фиксированных seed и chunk_size результат воспроизводим.
+
+        Args:
+            lkp: Последнее известное место (lat, lon)
+            duration_hours: Время дрейфа, часы
+            n_particles: Число частиц
+            seed: Начальное значение генератора (число или SeedSequence)
+            initial_error_nm: СКО начального положения по каждой оси, мили
+            output_hours: Моменты времени для сохранения промежуточных положений
+
+        Returns:
+            Облако частиц на конец дрейфа
+        """
+        if n_particles <= 0:
+            raise ValueError("Число частиц должно быть положительным")
+
+        output_hours = np.asarray(sorted(output_hours), dtype=np.float64)
+        lat = np.empty(n_particles)
+        lon = np.empty(n_particles)
+        branch = np.empty(n_particles, dtype=np.int8)
+        track_lat = track_lon = None
+        if len(output_hours):
+            track_lat = np.empty((len(output_hours), n_particles), dtype=np.float32)
+            track_lon = np.empty((len(output_hours), n_particles), dtype=np.float32)
+        stranded_hours = np.empty(n_particles) if self.land_mask is not None else None
+
+        root = as_seed_sequence(seed)
+        for index, start in enumerate(range(0, n_particles, self.chunk_size)):
+            stop = min(start + self.chunk_size, n_particles)
+            chunk = self.simulate_chunk(lkp, duration_hours, stop - start,
+                                        chunk_rng(root, index), initial_error_nm, output_hours)
+            lat[start:stop], lon[start:stop], branch[start:stop] = chunk[:3]
+            if track_lat is not None:
+                track_lat[:, start:stop] = chunk[3]
+                track_lon[:, start:stop] = chunk[4]
+            if stranded_hours is not None:
+                stranded_hours[start:stop] = chunk[5]
+
+        return ParticleCloud(
+            origin=tuple(lkp),
+            lat=lat,
+            lon=lon,
+            branch=branch,
+            time_hours=duration_hours,
+            object_type=self.coefficients.object_type,
+            track_times=output_hours,
+            track_lat=track_lat,
+            track_lon=track_lon,
+            stranded_hours=stranded_hours
+        )
+
+    def simulate_chunk(self,
+                       lkp: Tuple[float, float],
+                       duration_hours: float,
+                       n: int,
+                       rng: np.random.Generator,
+                       initial_error_nm: float = 0.0,
+                       output_hours: Sequence[float] = ()) -> Tuple:
+        """
+        Рассчитать дрейф одного блока частиц
+
+        Returns:
+            (lat, lon, branch, track_lat, track_lon, stranded_hours); треки -
+            None, если output_hours не заданы, stranded_hours - без маски суши
+        """
+        state = self.initial_state(lkp, n, rng, initial_error_nm)
+        track_lat, track_lon, _ = self.advance(state, duration_hours, rng, output_hours)
+        return state.lat, state.lon, state.branch, track_lat, track_lon, state.stranded_hours
+
+    def initial_state(self,
+                      lkp: Tuple[float, float],
+                      n: int,
+                      rng: np.random.Generator,
+                      initial_error_nm: float = 0.0) -> 'ParticleState':
+        """
+        Начальное состояние блока частиц (положения, ветви, возмущения ливея)
+
+        Args:
+            lkp: Исходная точка (lat, lon)
+            n: Число частиц блока
+            rng: Генератор блока
+            initial_error_nm: СКО начального положения по каждой оси, мили
+        """
+        coeffs = self.coefficients
+        lat = np.full(n, float(lkp[0]))
+        lon = np.full(n, float(lkp[1]))
+        if initial_error_nm > 0:
+            dx = rng.standard_normal(n) * initial_error_nm
+            dy = rng.standard_normal(n) * initial_error_nm
+            lat += dy / NM_PER_DEGREE
+            lon += dx / (NM_PER_DEGREE * np.cos(np.radians(lat)))
+
+        # Индивидуальные параметры частицы: ветвь и возмущение наклонов ливея
+        branch = np.where(rng.random(n) < 0.5, -1, 1).astype(np.int8)
+        dwl_slope = coeffs.dwl_slope + rng.standard_normal(n) * (coeffs.sigma_dwl / self.REFERENCE_WIND_KN)
+        cwl_slope = coeffs.cwl_slope + rng.standard_normal(n) * (coeffs.sigma_cwl / self.REFERENCE_WIND_KN)
+        stranded_hours = None
+        if self.land_mask is not None:
+            stranded_hours = np.where(self.land_mask.is_land(lat, lon), 0.0, np.nan)
+        return ParticleState(0.0, lat, lon, branch, dwl_slope, cwl_slope, stranded_hours)
+
+    def advance(self,
+                state: 'ParticleState',
+                until_hours: float,
+                rng: np.random.Generator,
+                output_hours: Sequence[float] = (),
+                checkpoint_hours: Sequence[float] = ()) -> Tuple:
+        """
+        Продвинуть состояние блока до момента until_hours (на месте)
+
+        Шаги отсчитываются от state.t_hours, поэтому продолжение с
+        сохраненного состояния (с тем же состоянием rng) дает тот же
+        результат, что и расчет без остановки.
+
+        Args:
+            state: Состояние блока (изменяется)
+            until_hours: Конец дрейфа, часы от исходной точки
+            rng: Генератор блока
+            output_hours: Моменты сохранения положений (раньше state.t_hours - пропускаются)
+            checkpoint_hours: Моменты снимков состояния (см. ParticleSnapshot)
+
+        Returns:
+            (track_lat, track_lon, snapshots)
+        """
+        coeffs = self.coefficients
+        n = len(state.lat)
+        lat, lon, branch = state.lat, state.lon, state.branch
+
+        output_hours = np.asarray(output_hours, dtype=np.float64)
+        track_lat = track_lon = None
+        if len(output_hours):
+            track_lat = np.full((len(output_hours), n), np.nan, dtype=np.float32)
+            track_lon = np.full((len(output_hours), n), np.nan, dtype=np.float32)
+        t = state.t_hours
+        next_output = int(np.searchsorted(output_hours, t - 1e-9))
+        checkpoint_hours = np.asarray(checkpoint_hours, dtype=np.float64)
+        next_checkpoint = int(np.searchsorted(checkpoint_hours, t - 1e-9))
+        snapshots = []
+
+        while True:
+            while next_output < len(output_hours) and output_hours[next_output] <= t + 1e-9:
+                track_lat[next_output] = lat
+                track_lon[next_output] = lon
+                next_output += 1
+            if next_checkpoint < len(checkpoint_hours) and checkpoint_hours[next_checkpoint] <= t + 1e-9:
+                stranded = None if state.stranded_hours is None else state.stranded_hours.copy()
+                snapshots.append(ParticleSnapshot(t, lat.copy(), lon.copy(), branch.copy(),
+                                                  rng.bit_generator.state, stranded))
+                while next_checkpoint < len(checkpoint_hours) and checkpoint_hours[next_checkpoint] <= t + 1e-9:
+                    next_checkpoint += 1
+            if t >= until_hours - 1e-9:
+                break
+
+            h = min(self.time_step_hours, until_hours - t)
+            u, v = self._drift_velocity(t, lat, lon, branch, state.dwl_slope, state.cwl_slope)
+            lat_step = lat + v * (h / NM_PER_DEGREE)
+            if self.land_mask is None:
+                lon += u * h / (NM_PER_DEGREE * np.cos(np.radians(lat)))
+            else:
+                lon_step = lon + u * h / (NM_PER_DEGREE * np.cos(np.radians(lat)))
+                self._strand(state.stranded_hours, lat, lon, lat_step, lon_step, t + h)
+                lon = lon_step
+            lat = lat_step
+
+            # Перекладка ветвей: вероятность 1 - exp(-rate*h) за шаг
+            if coeffs.divergence_rate > 0:
+                jibe = rng.random(n) < -math.expm1(-coeffs.divergence_rate * h)
+                branch[jibe] *= -1
+            t += h
+
+        state.t_hours, state.lat, state.lon = t, lat, lon
+        return track_lat, track_lon, snapshots
+
+    def _strand(self, stranded_hours: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+                lat_step: np.ndarray, lon_step: np.ndarray, t_hours: float):
+        """
+        Выброс на берег после шага: частицы, попавшие на сушу, и ранее
+        выброшенные остаются в прежней точке (lat_step, lon_step меняются на месте)
+        """
+        moving = np.flatnonzero(np.isnan(stranded_hours))
+        landed = moving[self.land_mask.is_land(lat_step[moving], lon_step[moving])]
+        stranded_hours[landed] = t_hours
+        frozen = ~np.isnan(stranded_hours)
+        lat_step[frozen] = lat[frozen]
+        lon_step[frozen] = lon[frozen]
+
+    def _drift_velocity(self, t: float, lat: np.ndarray, lon: np.ndarray,
+                        branch: np.ndarray, dwl_slope: np.ndarray,
+                        cwl_slope: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Скорость дрейфа частиц (u, v), узлы: ливей + течение"""
+        coeffs = self.coefficients
+        wind_u, wind_v, current_u, current_v = self.forcing(t, lat, lon)
+        wind_u = np.asarray(wind_u, dtype=np.float64)
+        wind_v = np.asarray(wind_v, dtype=np.float64)
+        wind_speed = np.hypot(wind_u, wind_v)
+
+        dwl = dwl_slope * wind_speed + coeffs.dwl_intercept
+        cwl = (cwl_slope * wind_speed + coeffs.cwl_intercept) * branch
+
+        # Единичный вектор по ветру; crosswind - перпендикуляр вправо (ey, -ex)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ex = np.where(wind_speed > 0, wind_u / wind_speed, 0.0)
+            ey = np.where(wind_speed > 0, wind_v / wind_speed, 0.0)
+
+        u = dwl * ex + cwl * ey + current_u
+        v = dwl * ey - cwl * ex + current_v
+        return u, v
+
+
+def as_seed_sequence(seed: Union[int, np.random.SeedSequence, None]) -> np.random.SeedSequence:
+    """Привести seed к SeedSequence"""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def chunk_rng(root: np.random.SeedSequence, index: int) -> np.random.Generator:
+    """Генератор блока частиц с номером index (не зависит от порядка обработки)"""
+    return np.random.default_rng(
+        np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (index,))
+    )
+
+
+def _local_offsets_nm(origin: Tuple[float, float], lat, lon):
+    """Смещения (dx, dy) в милях от origin в локальной плоской проекции"""
+    dx = (np.asarray(lon) - origin[1]) * NM_PER_DEGREE * math.cos(math.radians(origin[0]))
+    dy = (np.asarray(lat) - origin[0]) * NM_PER_DEGREE
+    return dx, dy
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+Геодезический буфер вокруг исходной линии
+Смещенные точки строятся прямой геодезической задачей от вершин линии
+перпендикулярно сегментам (сразу для всех сегментов), на внешней стороне
+поворота - дуга (round) или острый угол (mitre), на внутренней - переход
+через точку пересечения смещенных сегментов или через вершину линии.
+Полученный замкнутый контур самопересекается; объединение перекрытий
+строится по числу оборотов: контур разбивается в точках самопересечения,
+сохраняются куски, по одну сторону которых число оборотов нулевое, а по
+другую - нет, и из них собираются кольца. Поиск пересечений и числа
+оборотов идет по сетке ячеек (как в LandMask), поэтому трек из тысяч
+вершин обрабатывается без перебора всех пар ребер.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .geodesy import bearing_deg, destination, distance_nm, multipolygon_area_nm2
+from .land_mask import ANCHOR_X, ANCHOR_Y
+from .ring_utils import nest, shoelace, stitch
+
+
+JOINS = ('round', 'mitre')
+CAPS = ('round', 'flat', 'square')
+
+ARC_STEP_DEG = 5.0        # Шаг дуг скруглений
+MAX_SEGMENT_NM = 10.0     # Длинные сегменты дробятся по дуге большого круга
+STRAIGHT_DEG = 1e-6      # Меньшие повороты линии считаются прямым ходом
+_EPS = 1e-12              # Допуск параметра пересечения на концах ребер
+
+
+@dataclass
+class LineBuffer:
+    """Буферная зона линии: непересекающиеся полигоны с дырами"""
+    polygons: List[List[np.ndarray]]   # [полигон][кольцо] -> [n, 2] (lat, lon); первое кольцо - внешнее
+    distance_nm: float
+    join: str = 'round'
+    cap: str = 'round'
+
+    def area_nm2(self) -> float:
+        """Площадь буфера на эллипсоиде, кв. мили"""
+        return multipolygon_area_nm2(self.polygons)
+
+    def outer(self) -> List[Tuple[float, float]]:
+        """Внешняя граница наибольшего полигона [(lat, lon), ...]"""
+        if not self.polygons:
+            return []
+        largest = max(self.polygons, key=lambda rings: abs(shoelace(rings[0][:, 1], rings[0][:, 0])))
+        return [(float(lat), float(lon)) for lat, lon in largest[0]]
+
+
+def buffer_line(line: Sequence[Tuple[float, float]],
+                distance_nm: float,
+                join: str = 'round',
+                cap: str = 'round',
+                mitre_limit: float = 2.0,
+                arc_step_deg: float = ARC_STEP_DEG,
+                max_segment_nm: float = MAX_SEGMENT_NM,
+                ellipsoid: bool = False) -> LineBuffer:
+    """
+    Построить буфер вокруг линии
+
+    Args:
+        line: Вершины линии [(lat, lon), ...]
+        distance_nm: Расстояние буфера (половина ширины полосы), мили
+        join: Соединение на внешней стороне поворота: 'round' или 'mitre'
+        cap: Окончания линии: 'round', 'flat' или 'square'
+        mitre_limit: Предельная длина острого угла в долях distance_nm;
+            более острые углы срезаются
+        arc_step_deg: Шаг дуг скруглений, градусы
+        max_segment_nm: Максимальная длина сегмента линии до дробления
+        ellipsoid: True - смещения по эллипсоиду WGS84, False - по сфере
+            (как остальные границы SearchAreaCalculator)
+
+    Returns:
+        Буферная зона
+    """
+    if join not in JOINS:
+        raise ValueError(f"Неизвестный тип соединения: {join}")
+    if cap not in CAPS:
+        raise ValueError(f"Неизвестный тип окончания: {cap}")
+    if distance_nm <= 0:
+        raise ValueError("Расстояние буфера должно быть положительным")
+
+    points = np.asarray(line, dtype=np.float64).reshape(-1, 2)
+    if not len(points):
+        return LineBuffer([], distance_nm, join, cap)
+    keep = np.append(True, np.any(np.diff(points, axis=0) != 0, axis=1))
+    lat, lon = _densify(points[keep, 0], points[keep, 1], max_segment_nm)
+
+    if len(lat) == 1:
+        # Точка - круг
+        bearing = np.arange(0.0, 360.0, arc_step_deg)[::-1]
+        ring_lat, ring_lon = destination(lat[0], lon[0], distance_nm, bearing, ellipsoid=ellipsoid)
+        return LineBuffer([[np.column_stack([ring_lat, ring_lon])]], distance_nm, join, cap)
+
+    center, bearing, dist = _raw_outline(lat, lon, distance_nm, join, cap, mitre_limit, arc_step_deg)
+    raw_lat, raw_lon = destination(lat[center], lon[center], dist, bearing, ellipsoid=ellipsoid)
+
+    # Плоскость для топологии: аффинная от lat/lon, ребра остаются прямыми
+    lat0, lon0 = float(np.mean(lat)), float(lon[0])
+    scale = max(math.cos(math.radians(lat0)), 1e-6)
+    x = ((raw_lon - lon0 + 180.0) % 360.0 - 180.0) * scale
+    y = raw_lat
+    x, y = _cut_inner_corners(x, y, np.flatnonzero(dist == 0))
+
+    rings = _union_rings(x, y)
+
+    polygons = []
+    for outer, holes in nest(rings):
+        polygons.append([np.column_stack([ring[1], ring[0] / scale + lon0]) for ring in [outer, *holes]])
+    return LineBuffer(polygons, distance_nm, join, cap)
+
+
+def _densify(lat: np.ndarray, lon: np.ndarray, max_segment_nm: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Дробление длинных сегментов по дуге большого круга"""
+    if len(lat) < 2:
+        return lat, lon
+    length = distance_nm(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    pieces = np.maximum(np.ceil(length / max_segment_nm).astype(np.int64), 1)
+    if (pieces == 1).all():
+        return lat, lon
+    segment = np.repeat(np.arange(len(length)), pieces)
+    fraction = (np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / pieces[segment]
+    azimuth = bearing_deg(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    new_lat, new_lon = destination(lat[segment], lon[segment], fraction * length[segment], azimuth[segment])
+    # Исходные вершины сохраняются точно
+    start = fraction == 0
+    new_lat[start], new_lon[start] = lat[segment[start]], lon[segment[start]]
+    return np.append(new_lat, lat[-1]), np.append(new_lon, lon[-1])
+
+
+def _raw_outline(lat, lon, distance, join, cap, mitre_limit, arc_step_deg):
+    """
+    Исходный (самопересекающийся) контур буфера по часовой стрелке:
+    левая сторона вперед, конец, правая сторона назад, начало
+
+    Returns:
+        (center, bearing, dist): точка контура - смещение от вершины center
+        на dist миль по азимуту bearing (dist = 0 - сама вершина)
+    """
+    segments = len(lat) - 1
+    azimuth = bearing_deg(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    final = (bearing_deg(lat[1:], lon[1:], lat[:-1], lon[:-1]) + 180.0) % 360.0
+    # Поворот во внутренних вершинах 1..segments-1: > 0 - вправо
+    turn = (azimuth[1:] - final[:-1] + 180.0) % 360.0 - 180.0
+    # Шум округления на прямых участках (в том числе после дробления) - не поворот
+    turn[np.abs(turn) < STRAIGHT_DEG] = 0.0
+    vertex = np.arange(1, segments)
+    seg = np.arange(segments)
+    reverse = segments - 1 - seg
+    base = 3 * segments + 1
+
+    # Номер позиции (slot) в контуре и порядок внутри позиции
+    parts = [
+        (3 * seg, 0, seg, azimuth - 90.0, distance),                       # Левая сторона, начало сегмента
+        (3 * seg + 1, 0, seg + 1, final - 90.0, distance),                 # Левая сторона, конец сегмента
+        (base + 3 * reverse, 0, seg + 1, final + 90.0, distance),          # Правая сторона, конец сегмента
+        (base + 3 * reverse + 1, 0, seg, azimuth + 90.0, distance),        # Правая сторона, начало сегмента
+    ]
+
+    # Соединения: слева внешняя сторона при повороте вправо, справа - влево
+    left_slot = 3 * (vertex - 1) + 2
+    right_slot = base + 3 * (segments - 1 - vertex) + 2
+    outer_left = turn > 0
+    outer_right = turn < 0
+    parts.append(_corners(left_slot[outer_left], vertex[outer_left], final[:-1][outer_left] - 90.0,
+                          turn[outer_left], distance, join, mitre_limit, arc_step_deg))
+    parts.append(_corners(right_slot[outer_right], vertex[outer_right], azimuth[1:][outer_right] + 90.0,
+                          -turn[outer_right], distance, join, mitre_limit, arc_step_deg))
+    parts.append((left_slot[turn < 0], 0, vertex[turn < 0], 0.0, 0.0))
+    parts.append((right_slot[turn > 0], 0, vertex[turn > 0], 0.0, 0.0))
+
+    # Окончания: конец - от левой стороны к правой, начало - от правой к левой
+    parts.append(_cap(3 * segments, segments, final[-1] - 90.0, distance, cap, arc_step_deg))
+    parts.append(_cap(base + 3 * segments, 0, azimuth[0] + 90.0, distance, cap, arc_step_deg))
+
+    # Скалярные поля частей (порядок, азимут, расстояние) - на длину части
+    slot, order, center, bearing, dist = [
+        np.concatenate([np.broadcast_to(np.asarray(part[k], dtype=np.float64), np.shape(part[0]))
+                        for part in parts])
+        for k in range(5)]
+    index = np.lexsort((order, slot))
+    return center[index].astype(np.int64), bearing[index] % 360.0, dist[index]
+
+
+def _corners(slot, center, start, sweep, distance, join, mitre_limit, arc_step_deg):
+    """Точки внешнего соединения: поворот на sweep градусов от азимута start"""
+    if join == 'mitre':
+        half = np.radians(sweep) / 2
+        reach = distance / np.cos(half)
+        sharp = reach <= mitre_limit * distance
+        # Слишком острые углы срезаются (соединение по хорде)
+        return slot[sharp], 0, center[sharp], (start + sweep / 2)[sharp], reach[sharp]
+    return _fan(slot, center, start, sweep, distance, arc_step_deg)
+
+
+def _cap(slot, center, start, distance, cap, arc_step_deg):
+    """Точки окончания линии: полуокружность или квадрат от азимута start"""
+    slot, center, start = np.array([slot]), np.array([center]), np.array([start])
+    if cap == 'round':
+        return _fan(slot, center, start, np.array([180.0]), distance, arc_step_deg)
+    if cap == 'square':
+        return (np.repeat(slot, 2), np.arange(2), np.repeat(center, 2),
+                start + np.array([45.0, 135.0]), distance * math.sqrt(2.0))
+    return slot[:0], 0, center[:0], 0.0, 0.0
+
+
+def _fan(slot, center, start, sweep, distance, arc_step_deg):
+    """Промежуточные точки дуг радиуса distance (концы дуг - смещенные точки сегментов)"""
+    count = np.maximum(np.ceil(sweep / arc_step_deg).astype(np.int64) - 1, 0)
+    owner = np.repeat(np.arange(len(slot)), count)
+    order = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    bearing = start[owner] + (order + 1) * sweep[owner] / (count[owner] + 1)
+    return slot[owner], order, center[owner], bearing, distance
+
+
+def _cut_inner_corners(x: np.ndarray, y: np.ndarray, inner: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Внутренние повороты: если смещенные сегменты пересекаются в своих
+    ближних половинах, контур идет через точку пересечения, а не через
+    вершину линии (меньше лишних самопересечений у плотных треков)
+    """
+    inner = inner[(inner >= 2) & (inner + 2 < len(x))]
+    if not len(inner):
+        return x, y
+    ax, ay = x[inner - 2], y[inner - 2]
+    bx, by = x[inner - 1], y[inner - 1]
+    cx, cy = x[inner + 1], y[inner + 1]
+    dx, dy = x[inner + 2], y[inner + 2]
+    denominator = (bx - ax) * (dy - cy) - (by - ay) * (dx - cx)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = ((cx - ax) * (dy - cy) - (cy - ay) * (dx - cx)) / denominator
+        u = ((cx - ax) * (by - ay) - (cy - ay) * (bx - ax)) / denominator
+    # Соседние соединения не задевают друг друга: каждое съедает не больше
+    # половины каждого сегмента
+    cut = (denominator != 0) & (t >= 0.5) & (t <= 1.0) & (u >= 0.0) & (u <= 0.5)
+    inner, t = inner[cut], t[cut]
+    px = ax[cut] + t * (bx - ax)[cut]
+    py = ay[cut] + t * (by - ay)[cut]
+    x, y = x.copy(), y.copy()
+    for shift in (-1, 0, 1):
+        x[inner + shift] = px
+        y[inner + shift] = py
+    return x, y
+
+
+def _union_rings(x: np.ndarray, y: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Кольца границы области с ненулевым числом оборотов замкнутого контура"""
+    # Ребра контура без вырожденных (совпадающие с точностью округления
+    # точки на прямых участках)
+    span = max(np.ptp(x), np.ptp(y))
+    keep = np.hypot(x - np.roll(x, -1), y - np.roll(y, -1)) > span * 1e-10
+    x, y = x[keep], y[keep]
+    if len(x) < 3:
+        return []
+    x0, y0, x1, y1 = x, y, np.roll(x, -1), np.roll(y, -1)
+    count = len(x0)
+
+    length = np.hypot(x1 - x0, y1 - y0)
+    cell = max(2.0 * float(np.median(length)), span / 4096.0)
+    gx, gy = float(x.min()) - cell, float(y.min()) - cell
+    cols = int(math.ceil((float(x.max()) - gx) / cell)) + 2
+    grid = (gx, gy, cell, cols)
+
+    edge, key = _edge_cells(x0, y0, x1, y1, grid)
+    order = np.lexsort((edge, key))
+    edge, key = edge[order], key[order]
+
+    # Разбиение ребер в точках пересечения
+    a, b = _cell_pairs(edge, key)
+    adjacent = (b - a == 1) | ((a == 0) & (b == count - 1))
+    a, b = a[~adjacent], b[~adjacent]
+    px0, py0, px1, py1 = _split(x0, y0, x1, y1, a, b)
+
+    # Число оборотов слева от середины каждого куска
+    mx, my = (px0 + px1) / 2, (py0 + py1) / 2
+    vx, vy = px1 - px0, py1 - py0
+    offset = 1e-7
+    qx, qy = mx - vy * offset, my + vx * offset
+    left = _winding(qx, qy, x0, y0, x1, y1, edge, key, grid)
+    right = left - 1
+
+    # Граница объединения: снаружи ноль, внутри - нет; внутренность слева
+    boundary = (left == 0) != (right == 0)
+    flip = boundary & (left == 0)
+    sx = np.where(flip, px1, px0)[boundary]
+    sy = np.where(flip, py1, py0)[boundary]
+    ex = np.where(flip, px0, px1)[boundary]
+    ey = np.where(flip, py0, py1)[boundary]
+    return stitch(sx, sy, ex, ey)
+
+
+def _edge_cells(x0, y0, x1, y1, grid) -> Tuple[np.ndarray, np.ndarray]:
+    """Ячейки сетки, через которые проходит каждое ребро: (ребро, ключ ячейки)"""
+    gx, gy, cell, cols = grid
+    fx0, fy0 = (x0 - gx) / cell, (y0 - gy) / cell
+    fx1, fy1 = (x1 - gx) / cell, (y1 - gy) / cell
+    params = [np.zeros(len(x0))]
+    owners = [np.arange(len(x0))]
+    for f0, f1 in ((fx0, fx1), (fy0, fy1)):
+        low = np.floor(np.minimum(f0, f1)).astype(np.int64)
+        lines = np.floor(np.maximum(f0, f1)).astype(np.int64) - low
+        owner = np.repeat(np.arange(len(x0)), lines)
+        level = low[owner] + 1 + (np.arange(lines.sum()) - np.repeat(np.cumsum(lines) - lines, lines))
+        params.append((level - f0[owner]) / (f1 - f0)[owner])
+        owners.append(owner)
+    t = np.concatenate(params)
+    owner = np.concatenate(owners)
+    order = np.lexsort((t, owner))
+    t, owner = t[order], owner[order]
+    # Ячейка куска - по его середине
+    following = np.append(t[1:], 1.0)
+    following[np.append(owner[1:] != owner[:-1], True)] = 1.0
+    mid = (t + following) / 2
+    col = np.floor(fx0[owner] + mid * (fx1 - fx0)[owner]).astype(np.int64)
+    row = np.floor(fy0[owner] + mid * (fy1 - fy0)[owner]).astype(np.int64)
+    return owner, row * cols + col
+
+
+def _cell_pairs(edge: np.ndarray, key: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Пары ребер из одной ячейки (a < b; пара из нескольких общих ячеек повторяется); edge и key отсортированы по key"""
+    starts = np.flatnonzero(np.append(True, key[1:] != key[:-1]))
+    sizes = np.diff(np.append(starts, len(key)))
+    local = np.arange(len(key)) - np.repeat(starts, sizes)
+    later = np.repeat(sizes, sizes) - local - 1
+    first = np.repeat(np.arange(len(key)), later)
+    second = first + 1 + (np.arange(later.sum()) - np.repeat(np.cumsum(later) - later, later))
+    a, b = edge[first], edge[second]
+    return np.minimum(a, b), np.maximum(a, b)
+
+
+def _split(x0, y0, x1, y1, a, b):
+    """Куски ребер между точками пересечения (общие точки - с одинаковыми координатами)"""
+    ux, uy = (x1 - x0)[a], (y1 - y0)[a]
+    vx, vy = (x1 - x0)[b], (y1 - y0)[b]
+    wx, wy = (x0[b] - x0[a]), (y0[b] - y0[a])
+    denominator = ux * vy - uy * vx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (wx * vy - wy * vx) / denominator
+        u = (wx * uy - wy * ux) / denominator
+    hit = (denominator != 0) & (t >= -_EPS) & (t <= 1 + _EPS) & (u >= -_EPS) & (u <= 1 + _EPS)
+    a, b, t, u = a[hit], b[hit], t[hit], u[hit]
+    _, unique = np.unique(a * len(x0) + b, return_index=True)
+    a, b, t, u = a[unique], b[unique], t[unique], u[unique]
+    px = x0[a] + t * (x1 - x0)[a]
+    py = y0[a] + t * (y1 - y0)[a]
+    # Пересечение в вершине - точно в вершине
+    for edge, param in ((b, u), (a, t)):
+        start, end = param <= _EPS, param >= 1 - _EPS
+        px = np.where(start, x0[edge], np.where(end, x1[edge], px))
+        py = np.where(start, y0[edge], np.where(end, y1[edge], py))
+
+    inside_a = (t > _EPS) & (t < 1 - _EPS)
+    inside_b = (u > _EPS) & (u < 1 - _EPS)
+    count = len(x0)
+    owner = np.concatenate([np.arange(count), a[inside_a], b[inside_b]])
+    param = np.concatenate([np.zeros(count), t[inside_a], u[inside_b]])
+    nodes_x = np.concatenate([x0, px[inside_a], px[inside_b]])
+    nodes_y = np.concatenate([y0, py[inside_a], py[inside_b]])
+    order = np.lexsort((param, owner))
+    owner, nodes_x, nodes_y = owner[order], nodes_x[order], nodes_y[order]
+
+    # Конец куска - следующий узел того же ребра или конец ребра
+    last = np.append(owner[1:] != owner[:-1], True)
+    end_x = np.where(last, x1[owner], np.roll(nodes_x, -1))
+    end_y = np.where(last, y1[owner], np.roll(nodes_y, -1))
+    piece = (nodes_x != end_x) | (nodes_y != end_y)
+    return nodes_x[piece], nodes_y[piece], end_x[piece], end_y[piece]
+
+
+def _winding(qx, qy, x0, y0, x1, y1, edge, key, grid) -> np.ndarray:
+    """
+    Число оборотов контура в точках: в опорной точке ячейки - по сумме
+    пересечений ее строки левее нее, далее - по ребрам ячейки на отрезке
+    от опорной точки до проверяемой
+    """
+    gx, gy, cell, cols = grid
+    row = np.floor((qy - gy) / cell).astype(np.int64)
+    col = np.floor((qx - gx) / cell).astype(np.int64)
+    ax = gx + (col + ANCHOR_X) * cell
+    ay = gy + (row + ANCHOR_Y) * cell
+
+    # Пересечения ребер с линиями опорных точек: +1 - ребро вверх
+    ylo, yhi = np.minimum(y0, y1), np.maximum(y0, y1)
+    first = np.ceil((ylo - gy) / cell - ANCHOR_Y).astype(np.int64)
+    last = np.ceil((yhi - gy) / cell - ANCHOR_Y).astype(np.int64)
+    counts = np.maximum(last - first, 0)
+    owner = np.repeat(np.arange(len(x0)), counts)
+    line = first[owner] + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    yc = gy + (line + ANCHOR_Y) * cell
+    xc = x0[owner] + (yc - y0[owner]) / (y1 - y0)[owner] * (x1 - x0)[owner]
+    sign = np.where(y1[owner] > y0[owner], 1, -1)
+    width = float(cols + 2) * cell
+    crossing_key = line * width + (xc - gx)
+    order = np.argsort(crossing_key)
+    crossing_key = crossing_key[order]
+    total = np.append(0, np.cumsum(sign[order]))
+    # Сумма левее опорной точки = минус сумма правее (контур замкнут)
+    before = total[np.searchsorted(crossing_key, row * width + (ax - gx))]
+    line_start = total[np.searchsorted(crossing_key, row * width)]
+    winding = -(before - line_start)
+
+    # Ребра ячейки, пересекающие отрезок опорная точка - проверяемая точка
+    cells, starts = np.unique(key, return_index=True)
+    ends = np.append(starts[1:], len(key))
+    query_key = row * cols + col
+    slot = np.searchsorted(cells, query_key)
+    slot = np.minimum(slot, len(cells) - 1)
+    found = cells[slot] == query_key
+    counts = np.where(found, ends[slot] - starts[slot], 0)
+    point = np.repeat(np.arange(len(qx)), counts)
+    candidate = edge[np.repeat(starts[slot], counts)
+                     + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))]
+    ex0, ey0, ex1, ey1 = x0[candidate], y0[candidate], x1[candidate], y1[candidate]
+    px, py, rx, ry = ax[point], ay[point], qx[point], qy[point]
+    side_a = _cross(ex0, ey0, ex1, ey1, px, py) > 0
+    side_q = _cross(ex0, ey0, ex1, ey1, rx, ry) > 0
+    side_0 = _cross(px, py, rx, ry, ex0, ey0) > 0
+    side_1 = _cross(px, py, rx, ry, ex1, ey1) > 0
+    crossing = (side_a != side_q) & (side_0 != side_1)
+    step = np.where(side_q, 1, -1)[crossing]
+    return winding + np.bincount(point[crossing], weights=step, minlength=len(qx)).astype(np.int64)
+
+
+def _cross(ax, ay, bx, by, px, py):
+    """Векторное произведение (b - a) x (p - a)"""
+    return (bx - ax) * (py - ay) - (by - ay) * (px - ax)
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Оболочки облака частиц дрейфа для района поиска
+Выпуклая оболочка - монотонная цепочка Эндрю; перед сортировкой точки
+внутри восьмиугольника экстремальных точек (Акл-Туссен) отбрасываются,
+поэтому в цикл попадают тысячи точек из миллиона.
+
+Вогнутая оболочка - альфа-оболочка на сетке: дополнение объединения
+кругов радиуса alpha, не содержащих частиц, совпадает с морфологическим
+замыканием множества частиц кругом того же радиуса. Замыкание строится
+на сетке с ячейкой alpha / 2 (наращивание и эрозия сдвигами), граница -
+марширующими квадратами, кольца собираются функциями ring_utils.
+
+Обрезка по вероятности: ячейки сетки плотности (сглаживание 3x3)
+упорядочиваются по убыванию, сохраняются частицы ячеек, набирающих
+долю fraction суммарного веса (область наибольшей плотности, например
+90% наиболее вероятных частиц).
+
+Оболочки строятся в локальной плоскости (восток и север от центра
+облака, мили), как буфер линии.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .geodesy import multipolygon_area_nm2
+from .ring_utils import nest, shoelace, stitch
+
+
+POINTS_PER_DENSITY_CELL = 10     # Средняя заполненность ячейки сетки плотности
+MAX_DENSITY_BINS = 512           # Предел ячеек сетки плотности по оси
+MAX_GRID_CELLS = 4_000_000       # Предел сетки альфа-оболочки (ячейка укрупняется)
+EXTREME_DIRECTIONS = 64          # Направления уточняющего отсева кандидатов выпуклой оболочки
+REFINE_CANDIDATES = 2000         # Кандидатов больше - уточняющий отсев
+
+# Марширующие квадраты: середины сторон квадрата (удвоенные координаты
+# относительно левого нижнего узла) и направленные отрезки для каждого
+# случая (биты: 1 - левый нижний, 2 - правый нижний, 4 - правый верхний,
+# 8 - левый верхний узел внутри); частицы слева от отрезка, седловые
+# случаи 5 и 10 соединяют внутренние узлы.
+_EDGE_X = np.array([1, 2, 1, 0])        # B, R, T, L
+_EDGE_Y = np.array([0, 1, 2, 1])
+_B, _R, _T, _L = range(4)
+_SEGMENTS = {
+    1: [(_B, _L)], 2: [(_R, _B)], 3: [(_R, _L)], 4: [(_T, _R)],
+    5: [(_T, _L), (_B, _R)], 6: [(_T, _B)], 7: [(_T, _L)], 8: [(_L, _T)],
+    9: [(_B, _T)], 10: [(_L, _B), (_R, _T)], 11: [(_R, _T)], 12: [(_L, _R)],
+    13: [(_B, _R)], 14: [(_L, _B)],
+}
+
+
+@dataclass
+class ParticleHull:
+    """Область облака частиц: непересекающиеся полигоны с дырами"""
+    polygons: List[List[np.ndarray]]   # [полигон][кольцо] -> [n, 2] (lat, lon); первое кольцо - внешнее
+    fraction: float                    # Доля веса частиц, по которым построена оболочка
+    alpha_nm: Optional[float] = None   # None - выпуклая оболочка
+
+    def area_nm2(self) -> float:
+        """Площадь области на эллипсоиде, кв. мили"""
+        return multipolygon_area_nm2(self.polygons)
+
+    def outer(self) -> List[Tuple[float, float]]:
+        """Внешняя граница наибольшего полигона [(lat, lon), ...]"""
+        if not self.polygons:
+            return []
+        largest = max(self.polygons, key=lambda rings: abs(shoelace(rings[0][:, 1], rings[0][:, 0])))
+        return [(float(lat), float(lon)) for lat, lon in largest[0]]
+
+
+def convex_hull(points) -> np.ndarray:
+    """
+    Выпуклая оболочка точек на плоскости
+
+    Args:
+        points: Точки [n, 2] (x, y); нечисловые пропускаются
+
+    Returns:
+        Индексы вершин оболочки против часовой стрелки без повторов (для
+        точек на одной прямой - два крайних, для одной точки - одна)
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    valid = np.isfinite(points).all(axis=1)
+    if valid.all():
+        finite, x, y = np.arange(len(points)), points[:, 0], points[:, 1]
+    else:
+        finite = np.flatnonzero(valid)
+        x, y = points[finite, 0], points[finite, 1]
+    return finite[_monotone_chain(np.ascontiguousarray(x), np.ascontiguousarray(y))]
+
+
+def probable_mask(lat,
+                  lon,
+                  weights=None,
+                  fraction: float = 0.9,
+                  cell_nm: Optional[float] = None) -> np.ndarray:
+    """
+    Частицы области наибольшей плотности с долей веса fraction
+
+    Args:
+        lat, lon: Положения частиц
+        weights: Веса частиц (по умолчанию равные)
+        fraction: Доля суммарного веса (1 - все частицы)
+        cell_nm: Ячейка сетки плотности, мили (по умолчанию - около
+            POINTS_PER_DENSITY_CELL частиц на ячейку)
+
+    Returns:
+        Маска сохраненных частиц
+    """
+    x, y = _plane(lat, lon)[:2]
+    return _probable(x, y, _weights(weights, len(x)), fraction, cell_nm)
+
+
+def particle_hull(lat,
+                  lon,
+                  weights=None,
+                  fraction: float = 1.0,
+                  alpha_nm: Optional[float] = None,
+                  cell_nm: Optional[float] = None) -> ParticleHull:
+    """
+    Оболочка облака частиц (многоугольник района поиска)
+
+    Args:
+        lat, lon: Положения частиц
+        weights: Веса частиц (по умолчанию равные)
+        fraction: Доля наиболее вероятных частиц (см. probable_mask)
+        alpha_nm: Радиус альфа-оболочки, мили (None - выпуклая оболочка);
+            впадины и разрывы шире 2 * alpha остаются вне области
+        cell_nm: Ячейка сетки альфа-оболочки (по умолчанию alpha / 2)
+
+    Returns:
+        ParticleHull
+    """
+    x, y, lat0, lon0, scale = _plane(lat, lon)
+    weights = _weights(weights, len(x))
+    mask = _probable(x, y, weights, fraction, None)
+    if not mask.any():
+        return ParticleHull([], 0.0, alpha_nm)
+    share = 1.0
+    if fraction < 1.0:
+        total = weights[np.isfinite(x) & np.isfinite(y) & np.isfinite(weights) & (weights > 0)].sum()
+        share = float(weights[mask].sum() / total)
+
+    if not mask.all():
+        x, y = x[mask], y[mask]
+    if alpha_nm is None:
+        rings = [_convex_ring(x, y)]
+        rings = [(ring, []) for ring in rings if ring is not None]
+    else:
+        if alpha_nm <= 0:
+            raise ValueError("Радиус альфа-оболочки должен быть положительным")
+        # Сначала наибольшие полигоны
+        rings = nest(_alpha_rings(x, y, alpha_nm, cell_nm or alpha_nm / 2))[::-1]
+
+    polygons = []
+    for outer, holes in rings:
+        polygons.append([np.column_stack([lat0 + ring[1] / 60.0,
+                                          (lon0 + ring[0] / (60.0 * scale) + 180.0) % 360.0 - 180.0])
+                         for ring in [outer, *holes]])
+    return ParticleHull(polygons, share, alpha_nm)
+
+
+def _plane(lat, lon) -> Tuple[np.ndarray, np.ndarray, float, float, float]:
+    """Локальная плоскость: восток и север от центра облака, мили"""
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    lon = np.asarray(lon, dtype=np.float64).ravel()
+    finite = np.isfinite(lat) & np.isfinite(lon)
+    if not finite.any():
+        return np.full(len(lat), np.nan), np.full(len(lat), np.nan), 0.0, 0.0, 1.0
+    lat0 = float(np.mean(lat if finite.all() else lat[finite]))
+    lon0 = float(lon[np.argmax(finite)])
+    scale = max(math.cos(math.radians(lat0)), 1e-6)
+    east = lon - lon0
+    if np.nanmax(np.abs(east)) > 180.0:    # Облако через 180-й меридиан
+        east = (east + 180.0) % 360.0 - 180.0
+    return east * (60.0 * scale), (lat - lat0) * 60.0, lat0, lon0, scale
+
+
+def _weights(weights, count: int) -> np.ndarray:
+    return np.ones(count) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+
+
+def _probable(x: np.ndarray, y: np.ndarray, weights: np.ndarray, fraction: float,
+              cell_nm: Optional[float]) -> np.ndarray:
+    """Маска частиц области наибольшей плотности (см. probable_mask)"""
+    finite = np.isfinite(x) & np.isfinite(y) & np.isfinite(weights) & (weights > 0)
+    if fraction >= 1.0 or not finite.any():
+        return finite
+    if not 0.0 < fraction:
+        raise ValueError("Доля вероятности должна быть в (0, 1]")
+    xs, ys, ws = x[finite], y[finite], weights[finite]
+    x0, y0 = xs.min(), ys.min()
+    width, height = max(xs.max() - x0, 1e-9), max(ys.max() - y0, 1e-9)
+    if cell_nm is None:
+        cell_nm = math.sqrt(width * height * POINTS_PER_DENSITY_CELL / len(xs))
+    cell_nm = max(cell_nm, width / MAX_DENSITY_BINS, height / MAX_DENSITY_BINS, 1e-9)
+    nx, ny = int(width / cell_nm) + 1, int(height / cell_nm) + 1
+    key = np.minimum((ys - y0) / cell_nm, ny - 1).astype(np.int64) * nx \
+        + np.minimum((xs - x0) / cell_nm, nx - 1).astype(np.int64)
+    mass = np.bincount(key, weights=ws, minlength=nx * ny)
+
+    # Порядок ячеек - по сглаженной плотности, набор доли - по весу частиц
+    padded = np.pad(mass.reshape(ny, nx), 1)
+    smooth = sum(padded[dy:dy + ny, dx:dx + nx] for dy in range(3) for dx in range(3)).ravel()
+    order = np.lexsort((-mass, -smooth))
+    total = np.cumsum(mass[order])
+    count = int(np.searchsorted(total, fraction * total[-1] * (1 - 1e-12))) + 1
+    kept = np.zeros(nx * ny, dtype=bool)
+    kept[order[:count]] = True
+    finite[finite] = kept[key]
+    return finite
+
+
+def _monotone_chain(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Индексы вершин выпуклой оболочки конечных точек (см. convex_hull)"""
+    candidates = _akl_toussaint(x, y) if len(x) > 8 else np.arange(len(x))
+    order = candidates[np.lexsort((y[candidates], x[candidates]))]
+    duplicate = (np.diff(x[order]) == 0) & (np.diff(y[order]) == 0)
+    order = order[np.concatenate(([True], ~duplicate))] if len(order) else order
+    if len(order) < 3:
+        return order
+    xs, ys = x[order].tolist(), y[order].tolist()
+    lower = _chain(xs, ys, range(len(order)))
+    upper = _chain(xs, ys, range(len(order) - 1, -1, -1))
+    return order[lower[:-1] + upper[:-1]]
+
+
+def _akl_toussaint(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Индексы точек вне многоугольника экстремальных точек (кандидаты в оболочку)"""
+    s, d = x + y, x - y
+    corners = [np.argmin(x), np.argmin(s), np.argmin(y), np.argmax(d),
+               np.argmax(x), np.argmax(s), np.argmax(y), np.argmin(d)]
+    edges = _edges(x, y, corners)
+    if edges is None:
+        return np.arange(len(x))
+
+    # Сначала дешевый отсев прямоугольником, вписанным в восьмиугольник
+    left, right = x[corners[:2] + corners[7:]].max(), x[corners[3:6]].min()
+    bottom, top = y[corners[1:4]].max(), y[corners[5:8]].min()
+    box_x, box_y = np.array([left, right, right, left]), np.array([bottom, bottom, top, top])
+    if left < right and bottom < top and _inside(box_x, box_y, *edges).all():
+        candidates = np.flatnonzero((x <= left) | (x >= right) | (y <= bottom) | (y >= top))
+    else:
+        candidates = np.arange(len(x))
+    candidates = candidates[~_inside(x[candidates], y[candidates], *edges)]
+
+    # Много кандидатов (облако обрезано по вероятности) - многоугольник
+    # экстремальных точек по EXTREME_DIRECTIONS направлениям
+    if len(candidates) > REFINE_CANDIDATES:
+        angle = np.pi + 2 * np.pi * np.arange(EXTREME_DIRECTIONS) / EXTREME_DIRECTIONS
+        cx, cy = x[candidates], y[candidates]
+        extremes = np.argmax(np.outer(cx, np.cos(angle)) + np.outer(cy, np.sin(angle)), axis=0)
+        edges = _edges(cx, cy, extremes.tolist())
+        if edges is not None:
+            candidates = candidates[~_inside(cx, cy, *edges)]
+    return candidates
+
+
+def _edges(x: np.ndarray, y: np.ndarray, corners: list) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Нормали и смещения ребер выпуклого многоугольника вершин corners (против часовой стрелки)"""
+    ring = []
+    for corner in corners:
+        if not ring or (x[corner], y[corner]) != (x[ring[-1]], y[ring[-1]]):
+            ring.append(corner)
+    while len(ring) > 1 and (x[ring[0]], y[ring[0]]) == (x[ring[-1]], y[ring[-1]]):
+        ring.pop()
+    if len(ring) < 3:
+        return None
+    a, b = np.array(ring), np.array(ring[1:] + ring[:1])
+    normal = np.column_stack([y[a] - y[b], x[b] - x[a]])
+    return normal, normal[:, 0] * x[a] + normal[:, 1] * y[a]
+
+
+def _inside(px: np.ndarray, py: np.ndarray, normal: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    """Точки строго внутри многоугольника: n . p > n . a для всех ребер"""
+    result = np.ones(len(px), dtype=bool)
+    for (nx, ny), level in zip(normal, offset):
+        result &= nx * px + ny * py > level
+    return result
+
+
+def _chain(xs: list, ys: list, order) -> List[int]:
+    """Нижняя (или верхняя при обратном порядке) цепочка оболочки"""
+    hull: List[int] = []
+    for p in order:
+        px, py = xs[p], ys[p]
+        while len(hull) >= 2:
+            a, b = hull[-2], hull[-1]
+            if (xs[b] - xs[a]) * (py - ys[a]) - (ys[b] - ys[a]) * (px - xs[a]) > 0:
+                break
+            hull.pop()
+        hull.append(p)
+    return hull
+
+
+def _convex_ring(x: np.ndarray, y: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Выпуклая оболочка как кольцо или None для вырожденного облака"""
+    vertices = _monotone_chain(x, y)
+    if len(vertices) < 3:
+        return None
+    return x[vertices], y[vertices]
+
+
+def _alpha_rings(x: np.ndarray, y: np.ndarray, alpha: float, cell: float) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Кольца границы замыкания множества частиц кругом радиуса alpha"""
+    x0, y0 = x.min(), y.min()
+    width, height = x.max() - x0, y.max() - y0
+    cell = max(cell, math.sqrt((width + 2 * alpha) * (height + 2 * alpha) / MAX_GRID_CELLS))
+    radius = max(int(math.ceil(alpha / cell)), 1)
+    pad = radius + 1
+    nx, ny = int(width / cell) + 1 + 2 * pad, int(height / cell) + 1 + 2 * pad
+    occupied = np.zeros((ny, nx), dtype=bool)
+    occupied[((y - y0) / cell).astype(np.int64) + pad, ((x - x0) / cell).astype(np.int64) + pad] = True
+    closed = ~_dilate(~_dilate(occupied, radius), radius)
+
+    field = closed.astype(np.uint8)
+    case = field[:-1, :-1] + 2 * field[:-1, 1:] + 4 * field[1:, 1:] + 8 * field[1:, :-1]
+    starts, ends, rows, cols = [], [], [], []
+    for value, segments in _SEGMENTS.items():
+        row, col = np.nonzero(case == value)
+        for begin, end in segments:
+            starts.append(np.full(len(row), begin))
+            ends.append(np.full(len(row), end))
+            rows.append(row)
+            cols.append(col)
+    start, end = np.concatenate(starts), np.concatenate(ends)
+    row, col = np.concatenate(rows), np.concatenate(cols)
+    rings = stitch(2 * col + _EDGE_X[start], 2 * row + _EDGE_Y[start],
+                   2 * col + _EDGE_X[end], 2 * row + _EDGE_Y[end])
+
+    result = []
+    for rx, ry in rings:
+        # Вершины на прямых участках (удвоенные координаты целые - сравнение точное)
+        bend = (np.roll(rx, -1) - rx) * (ry - np.roll(ry, 1)) != (rx - np.roll(rx, 1)) * (np.roll(ry, -1) - ry)
+        rx, ry = rx[bend], ry[bend]
+        result.append((x0 + (rx / 2 - pad + 0.5) * cell, y0 + (ry / 2 - pad + 0.5) * cell))
+    return result
+
+
+def _dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    """Наращивание маски кругом радиуса radius ячеек"""
+    ny, nx = mask.shape
+    result = mask.copy()
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if (dy or dx) and dy * dy + dx * dx <= radius * radius:
+                result[max(dy, 0):ny + min(dy, 0), max(dx, 0):nx + min(dx, 0)] |= \
+                    mask[max(-dy, 0):ny + min(-dy, 0), max(-dx, 0):nx + min(-dx, 0)]
+    return result
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+Растр вероятности нахождения объекта (POC) по облаку частиц
+Частицы (или нормальные распределения исходных пунктов) переводятся в
+равновеликую азимутальную проекцию Ламберта с центром в районе, поэтому
+все ячейки сетки имеют одинаковую площадь на эллипсоиде. Облако частиц
+раскладывается по ячейкам гистограммой (np.bincount) или сглаживается
+гауссовым ядром (разделимая свертка гистограммы с ядром, проинтегрированным
+по ячейкам). Значение ячейки - доля веса частиц (вероятность) в ней.
+Массив values хранится сверху вниз (строка 0 - север), как в GeoTIFF и
+растровых слоях QGIS; geotransform() и proj4() описывают его привязку.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .geodesy import METERS_PER_NM, laea_forward, laea_inverse
+
+
+METHODS = ('histogram', 'kde')
+DEFAULT_SHAPE = (200, 200)      # Размер сетки, если не задан ни размер, ни ячейка
+KDE_EXTENT_SIGMAS = 3.0         # Запас вокруг облака для ядерной оценки, в ширинах ядра
+PROBABLE_ERROR_SIGMAS = 1.1774  # Радиус круга 50% кругового нормального распределения, в СКО
+
+_erf = np.vectorize(math.erf, otypes=[float])
+
+
+def erf(x) -> np.ndarray:
+    """Функция ошибок поэлементно (число или массив любой формы)"""
+    return _erf(np.asarray(x, dtype=np.float64))
+
+
+@dataclass
+class PocGrid:
+    """Сетка POC в равновеликой проекции"""
+    origin: Tuple[float, float]     # Центр проекции (lat, lon)
+    x0: float                       # Западный край сетки в проекции, мили
+    y0: float                       # Южный край сетки в проекции, мили
+    cell_nm: float                  # Размер ячейки, мили
+    values: np.ndarray              # [строка, столбец], строка 0 - север
+    ellipsoid: bool = True          # Проекция на эллипсоиде WGS84 (иначе - на сфере)
+
+    @classmethod
+    def empty(cls,
+              origin: Tuple[float, float],
+              x0: float,
+              y0: float,
+              cell_nm: float,
+              shape: Tuple[int, int],
+              ellipsoid: bool = True) -> 'PocGrid':
+        """Пустая сетка заданной привязки"""
+        if cell_nm <= 0:
+            raise ValueError("Размер ячейки должен быть положительным")
+        rows, cols = int(shape[0]), int(shape[1])
+        if rows <= 0 or cols <= 0:
+            raise ValueError("Размер сетки должен быть положительным")
+        return cls((float(origin[0]), float(origin[1])), float(x0), float(y0), float(cell_nm),
+                   np.zeros((rows, cols)), ellipsoid)
+
+    @classmethod
+    def covering(cls,
+                 lat,
+                 lon,
+                 cell_nm: Optional[float] = None,
+                 shape: Optional[Tuple[int, int]] = None,
+                 margin_nm: float = 0.0,
+                 origin: Optional[Tuple[float, float]] = None,
+                 ellipsoid: bool = True) -> 'PocGrid':
+        """
+        Пустая сетка, покрывающая точки
+
+        Args:
+            lat, lon: Точки, которые должны попасть в сетку
+            cell_nm: Размер ячейки, мили (размер сетки - по охвату точек)
+            shape: Размер сетки (строки, столбцы); без cell_nm ячейка подбирается
+                так, чтобы охват поместился в сетку
+            margin_nm: Запас вокруг точек, мили
+            origin: Центр проекции; по умолчанию - центр точек
+            ellipsoid: Проекция на эллипсоиде WGS84
+
+        Returns:
+            Сетка с нулевыми значениями
+        """
+        lat = np.asarray(lat, dtype=np.float64).ravel()
+        lon = np.asarray(lon, dtype=np.float64).ravel()
+        if not len(lat):
+            raise ValueError("Нет точек для построения сетки")
+        if origin is None:
+            origin = _center(lat, lon)
+        x, y = laea_forward(lat, lon, origin[0], origin[1], ellipsoid)
+        xmin, xmax = float(x.min()) - margin_nm, float(x.max()) + margin_nm
+        ymin, ymax = float(y.min()) - margin_nm, float(y.max()) + margin_nm
+
+        if cell_nm is None:
+            rows, cols = shape or DEFAULT_SHAPE
+            cell_nm = max((xmax - xmin) / cols, (ymax - ymin) / rows)
+            if cell_nm <= 0:
+                cell_nm = 1.0
+        elif cell_nm <= 0:
+            raise ValueError("Размер ячейки должен быть положительным")
+        if shape is None:
+            cols = max(int(math.ceil((xmax - xmin) / cell_nm)), 1)
+            rows = max(int(math.ceil((ymax - ymin) / cell_nm)), 1)
+        else:
+            rows, cols = shape
+        # Охват по центру сетки
+        x0 = (xmin + xmax - cols * cell_nm) / 2
+        y0 = (ymin + ymax - rows * cell_nm) / 2
+        return cls.empty(origin, x0, y0, cell_nm, (rows, cols), ellipsoid)
+
+    @classmethod
+    def from_particles(cls,
+                       lat,
+                       lon,
+                       weights=None,
+                       cell_nm: Optional[float] = None,
+                       shape: Optional[Tuple[int, int]] = None,
+                       method: str = 'histogram',
+                       bandwidth_nm: Optional[float] = None,
+                       origin: Optional[Tuple[float, float]] = None,
+                       ellipsoid: bool = True) -> 'PocGrid':
+        """
+        Сетка POC по облаку частиц
+
+        Args:
+            lat, lon: Положения частиц
+            weights: Веса частиц (None - равные)
+            cell_nm, shape: Размер ячейки и/или сетки (см. covering)
+            method: 'histogram' - доля частиц в ячейке, 'kde' - гауссово ядро
+            bandwidth_nm: Ширина ядра (СКО), мили; по умолчанию - правило Скотта
+            origin: Центр проекции; по умолчанию - центр облака
+            ellipsoid: Проекция на эллипсоиде WGS84
+
+        Returns:
+            Сетка, сумма значений которой - доля веса частиц внутри нее
+        """
+        if method not in METHODS:
+            raise ValueError(f"Неизвестный метод: {method}")
+        lat = np.asarray(lat, dtype=np.float64).ravel()
+        lon = np.asarray(lon, dtype=np.float64).ravel()
+        if origin is None:
+            origin = _center(lat, lon)
+        x, y = laea_forward(lat, lon, origin[0], origin[1], ellipsoid)
+
+        margin = 0.0
+        if method == 'kde':
+            if bandwidth_nm is None:
+                bandwidth_nm = _scott_bandwidth(x, y, weights)
+            margin = KDE_EXTENT_SIGMAS * bandwidth_nm
+        grid = cls.covering(lat, lon, cell_nm, shape, margin, origin, ellipsoid)
+        grid._accumulate(x, y, weights, method, bandwidth_nm)
+        return grid
+
+    @classmethod
+    def from_datums(cls,
+                    datums: Sequence[Dict],
+                    cell_nm: Optional[float] = None,
+                    shape: Optional[Tuple[int, int]] = None,
+                    extent_sigmas: float = 3.0,
+                    origin: Optional[Tuple[float, float]] = None,
+                    ellipsoid: bool = True) -> 'PocGrid':
+        """
+        Сетка POC по исходным пунктам с круговыми нормальными распределениями
+
+        Args:
+            datums: Исходные пункты: 'lat', 'lon', СКО по оси 'sigma_nm' (или
+                'spread_nm' - СКО расстояния, как в ParticleCloud.datum_points,
+                или 'probable_error_nm' - радиус круга 50%), 'weight' (1.0)
+            cell_nm, shape: Размер ячейки и/или сетки (см. covering)
+            extent_sigmas: Охват сетки вокруг пунктов, в СКО
+            origin: Центр проекции; по умолчанию - центр пунктов
+            ellipsoid: Проекция на эллипсоиде WGS84
+
+        Returns:
+            Сетка, сумма значений которой - доля веса пунктов внутри нее
+        """
+        if not datums:
+            raise ValueError("Нет исходных пунктов")
+        lat = np.array([float(datum['lat']) for datum in datums])
+        lon = np.array([float(datum['lon']) for datum in datums])
+        sigma = np.array([_datum_sigma(datum) for datum in datums])
+        weight = np.array([float(datum.get('weight', 1.0)) for datum in datums])
+        if origin is None:
+            origin = _center(lat, lon)
+        x, y = laea_forward(lat, lon, origin[0], origin[1], ellipsoid)
+
+        # Охват - квадраты extent_sigmas * sigma вокруг пунктов
+        corner_x = np.concatenate([x - extent_sigmas * sigma, x + extent_sigmas * sigma])
+        corner_y = np.concatenate([y - extent_sigmas * sigma, y + extent_sigmas * sigma])
+        corner_lat, corner_lon = laea_inverse(corner_x, corner_y, origin[0], origin[1], ellipsoid)
+        grid = cls.covering(corner_lat, corner_lon, cell_nm, shape, 0.0, origin, ellipsoid)
+
+        total = weight.sum()
+        for mx, my, s, w in zip(x, y, sigma, weight):
+            grid.values += (w / total) * np.outer(grid._cell_mass(my, s, axis=0), grid._cell_mass(mx, s, axis=1))
+        return grid
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Размер сетки (строки, столбцы)"""
+        return self.values.shape
+
+    @property
+    def cell_area_nm2(self) -> float:
+        """Площадь ячейки на эллипсоиде (одинакова для всех ячеек), кв. мили"""
+        return self.cell_nm ** 2
+
+    @property
+    def containment(self) -> float:
+        """Суммарная вероятность внутри сетки"""
+        return float(self.values.sum())
+
+    def add_particles(self, lat, lon, weights=None, method: str = 'histogram',
+                      bandwidth_nm: Optional[float] = None, total_weight: Optional[float] = None):
+        """
+        Добавить облако частиц к сетке (например, блоки большого ансамбля)
+
+        Args:
+            lat, lon, weights, method, bandwidth_nm: См. from_particles
+            total_weight: Общий вес всех блоков; по умолчанию - вес этого блока
+        """
+        if method not in METHODS:
+            raise ValueError(f"Неизвестный метод: {method}")
+        x, y = laea_forward(np.asarray(lat, dtype=np.float64).ravel(),
+                            np.asarray(lon, dtype=np.float64).ravel(),
+                            self.origin[0], self.origin[1], self.ellipsoid)
+        if method == 'kde' and bandwidth_nm is None:
+            bandwidth_nm = _scott_bandwidth(x, y, weights)
+        self._accumulate(x, y, weights, method, bandwidth_nm, total_weight)
+        return self
+
+    def normalize(self) -> 'PocGrid':
+        """Нормировать значения к сумме 1 (вероятность при условии нахождения в сетке)"""
+        total = self.values.sum()
+        if total > 0:
+            self.values /= total
+        return self
+
+    def density(self) -> np.ndarray:
+        """Плотность вероятности, 1/кв. миля"""
+        return self.values / self.cell_area_nm2
+
+    def cell_index(self, lat, lon) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Ячейки точек
+
+        Returns:
+            (row, col, inside): номера ячеек и признак попадания в сетку
+        """
+        x, y = laea_forward(lat, lon, self.origin[0], self.origin[1], self.ellipsoid)
+        return self._index(np.asarray(x), np.asarray(y))
+
+    def sample(self, lat, lon) -> np.ndarray:
+        """Значения ячеек в точках (0 вне сетки)"""
+        row, col, inside = self.cell_index(lat, lon)
+        return np.where(inside, self.values[np.where(inside, row, 0), np.where(inside, col, 0)], 0.0)
+
+    def cell_centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Центры ячеек (lat, lon) [строка, столбец]"""
+        rows, cols = self.shape
+        x = self.x0 + (np.arange(cols) + 0.5) * self.cell_nm
+        y = self.y0 + (rows - np.arange(rows) - 0.5) * self.cell_nm
+        return laea_inverse(x[None, :], y[:, None], self.origin[0], self.origin[1], self.ellipsoid)
+
+    def raster(self, dtype=np.float32) -> np.ndarray:
+        """Непрерывный буфер значений для GeoTIFF / QgsRasterBlock (строка 0 - север)"""
+        return np.ascontiguousarray(self.values, dtype=dtype)
+
+    def geotransform(self) -> Tuple[float, float, float, float, float, float]:
+        """Привязка растра в формате GDAL (метры проекции proj4())"""
+        cell = self.cell_nm * METERS_PER_NM
+        top = (self.y0 + self.shape[0] * self.cell_nm) * METERS_PER_NM
+        return (self.x0 * METERS_PER_NM, cell, 0.0, top, 0.0, -cell)
+
+    def proj4(self) -> str:
+        """Проекция сетки в формате PROJ (для GDAL и QgsCoordinateReferenceSystem)"""
+        datum = '+ellps=WGS84' if self.ellipsoid else '+R=6371008.8'
+        return (f"+proj=laea +lat_0={self.origin[0]:.10f} +lon_0={self.origin[1]:.10f} "
+                f"+x_0=0 +y_0=0 {datum} +units=m +no_defs")
+
+    def write_geotiff(self, path: str, dtype=np.float32) -> str:
+        """
+        Записать сетку в GeoTIFF (нужен GDAL, он входит в состав QGIS)
+
+        Returns:
+            Путь к файлу
+        """
+        from osgeo import gdal, osr
+
+        data = self.raster(dtype)
+        gdal_type = gdal.GDT_Float64 if data.dtype == np.float64 else gdal.GDT_Float32
+        dataset = gdal.GetDriverByName('GTiff').Create(path, data.shape[1], data.shape[0], 1, gdal_type,
+                                                       options=['COMPRESS=DEFLATE'])
+        dataset.SetGeoTransform(self.geotransform())
+        srs = osr.SpatialReference()
+        srs.ImportFromProj4(self.proj4())
+        dataset.SetProjection(srs.ExportToWkt())
+        band = dataset.GetRasterBand(1)
+        band.WriteArray(data)
+        band.SetDescription('POC')
+        dataset.FlushCache()
+        dataset = None
+        return path
+
+    def _index(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Номера ячеек для координат проекции"""
+        rows, cols = self.shape
+        col = np.floor((x - self.x0) / self.cell_nm).astype(np.int64)
+        row = rows - 1 - np.floor((y - self.y0) / self.cell_nm).astype(np.int64)
+        inside = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+        return row, col, inside
+
+    def _accumulate(self, x, y, weights, method, bandwidth_nm, total_weight=None):
+        """Добавить частицы (координаты проекции) к значениям"""
+        rows, cols = self.shape
+        if weights is None:
+            weights = np.ones(len(x))
+        weights = np.asarray(weights, dtype=np.float64).ravel()
+        total = float(weights.sum()) if total_weight is None else float(total_weight)
+        if total <= 0:
+            return
+
+        row, col, inside = self._index(x, y)
+        if method == 'histogram':
+            cell = row[inside] * cols + col[inside]
+            counts = np.bincount(cell, weights=weights[inside], minlength=rows * cols)
+            self.values += counts.reshape(rows, cols) / total
+            return
+
+        # Гистограмма с запасом в 3 ширины ядра: частицы за краем сетки
+        # тоже дают вклад в крайние ячейки
+        pad = int(math.ceil(KDE_EXTENT_SIGMAS * bandwidth_nm / self.cell_nm))
+        prow, pcol = row + pad, col + pad
+        prows, pcols = rows + 2 * pad, cols + 2 * pad
+        keep = (prow >= 0) & (prow < prows) & (pcol >= 0) & (pcol < pcols)
+        counts = np.bincount(prow[keep] * pcols + pcol[keep], weights=weights[keep],
+                             minlength=prows * pcols).reshape(prows, pcols)
+        kernel_rows = _kernel_matrix(rows, prows, pad, bandwidth_nm / self.cell_nm)
+        kernel_cols = _kernel_matrix(cols, pcols, pad, bandwidth_nm / self.cell_nm)
+        self.values += kernel_rows @ counts @ kernel_cols.T / total
+
+    def _cell_mass(self, mean: float, sigma: float, axis: int) -> np.ndarray:
+        """Вероятность нормального распределения по строкам (axis=0) или столбцам"""
+        count = self.shape[axis]
+        if axis == 1:
+            edges = self.x0 + np.arange(count + 1) * self.cell_nm
+            return np.diff(_normal_cdf((edges - mean) / sigma))
+        edges = self.y0 + (count - np.arange(count + 1)) * self.cell_nm
+        return -np.diff(_normal_cdf((edges - mean) / sigma))
+
+
+def _kernel_matrix(size: int, padded: int, pad: int, sigma_cells: float) -> np.ndarray:
+    """
+    Гауссово ядро по одной оси: доля массы частицы из ячейки j (с учетом
+    запаса pad) в ячейке i сетки; ядро проинтегрировано по ячейке
+    """
+    if sigma_cells <= 0:
+        kernel = np.zeros((size, padded))
+        kernel[np.arange(size), np.arange(size) + pad] = 1.0
+        return kernel
+    offsets = np.arange(-padded, padded + 1)
+    mass = np.diff(_normal_cdf((np.append(offsets, padded + 1) - 0.5) / sigma_cells))
+    shift = (np.arange(size)[:, None] + pad) - np.arange(padded)[None, :]
+    return mass[shift + padded]
+
+
+def _normal_cdf(z) -> np.ndarray:
+    """Функция стандартного нормального распределения"""
+    return 0.5 * (1.0 + erf(np.asarray(z, dtype=np.float64) / math.sqrt(2.0)))
+
+
+def _scott_bandwidth(x: np.ndarray, y: np.ndarray, weights=None) -> float:
+    """Ширина ядра по правилу Скотта для двумерной выборки, мили"""
+    if weights is None:
+        weights = np.ones(len(x))
+    weights = np.asarray(weights, dtype=np.float64).ravel()
+    total = weights.sum()
+    if total <= 0 or len(x) < 2:
+        return 1.0
+    mx, my = np.dot(weights, x) / total, np.dot(weights, y) / total
+    sigma = math.sqrt((np.dot(weights, (x - mx) ** 2) + np.dot(weights, (y - my) ** 2)) / (2 * total))
+    effective = total ** 2 / np.dot(weights, weights)
+    bandwidth = sigma * effective ** (-1.0 / 6.0)
+    return bandwidth if bandwidth > 0 else 1.0
+
+
+def _datum_sigma(datum: Dict) -> float:
+    """СКО положения по оси для исходного пункта"""
+    if datum.get('sigma_nm') is not None:
+        sigma = float(datum['sigma_nm'])
+    elif datum.get('spread_nm') is not None:
+        sigma = float(datum['spread_nm']) / math.sqrt(2.0)
+    elif datum.get('probable_error_nm') is not None:
+        sigma = float(datum['probable_error_nm']) / PROBABLE_ERROR_SIGMAS
+    else:
+        raise ValueError("Для исходного пункта не задана ошибка положения")
+    if sigma <= 0:
+        raise ValueError("Ошибка положения должна быть положительной")
+    return sigma
+
+
+def _center(lat: np.ndarray, lon: np.ndarray) -> Tuple[float, float]:
+    """Центр точек: средняя широта и круговое среднее долготы"""
+    lmb = np.radians(lon)
+    return (float(np.mean(lat)),
+            float(np.degrees(np.arctan2(np.mean(np.sin(lmb)), np.mean(np.cos(lmb))))))
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш результатов расчетов дрейфа и исходных пунктов
+Ключ - хэш всех входных данных (LKP, время, объект, расписание погоды,
+версия алгоритма), поэтому при неизменных данных повторный расчет
+не выполняется. Два уровня: LRU в памяти и SQLite (drift_calculations /
+drift_track), который сохраняется между сеансами. Из БД возвращаются
+те же типы, что из памяти: dataclass и массивы NumPy записываются в JSON
+с меткой типа и восстанавливаются при чтении.
+"""
+
+import dataclasses
+import hashlib
+import importlib
+import json
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+
+from ..db.weather_schedule_db import ensure_drift_cache_schema, load_drift_track
+from .drift_integrator import DriftTrack
+
+
+# Метка типа для траекторий, хранящихся в drift_track
+TRACK_TYPE = "drift_track"
+
+# Метки dataclass и массивов в result_json
+DATACLASS_TAG = "__dataclass__"
+NDARRAY_TAG = "__ndarray__"
+
+# Dataclass восстанавливаются только из модулей плагина
+_PACKAGE = __name__.split(".")[0]
+
+
+@dataclass(frozen=True)
+class CacheKey:
+    """Ключ кэша и сведения для строки drift_calculations"""
+    digest: str
+    incident_id: int
+    lkp: Tuple[float, float]
+    lkp_time: str
+    object_type: str
+
+    @classmethod
+    def build(cls,
+              kind: str,
+              engine_version: str,
+              lkp: Tuple[float, float],
+              lkp_time: Any,
+              object_type: str,
+              incident_id: int = 0,
+              **inputs) -> 'CacheKey':
+        """
+        Построить ключ по содержимому входных данных
+
+        Args:
+            kind: Вид расчета ('drift', 'datum', 'schedule_drift', ...)
+            engine_version: Версия алгоритма (ENGINE_VERSION модуля расчета)
+            lkp: Последнее известное место (lat, lon)
+            lkp_time: Время LKP (строка или datetime)
+            object_type: Тип объекта поиска
+            incident_id: Инцидент (для строки БД, в хэш не входит)
+            **inputs: Прочие входные данные (расписания, коэффициенты, время дрейфа)
+        """
+        lkp = (float(lkp[0]), float(lkp[1]))
+        lkp_time = lkp_time.isoformat() if isinstance(lkp_time, datetime) else str(lkp_time or "")
+        payload = {
+            "kind": kind,
+            "engine": engine_version,
+            "lkp": lkp,
+            "lkp_time": lkp_time,
+            "object_type": object_type,
+            "inputs": inputs,
+        }
+        text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_json_default)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return cls(digest, int(incident_id or 0), lkp, lkp_time, object_type)
+
+
+@dataclass
+class CacheStats:
+    """Счетчики обращений к кэшу"""
+    memory_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.db_hits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResultCache:
+    """Двухуровневый кэш результатов (память + SQLite)"""
+
+    def __init__(self,
+                 conn: Optional[sqlite3.Connection] = None,
+                 max_entries: int = 64,
+                 max_db_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            conn: Соединение с БД; None - только кэш в памяти
+            max_entries: Число результатов в памяти
+            max_db_bytes: Предельный объем результатов в БД (оценка), байты
+        """
+        self.conn = conn
+        self.max_entries = max_entries
+        self.max_db_bytes = max_db_bytes
+        self.stats = CacheStats()
+        self._memory = OrderedDict()
+        if conn is not None:
+            ensure_drift_cache_schema(conn)
+
+    @classmethod
+    def open(cls, db_path: str, **kwargs) -> 'ResultCache':
+        """Кэш с уровнем SQLite в файле db_path"""
+        return cls(sqlite3.connect(db_path), **kwargs)
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        """
+        Найти результат в кэше
+
+        Результаты из кэша общие для всех вызывающих - их нельзя изменять.
+
+        Returns:
+            Результат или None
+        """
+        value = self._memory.get(key.digest)
+        if value is not None:
+            self._memory.move_to_end(key.digest)
+            self.stats.memory_hits += 1
+            return value
+
+        if self.conn is not None:
+            value = self._load(key.digest)
+            if value is not None:
+                self.stats.db_hits += 1
+                self._remember(key.digest, value)
+                return value
+
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: CacheKey, value: Any):
+        """Сохранить результат в памяти и (если возможно) в БД"""
+        self._remember(key.digest, value)
+        if self.conn is not None:
+            self._store(key, value)
+
+    def get_or_compute(self, key: CacheKey, compute: Callable[[], Any]) -> Any:
+        """Результат из кэша или вычисленный compute() и сохраненный"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def calculation_id(self, key: CacheKey) -> Optional[int]:
+        """Строка drift_calculations результата (None - результата нет в БД)"""
+        if self.conn is None:
+            return None
+        row = self.conn.execute("SELECT id FROM drift_calculations WHERE cache_key = ?",
+                                (key.digest,)).fetchone()
+        return None if row is None else row[0]
+
+    def clear(self):
+        """Очистить оба уровня (строки расчетов без ключа кэша не затрагиваются)"""
+        self._memory.clear()
+        if self.conn is not None:
+            ids = [row[0] for row in self.conn.execute(
+                "SELECT id FROM drift_calculations WHERE cache_key IS NOT NULL")]
+            self._delete(ids)
+
+    def _remember(self, digest: str, value: Any):
+        self._memory[digest] = value
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _load(self, digest: str) -> Optional[Any]:
+        row = self.conn.execute(
+            "SELECT id, result_json FROM drift_calculations WHERE cache_key = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        calculation_id, result_json = row
+        self.conn.execute("UPDATE drift_calculations SET cache_used_at = ? WHERE id = ?",
+                          (time.time(), calculation_id))
+        self.conn.commit()
+
+        result = json.loads(result_json, object_hook=_result_hook)
+        if isinstance(result, dict) and result.get("__type__") == TRACK_TYPE:
+            start_time = datetime.fromisoformat(result["start_time"])
+            stranded = [math.nan if result.get(name) is None else result[name]
+                        for name in ("left_stranded_hours", "right_stranded_hours")]
+            return DriftTrack.from_track_rows(load_drift_track(self.conn, calculation_id), start_time,
+                                              *stranded)
+        return result
+
+    def _store(self, key: CacheKey, value: Any):
+        """Записать результат в drift_calculations (и drift_track для траекторий)"""
+        track = value if isinstance(value, DriftTrack) else None
+        if track is not None:
+            result_json = json.dumps({
+                "__type__": TRACK_TYPE,
+                "start_time": track.start_time.isoformat(),
+                # Столбцов для выброса на берег в drift_track нет; NaN - не JSON
+                "left_stranded_hours": _finite_or_none(track.left_stranded_hours),
+                "right_stranded_hours": _finite_or_none(track.right_stranded_hours),
+            })
+        else:
+            try:
+                result_json = json.dumps(value, ensure_ascii=False, default=_result_default)
+            except (TypeError, ValueError):
+                # Несериализуемый результат остается только в памяти
+                return
+
+        columns = {
+            "incident_id": key.incident_id,
+            "lkp_lat": key.lkp[0],
+            "lkp_lon": key.lkp[1],
+            "lkp_time": key.lkp_time,
+            "object_type": key.object_type,
+            "cache_key": key.digest,
+            "result_json": result_json,
+            "cache_size": len(result_json),
+            "cache_used_at": time.time(),
+        }
+        if track is not None:
+            points = {p["name"]: p for p in track.datum_points()}
+            columns.update({
+                "datum_left_lat": points["Datum Left"]["lat"],
+                "datum_left_lon": points["Datum Left"]["lon"],
+                "datum_right_lat": points["Datum Right"]["lat"],
+                "datum_right_lon": points["Datum Right"]["lon"],
+                "datum_center_lat": points["Datum Center"]["lat"],
+                "datum_center_lon": points["Datum Center"]["lon"],
+                "total_drift_nm": track.total_drift_nm,
+                "drift_direction": track.total_drift_direction,
+                "divergence_nm": float(track.divergence_nm[-1]),
+                # 17 числовых столбцов drift_track на узел
+                "cache_size": len(result_json) + 17 * 8 * len(track.hours),
+            })
+
+        old = self.conn.execute("SELECT id FROM drift_calculations WHERE cache_key = ?",
+                                (key.digest,)).fetchall()
+        self._delete([row[0] for row in old], commit=False)
+        cursor = self.conn.execute(
+            f"INSERT INTO drift_calculations ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})", tuple(columns.values()))
+        if track is not None:
+            self.conn.executemany("""
+                INSERT INTO drift_track
+                (calculation_id, t_utc, wind_speed_ms, wind_dir, dwl_kn, cwl_kn,
+                 leeway_speed_kn, leeway_dir, current_speed_kn, current_dir,
+                 drift_speed_kn, drift_dir, left_lat, left_lon, right_lat, right_lon, divergence_nm)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, track.to_track_rows(cursor.lastrowid))
+        self.conn.commit()
+        self._evict_db()
+
+    def _evict_db(self):
+        """Удалить давно не использованные результаты сверх max_db_bytes"""
+        rows = self.conn.execute("""
+            SELECT id, cache_size FROM drift_calculations
+            WHERE cache_key IS NOT NULL
+            ORDER BY cache_used_at DESC
+        """).fetchall()
+        total = 0
+        stale = []
+        for calculation_id, size in rows:
+            total += size or 0
+            if total > self.max_db_bytes:
+                stale.append(calculation_id)
+        if stale:
+            self._delete(stale)
+            self.stats.evictions += len(stale)
+
+    def _delete(self, ids, commit: bool = True):
+        if not ids:
+            return
+        marks = ", ".join("?" for _ in ids)
+        self.conn.execute(f"DELETE FROM drift_track WHERE calculation_id IN ({marks})", ids)
+        self.conn.execute(f"DELETE FROM drift_checkpoints WHERE calculation_id IN ({marks})", ids)
+        self.conn.execute(f"DELETE FROM drift_calculations WHERE id IN ({marks})", ids)
+        if commit:
+            self.conn.commit()
+
+
+def _json_default(value):
+    """Преобразование значений, которые json не сериализует сам"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется")
+
+
+def _result_default(value):
+    """Как _json_default, но dataclass и массивы - с меткой типа для _result_hook"""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        cls = type(value)
+        fields = {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+        return {DATACLASS_TAG: f"{cls.__module__}:{cls.__qualname__}", **fields}
+    if isinstance(value, np.ndarray) and value.dtype.kind in "biuf":
+        return {NDARRAY_TAG: value.tolist(), "dtype": value.dtype.str}
+    return _json_default(value)
+
+
+def _result_hook(obj: dict):
+    """Восстановить dataclass и массивы, записанные _result_default"""
+    if NDARRAY_TAG in obj:
+        return np.asarray(obj[NDARRAY_TAG], dtype=np.dtype(obj["dtype"]))
+    if DATACLASS_TAG not in obj:
+        return obj
+    module, _, qualname = obj[DATACLASS_TAG].partition(":")
+    if module != _PACKAGE and not module.startswith(_PACKAGE + "."):
+        return obj
+    try:
+        cls = importlib.import_module(module)
+        for name in qualname.split("."):
+            cls = getattr(cls, name)
+    except (ImportError, AttributeError):
+        return obj
+    if not (isinstance(cls, type) and dataclasses.is_dataclass(cls)):
+        return obj
+    fields = dataclasses.fields(cls)
+    try:
+        value = cls(**{field.name: obj[field.name] for field in fields if field.init and field.name in obj})
+    except TypeError:
+        return obj
+    for field in fields:
+        if not field.init and field.name in obj:
+            object.__setattr__(value, field.name, obj[field.name])
+    return value
+
+
+def _finite_or_none(value: float) -> Optional[float]:
+    return None if math.isnan(value) else float(value)
+
+
+# Общий кэш плагина (по умолчанию - только в памяти)
+_default_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Общий кэш результатов плагина"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
+
+
+def set_result_cache(cache: ResultCache):
+    """Заменить общий кэш (например, на кэш с файлом БД плагина)"""
+    global _default_cache
+    _default_cache = cache
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Операции с кольцами полигонов в плоскости
+Кольцо - пара массивов (x, y) без повторения первой вершины в конце;
+внешние кольца ориентированы против часовой стрелки, дыры - по часовой.
+Используются буфером линии, сеткой подрайонов и оболочкой облака частиц.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+
+def shoelace(x: np.ndarray, y: np.ndarray) -> float:
+    """
+    Ориентированная площадь кольца по формуле Гаусса.
+
+    Args:
+        x, y: координаты вершин кольца
+
+    Returns:
+        float: площадь (> 0 - обход против часовой стрелки)
+    """
+    return float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2
+
+
+def contains(ring: Tuple[np.ndarray, np.ndarray], px: float, py: float) -> bool:
+    """
+    Точка внутри кольца (по четности пересечений луча с ребрами).
+
+    Args:
+        ring: кольцо (x, y)
+        px, py: координаты точки
+
+    Returns:
+        bool: True, если точка внутри
+    """
+    x, y = ring
+    nx, ny = np.roll(x, -1), np.roll(y, -1)
+    straddle = (y > py) != (ny > py)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xc = x + (py - y) / (ny - y) * (nx - x)
+    return bool(np.count_nonzero(straddle & (xc > px)) % 2)
+
+
+def stitch(sx: np.ndarray, sy: np.ndarray, ex: np.ndarray, ey: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Сборка колец из направленных кусков границы.
+
+    Кусок k идет из (sx[k], sy[k]) в (ex[k], ey[k]); следующим за ним
+    становится кусок, начинающийся в его конце (в точках касания - по
+    порядку). Незамкнутые цепочки и цепочки короче трех кусков
+    отбрасываются.
+
+    Args:
+        sx, sy: начала кусков
+        ex, ey: концы кусков
+
+    Returns:
+        List[Tuple[np.ndarray, np.ndarray]]: кольца (x, y) из начал кусков
+    """
+    if not len(sx):
+        return []
+    coords = np.concatenate([np.column_stack([sx, sy]), np.column_stack([ex, ey])])
+    _, node = np.unique(coords, axis=0, return_inverse=True)
+    node = node.ravel()
+    start, end = node[:len(sx)], node[len(sx):]
+
+    by_start = np.argsort(start, kind='stable')
+    by_end = np.argsort(end, kind='stable')
+    following = np.full(len(sx), -1)
+    start_sorted, end_sorted = start[by_start], end[by_end]
+    rank_start = np.arange(len(sx)) - np.searchsorted(start_sorted, start_sorted)
+    rank_end = np.arange(len(sx)) - np.searchsorted(end_sorted, end_sorted)
+    lookup = {(int(n), int(r)): int(p) for n, r, p in zip(start_sorted, rank_start, by_start)}
+    for n, r, p in zip(end_sorted, rank_end, by_end):
+        following[p] = lookup.get((int(n), int(r)), -1)
+
+    rings = []
+    visited = np.zeros(len(sx), dtype=bool)
+    for first in range(len(sx)):
+        if visited[first]:
+            continue
+        chain = []
+        piece = first
+        while piece >= 0 and not visited[piece]:
+            visited[piece] = True
+            chain.append(piece)
+            piece = following[piece]
+        if piece == first and len(chain) >= 3:
+            chain = np.array(chain)
+            rings.append((sx[chain], sy[chain]))
+    return rings
+
+
+def nest(rings) -> List[Tuple[Tuple[np.ndarray, np.ndarray], list]]:
+    """
+    Распределение дыр по внешним кольцам.
+
+    Args:
+        rings: кольца (x, y); внешние - против часовой стрелки, дыры - по часовой
+
+    Returns:
+        List[Tuple[Tuple[np.ndarray, np.ndarray], list]]: пары (внешнее кольцо,
+        дыры внутри него) по возрастанию площади внешнего кольца
+    """
+    outers = [ring for ring in rings if shoelace(*ring) > 0]
+    holes = [ring for ring in rings if shoelace(*ring) < 0]
+    nested = [(outer, []) for outer in sorted(outers, key=lambda ring: shoelace(*ring))]
+    for hole in holes:
+        for outer, inner in nested:
+            if contains(outer, hole[0][0], hole[1][0]):
+                inner.append(hole)
+                break
+    return nested
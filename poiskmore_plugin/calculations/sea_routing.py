@@ -0,0 +1,669 @@
+# -*- coding: utf-8 -*-
+"""
+Маршруты SRU в обход суши и запретных зон по графу видимости
+Препятствия (береговая линия, лед, запретные зоны) переводятся в
+равновеликую азимутальную проекцию района и упрощаются (Дуглас-Пекер).
+Узлы графа - выпуклые (со стороны моря - отражающие) вершины
+препятствий, вынесенные наружу на clearance; ребро между узлами есть,
+если отрезок касателен к препятствиям в обоих узлах (остальные ребра не
+входят в кратчайшие пути) и не пересекает ни одного ребра препятствий.
+
+Видимость из узла или точки маршрута оценивается угловым z-буфером:
+для каждого сектора направлений известно, дальше какого расстояния
+сектор целиком перекрыт ребром препятствия. Отрезки длиннее этой
+границы закрыты, точно (по сетке ячеек ребер слоя) проверяются только
+остальные.
+
+Граф строится один раз на район и хранится в кэше; слои препятствий
+добавляются и снимаются без перестройки - для каждого слоя запоминаются
+закрытые им ребра и узлы, а при добавлении слоя прежние ребра
+проверяются только по его сетке и только если их охват задевает охват
+слоя.
+
+Маршрут - A* от начальной точки через видимые из нее узлы к видимым из
+конечной; матрица расстояний для всех пар SRU - подрайон - Дейкстра от
+каждой начальной точки.
+"""
+
+import heapq
+import math
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .geodesy import laea_forward, laea_inverse, path_length_nm
+
+
+COAST_LAYER = 'coast'
+DEFAULT_CLEARANCE_NM = 0.05     # Вынос узлов от вершин препятствий
+MAX_CACHED_GRAPHS = 8           # Графов районов в кэше
+INDEX_CELLS = 128               # Наибольшее число ячеек сетки пересечений по большей стороне
+CHUNK_SEGMENTS = 20_000         # Отрезков за один проход поиска пересечений
+SWEEP_SECTORS = 1024            # Секторов углового буфера видимости
+SWEEP_EDGES = 256               # Слои с меньшим числом ребер проверяются только по сетке
+BRUTE_EDGES = 16                # ...а с числом ребер не больше этого - перебором
+
+_GRAPHS: 'OrderedDict[Hashable, RouteGraph]' = OrderedDict()
+
+
+@dataclass
+class Route:
+    """Маршрут SRU"""
+    waypoints: List[Tuple[float, float]]    # (lat, lon), от начала до конца
+    length_nm: float                        # Длина по ортодромии
+
+    def transit_hours(self, speed_kn: float) -> float:
+        """Время перехода, часы"""
+        return self.length_nm / speed_kn if speed_kn > 0 else math.inf
+
+
+@dataclass
+class _Layer:
+    """Слой препятствий и его влияние на граф"""
+    edges: np.ndarray                       # [ребро, (x0, y0, x1, y1)]
+    index: '_EdgeIndex'                     # Сетка ребер слоя
+    nodes: np.ndarray                       # Узлы графа от вершин слоя
+    covers: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))  # Узлы внутри слоя
+    blocks: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))  # Закрытые ребра графа
+
+
+class RouteGraph:
+    """Граф видимости района"""
+
+    def __init__(self,
+                 polygons: Sequence = (),
+                 origin: Optional[Tuple[float, float]] = None,
+                 clearance_nm: float = DEFAULT_CLEARANCE_NM,
+                 simplify_nm: float = 0.0):
+        """
+        Args:
+            polygons: Полигоны суши (кольца (lon, lat), как в LandMask)
+            origin: Центр проекции (lat, lon); по умолчанию - центр охвата полигонов
+            clearance_nm: Вынос узлов от вершин препятствий, мили
+            simplify_nm: Допуск упрощения береговой линии, мили (0 - без упрощения)
+        """
+        if clearance_nm <= 0:
+            raise ValueError("Вынос узлов должен быть положительным")
+        if origin is None:
+            points = [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+            if points:
+                points = np.concatenate(points)
+                origin = ((points[:, 1].min() + points[:, 1].max()) / 2,
+                          (points[:, 0].min() + points[:, 0].max()) / 2)
+            else:
+                origin = (0.0, 0.0)
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.clearance_nm = float(clearance_nm)
+        self.simplify_nm = float(simplify_nm)
+
+        self._layers: Dict[Hashable, _Layer] = {}
+        self._xy = np.empty((0, 2))             # Узлы
+        self._prev = np.empty((0, 2))           # Соседние вершины препятствия (для касательности)
+        self._next = np.empty((0, 2))
+        self._cover = np.empty(0, dtype=np.int64)       # Число слоев, внутри которых узел
+        self._pairs = np.empty((0, 2), dtype=np.int64)  # Ребра графа (кандидаты)
+        self._block = np.empty(0, dtype=np.int64)       # Число слоев, закрывающих ребро
+        self._adjacency = None
+        if len(polygons):
+            self.add_obstacles(COAST_LAYER, polygons)
+
+    # --- Слои препятствий ---
+
+    @property
+    def layers(self) -> List[Hashable]:
+        return list(self._layers)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._xy)
+
+    def add_obstacles(self, key: Hashable, polygons: Sequence):
+        """
+        Добавить слой препятствий (лед, запретная зона); слой с тем же
+        ключом заменяется
+
+        Args:
+            key: Ключ слоя
+            polygons: Полигоны (кольца (lon, lat))
+        """
+        if key in self._layers:
+            self.remove_obstacles(key)
+        rings = [self._simplify(self._project(ring)) for polygon in polygons for ring in polygon]
+        rings = [ring for ring in rings if len(ring) >= 3]
+        if rings:
+            edges = np.concatenate([np.hstack([ring, np.roll(ring, -1, axis=0)]) for ring in rings])
+        else:
+            edges = np.empty((0, 4))
+        index = _EdgeIndex(edges)
+        xy, prev, nxt = self._obstacle_nodes(rings, index)
+        old_count, old_pairs = len(self._xy), len(self._pairs)
+        new = np.arange(old_count, old_count + len(xy))
+        layer = _Layer(edges, index, new)
+        self._xy = np.vstack([self._xy, xy])
+        self._prev = np.vstack([self._prev, prev])
+        self._next = np.vstack([self._next, nxt])
+        self._cover = np.concatenate([self._cover, np.zeros(len(xy), dtype=np.int64)])
+
+        # Узлы внутри препятствий: новые - во всех слоях, прежние - в новом
+        for other in self._layers.values():
+            covered = new[other.index.parity(xy)]
+            other.covers = np.concatenate([other.covers, covered])
+            self._cover[covered] += 1
+        layer.covers = np.flatnonzero(index.parity(self._xy))
+        self._cover[layer.covers] += 1
+        self._layers[key] = layer
+
+        # Новые ребра графа - от новых узлов ко всем, проверка со всеми слоями;
+        # пары сгруппированы по первому узлу (одно начало - один угловой буфер)
+        pairs, bounds = [np.empty((0, 2), dtype=np.int64)], [0]
+        x, y = self._xy[:, 0], self._xy[:, 1]
+        ax, ay = self._prev[:, 0] - x, self._prev[:, 1] - y
+        bx, by = self._next[:, 0] - x, self._next[:, 1] - y
+        for node in new.tolist():
+            partner = np.concatenate([np.arange(old_count), np.arange(node + 1, len(self._xy))])
+            # Касательность в узле, затем - в партнере
+            dx, dy = x[partner] - x[node], y[partner] - y[node]
+            tangent = (dx * ay[node] - dy * ax[node]) * (dx * by[node] - dy * bx[node]) >= 0
+            partner, dx, dy = partner[tangent], dx[tangent], dy[tangent]
+            tangent = (dx * ay[partner] - dy * ax[partner]) * (dx * by[partner] - dy * bx[partner]) >= 0
+            partner = partner[tangent]
+            pairs.append(np.column_stack([np.full(len(partner), node), partner]))
+            bounds.append(bounds[-1] + len(partner))
+        pairs = np.concatenate(pairs)
+        self._pairs = np.vstack([self._pairs, pairs])
+        self._block = np.concatenate([self._block, np.zeros(len(pairs), dtype=np.int64)])
+        a, b = self._xy[pairs[:, 0]], self._xy[pairs[:, 1]]
+        for other in self._layers.values():
+            blocked = np.flatnonzero(self._layer_blocked(other, a, b, np.array(bounds))) + old_pairs
+            other.blocks = np.concatenate([other.blocks, blocked])
+            self._block[blocked] += 1
+
+        # Прежние ребра графа, закрытые новым слоем: по сетке нового слоя
+        # и только те, охват которых задевает охват слоя
+        if old_pairs and len(edges):
+            a, b = self._xy[self._pairs[:old_pairs, 0]], self._xy[self._pairs[:old_pairs, 1]]
+            low, high = index.low, index.high
+            near = np.flatnonzero((np.minimum(a, b) <= high).all(axis=1) & (np.maximum(a, b) >= low).all(axis=1))
+            # ...и прямая которых проходит между углами охвата
+            a, b = a[near], b[near]
+            corners = ((low[0], low[1]), (high[0], low[1]), (high[0], high[1]), (low[0], high[1]))
+            side = np.stack([(b[:, 0] - a[:, 0]) * (cy - a[:, 1]) - (b[:, 1] - a[:, 1]) * (cx - a[:, 0])
+                             for cx, cy in corners])
+            meets = (side.min(axis=0) <= 0) & (side.max(axis=0) >= 0)
+            near, a, b = near[meets], a[meets], b[meets]
+            blocked = near[self._layer_blocked(layer, a, b)]
+            layer.blocks = np.concatenate([layer.blocks, blocked])
+            self._block[blocked] += 1
+        self._adjacency = None
+
+    def remove_obstacles(self, key: Hashable):
+        """Снять слой препятствий"""
+        layer = self._layers.pop(key)
+        self._cover[layer.covers] -= 1
+        self._block[layer.blocks] -= 1
+        alive = np.ones(len(self._xy), dtype=bool)
+        alive[layer.nodes] = False
+        node_map = np.cumsum(alive) - 1
+        kept = alive[self._pairs].all(axis=1)
+        pair_map = np.cumsum(kept) - 1
+        self._xy, self._prev, self._next = self._xy[alive], self._prev[alive], self._next[alive]
+        self._cover = self._cover[alive]
+        self._pairs = node_map[self._pairs[kept]]
+        self._block = self._block[kept]
+        for other in self._layers.values():
+            other.nodes = node_map[other.nodes]
+            other.covers = node_map[other.covers[alive[other.covers]]]
+            other.blocks = pair_map[other.blocks[kept[other.blocks]]]
+        self._adjacency = None
+
+    # --- Маршруты ---
+
+    def route(self, start: Tuple[float, float], end: Tuple[float, float]) -> Optional[Route]:
+        """
+        Кратчайший маршрут в обход препятствий
+
+        Args:
+            start, end: Точки (lat, lon)
+
+        Returns:
+            Маршрут или None, если конечная точка недостижима
+
+        Raises:
+            ValueError: точка внутри препятствия
+        """
+        points = self._project_points([start, end])
+        if self._inside(points).any():
+            raise ValueError("Точка маршрута внутри препятствия")
+        s, e = points
+        if not self._blocked(s[None, :], e[None, :])[0]:
+            path = [s, e]
+        else:
+            seeds, seed_dist = self._visible(s)
+            goal_nodes, goal_dist = self._visible(e)
+            goal = np.full(len(self._xy), math.inf)
+            goal[goal_nodes] = goal_dist
+            heuristic = np.hypot(*(self._xy - e).T)
+            _, parent, last = self._dijkstra(seeds, seed_dist, goal, heuristic)
+            if last < 0:
+                return None
+            nodes = [last]
+            while parent[nodes[-1]] >= 0:
+                nodes.append(int(parent[nodes[-1]]))
+            path = [s] + [self._xy[node] for node in reversed(nodes)] + [e]
+        lat, lon = laea_inverse(*np.array(path).T, *self.origin, ellipsoid=False)
+        lat[0], lon[0], lat[-1], lon[-1] = start[0], start[1], end[0], end[1]
+        return Route(list(zip(lat.tolist(), lon.tolist())), path_length_nm(lat, lon))
+
+    def distance_matrix(self,
+                        starts: Sequence[Tuple[float, float]],
+                        ends: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """
+        Длины маршрутов для всех пар начальных и конечных точек
+
+        Args:
+            starts, ends: Точки (lat, lon)
+
+        Returns:
+            Матрица [начало, конец], мили в плоскости проекции;
+            inf - точка внутри препятствия или недостижима, NaN - точка без координат
+        """
+        s = self._project_points(starts)
+        e = self._project_points(ends)
+        result = np.full((len(s), len(e)), math.inf)
+        s_ok, e_ok = np.isfinite(s).all(axis=1), np.isfinite(e).all(axis=1)
+        result[~s_ok] = math.nan
+        result[:, ~e_ok] = math.nan
+        if not s_ok.any() or not e_ok.any():
+            return result
+        s_ok[s_ok] = ~self._inside(s[s_ok]).any(axis=1)
+        e_ok[e_ok] = ~self._inside(e[e_ok]).any(axis=1)
+
+        # Прямая видимость (пары сгруппированы по начальной точке)
+        pair_s, pair_e = np.meshgrid(np.flatnonzero(s_ok), np.flatnonzero(e_ok), indexing='ij')
+        pair_s, pair_e = pair_s.ravel(), pair_e.ravel()
+        bounds = np.arange(0, len(pair_s) + 1, max(int(e_ok.sum()), 1))
+        clear = ~self._blocked(s[pair_s], e[pair_e], bounds)
+        result[pair_s[clear], pair_e[clear]] = np.hypot(*(s[pair_s[clear]] - e[pair_e[clear]]).T)
+        if not len(self._xy) or clear.all():
+            return result
+
+        # Через узлы: расстояние от узла до видимых из него концов
+        to_end = np.full((len(self._xy), len(e)), math.inf)
+        for index in np.flatnonzero(e_ok):
+            nodes, dist = self._visible(e[index])
+            to_end[nodes, index] = dist
+        for index in np.flatnonzero(s_ok):
+            seeds, seed_dist = self._visible(s[index])
+            dist, _, _ = self._dijkstra(seeds, seed_dist)
+            reached = np.isfinite(dist)
+            via = np.min(dist[reached, None] + to_end[reached], axis=0, initial=math.inf)
+            result[index] = np.minimum(result[index], via)
+        return result
+
+    # --- Геометрия ---
+
+    def _project(self, ring) -> np.ndarray:
+        """Кольцо (lon, lat) в плоскость проекции, без замыкающей точки"""
+        ring = np.asarray(ring, dtype=np.float64)[:, :2]
+        if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+            ring = ring[:-1]
+        x, y = laea_forward(ring[:, 1], ring[:, 0], *self.origin, ellipsoid=False)
+        return np.column_stack([x, y])
+
+    def _project_points(self, points) -> np.ndarray:
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x, y = laea_forward(points[:, 0], points[:, 1], *self.origin, ellipsoid=False)
+        return np.column_stack([x, y])
+
+    def _simplify(self, ring: np.ndarray) -> np.ndarray:
+        """Упрощение замкнутого кольца (Дуглас-Пекер от двух самых удаленных вершин)"""
+        if self.simplify_nm <= 0 or len(ring) < 4:
+            return ring
+        far = int(np.argmax(np.hypot(*(ring - ring[0]).T)))
+        keep = np.zeros(len(ring) + 1, dtype=bool)
+        closed = np.vstack([ring, ring[:1]])
+        keep[[0, far, len(ring)]] = True
+        stack = [(0, far), (far, len(ring))]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo < 2:
+                continue
+            a, b = closed[lo], closed[hi]
+            inner = closed[lo + 1:hi]
+            chord = b - a
+            norm = math.hypot(*chord)
+            if norm > 0:
+                deviation = np.abs(chord[0] * (inner[:, 1] - a[1]) - chord[1] * (inner[:, 0] - a[0])) / norm
+            else:
+                deviation = np.hypot(*(inner - a).T)
+            worst = int(np.argmax(deviation))
+            if deviation[worst] > self.simplify_nm:
+                middle = lo + 1 + worst
+                keep[middle] = True
+                stack.extend([(lo, middle), (middle, hi)])
+        simplified = closed[keep][:-1]
+        return simplified if len(simplified) >= 3 else ring
+
+    def _obstacle_nodes(self, rings: List[np.ndarray], index: '_EdgeIndex'):
+        """
+        Выпуклые (со стороны моря - отражающие) вершины колец слоя,
+        вынесенные наружу по биссектрисе; вогнутые вершины в кратчайшие
+        пути не входят
+        """
+        if not rings:
+            empty = np.empty((0, 2))
+            return empty, empty, empty
+        vertex = np.concatenate(rings)
+        prev = np.concatenate([np.roll(ring, 1, axis=0) for ring in rings])
+        nxt = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+        a, b = prev - vertex, nxt - vertex
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bisector = a / np.hypot(*a.T)[:, None] + b / np.hypot(*b.T)[:, None]
+            norm = np.hypot(*bisector.T)
+            bisector = bisector / norm[:, None]
+        # Биссектриса смотрит в меньший угол; если он - суша, вершина выпуклая
+        valid = np.isfinite(norm) & (norm > 1e-9)
+        probe = vertex[valid] + self.clearance_nm * bisector[valid]
+        convex = np.zeros(len(vertex), dtype=bool)
+        convex[np.flatnonzero(valid)] = index.parity(probe)
+        node = vertex[convex] - self.clearance_nm * bisector[convex]
+        return node, prev[convex], nxt[convex]
+
+    def _tangent(self, nodes: np.ndarray, towards: np.ndarray) -> np.ndarray:
+        """Отрезок из узла касателен к препятствию (соседние вершины по одну сторону)"""
+        d = towards - self._xy[nodes]
+        a = self._prev[nodes] - self._xy[nodes]
+        b = self._next[nodes] - self._xy[nodes]
+        return (d[:, 0] * a[:, 1] - d[:, 1] * a[:, 0]) * (d[:, 0] * b[:, 1] - d[:, 1] * b[:, 0]) >= 0
+
+    def _usable_nodes(self) -> np.ndarray:
+        return np.flatnonzero(self._cover == 0)
+
+    def _visible(self, point: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Узлы, видимые из точки (с касательностью в узле), и расстояния до них"""
+        nodes = self._usable_nodes()
+        nodes = nodes[self._tangent(nodes, np.broadcast_to(point, (len(nodes), 2)))]
+        clear = ~self._blocked(np.broadcast_to(point, (len(nodes), 2)), self._xy[nodes],
+                               np.array([0, len(nodes)]))
+        nodes = nodes[clear]
+        return nodes, np.hypot(*(self._xy[nodes] - point).T)
+
+    def _inside(self, points: np.ndarray) -> np.ndarray:
+        """Точки внутри слоев [точка, слой]"""
+        inside = np.zeros((len(points), len(self._layers)), dtype=bool)
+        for column, layer in enumerate(self._layers.values()):
+            inside[:, column] = layer.index.parity(points)
+        return inside
+
+    def _blocked(self, a: np.ndarray, b: np.ndarray, bounds: Optional[np.ndarray] = None) -> np.ndarray:
+        """Отрезок пересекает хотя бы одно ребро препятствий"""
+        blocked = np.zeros(len(a), dtype=bool)
+        for layer in self._layers.values():
+            blocked |= self._layer_blocked(layer, a, b, bounds)
+        return blocked
+
+    def _layer_blocked(self, layer: _Layer, a: np.ndarray, b: np.ndarray,
+                       bounds: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Отрезки a-b, пересекающие ребра слоя
+
+        Args:
+            bounds: Границы групп отрезков с общим началом a; для больших
+                слоев отрезки, наверняка закрытые по угловому буферу из
+                начала, не проверяются по сетке
+        """
+        blocked = np.zeros(len(a), dtype=bool)
+        if not len(a) or not len(layer.edges):
+            return blocked
+        unsure = np.arange(len(a))
+        if bounds is not None and len(layer.edges) >= SWEEP_EDGES:
+            unsure = [np.empty(0, dtype=np.int64)]
+            for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+                if hi == lo:
+                    continue
+                far = _sweep(layer.index.columns, a[lo])
+                offset = b[lo:hi] - a[lo]
+                sector = np.floor((np.arctan2(offset[:, 1], offset[:, 0]) + np.pi)
+                                  * (SWEEP_SECTORS / (2 * np.pi))).astype(np.int64) % SWEEP_SECTORS
+                blocked[lo:hi] = np.hypot(offset[:, 0], offset[:, 1]) > far[sector]
+                unsure.append(lo + np.flatnonzero(~blocked[lo:hi]))
+            unsure = np.concatenate(unsure)
+        segment, _ = layer.index.crossings(a[unsure], b[unsure])
+        blocked[unsure[segment]] = True
+        return blocked
+
+    # --- Поиск пути ---
+
+    def _neighbors(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Смежность по открытым ребрам графа, CSR (строится после изменений)"""
+        if self._adjacency is None:
+            open_pairs = self._pairs[(self._block == 0) & (self._cover[self._pairs] == 0).all(axis=1)]
+            source = np.concatenate([open_pairs[:, 0], open_pairs[:, 1]])
+            target = np.concatenate([open_pairs[:, 1], open_pairs[:, 0]])
+            weight = np.hypot(*(self._xy[source] - self._xy[target]).T)
+            order = np.argsort(source, kind='stable')
+            bounds = np.searchsorted(source[order], np.arange(len(self._xy) + 1))
+            self._adjacency = (bounds, target[order], weight[order])
+        return self._adjacency
+
+    def _dijkstra(self, seeds, seed_dist, goal=None, heuristic=None):
+        """
+        Дейкстра (A* при heuristic) от виртуального источника; соседи узла
+        релаксируются одной векторной операцией
+
+        Returns:
+            (расстояния до узлов, предки, последний узел лучшего пути к цели или -1)
+        """
+        bounds, targets, weights = self._neighbors()
+        bounds = bounds.tolist()
+        dist = np.full(len(self._xy), math.inf)
+        parent = np.full(len(self._xy), -1, dtype=np.int64)
+        done = np.zeros(len(self._xy), dtype=bool)
+        h = np.zeros(len(self._xy)) if heuristic is None else heuristic
+        np.minimum.at(dist, np.asarray(seeds, dtype=np.int64), np.asarray(seed_dist, dtype=np.float64))
+        reached = np.flatnonzero(np.isfinite(dist))
+        heap = list(zip((dist[reached] + h[reached]).tolist(), reached.tolist()))
+        heapq.heapify(heap)
+        best, last = math.inf, -1
+        while heap:
+            f, node = heapq.heappop(heap)
+            if f >= best:
+                break
+            if done[node]:
+                continue
+            done[node] = True
+            d = dist[node]
+            if goal is not None and d + goal[node] < best:
+                best, last = d + goal[node], node
+            lo, hi = bounds[node], bounds[node + 1]
+            target = targets[lo:hi]
+            total = d + weights[lo:hi]
+            better = total < dist[target]
+            if better.any():
+                target, total = target[better], total[better]
+                dist[target] = total
+                parent[target] = node
+                for item in zip((total + h[target]).tolist(), target.tolist()):
+                    heapq.heappush(heap, item)
+        return dist, parent, last
+
+
+class _EdgeIndex:
+    """Сетка ячеек по ребрам слоя препятствий (CSR: ячейка -> ребра)"""
+
+    def __init__(self, edges: np.ndarray):
+        self.edges = edges
+        self.columns = tuple(np.ascontiguousarray(edges[:, k]) for k in range(4))
+        if len(edges):
+            xs, ys = edges[:, [0, 2]], edges[:, [1, 3]]
+            x0, x1, y0, y1 = xs.min(), xs.max(), ys.min(), ys.max()
+        else:
+            x0 = x1 = y0 = y1 = 0.0
+        self.low, self.high = np.array([x0, y0]), np.array([x1, y1])
+        size = max(x1 - x0, y1 - y0, 1e-6)
+        # Мелкому слою (лед, запретная зона) - грубая сетка
+        self._cell = size / min(INDEX_CELLS, max(1, int(2 * math.sqrt(len(edges)))))
+        # Сетка с запасом в ячейку и "некруглым" сдвигом узлов
+        self._x0 = x0 - self._cell * 1.0123457
+        self._y0 = y0 - self._cell * 1.0876543
+        self._cols = int(math.ceil((x1 - self._x0) / self._cell)) + 2
+        self._rows = int(math.ceil((y1 - self._y0) / self._cell)) + 2
+        edge, cell = self._cells(edges[:, :2], edges[:, 2:])
+        order = np.argsort(cell, kind='stable')
+        self._offsets = np.searchsorted(cell[order], np.arange(self._rows * self._cols + 1))
+        self._index = edge[order]
+
+    def parity(self, points: np.ndarray) -> np.ndarray:
+        """Точки внутри колец слоя (четность пересечений луча из точки наружу)"""
+        inside = np.zeros(len(points), dtype=bool)
+        if not len(points) or not len(self.edges):
+            return inside
+        # Внешняя точка с "некруглым" смещением от охвата ребер
+        outside = np.array([self._x0 - 1.2345679, self._y0 - 0.7654321])
+        segment, _ = self.crossings(points, np.broadcast_to(outside, points.shape))
+        return np.bincount(segment, minlength=len(points)) % 2 == 1
+
+    def _cells(self, a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Ячейки, через которые проходят отрезки: (номер отрезка, ячейка)"""
+        count = len(a)
+        if not count:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        # Отсечение по сетке (Лианг-Барски), затем - в единицах ячейки
+        ga = (a - [self._x0, self._y0]) / self._cell
+        gb = (b - [self._x0, self._y0]) / self._cell
+        delta = gb - ga
+        t0, t1 = np.zeros(count), np.ones(count)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for axis, limit in ((0, self._cols), (1, self._rows)):
+                low = (0 - ga[:, axis]) / delta[:, axis]
+                high = (limit - ga[:, axis]) / delta[:, axis]
+                fixed = delta[:, axis] == 0
+                outside = fixed & ((ga[:, axis] < 0) | (ga[:, axis] > limit))
+                t0 = np.where(fixed, t0, np.maximum(t0, np.minimum(low, high)))
+                t1 = np.where(fixed, t1, np.minimum(t1, np.maximum(low, high)))
+                t1 = np.where(outside, -1.0, t1)
+        segment = np.flatnonzero(t1 >= t0)
+        start = ga[segment] + t0[segment, None] * delta[segment]
+        end = ga[segment] + t1[segment, None] * delta[segment]
+
+        # Части отрезков между пересечениями с линиями сетки (как в CoverageGrid)
+        lines, params = [np.arange(len(segment))] * 2, [np.zeros(len(segment)), np.ones(len(segment))]
+        for axis in (0, 1):
+            low = np.floor(np.minimum(start[:, axis], end[:, axis]))
+            crossings = (np.floor(np.maximum(start[:, axis], end[:, axis])) - low).astype(np.int64)
+            line = np.repeat(np.arange(len(segment)), crossings)
+            boundary = low[line] + 1 + np.arange(len(line)) - np.repeat(np.cumsum(crossings) - crossings, crossings)
+            lines.append(line)
+            params.append((boundary - start[line, axis]) / (end[line, axis] - start[line, axis]))
+        line = np.concatenate(lines)
+        t = np.concatenate(params)
+        order = np.argsort(line + t / 2)
+        line, t = line[order], t[order]
+        same = line[1:] == line[:-1]
+        line, middle = line[:-1][same], ((t[:-1] + t[1:]) / 2)[same]
+        gx = start[line, 0] + middle * (end[line, 0] - start[line, 0])
+        gy = start[line, 1] + middle * (end[line, 1] - start[line, 1])
+        col = np.clip(np.floor(gx).astype(np.int64), 0, self._cols - 1)
+        row = np.clip(np.floor(gy).astype(np.int64), 0, self._rows - 1)
+        # Прямой отрезок проходит каждую ячейку один раз
+        return segment[line], row * self._cols + col
+
+    def crossings(self, a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Пересечения отрезков a-b с ребрами слоя: (номер отрезка, ребро)"""
+        found_segment, found_edge = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        a = np.asarray(a, dtype=np.float64).reshape(-1, 2)
+        b = np.asarray(b, dtype=np.float64).reshape(-1, 2)
+        if not len(self.edges):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        chunk = max(CHUNK_SEGMENTS // len(self.edges), 1) if len(self.edges) <= BRUTE_EDGES else CHUNK_SEGMENTS
+        for lo in range(0, len(a), chunk):
+            if len(self.edges) <= BRUTE_EDGES:
+                # Мелкий слой - перебор всех пар отрезок - ребро
+                count = len(a[lo:lo + chunk])
+                segment = np.repeat(np.arange(count), len(self.edges))
+                edge = np.tile(np.arange(len(self.edges)), count)
+            else:
+                segment, cell = self._cells(a[lo:lo + chunk], b[lo:lo + chunk])
+                counts = self._offsets[cell + 1] - self._offsets[cell]
+                segment = np.repeat(segment, counts)
+                first = np.repeat(self._offsets[cell], counts)
+                edge = self._index[first + np.arange(len(segment)) - np.repeat(np.cumsum(counts) - counts, counts)]
+            p, q = a[lo + segment], b[lo + segment]
+            e = self.edges[edge]
+            d1 = _cross(p, q, e[:, :2])
+            d2 = _cross(p, q, e[:, 2:])
+            d3 = _cross(e[:, :2], e[:, 2:], p)
+            d4 = _cross(e[:, :2], e[:, 2:], q)
+            crossing = (d1 * d2 < 0) & (d3 * d4 < 0)
+            # Ребро в нескольких ячейках отрезка - одно пересечение
+            key = np.unique(segment[crossing] * len(self.edges) + edge[crossing])
+            found_segment.append(lo + key // len(self.edges))
+            found_edge.append(key % len(self.edges))
+        return np.concatenate(found_segment), np.concatenate(found_edge)
+
+
+def _sweep(columns: Tuple[np.ndarray, ...], origin: np.ndarray) -> np.ndarray:
+    """
+    Угловой z-буфер ребер из точки: для каждого сектора направлений -
+    наибольшее удаление ближайшего ребра, перекрывающего сектор целиком
+    (дальше отрезок наверняка пересекает ребро). Ребра в пределах одного-
+    двух секторов ничего не перекрывают и пропускаются; граница берется
+    по худшему из соседних секторов - запас на округление угла.
+
+    Args:
+        columns: Координаты концов ребер (x0, y0, x1, y1) отдельными массивами
+        origin: Точка (x, y)
+
+    Returns:
+        Граница по секторам (inf - сектор не перекрыт)
+    """
+    scale = SWEEP_SECTORS / (2 * np.pi)
+    px, py = columns[0] - origin[0], columns[1] - origin[1]
+    qx, qy = columns[2] - origin[0], columns[3] - origin[1]
+    # Ребро занимает углы [angle + min(span, 0), angle + max(span, 0)]
+    angle = (np.arctan2(py, px) + np.pi) * scale
+    span = np.arctan2(px * qy - py * qx, px * qx + py * qy) * scale
+    first = np.floor(angle + np.minimum(span, 0)).astype(np.int64) + 1
+    last = np.floor(angle + np.maximum(span, 0)).astype(np.int64) - 1
+    # Точка на самом ребре (span = +-pi) - ребро ее не закрывает
+    wide = np.flatnonzero((last >= first) & (np.abs(span) < SWEEP_SECTORS / 2))
+    first, last = first[wide], last[wide]
+    px, py, qx, qy = px[wide], py[wide], qx[wide], qy[wide]
+    reach = np.sqrt(np.maximum(px * px + py * py, qx * qx + qy * qy))
+
+    far = np.full(SWEEP_SECTORS, math.inf)
+    count = last - first + 1
+    edge = np.repeat(np.arange(len(wide)), count)
+    sector = np.arange(len(edge)) + np.repeat(first - np.cumsum(count) + count, count)
+    np.minimum.at(far, sector % SWEEP_SECTORS, reach[edge])
+    far = np.concatenate([far[-1:], far, far[:1]])
+    return np.maximum(np.maximum(far[:-2], far[1:-1]), far[2:])
+
+
+def region_graph(region: Hashable, polygons: Optional[Sequence] = None, **options) -> RouteGraph:
+    """
+    Граф района из кэша (строится при первом обращении)
+
+    Args:
+        region: Ключ района
+        polygons: Береговая линия района (нужна при первом обращении)
+        **options: Параметры RouteGraph (origin, clearance_nm, simplify_nm)
+    """
+    graph = _GRAPHS.get(region)
+    if graph is not None:
+        _GRAPHS.move_to_end(region)
+        return graph
+    if polygons is None:
+        raise KeyError(f"Граф района {region!r} не построен")
+    graph = RouteGraph(polygons, **options)
+    _GRAPHS[region] = graph
+    while len(_GRAPHS) > MAX_CACHED_GRAPHS:
+        _GRAPHS.popitem(last=False)
+    return graph
+
+
+def _cross(a: np.ndarray, b: np.ndarray, p: np.ndarray) -> np.ndarray:
+    """Векторное произведение (b - a) x (p - a) по строкам"""
+    return (b[:, 0] - a[:, 0]) * (p[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (p[:, 0] - a[:, 0])
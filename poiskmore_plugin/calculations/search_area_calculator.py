@@ -9,6 +9,14 @@ from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 import numpy as np
 
+from .clustering import group_labels
+from .coverage_grid import CoverageGrid
+from .geodesy import destination, distance_nm, path_length_nm, ring_area_nm2
+from .line_buffer import buffer_line
+from .search_patterns import expanding_square, generate_pattern, track_line_search
+from .sru_assignment import assign_srus
+from .sub_area_grid import SubAreaGrid
+
 
 @dataclass 
 class SearchArea:
@@ -34,9 +42,15 @@ class SearchAreaCalculator:
         'coverage_factor': 1.0  # Коэффициент покрытия
     }
     
-    def __init__(self):
-        """Инициализация калькулятора"""
+    def __init__(self, land_mask=None):
+        """
+        Инициализация калькулятора
+        
+        Args:
+            land_mask: Маска суши (LandMask) для обрезки подрайонов
+        """
         self.search_areas = []
+        self.land_mask = land_mask
     
     def calculate_from_two_points(self,
                                  datum_left: Dict,
@@ -91,7 +105,7 @@ class SearchAreaCalculator:
         area_nm2 = width_nm * length_nm
         
         # Создаем подрайоны для распределения SRU
-        sub_areas = self._divide_into_sub_areas(bounds, params['track_spacing'])
+        sub_areas = self._divide_into_sub_areas(bounds, params['track_spacing'], drift_direction)
         
         search_area = SearchArea(
             id=f"area_two_points_{len(self.search_areas)+1}",
@@ -110,7 +124,9 @@ class SearchAreaCalculator:
     def calculate_along_line(self,
                            datum_line: List[Tuple[float, float]],
                            search_width: float,
-                           params: Optional[Dict] = None) -> SearchArea:
+                           params: Optional[Dict] = None,
+                           join: str = 'round',
+                           cap: str = 'flat') -> SearchArea:
         """
         Расчет района поиска вдоль исходной линии
         Соответствует разделу 3.5 документации
@@ -119,26 +135,24 @@ class SearchAreaCalculator:
             datum_line: Список точек исходной линии [(lat, lon), ...]
             search_width: Ширина полосы поиска в милях
             params: Параметры поиска
+            join: Соединение полосы на поворотах линии: 'round' или 'mitre'
+            cap: Окончания полосы: 'flat' (по концам линии), 'round' или 'square'
             
         Returns:
             Район поиска вдоль линии
         """
         params = params or self.DEFAULT_SEARCH_PARAMS
         
-        # Рассчитываем длину линии
-        total_length = 0
-        for i in range(len(datum_line) - 1):
-            total_length += self._calculate_distance(datum_line[i], datum_line[i+1])
-        
-        # Создаем буферную зону вокруг линии
-        bounds = self._create_buffer_around_line(datum_line, search_width / 2)
+        # Создаем буферную зону вокруг линии (перекрытия на петлях объединяются)
+        buffer = buffer_line(datum_line, search_width / 2, join=join, cap=cap)
+        bounds = buffer.outer()
         
         # Центр района - середина линии
         mid_index = len(datum_line) // 2
         center = datum_line[mid_index]
         
-        # Площадь района
-        area_nm2 = total_length * search_width
+        # Площадь района - площадь буфера без повторного учета перекрытий
+        area_nm2 = buffer.area_nm2()
         
         # Создаем подрайоны вдоль линии
         sub_areas = self._divide_line_into_segments(datum_line, search_width, params['track_spacing'])
@@ -161,7 +175,9 @@ class SearchAreaCalculator:
                                datum_points: List[Dict],
                                max_distance: float,
                                search_duration: float,
-                               params: Optional[Dict] = None) -> List[SearchArea]:
+                               params: Optional[Dict] = None,
+                               clustering: str = 'complete',
+                               min_samples: int = 1) -> List[SearchArea]:
         """
         Расчет далеко разнесенных районов поиска
         Соответствует разделам 3.2 и 3.4 документации
@@ -171,6 +187,8 @@ class SearchAreaCalculator:
             max_distance: Максимальное расстояние между районами
             search_duration: Продолжительность поиска
             params: Параметры поиска
+            clustering: Способ группировки пунктов - 'complete' или 'dbscan'
+            min_samples: Минимальное число соседей ядерной точки (для 'dbscan')
             
         Returns:
             Список районов поиска
@@ -179,7 +197,7 @@ class SearchAreaCalculator:
         areas = []
         
         # Группируем исходные пункты по расстоянию
-        groups = self._group_points_by_distance(datum_points, max_distance)
+        groups = self._group_points_by_distance(datum_points, max_distance, clustering, min_samples)
         
         for i, group in enumerate(groups):
             # Для каждой группы создаем отдельный район
@@ -297,13 +315,25 @@ class SearchAreaCalculator:
     
     def optimize_search_pattern(self,
                               search_area: SearchArea,
-                              sru_units: List[Dict]) -> Dict:
+                              sru_units: List[Dict],
+                              poc_grid=None) -> Dict:
         """
         Оптимизация схемы поиска для района
         
+        SRU назначаются на подрайоны точным решением задачи о назначениях
+        (sru_assignment.assign_srus): стоимость учитывает переход с базы SRU
+        ('base' или 'lat'/'lon'), остаток автономности, ширину обзора и
+        прирост POS (экспоненциальная функция обнаружения). Несколько SRU
+        в одном подрайоне допускаются с убывающим приростом; SRU, которой
+        не хватает автономности ни на один подрайон, не назначается.
+        POC подрайона - ключ 'poc', иначе оценка по сетке POC в центре
+        подрайона, иначе - пропорционально площади (равномерное распределение).
+        
         Args:
             search_area: Район поиска
             sru_units: Список поисковых единиц (SRU)
+            poc_grid: Сетка POC (PocGrid) или None; с ней в результате также
+                растр покрытия галсами ('coverage_grid') и его POS ('achieved_pos')
             
         Returns:
             Оптимизированная схема поиска
@@ -312,31 +342,66 @@ class SearchAreaCalculator:
                                 for sru in sru_units)
         
         # Время для покрытия района
-        coverage_time = search_area.area_nm2 / total_sru_capacity
+        coverage_time = search_area.area_nm2 / total_sru_capacity if total_sru_capacity > 0 else float('inf')
+        
+        sub_areas = search_area.sub_areas
+        sub_poc = self._sub_area_poc(search_area, poc_grid)
+        sub_area_nm2 = [sub.get('area_nm2', 0.0) for sub in sub_areas]
+        solution = assign_srus(sru_units, sub_areas, sub_poc, capacity=[1] * len(sru_units),
+                               sub_area_capacity=max(len(sru_units), 1))
         
         # Распределяем SRU по подрайонам
         assignments = []
-        sub_area_index = 0
+        effort = np.zeros(len(sub_areas))
+        for sru_index, index in solution.pairs:
+            sru = sru_units[sru_index]
+            effort[index] += solution.costs.effort_nm2[sru_index, index]
+            assignments.append({
+                'sru_id': sru['id'],
+                'sru_name': sru.get('name', str(sru['id'])),
+                'sub_area': sub_areas[index],
+                'transit_hours': float(solution.costs.transit_hours[sru_index, index]),
+                'search_hours': float(solution.costs.search_hours[sru_index, index]),
+                'pattern': self._determine_search_pattern(sub_areas[index], sru)
+            })
         
-        for sru in sru_units:
-            if sub_area_index < len(search_area.sub_areas):
-                assignments.append({
-                    'sru_id': sru['id'],
-                    'sru_name': sru['name'],
-                    'sub_area': search_area.sub_areas[sub_area_index],
-                    'pattern': self._determine_search_pattern(
-                        search_area.sub_areas[sub_area_index],
-                        sru
-                    )
-                })
-                sub_area_index += 1
-        
-        return {
+        area = np.asarray(sub_area_nm2, dtype=np.float64)
+        pod = np.where(area > 0, -np.expm1(-effort / np.where(area > 0, area, 1.0)), 0.0)
+        
+        result = {
             'area_id': search_area.id,
             'total_time_hours': coverage_time,
             'assignments': assignments,
-            'coverage_probability': self._calculate_pod(search_area, sru_units)
+            'coverage_probability': self._calculate_pod(search_area, sru_units),
+            'probability_of_success': float(np.dot(sub_poc, pod)) if len(sub_areas) else 0.0
         }
+        
+        # По сетке POC - покрытие построенными галсами каждой SRU и достигнутая POS
+        if poc_grid is not None:
+            widths = {sru['id']: sru.get('sweep_width', 2.0) for sru in sru_units}
+            tracks, track_widths = [], []
+            for assignment in assignments:
+                for leg in assignment['pattern']['legs']:
+                    tracks.append([leg['start'], leg['end']])
+                    track_widths.append(widths[assignment['sru_id']])
+            coverage = CoverageGrid.for_grid(poc_grid).burn(tracks, track_widths)
+            result['coverage_grid'] = coverage
+            result['achieved_pos'] = coverage.pos(poc_grid)
+        
+        return result
+    
+    def _sub_area_poc(self, search_area: SearchArea, poc_grid=None) -> np.ndarray:
+        """POC подрайонов: заданная, по сетке POC или пропорционально площади"""
+        sub_areas = search_area.sub_areas
+        area = np.array([sub.get('area_nm2', 0.0) for sub in sub_areas], dtype=np.float64)
+        if sub_areas and all('poc' in sub for sub in sub_areas):
+            return np.array([sub['poc'] for sub in sub_areas], dtype=np.float64)
+        if poc_grid is not None and sub_areas and all('center' in sub for sub in sub_areas):
+            lat = [sub['center'][0] for sub in sub_areas]
+            lon = [sub['center'][1] for sub in sub_areas]
+            return poc_grid.sample(lat, lon) / poc_grid.cell_area_nm2 * area
+        total = area.sum()
+        return area / total if total > 0 else area
     
     def _calculate_distance(self, point1: Tuple[float, float], 
                           point2: Tuple[float, float]) -> float:
@@ -350,23 +415,14 @@ class SearchAreaCalculator:
         Returns:
             Расстояние в морских милях
         """
-        lat1, lon1 = point1
-        lat2, lon2 = point2
-        
-        # Формула гаверсинуса
-        R = 3440.065  # Радиус Земли в морских милях
-        
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(dlat/2)**2 + 
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-             math.sin(dlon/2)**2)
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        return distance
+        return float(distance_nm(point1[0], point1[1], point2[0], point2[1]))
+    
+    def _calculate_line_length(self, line: List[Tuple[float, float]]) -> float:
+        """Длина ломаной (lat, lon) в морских милях (один векторный вызов)"""
+        if len(line) < 2:
+            return 0.0
+        points = np.asarray(line, dtype=np.float64)
+        return path_length_nm(points[:, 0], points[:, 1])
     
     def _calculate_point_at_distance_and_bearing(self,
                                                 start_point: Tuple[float, float],
@@ -383,27 +439,8 @@ class SearchAreaCalculator:
         Returns:
             Новая точка (lat, lon)
         """
-        lat1, lon1 = start_point
-        R = 3440.065  # Радиус Земли в морских милях
-        
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        bearing_rad = math.radians(bearing_deg)
-        
-        lat2_rad = math.asin(
-            math.sin(lat1_rad) * math.cos(distance_nm/R) +
-            math.cos(lat1_rad) * math.sin(distance_nm/R) * math.cos(bearing_rad)
-        )
-        
-        lon2_rad = lon1_rad + math.atan2(
-            math.sin(bearing_rad) * math.sin(distance_nm/R) * math.cos(lat1_rad),
-            math.cos(distance_nm/R) - math.sin(lat1_rad) * math.sin(lat2_rad)
-        )
-        
-        lat2 = math.degrees(lat2_rad)
-        lon2 = math.degrees(lon2_rad)
-        
-        return (lat2, lon2)
+        lat2, lon2 = destination(start_point[0], start_point[1], distance_nm, bearing_deg)
+        return (float(lat2), float(lon2))
     
     def _create_rectangle_bounds(self,
                                 center: Tuple[float, float],
@@ -448,89 +485,46 @@ class SearchAreaCalculator:
     
     def _divide_into_sub_areas(self,
                               bounds: List[Tuple[float, float]],
-                              track_spacing: float) -> List[Dict]:
+                              track_spacing: float,
+                              orientation_deg: float = 0.0) -> List[Dict]:
         """
         Разделить район на подрайоны для SRU
         
+        Ячейки сетки повернуты вдоль дрейфа и обрезаны по границе района
+        и суше (self.land_mask); площадь подрайона - площадь его части
+        внутри района на эллипсоиде (SubAreaGrid).
+        
         Args:
             bounds: Границы района
             track_spacing: Расстояние между галсами
+            orientation_deg: Направление дрейфа - направление строк сетки
             
         Returns:
             Список подрайонов
         """
-        # Упрощенное деление на сетку
-        # В реальности нужен более сложный алгоритм
-        sub_areas = []
-        
-        # Определяем bbox
-        lats = [p[0] for p in bounds]
-        lons = [p[1] for p in bounds]
-        min_lat, max_lat = min(lats), max(lats)
-        min_lon, max_lon = min(lons), max(lons)
-        
-        # Размер подрайона (примерно)
-        sub_size = track_spacing * 10  # 10 галсов на подрайон
-        
-        lat_steps = int((max_lat - min_lat) * 60 / sub_size) + 1
-        lon_steps = int((max_lon - min_lon) * 60 / sub_size) + 1
-        
-        for i in range(lat_steps):
-            for j in range(lon_steps):
-                sub_lat_min = min_lat + (i * sub_size / 60)
-                sub_lat_max = min_lat + ((i + 1) * sub_size / 60)
-                sub_lon_min = min_lon + (j * sub_size / 60)
-                sub_lon_max = min_lon + ((j + 1) * sub_size / 60)
-                
-                sub_areas.append({
-                    'id': f"sub_{i}_{j}",
-                    'bounds': [
-                        (sub_lat_min, sub_lon_min),
-                        (sub_lat_max, sub_lon_min),
-                        (sub_lat_max, sub_lon_max),
-                        (sub_lat_min, sub_lon_max)
-                    ],
-                    'center': ((sub_lat_min + sub_lat_max) / 2,
-                              (sub_lon_min + sub_lon_max) / 2),
-                    'area_nm2': sub_size ** 2
-                })
-        
-        return sub_areas
+        # Размер подрайона - 10 галсов
+        sub_size = track_spacing * 10
+        grid = SubAreaGrid.from_polygon(bounds, sub_size, orientation_deg,
+                                        land_mask=self.land_mask)
+        return grid.to_sub_areas()
     
     def _calculate_polygon_area(self, points: List[Tuple[float, float]]) -> float:
         """
         Рассчитать площадь полигона в квадратных морских милях
         
+        Точная площадь на эллипсоиде WGS84 (geodesy.ring_area_nm2).
+        
         Args:
             points: Список точек полигона
             
         Returns:
             Площадь в квадратных морских милях
         """
-        # Используем формулу площади для сферического полигона
-        # Упрощенная версия - проекция на плоскость
         if len(points) < 3:
             return 0
         
-        # Центр полигона
-        center = self._calculate_polygon_center(points)
-        
-        # Переводим в локальную проекцию относительно центра
-        local_points = []
-        for lat, lon in points:
-            dx = (lon - center[1]) * 60 * math.cos(math.radians(center[0]))
-            dy = (lat - center[0]) * 60
-            local_points.append((dx, dy))
-        
-        # Формула площади полигона (формула шнурования)
-        area = 0
-        n = len(local_points)
-        for i in range(n):
-            j = (i + 1) % n
-            area += local_points[i][0] * local_points[j][1]
-            area -= local_points[j][0] * local_points[i][1]
-        
-        return abs(area) / 2
+        points = np.asarray(points, dtype=np.float64)
+        return float(ring_area_nm2(points[:, 0], points[:, 1]))
     
     def _calculate_polygon_center(self, points: List[Tuple[float, float]]) -> Tuple[float, float]:
         """
@@ -554,44 +548,38 @@ class SearchAreaCalculator:
         """
         Определить схему поиска для подрайона
         
+        Полигон - параллельное галсирование вдоль длинной оси (или схема
+        sru['pattern']) по части района внутри подрайона с учетом дыр
+        ('bounds', 'holes'), участок линии - поиск вдоль линии пути, кольцо -
+        расходящийся квадрат от центра. Интервал галсов S = W / C.
+        
         Args:
             sub_area: Подрайон
             sru: Поисковая единица
             
         Returns:
-            Схема поиска
-        """
-        # Параллельные галсы - наиболее эффективная схема
-        pattern = {
-            'type': 'parallel',
-            'track_spacing': self.DEFAULT_SEARCH_PARAMS['track_spacing'],
-            'direction': 0,  # Будет оптимизировано
-            'legs': []
-        }
-        
-        # Рассчитываем галсы
-        bounds = sub_area['bounds']
-        width = self._calculate_distance(bounds[0], bounds[1])
-        length = self._calculate_distance(bounds[1], bounds[2])
-        
-        # Направление галсов - вдоль длинной стороны
-        if length > width:
-            pattern['direction'] = 0
-            num_tracks = int(width / pattern['track_spacing'])
+            Схема поиска: галсы с координатами, точки маршрута, длина и время
+        """
+        spacing = sru.get('track_spacing')
+        if spacing is None and 'sweep_width' in sru:
+            spacing = sru['sweep_width'] / self.DEFAULT_SEARCH_PARAMS['coverage_factor']
+        if spacing is None:
+            spacing = self.DEFAULT_SEARCH_PARAMS['track_spacing']
+        speed = sru.get('search_speed', self.DEFAULT_SEARCH_PARAMS['search_speed'])
+        
+        if 'bounds' in sub_area:
+            # Подрайон сетки - часть района внутри ячейки: галсы только по ней
+            kind = sru.get('pattern', 'parallel')
+            options = {'holes': sub_area['holes']} if sub_area.get('holes') and kind in (
+                'parallel', 'creeping_line') else {}
+            pattern = generate_pattern(kind, spacing, polygon=sub_area['bounds'], datum=sub_area.get('center'),
+                                       speed_kn=speed, **options)
+        elif 'track' in sub_area:
+            pattern = track_line_search(sub_area['track'], spacing, speed_kn=speed)
         else:
-            pattern['direction'] = 90
-            num_tracks = int(length / pattern['track_spacing'])
-        
-        # Создаем галсы
-        for i in range(num_tracks):
-            pattern['legs'].append({
-                'number': i + 1,
-                'start': None,  # Будет рассчитано
-                'end': None,    # Будет рассчитано
-                'distance': length if length > width else width
-            })
-        
-        return pattern
+            pattern = expanding_square(sub_area['center'], spacing, radius_nm=sub_area.get('outer_radius'),
+                                       speed_kn=speed)
+        return pattern.to_dict()
     
     def _calculate_pod(self, search_area: SearchArea, sru_units: List[Dict]) -> float:
         """
@@ -629,71 +617,42 @@ class SearchAreaCalculator:
     
     def _create_buffer_around_line(self,
                                   line: List[Tuple[float, float]],
-                                  buffer_distance: float) -> List[Tuple[float, float]]:
+                                  buffer_distance: float,
+                                  join: str = 'round',
+                                  cap: str = 'flat') -> List[Tuple[float, float]]:
         """
         Создать буферную зону вокруг линии
         
+        Геодезический буфер с объединением перекрытий (line_buffer.buffer_line).
+        
         Args:
             line: Линия
             buffer_distance: Расстояние буфера в милях
+            join: Соединение на поворотах: 'round' или 'mitre'
+            cap: Окончания линии: 'flat', 'round' или 'square'
             
         Returns:
-            Границы буферной зоны
+            Границы буферной зоны (внешний контур)
         """
-        # Создаем точки с обеих сторон линии
-        left_side = []
-        right_side = []
-        
-        for i in range(len(line) - 1):
-            # Направление сегмента
-            lat1, lon1 = line[i]
-            lat2, lon2 = line[i + 1]
-            
-            # Азимут сегмента
-            bearing = math.degrees(math.atan2(lon2 - lon1, lat2 - lat1))
-            
-            # Перпендикулярные направления
-            left_bearing = (bearing - 90) % 360
-            right_bearing = (bearing + 90) % 360
-            
-            # Точки слева
-            left_point = self._calculate_point_at_distance_and_bearing(
-                line[i], buffer_distance, left_bearing
-            )
-            left_side.append(left_point)
-            
-            # Точки справа
-            right_point = self._calculate_point_at_distance_and_bearing(
-                line[i], buffer_distance, right_bearing
-            )
-            right_side.append(right_point)
-        
-        # Добавляем последнюю точку
-        bearing = math.degrees(math.atan2(
-            line[-1][1] - line[-2][1],
-            line[-1][0] - line[-2][0]
-        ))
-        
-        left_side.append(self._calculate_point_at_distance_and_bearing(
-            line[-1], buffer_distance, (bearing - 90) % 360
-        ))
-        
-        right_side.append(self._calculate_point_at_distance_and_bearing(
-            line[-1], buffer_distance, (bearing + 90) % 360
-        ))
-        
-        # Объединяем в полигон
-        return left_side + right_side[::-1]
+        return buffer_line(line, buffer_distance, join=join, cap=cap).outer()
     
     def _group_points_by_distance(self,
                                  points: List[Dict],
-                                 max_distance: float) -> List[List[Dict]]:
+                                 max_distance: float,
+                                 method: str = 'complete',
+                                 min_samples: int = 1) -> List[List[Dict]]:
         """
         Группировать точки по расстоянию
         
+        Соседи ищутся по пространственному хэшу (clustering.SpatialHash),
+        поэтому группировка облака из сотен тысяч точек занимает секунды.
+        
         Args:
             points: Список точек
             max_distance: Максимальное расстояние для группировки
+            method: 'complete' - все точки группы не дальше max_distance
+                друг от друга; 'dbscan' - цепочки ядерных точек
+            min_samples: Минимальное число соседей ядерной точки (для 'dbscan')
             
         Returns:
             Список групп точек
@@ -701,36 +660,13 @@ class SearchAreaCalculator:
         if not points:
             return []
         
-        groups = []
-        used = set()
+        lat = np.array([p['lat'] for p in points], dtype=np.float64)
+        lon = np.array([p['lon'] for p in points], dtype=np.float64)
+        labels = group_labels(lat, lon, max_distance, method, min_samples)
         
-        for i, point in enumerate(points):
-            if i in used:
-                continue
-            
-            group = [point]
-            used.add(i)
-            
-            for j, other_point in enumerate(points):
-                if j in used:
-                    continue
-                
-                # Проверяем расстояние до всех точек в группе
-                in_group = True
-                for group_point in group:
-                    dist = self._calculate_distance(
-                        (group_point['lat'], group_point['lon']),
-                        (other_point['lat'], other_point['lon'])
-                    )
-                    if dist > max_distance:
-                        in_group = False
-                        break
-                
-                if in_group:
-                    group.append(other_point)
-                    used.add(j)
-            
-            groups.append(group)
+        groups = [[] for _ in range(int(labels.max()) + 1)]
+        for point, label in zip(points, labels.tolist()):
+            groups[label].append(point)
         
         return groups
     
@@ -771,7 +707,13 @@ class SearchAreaCalculator:
             expanded_bounds.append(new_point)
         
         area_nm2 = self._calculate_polygon_area(expanded_bounds)
-        sub_areas = self._divide_polygon_into_sub_areas(expanded_bounds, params['track_spacing'])
+        
+        # Сетка подрайонов - вдоль среднего направления дрейфа пунктов
+        directions = [math.radians(p.get('drift_direction', 0)) for p in datum_points]
+        orientation = math.degrees(math.atan2(sum(math.sin(d) for d in directions),
+                                              sum(math.cos(d) for d in directions)))
+        sub_areas = self._divide_polygon_into_sub_areas(expanded_bounds, params['track_spacing'],
+                                                        orientation)
         
         return SearchArea(
             id="temp",
@@ -792,9 +734,7 @@ class SearchAreaCalculator:
         segments = []
         segment_length = spacing * 10  # 10 галсов на сегмент
         
-        total_length = 0
-        for i in range(len(line) - 1):
-            total_length += self._calculate_distance(line[i], line[i+1])
+        total_length = self._calculate_line_length(line)
         
         num_segments = int(total_length / segment_length) + 1
         
@@ -807,11 +747,26 @@ class SearchAreaCalculator:
                 'start_distance': start_dist,
                 'end_distance': end_dist,
                 'width': width,
-                'area_nm2': (end_dist - start_dist) * width
+                'area_nm2': (end_dist - start_dist) * width,
+                'track': self._line_section(line, start_dist, end_dist)
             })
         
         return segments
     
+    def _line_section(self,
+                      line: List[Tuple[float, float]],
+                      start_distance: float,
+                      end_distance: float) -> List[Tuple[float, float]]:
+        """Участок линии между расстояниями от ее начала, мили"""
+        points = np.asarray(line, dtype=np.float64)
+        steps = distance_nm(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+        along = np.concatenate([[0.0], np.cumsum(steps)])
+        inner = (along > start_distance) & (along < end_distance)
+        distances = np.concatenate([[start_distance], along[inner], [end_distance]])
+        lat = np.interp(distances, along, points[:, 0])
+        lon = np.interp(distances, along, points[:, 1])
+        return list(zip(lat.tolist(), lon.tolist()))
+    
     def _create_concentric_sub_areas(self,
                                     center: Tuple[float, float],
                                     radius: float,
@@ -837,7 +792,7 @@ class SearchAreaCalculator:
     
     def _divide_polygon_into_sub_areas(self,
                                       bounds: List[Tuple[float, float]],
-                                      spacing: float) -> List[Dict]:
-        """Разделить полигон на подрайоны"""
-        # Используем упрощенный метод деления на сетку
-        return self._divide_into_sub_areas(bounds, spacing)
\ No newline at end of file
+                                      spacing: float,
+                                      orientation_deg: float = 0.0) -> List[Dict]:
+        """Разделить полигон на подрайоны (ячейки обрезаются по полигону)"""
+        return self._divide_into_sub_areas(bounds, spacing, orientation_deg)
\ No newline at end of file
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+История поиска: обновление POC после вылетов без обнаружения
+После каждого вылета, не обнаружившего объект, вероятность в ячейках
+пересчитывается по Байесу: POC' = POC * (1 - POD) / (1 - POS), где
+POS = sum(POC * POD) - вероятность успеха вылета. Последовательные
+обновления сводятся к одному множителю выживания prod(1 - POD) на
+ячейку, поэтому хранится только априорная сетка и этот множитель;
+вылет меняет лишь свои ячейки (сплошной диапазон - срезом, без выборки
+по номерам). Вылеты хранятся разреженно (ячейки и
+POD), так что история инцидента занимает немного места в БД, а
+повторное применение десятков вылетов к сетке занимает миллисекунды.
+"""
+
+import io
+import json
+from dataclasses import dataclass, replace
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from ..db.search_history_db import append_search_sortie, load_search_history, save_search_prior
+from .poc_grid import PocGrid
+
+
+@dataclass
+class Sortie:
+    """Вылет: обследованные ячейки и POD в них"""
+    cells: np.ndarray           # Номера ячеек в развернутой сетке (по возрастанию, без повторов)
+    pod: np.ndarray             # POD вылета в этих ячейках
+    sru_id: str = ""
+    completed_at: str = ""      # Время окончания вылета
+    pos: float = 0.0            # POS вылета (по распределению перед ним)
+
+    def to_bytes(self) -> bytes:
+        """Сжатое представление: приращения номеров ячеек и POD (float32)"""
+        buffer = io.BytesIO()
+        steps = np.diff(self.cells, prepend=0).astype(np.uint32)
+        np.savez_compressed(buffer, steps=steps, pod=self.pod.astype(np.float32))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes, sru_id: str = "", completed_at: str = "",
+                   pos: float = 0.0) -> 'Sortie':
+        with np.load(io.BytesIO(blob)) as data:
+            cells = np.cumsum(data["steps"], dtype=np.int64)
+            return cls(cells, data["pod"].astype(np.float64), sru_id, completed_at, pos)
+
+
+class SearchHistory:
+    """Априорная сетка POC и выполненные вылеты инцидента"""
+
+    def __init__(self, prior: PocGrid):
+        """
+        Args:
+            prior: Сетка POC до начала поиска (сумма - вероятность нахождения в сетке)
+        """
+        self.prior = prior
+        self.sorties: List[Sortie] = []
+        self._prior = np.asarray(prior.values, dtype=np.float64).ravel()
+        self._survival = np.ones(self._prior.size)      # prod(1 - POD) по ячейкам
+        self._not_found = 1.0                           # 1 - суммарная POS
+
+    @classmethod
+    def replay(cls, prior: PocGrid, sorties: Sequence[Sortie]) -> 'SearchHistory':
+        """История после последовательного применения вылетов"""
+        history = cls(prior)
+        for sortie in sorties:
+            history._apply(sortie)
+        return history
+
+    # --- Состояние ---
+
+    @property
+    def cumulative_pos(self) -> float:
+        """Суммарная вероятность успеха всех вылетов"""
+        return 1.0 - self._not_found
+
+    @property
+    def cumulative_pod(self) -> np.ndarray:
+        """Суммарная POD по ячейкам (форма сетки)"""
+        return (1.0 - self._survival).reshape(self.prior.shape)
+
+    @property
+    def coverage(self) -> np.ndarray:
+        """Суммарный коэффициент покрытия по ячейкам (-ln(1 - POD))"""
+        with np.errstate(divide='ignore'):
+            return -np.log(self._survival).reshape(self.prior.shape)
+
+    @property
+    def effort(self) -> np.ndarray:
+        """Равноценное выполненное усилие по ячейкам, кв. мили (для allocate(prior_effort=...))"""
+        return self.coverage * self.prior.cell_area_nm2
+
+    @property
+    def poc(self) -> PocGrid:
+        """Апостериорная сетка POC при условии, что объект не обнаружен"""
+        values = self._prior * self._survival
+        if self._not_found > 0:
+            values /= self._not_found
+        return replace(self.prior, values=values.reshape(self.prior.shape))
+
+    # --- Вылеты ---
+
+    def record(self,
+               pod,
+               cells: Optional[Sequence[int]] = None,
+               sru_id: str = "",
+               completed_at: str = "") -> Sortie:
+        """
+        Учесть вылет без обнаружения
+
+        Args:
+            pod: POD вылета - по всей сетке (форма сетки) или в ячейках cells
+            cells: Номера ячеек в развернутой сетке (строка * столбцов + столбец)
+            sru_id: Поисковая единица
+            completed_at: Время окончания вылета
+
+        Returns:
+            Вылет с его POS
+        """
+        pod = np.asarray(pod, dtype=np.float64)
+        if not ((pod >= 0) & (pod <= 1)).all():
+            raise ValueError("POD должна быть в пределах от 0 до 1")
+        if cells is None:
+            if pod.shape != self.prior.shape:
+                raise ValueError("Форма POD не совпадает с сеткой")
+            pod = pod.ravel()
+            cells = np.flatnonzero(pod > 0)
+            pod = pod[cells]
+        else:
+            cells = np.asarray(cells, dtype=np.int64).ravel()
+            pod = np.broadcast_to(pod, cells.shape)
+            if len(cells) and (cells.min() < 0 or cells.max() >= self._prior.size):
+                raise ValueError("Номер ячейки вне сетки")
+            # Повторное обследование ячейки в одном вылете: промахи перемножаются
+            cells, inverse = np.unique(cells, return_inverse=True)
+            pod = -np.expm1(np.bincount(inverse, weights=np.log1p(-pod), minlength=len(cells)))
+        return self._apply(Sortie(cells, pod, sru_id, completed_at))
+
+    def record_allocation(self, allocation, completed_at: str = "") -> List[Sortie]:
+        """
+        Учесть выполненный план распределения усилий (по вылету на SRU)
+
+        Args:
+            allocation: EffortAllocation, рассчитанный на сетке этой истории
+            completed_at: Время окончания вылетов
+        """
+        area = self.prior.cell_area_nm2
+        return [self.record(-np.expm1(-unit.cell_effort / area), unit.cells, str(unit.sru_id), completed_at)
+                for unit in allocation.units]
+
+    def _apply(self, sortie: Sortie) -> Sortie:
+        """Обновить выживание в ячейках вылета и его POS"""
+        cells = sortie.cells
+        if len(cells) and cells[-1] - cells[0] + 1 == len(cells):
+            cells = slice(int(cells[0]), int(cells[-1]) + 1)
+        found = float(np.dot(self._prior[cells] * self._survival[cells], sortie.pod))
+        sortie.pos = found / self._not_found if self._not_found > 0 else 0.0
+        self._not_found = max(self._not_found - found, 0.0)
+        self._survival[cells] *= 1.0 - sortie.pod
+        self.sorties.append(sortie)
+        return sortie
+
+    # --- Сериализация ---
+
+    def grid_json(self) -> str:
+        """Привязка сетки (без значений)"""
+        return json.dumps({"origin": list(self.prior.origin), "x0": self.prior.x0, "y0": self.prior.y0,
+                           "cell_nm": self.prior.cell_nm, "shape": list(self.prior.shape),
+                           "ellipsoid": self.prior.ellipsoid})
+
+    def prior_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, values=self.prior.values)
+        return buffer.getvalue()
+
+    def save(self, conn, incident_id: int):
+        """Сохранить историю инцидента (заменяя прежнюю)"""
+        save_search_prior(conn, incident_id, self.grid_json(), self.prior_bytes())
+        for number in range(len(self.sorties)):
+            self.save_sortie(conn, incident_id, number)
+
+    def save_sortie(self, conn, incident_id: int, number: int = -1):
+        """Дописать вылет (по умолчанию последний) к сохраненной истории"""
+        number = range(len(self.sorties))[number]
+        sortie = self.sorties[number]
+        append_search_sortie(conn, incident_id, number, sortie.sru_id, sortie.completed_at,
+                             sortie.pos, sortie.to_bytes())
+
+    @classmethod
+    def load(cls, conn, incident_id: int) -> Optional['SearchHistory']:
+        """Загрузить историю инцидента (None, если ее нет)"""
+        stored = load_search_history(conn, incident_id)
+        if stored is None:
+            return None
+        grid_json, prior_blob, rows = stored
+        grid = json.loads(grid_json)
+        with np.load(io.BytesIO(prior_blob)) as data:
+            values = data["values"]
+        prior = PocGrid(tuple(grid["origin"]), grid["x0"], grid["y0"], grid["cell_nm"],
+                        values.reshape(grid["shape"]), grid["ellipsoid"])
+        return cls.replay(prior, [Sortie.from_bytes(blob, sru_id, completed_at)
+                                  for sru_id, completed_at, _, blob in rows])
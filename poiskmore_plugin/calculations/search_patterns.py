@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+Схемы поиска (IAMSAR, том II, гл. 5): маршруты с координатами точек
+Параллельное галсирование (PS), гребенка (CS), расходящийся квадрат (SS),
+секторный поиск (VS) и поиск вдоль линии пути (TS). Маршрут строится в
+равновеликой азимутальной проекции с центром в подрайоне (на масштабе
+подрайона искажения пренебрежимо малы) целиком операциями над массивами:
+галсы - пересечение семейства прямых со всеми ребрами полигона сразу,
+квадрат и сектор - накопленная сумма векторов галсов. Результат - точки
+поворота (lat, lon), длина маршрута и время его прохождения.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .geodesy import distance_nm, laea_forward, laea_inverse, path_length_nm
+
+
+PATTERNS = ('parallel', 'creeping_line', 'expanding_square', 'sector', 'track_line')
+
+DEFAULT_SPEED_KN = 10.0
+EXPANDING_SQUARE_LEGS = 14      # Число галсов квадрата, если не задан район
+SECTOR_TURN_DEG = 120.0         # Поворот в секторном поиске
+SECTOR_SECOND_PASS_DEG = 30.0   # Смещение второго прохода сектора
+
+
+@dataclass
+class SearchPattern:
+    """Маршрут поиска"""
+    type: str                   # Один из PATTERNS
+    waypoints: np.ndarray       # [точка, (lat, lon)]
+    track_spacing: float        # Расстояние между галсами, мили
+    direction: float            # Направление первого галса, градусы
+    speed_kn: float = DEFAULT_SPEED_KN
+    search_legs: Optional[np.ndarray] = None  # Номера поисковых отрезков (остальные - переходы)
+
+    @property
+    def length_nm(self) -> float:
+        """Длина маршрута, мили"""
+        return path_length_nm(self.waypoints[:, 0], self.waypoints[:, 1])
+
+    @property
+    def time_hours(self) -> float:
+        """Время прохождения маршрута, часы"""
+        return self.length_nm / self.speed_kn if self.speed_kn > 0 else math.inf
+
+    def legs(self) -> List[Dict]:
+        """Поисковые галсы: номер, начало, конец, длина"""
+        lat, lon = self.waypoints[:, 0], self.waypoints[:, 1]
+        segments = np.arange(len(self.waypoints) - 1) if self.search_legs is None else self.search_legs
+        lengths = distance_nm(lat[:-1], lon[:-1], lat[1:], lon[1:])[segments]
+        return [{'number': number + 1,
+                 'start': (float(lat[k]), float(lon[k])),
+                 'end': (float(lat[k + 1]), float(lon[k + 1])),
+                 'distance': float(length)}
+                for number, (k, length) in enumerate(zip(segments, lengths))]
+
+    def to_dict(self) -> Dict:
+        """Схема для плана поиска (формат SearchAreaCalculator)"""
+        return {
+            'type': self.type,
+            'track_spacing': self.track_spacing,
+            'direction': self.direction,
+            'legs': self.legs(),
+            'waypoints': [(float(lat), float(lon)) for lat, lon in self.waypoints],
+            'length_nm': self.length_nm,
+            'time_hours': self.time_hours,
+        }
+
+
+def parallel_sweep(polygon: Sequence[Tuple[float, float]],
+                   track_spacing: float,
+                   direction: Optional[float] = None,
+                   start: Optional[Tuple[float, float]] = None,
+                   speed_kn: float = DEFAULT_SPEED_KN,
+                   creeping: bool = False,
+                   holes: Sequence[Sequence[Tuple[float, float]]] = ()) -> SearchPattern:
+    """
+    Параллельное галсирование (или гребенка) по полигону подрайона
+
+    Галсы идут на расстоянии track_spacing друг от друга, первый и
+    последний - в половине интервала от границы. В невыпуклом полигоне
+    (и в полигоне с дырами) прямая галса делится на отрезки внутри
+    полигона, промежутки между ними проходятся как переходы.
+
+    Args:
+        polygon: Вершины подрайона (lat, lon)
+        track_spacing: Расстояние между галсами, мили
+        direction: Направление галсов, градусы; по умолчанию - вдоль
+            длинной оси подрайона (для гребенки - поперек нее)
+        start: Точка начала поиска (CSP) - маршрут начинается в ближайшем к ней углу
+        speed_kn: Скорость поиска, узлы
+        creeping: Гребенка (галсы поперек длинной оси)
+        holes: Исключаемые области внутри подрайона (lat, lon)
+
+    Returns:
+        Маршрут: начало и конец каждого галса, между ними - переходы
+    """
+    if track_spacing <= 0:
+        raise ValueError("Расстояние между галсами должно быть положительным")
+    points = np.asarray(polygon, dtype=np.float64)
+    if len(points) < 3:
+        raise ValueError("Полигон подрайона должен иметь не менее трех вершин")
+    origin = _origin(points)
+    x, y = laea_forward(points[:, 0], points[:, 1], origin[0], origin[1], ellipsoid=False)
+    if direction is None:
+        direction = _long_axis(x, y) + (90.0 if creeping else 0.0)
+    direction = float(direction) % 360.0
+
+    # Координаты вдоль галса (u) и поперек (v)
+    theta = math.radians(direction)
+    u = x * math.sin(theta) + y * math.cos(theta)
+    v = x * math.cos(theta) - y * math.sin(theta)
+    count = max(int(math.ceil((v.max() - v.min()) / track_spacing - 1e-9)), 1)
+    lines = (v.min() + v.max()) / 2 + (np.arange(count) - (count - 1) / 2) * track_spacing
+
+    # Ребра внешнего кольца и дыр
+    u1, v1 = [u], [v]
+    u2, v2 = [np.roll(u, -1)], [np.roll(v, -1)]
+    for hole in holes:
+        hole = np.asarray(hole, dtype=np.float64)
+        if len(hole) < 3:
+            continue
+        hx, hy = laea_forward(hole[:, 0], hole[:, 1], origin[0], origin[1], ellipsoid=False)
+        hu = hx * math.sin(theta) + hy * math.cos(theta)
+        hv = hx * math.cos(theta) - hy * math.sin(theta)
+        u1.append(hu)
+        v1.append(hv)
+        u2.append(np.roll(hu, -1))
+        v2.append(np.roll(hv, -1))
+    u1, v1, u2, v2 = (np.concatenate(a) for a in (u1, v1, u2, v2))
+
+    # Пересечения всех прямых со всеми ребрами: [прямая, ребро]
+    crosses = (np.minimum(v1, v2) <= lines[:, None]) & (lines[:, None] < np.maximum(v1, v2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = (lines[:, None] - v1) / (v2 - v1)
+    at = np.sort(np.where(crosses, u1 + t * (u2 - u1), np.nan), axis=1)
+    width = int(crosses.sum(axis=1).max())
+    at = at[:, :max(width + width % 2, 2)]
+    # Пары пересечений - отрезки прямой внутри полигона: [прямая, отрезок, (начало, конец)]
+    inside = at.reshape(len(lines), -1, 2)
+
+    # Галсы «змейкой»; из четырех углов начала выбирается ближайший к CSP
+    variants = []
+    for parity in (0, 1):
+        track_u, track_v = _snake(inside, lines, parity)
+        variants += [(track_u, track_v), (track_u[::-1], track_v[::-1])]
+    if start is not None:
+        su, sv = _rotate_point(start, origin, theta)
+        track_u, track_v = min(variants, key=lambda item: math.hypot(item[0][0] - su, item[1][0] - sv))
+    else:
+        track_u, track_v = variants[0]
+    if (track_u[1] - track_u[0]) < 0:
+        direction = (direction + 180.0) % 360.0
+
+    waypoints = _unrotate(track_u, track_v, theta, origin)
+    return SearchPattern('creeping_line' if creeping else 'parallel', waypoints, float(track_spacing),
+                         direction, speed_kn, np.arange(0, len(waypoints) - 1, 2))
+
+
+def creeping_line(polygon: Sequence[Tuple[float, float]],
+                  track_spacing: float,
+                  direction: Optional[float] = None,
+                  start: Optional[Tuple[float, float]] = None,
+                  speed_kn: float = DEFAULT_SPEED_KN) -> SearchPattern:
+    """Гребенка: короткие галсы поперек длинной оси подрайона (см. parallel_sweep)"""
+    return parallel_sweep(polygon, track_spacing, direction, start, speed_kn, creeping=True)
+
+
+def expanding_square(datum: Tuple[float, float],
+                     track_spacing: float,
+                     direction: float = 0.0,
+                     legs: Optional[int] = None,
+                     polygon: Optional[Sequence[Tuple[float, float]]] = None,
+                     radius_nm: Optional[float] = None,
+                     speed_kn: float = DEFAULT_SPEED_KN) -> SearchPattern:
+    """
+    Поиск расходящимся квадратом от исходного пункта
+
+    Длины галсов S, S, 2S, 2S, 3S, ...; каждый следующий галс повернут на
+    90 градусов вправо.
+
+    Args:
+        datum: Исходный пункт (lat, lon)
+        track_spacing: Расстояние между галсами S, мили
+        direction: Направление первого галса, градусы
+        legs: Число галсов; по умолчанию - до покрытия полигона или круга
+            radius_nm, без них - EXPANDING_SQUARE_LEGS
+        polygon: Подрайон, который должен быть покрыт
+        radius_nm: Радиус района вокруг исходного пункта
+        speed_kn: Скорость поиска, узлы
+    """
+    if track_spacing <= 0:
+        raise ValueError("Расстояние между галсами должно быть положительным")
+    datum = (float(datum[0]), float(datum[1]))
+    if legs is None:
+        legs = EXPANDING_SQUARE_LEGS
+        theta = math.radians(direction)
+        if polygon is not None:
+            points = np.asarray(polygon, dtype=np.float64)
+            x, y = laea_forward(points[:, 0], points[:, 1], datum[0], datum[1], ellipsoid=False)
+            u = x * math.sin(theta) + y * math.cos(theta)
+            v = x * math.cos(theta) - y * math.sin(theta)
+            radius_nm = float(np.max(np.maximum(np.abs(u), np.abs(v))))
+        if radius_nm is not None:
+            # Квадрат после 2m галсов простирается примерно на m * S / 2 от центра
+            legs = 2 * (int(math.ceil(2 * radius_nm / track_spacing)) + 1)
+    number = np.arange(int(legs))
+    lengths = track_spacing * (number // 2 + 1)
+    headings = np.radians(direction + 90.0 * number)
+    waypoints = _walk(datum, lengths, headings)
+    return SearchPattern('expanding_square', waypoints, float(track_spacing), float(direction) % 360.0,
+                         speed_kn)
+
+
+def sector_search(datum: Tuple[float, float],
+                  radius_nm: float,
+                  direction: float = 0.0,
+                  passes: int = 1,
+                  speed_kn: float = DEFAULT_SPEED_KN) -> SearchPattern:
+    """
+    Секторный поиск: три треугольника с поворотами на 120 градусов вправо
+
+    Args:
+        datum: Исходный пункт (lat, lon)
+        radius_nm: Радиус (длина галса), мили
+        direction: Направление первого галса, градусы
+        passes: 2 - второй проход, повернутый на SECTOR_SECOND_PASS_DEG
+        speed_kn: Скорость поиска, узлы
+    """
+    if radius_nm <= 0:
+        raise ValueError("Радиус сектора должен быть положительным")
+    # Курсы галсов одного прохода: наружу, поперечный, к центру и сразу наружу
+    turns = np.array([0, 1, 2, 2, 3, 4, 4, 5, 6]) * SECTOR_TURN_DEG
+    headings = [direction + turns + k * SECTOR_SECOND_PASS_DEG for k in range(passes)]
+    headings = np.radians(np.concatenate(headings))
+    waypoints = _walk((float(datum[0]), float(datum[1])), np.full(len(headings), float(radius_nm)), headings)
+    return SearchPattern('sector', waypoints, float(radius_nm), float(direction) % 360.0, speed_kn)
+
+
+def track_line_search(track: Sequence[Tuple[float, float]],
+                      track_spacing: float,
+                      legs: int = 2,
+                      speed_kn: float = DEFAULT_SPEED_KN) -> SearchPattern:
+    """
+    Поиск вдоль линии пути
+
+    Галсы параллельны линии пути со смещениями (k - (legs - 1) / 2) * S и
+    проходятся поочередно в прямом и обратном направлении: legs=1 - поиск
+    без возврата (TSN), legs=2 - с возвратом по другой стороне (TSR).
+
+    Args:
+        track: Линия пути (lat, lon)
+        track_spacing: Расстояние между галсами S, мили
+        legs: Число галсов
+        speed_kn: Скорость поиска, узлы
+    """
+    points = np.asarray(track, dtype=np.float64)
+    if len(points) < 2:
+        raise ValueError("Линия пути должна иметь не менее двух точек")
+    if legs < 1:
+        raise ValueError("Число галсов должно быть не меньше 1")
+    origin = _origin(points)
+    x, y = laea_forward(points[:, 0], points[:, 1], origin[0], origin[1], ellipsoid=False)
+    normal_x, normal_y = _vertex_normals(x, y)
+    offsets = (np.arange(legs) - (legs - 1) / 2) * track_spacing
+    # [галс, вершина]; нечетные галсы проходятся в обратную сторону
+    lx = x[None, :] + offsets[:, None] * normal_x[None, :]
+    ly = y[None, :] + offsets[:, None] * normal_y[None, :]
+    lx[1::2], ly[1::2] = lx[1::2, ::-1], ly[1::2, ::-1]
+    lat, lon = laea_inverse(lx.ravel(), ly.ravel(), origin[0], origin[1], ellipsoid=False)
+    vertices = len(points)
+    search = (np.arange(legs)[:, None] * vertices + np.arange(vertices - 1)[None, :]).ravel()
+    direction = math.degrees(math.atan2(x[1] - x[0], y[1] - y[0])) % 360.0
+    return SearchPattern('track_line', np.column_stack([lat, lon]), float(track_spacing), direction,
+                         speed_kn, search)
+
+
+def generate_pattern(kind: str,
+                     track_spacing: float,
+                     polygon: Optional[Sequence[Tuple[float, float]]] = None,
+                     datum: Optional[Tuple[float, float]] = None,
+                     track: Optional[Sequence[Tuple[float, float]]] = None,
+                     direction: Optional[float] = None,
+                     speed_kn: float = DEFAULT_SPEED_KN,
+                     **options) -> SearchPattern:
+    """
+    Построить схему поиска по названию
+
+    Args:
+        kind: Один из PATTERNS
+        track_spacing: Расстояние между галсами (для сектора - радиус), мили
+        polygon: Подрайон (parallel, creeping_line; для квадрата - покрываемый район)
+        datum: Исходный пункт (expanding_square, sector); по умолчанию - центр polygon
+        track: Линия пути (track_line)
+        direction: Направление галсов / первого галса, градусы
+        speed_kn: Скорость поиска, узлы
+        **options: Дополнительные параметры конкретной схемы
+    """
+    if kind not in PATTERNS:
+        raise ValueError(f"Неизвестная схема поиска: {kind}")
+    if kind in ('parallel', 'creeping_line'):
+        if polygon is None:
+            raise ValueError("Для галсирования нужен полигон подрайона")
+        return parallel_sweep(polygon, track_spacing, direction, speed_kn=speed_kn,
+                              creeping=kind == 'creeping_line', **options)
+    if kind == 'track_line':
+        if track is None:
+            raise ValueError("Для поиска вдоль линии пути нужна линия")
+        return track_line_search(track, track_spacing, speed_kn=speed_kn, **options)
+    if datum is None:
+        if polygon is None:
+            raise ValueError("Для схемы нужен исходный пункт или полигон")
+        datum = _origin(np.asarray(polygon, dtype=np.float64))
+    if kind == 'sector':
+        return sector_search(datum, track_spacing, direction or 0.0, speed_kn=speed_kn, **options)
+    return expanding_square(datum, track_spacing, direction or 0.0, polygon=polygon, speed_kn=speed_kn,
+                            **options)
+
+
+def _origin(points: np.ndarray) -> Tuple[float, float]:
+    """Центр проекции - середина охвата вершин"""
+    lat = (points[:, 0].min() + points[:, 0].max()) / 2
+    lon = points[:, 1]
+    # Середина по долготе с учетом перехода через 180
+    shift = (lon - lon[0] + 180) % 360 - 180
+    return float(lat), float((lon[0] + (shift.min() + shift.max()) / 2 + 180) % 360 - 180)
+
+
+def _long_axis(x: np.ndarray, y: np.ndarray) -> float:
+    """Направление, вдоль которого полигон уже всего поперек (из направлений ребер)"""
+    bearings = np.arctan2(np.roll(x, -1) - x, np.roll(y, -1) - y)
+    keep = np.hypot(np.roll(x, -1) - x, np.roll(y, -1) - y) > 0
+    bearings = bearings[keep]
+    # Ширина поперек каждого направления: [направление, вершина]
+    across = x[None, :] * np.cos(bearings)[:, None] - y[None, :] * np.sin(bearings)[:, None]
+    width = across.max(axis=1) - across.min(axis=1)
+    return float(np.degrees(bearings[int(np.argmin(width))]) % 180.0)
+
+
+def _rotate_point(point: Tuple[float, float], origin: Tuple[float, float], theta: float) -> Tuple[float, float]:
+    x, y = laea_forward(point[0], point[1], origin[0], origin[1], ellipsoid=False)
+    return (float(x * math.sin(theta) + y * math.cos(theta)),
+            float(x * math.cos(theta) - y * math.sin(theta)))
+
+
+def _unrotate(u: np.ndarray, v: np.ndarray, theta: float, origin: Tuple[float, float]) -> np.ndarray:
+    """Из координат (вдоль, поперек) галсов в (lat, lon)"""
+    x = u * math.sin(theta) + v * math.cos(theta)
+    y = u * math.cos(theta) - v * math.sin(theta)
+    lat, lon = laea_inverse(x, y, origin[0], origin[1], ellipsoid=False)
+    return np.column_stack([lat, lon])
+
+
+def _walk(start: Tuple[float, float], lengths: np.ndarray, headings: np.ndarray) -> np.ndarray:
+    """Точки поворота маршрута из длин и курсов галсов (накопленная сумма в проекции)"""
+    x = np.concatenate([[0.0], np.cumsum(lengths * np.sin(headings))])
+    y = np.concatenate([[0.0], np.cumsum(lengths * np.cos(headings))])
+    lat, lon = laea_inverse(x, y, start[0], start[1], ellipsoid=False)
+    return np.column_stack([lat, lon])
+
+
+def _snake(inside: np.ndarray, lines: np.ndarray, parity: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Отрезки галсов по порядку: каждая вторая прямая проходится в обратную сторону"""
+    reverse = (np.arange(len(lines)) + parity) % 2 == 1
+    ends = inside.reshape(len(lines), -1).copy()
+    ends[reverse] = ends[reverse, ::-1]
+    valid = ~np.isnan(ends)
+    return ends[valid], np.broadcast_to(lines[:, None], ends.shape)[valid]
+
+
+def _vertex_normals(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Нормали вправо от линии в вершинах (со скосом на изломах)"""
+    dx, dy = np.diff(x), np.diff(y)
+    length = np.hypot(dx, dy)
+    length[length == 0] = 1.0
+    nx, ny = dy / length, -dx / length
+    # В вершине - биссектриса соседних нормалей, удлиненная до смещения на 1 от обоих отрезков
+    ax = np.concatenate([nx[:1], nx])
+    ay = np.concatenate([ny[:1], ny])
+    bx = np.concatenate([nx, nx[-1:]])
+    by = np.concatenate([ny, ny[-1:]])
+    mx, my = ax + bx, ay + by
+    dot = np.maximum(mx * bx + my * by, 0.5)
+    return mx / dot, my / dot
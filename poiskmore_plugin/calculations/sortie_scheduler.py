@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+План вылетов SRU на 24-72 часа
+Вылет - переход с базы в подрайон, поиск и возвращение; затем подготовка
+(дозаправка) до следующего вылета. Время поиска ограничено временем на
+сцене и автономностью (с учетом перехода туда и обратно), светлым
+временем в подрайоне (визуальный поиск), суммарным временем работы
+экипажа за скользящие 24 часа, окнами недоступности SRU и концом
+горизонта планирования.
+
+План строится жадно по событиям: освободившаяся SRU получает вылет с
+наибольшим приростом POS на час занятости (с учетом ожидания рассвета),
+прирост считается сразу для всех подрайонов, после вылета POC подрайона
+уменьшается по экспоненциальному закону обнаружения. Скользящий горизонт:
+replan сохраняет начатые вылеты (вылет SRU, ставшей недоступной,
+обрывается) и заново строит остаток плана - за доли секунды.
+
+Светлое время - по высоте Солнца в центрах подрайонов (упрощенные
+формулы Астрономического альманаха, точность около 0.01 градуса) на
+сетке с шагом 5 минут.
+"""
+
+import heapq
+import math
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .effort_allocation import DEFAULT_SEARCH_SPEED_KN, DEFAULT_SWEEP_WIDTH_NM
+from .sru_assignment import assignment_costs, sub_area_center
+
+
+SUNRISE_ELEVATION_DEG = -0.833     # Восход/заход верхнего края диска с рефракцией
+DAYLIGHT_STEP_HOURS = 1.0 / 12     # Шаг сетки светлого времени
+MIN_SEARCH_HOURS = 0.25            # Более короткий поиск не планируется
+IDLE_STEP_HOURS = 0.5              # Сдвиг SRU без допустимого вылета
+TURNAROUND_HOURS = 1.0             # Подготовка к повторному вылету по умолчанию
+AIRCRAFT_CREW_DUTY_HOURS = 10.0    # Работа экипажа ВС за 24 ч по умолчанию (суда - без ограничения)
+AIRCRAFT_TYPES = ('helicopter', 'fixed_wing')
+
+
+@dataclass
+class ScheduledSortie:
+    """Вылет SRU в подрайон"""
+    sru_id: object
+    sub_area_id: object
+    depart: datetime
+    search_start: datetime
+    search_end: datetime
+    return_time: datetime
+    effort_nm2: float           # Обследованная площадь W * V * T
+    pos: float                  # Прирост POS
+
+    @property
+    def search_hours(self) -> float:
+        return (self.search_end - self.search_start).total_seconds() / 3600
+
+
+@dataclass
+class SortiePlan:
+    """План вылетов"""
+    start: datetime
+    horizon_hours: float
+    sorties: List[ScheduledSortie] = field(default_factory=list)
+    pos: float = 0.0                    # Суммарная POS плана (включая выполненные вылеты)
+    remaining_poc: Optional[np.ndarray] = None  # POC подрайонов после плана
+
+    def by_sru(self) -> Dict:
+        """Вылеты каждой SRU по времени"""
+        result = {}
+        for sortie in self.sorties:
+            result.setdefault(sortie.sru_id, []).append(sortie)
+        return result
+
+
+@dataclass
+class _Unit:
+    """Параметры SRU для планирования (часы от начала плана)"""
+    sru_id: object
+    search_speed: float
+    sweep_width: float
+    endurance: float
+    on_scene: float
+    turnaround: float
+    crew_duty: float
+    daylight_only: bool
+    available_from: float
+    blocks: List[Tuple[float, float]] = field(default_factory=list)   # Недоступность [от, до)
+
+
+class SortieScheduler:
+    """Планировщик вылетов со скользящим горизонтом"""
+
+    def __init__(self,
+                 srus: Sequence[Dict],
+                 sub_areas: Sequence[Dict],
+                 start: datetime,
+                 horizon_hours: float = 48.0,
+                 poc: Optional[Sequence[float]] = None,
+                 routes=None,
+                 sun_elevation_deg: float = SUNRISE_ELEVATION_DEG):
+        """
+        Args:
+            srus: SRU: 'id', 'type' (ключ SEARCH_ENDURANCE) и/или 'search_speed',
+                'transit_speed', 'endurance', 'on_scene', 'sweep_width', база
+                'base' (lat, lon), 'turnaround', 'crew_duty_hours' (за 24 ч),
+                'daylight_only' (по умолчанию True - визуальный поиск),
+                'available_from' (часы от start или datetime)
+            sub_areas: Подрайоны: 'id', 'center', 'area_nm2', 'poc'
+            start: Начало плана (без часового пояса - UTC)
+            horizon_hours: Горизонт планирования, часы
+            poc: POC подрайонов (вместо ключей 'poc')
+            routes: Граф маршрутов в обход суши (sea_routing.RouteGraph)
+            sun_elevation_deg: Высота Солнца начала светлого времени
+        """
+        if horizon_hours <= 0:
+            raise ValueError("Горизонт планирования должен быть положительным")
+        self.start = start
+        self.horizon = float(horizon_hours)
+        self.sub_areas = list(sub_areas)
+        self.sub_ids = [sub.get('id', index) for index, sub in enumerate(self.sub_areas)]
+        self.units = [self._unit(sru, index) for index, sru in enumerate(srus)]
+        self._unit_index = {unit.sru_id: index for index, unit in enumerate(self.units)}
+
+        profiles = [dict(sru, endurance=unit.endurance, search_speed=unit.search_speed,
+                         sweep_width=unit.sweep_width) for sru, unit in zip(srus, self.units)]
+        costs = assignment_costs(profiles, self.sub_areas, poc, routes=routes)
+        self.transit = costs.transit_hours                      # [SRU, подрайон], в один конец
+        self.area = np.array([float(sub.get('area_nm2', 0.0)) for sub in self.sub_areas])
+        if poc is None:
+            poc = [sub.get('poc', 0.0) for sub in self.sub_areas]
+        self.poc = np.asarray(poc, dtype=np.float64)
+
+        # Светлое время по центрам подрайонов: первый светлый и первый темный отсчет с k
+        centers = np.array([sub_area_center(sub) for sub in self.sub_areas]).reshape(-1, 2)
+        missing = ~np.isfinite(centers).all(axis=1)
+        if missing.any():
+            centers[missing] = np.nanmean(centers, axis=0) if (~missing).any() else 0.0
+        steps = int(math.ceil(self.horizon / DAYLIGHT_STEP_HOURS)) + 1
+        hours = np.arange(steps) * DAYLIGHT_STEP_HOURS
+        light = solar_elevation_deg(centers[:, :1], centers[:, 1:], _posix(start) + hours * 3600) \
+            > sun_elevation_deg
+        index = np.arange(steps)
+        self._next_light = _next_index(np.where(light, index, steps))
+        self._next_dark = _next_index(np.where(light, steps, index))
+        self._steps = steps
+        self.plan_result: Optional[SortiePlan] = None
+
+    # --- Планирование ---
+
+    def plan(self) -> SortiePlan:
+        """План на весь горизонт от начала"""
+        self.plan_result = self._build([], 0.0)
+        return self.plan_result
+
+    def replan(self,
+               now,
+               unavailable: Optional[Dict] = None) -> SortiePlan:
+        """
+        Перепланирование с момента now
+
+        Args:
+            now: Момент перепланирования (datetime или часы от начала плана)
+            unavailable: {id SRU: (от, до)} - недоступность (до = None - до
+                конца горизонта); начатый вылет такой SRU обрывается
+
+        Returns:
+            Новый план: вылеты, начатые до now, и заново построенный остаток
+        """
+        now = self._hours(now)
+        for sru_id, (begin, end) in (unavailable or {}).items():
+            unit = self.units[self._unit_index[sru_id]]
+            begin = self._hours(begin)
+            end = self.horizon if end is None else self._hours(end)
+            unit.blocks.append((begin, end))
+        previous = self.plan_result.sorties if self.plan_result is not None else []
+        kept = []
+        for sortie in previous:
+            depart = self._hours(sortie.depart)
+            if depart >= now:
+                continue
+            kept.append(self._truncate(sortie))
+        self.plan_result = self._build([sortie for sortie in kept if sortie is not None], now)
+        return self.plan_result
+
+    def _build(self, kept: List[ScheduledSortie], now: float) -> SortiePlan:
+        """Жадное построение плана после выполненных вылетов kept"""
+        effort = np.zeros(len(self.sub_areas))
+        free = np.array([max(unit.available_from, now) for unit in self.units])
+        history: List[List[Tuple[float, float]]] = [[] for _ in self.units]   # (вылет, возвращение)
+        sub_index = {sub_id: index for index, sub_id in enumerate(self.sub_ids)}
+        for sortie in kept:
+            number = self._unit_index[sortie.sru_id]
+            effort[sub_index[sortie.sub_area_id]] += sortie.effort_nm2
+            back = self._hours(sortie.return_time)
+            history[number].append((self._hours(sortie.depart), back))
+            free[number] = max(free[number], back + self.units[number].turnaround)
+
+        safe_area = np.where(self.area > 0, self.area, 1.0)
+        remaining = np.where(self.area > 0, self.poc * np.exp(-effort / safe_area), 0.0)
+        sorties = list(kept)
+        heap = [(free[number], number) for number in range(len(self.units))]
+        heapq.heapify(heap)
+        while heap:
+            time, number = heapq.heappop(heap)
+            if time >= self.horizon:
+                continue
+            unit = self.units[number]
+            choice = self._best_sortie(number, time, remaining, history[number])
+            if choice is None:
+                heapq.heappush(heap, (time + IDLE_STEP_HOURS, number))
+                continue
+            sub, depart, search_start, search_hours = choice
+            back = search_start + search_hours + self.transit[number, sub]
+            swept = unit.sweep_width * unit.search_speed * search_hours
+            gain = float(remaining[sub] * -math.expm1(-swept / safe_area[sub]))
+            remaining[sub] -= gain
+            history[number].append((depart, back))
+            sorties.append(ScheduledSortie(unit.sru_id, self.sub_ids[sub], self._time(depart),
+                                           self._time(search_start), self._time(search_start + search_hours),
+                                           self._time(back), swept, gain))
+            heapq.heappush(heap, (back + unit.turnaround, number))
+
+        sorties.sort(key=lambda sortie: (sortie.depart, str(sortie.sru_id)))
+        pos = float(np.sum(self.poc - remaining))
+        return SortiePlan(self.start, self.horizon, sorties, pos, remaining)
+
+    def _best_sortie(self, number: int, free: float, remaining: np.ndarray,
+                     history: List[Tuple[float, float]]) -> Optional[Tuple[int, float, float, float]]:
+        """Лучший вылет SRU, свободной с момента free: (подрайон, вылет, начало поиска, часы поиска)"""
+        unit = self.units[number]
+        reachable = np.isfinite(self.transit[number])
+        transit = np.where(reachable, self.transit[number], self.horizon)
+        arrival = free + transit
+        if unit.daylight_only:
+            rows = np.arange(len(transit))
+            step = np.clip(np.ceil(arrival / DAYLIGHT_STEP_HOURS - 1e-9).astype(np.int64), 0, self._steps - 1)
+            first = self._next_light[rows, step]
+            light = first < self._steps
+            first = np.minimum(first, self._steps - 1)
+            # Без светлого времени до конца горизонта поиск нулевой длины
+            search_start = np.where(light, np.maximum(first * DAYLIGHT_STEP_HOURS, arrival), self.horizon)
+            window_end = np.where(light, (self._next_dark[rows, first] - 1) * DAYLIGHT_STEP_HOURS, self.horizon)
+        else:
+            search_start = arrival
+            window_end = np.full(len(transit), self.horizon)
+        depart = search_start - transit
+        hours = np.minimum.reduce([np.full(len(transit), unit.on_scene), unit.endurance - 2 * transit,
+                                   window_end - search_start, self.horizon - search_start])
+
+        # Экипаж: работа за 24 часа до возвращения не больше crew_duty
+        if math.isfinite(unit.crew_duty):
+            used = np.zeros(len(transit))
+            for begin, end in history:
+                used += np.clip(np.minimum(end, depart) - np.maximum(begin, depart - 24.0), 0.0, None)
+            hours = np.minimum(hours, unit.crew_duty - used - 2 * transit)
+
+        # Недоступность: вылет до окна - вернуться к его началу, внутри окна - нельзя
+        for begin, end in unit.blocks:
+            overlap = (depart < end) & (search_start + hours + transit > begin)
+            hours = np.where(overlap & (depart < begin), np.minimum(hours, begin - transit - search_start), hours)
+            hours = np.where(overlap & (depart >= begin), 0.0, hours)
+
+        valid = (hours >= MIN_SEARCH_HOURS) & reachable
+        if not valid.any():
+            return None
+        hours = np.where(valid, hours, 0.0)
+        safe_area = np.where(self.area > 0, self.area, 1.0)
+        gain = remaining * -np.expm1(-unit.sweep_width * unit.search_speed * hours / safe_area)
+        busy = np.where(valid, search_start + hours + transit - free, 1.0)
+        rate = np.where(valid, gain / np.maximum(busy, 1e-9), -np.inf)
+        best = int(np.argmax(rate))
+        if gain[best] <= 0:
+            return None
+        return best, float(depart[best]), float(search_start[best]), float(hours[best])
+
+    def _truncate(self, sortie: ScheduledSortie) -> Optional[ScheduledSortie]:
+        """Выполненная часть вылета SRU с учетом ее недоступности"""
+        unit = self.units[self._unit_index[sortie.sru_id]]
+        depart = self._hours(sortie.depart)
+        start, end = self._hours(sortie.search_start), self._hours(sortie.search_end)
+        cut = min((begin for begin, end in unit.blocks if begin < self._hours(sortie.return_time)
+                   and end > depart), default=None)
+        if cut is None:
+            return sortie
+        if cut <= depart:
+            return None
+        searched = min(max(cut - start, 0.0), end - start)
+        share = searched / (end - start) if end > start else 0.0
+        return ScheduledSortie(sortie.sru_id, sortie.sub_area_id, sortie.depart, sortie.search_start,
+                               self._time(start + searched), self._time(cut),
+                               sortie.effort_nm2 * share, sortie.pos * share)
+
+    # --- Вспомогательные ---
+
+    def _unit(self, sru: Dict, index: int) -> _Unit:
+        """Параметры SRU: явные ключи, иначе по типу из SEARCH_ENDURANCE"""
+        from ..iamsar_constants import SEARCH_ENDURANCE
+
+        kind = str(sru.get('type', ''))
+        cruise, endurance, on_scene = SEARCH_ENDURANCE.get(kind, (DEFAULT_SEARCH_SPEED_KN, math.inf, math.inf))
+        aircraft = kind.startswith(AIRCRAFT_TYPES)
+        endurance = float(sru.get('endurance', endurance))
+        available = sru.get('available_from', 0.0)
+        return _Unit(
+            sru_id=sru.get('id', index),
+            search_speed=float(sru.get('search_speed', cruise)),
+            sweep_width=float(sru.get('sweep_width', DEFAULT_SWEEP_WIDTH_NM)),
+            endurance=endurance,
+            on_scene=float(sru.get('on_scene', on_scene)),
+            turnaround=float(sru.get('turnaround', TURNAROUND_HOURS)),
+            crew_duty=float(sru.get('crew_duty_hours', AIRCRAFT_CREW_DUTY_HOURS if aircraft else math.inf)),
+            daylight_only=bool(sru.get('daylight_only', True)),
+            available_from=self._hours(available),
+        )
+
+    def _hours(self, moment) -> float:
+        """Часы от начала плана (datetime или число часов)"""
+        if isinstance(moment, datetime):
+            return (_posix(moment) - _posix(self.start)) / 3600
+        return float(moment)
+
+    def _time(self, hours: float) -> datetime:
+        return self.start + timedelta(hours=float(hours))
+
+
+def solar_elevation_deg(lat, lon, posix_seconds) -> np.ndarray:
+    """
+    Высота центра Солнца над горизонтом без рефракции, градусы
+
+    Args:
+        lat, lon: Координаты (массивы с трансляцией)
+        posix_seconds: Время UTC, секунды POSIX
+    """
+    days = np.asarray(posix_seconds, dtype=np.float64) / 86400.0 + 2440587.5 - 2451545.0
+    anomaly = np.radians(357.529 + 0.98560028 * days)
+    mean_longitude = 280.459 + 0.98564736 * days
+    ecliptic = np.radians(mean_longitude + 1.915 * np.sin(anomaly) + 0.020 * np.sin(2 * anomaly))
+    obliquity = np.radians(23.439 - 0.00000036 * days)
+    right_ascension = np.arctan2(np.cos(obliquity) * np.sin(ecliptic), np.cos(ecliptic))
+    declination = np.arcsin(np.sin(obliquity) * np.sin(ecliptic))
+    sidereal = np.radians((280.46061837 + 360.98564736629 * days) % 360.0)
+    hour_angle = sidereal + np.radians(lon) - right_ascension
+    phi = np.radians(lat)
+    return np.degrees(np.arcsin(np.sin(phi) * np.sin(declination)
+                                + np.cos(phi) * np.cos(declination) * np.cos(hour_angle)))
+
+
+def _next_index(index: np.ndarray) -> np.ndarray:
+    """Для каждого столбца - наименьшее значение в нем и правее (по строкам)"""
+    return np.minimum.accumulate(index[:, ::-1], axis=1)[:, ::-1]
+
+
+def _posix(moment: datetime) -> float:
+    """Секунды POSIX; время без часового пояса считается UTC"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
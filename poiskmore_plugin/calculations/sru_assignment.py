@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Назначение SRU на подрайоны по матрице стоимости
+Для каждой пары SRU - подрайон оценивается: время перехода с базы по
+ортодромии (туда и обратно), остаток автономности на поиск, усилие
+W * V * T (SRU с шириной обзора меньше требуемой для подрайона не
+допускается) и прирост POS = POC * (1 - exp(-усилие / площадь)).
+Стоимость - минус прирост POS плюс штраф за время перехода. Задача
+решается точно алгоритмом кратчайших увеличивающих путей (венгерский
+метод в форме Джонкера-Волгенанта): вместимость SRU (несколько
+подрайонов) и подрайона (несколько SRU с убывающим приростом) задается
+повторением строк и столбцов, обязательные пары - большой премией,
+запрещенные - недопустимой стоимостью.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .effort_allocation import (
+    DEFAULT_ENDURANCE_HOURS,
+    DEFAULT_SEARCH_SPEED_KN,
+    DEFAULT_SWEEP_WIDTH_NM,
+)
+from .geodesy import distance_nm
+
+
+# Стоимость недопустимой пары и премия обязательной (POS не больше 1)
+FORBIDDEN_COST = 1e9
+REQUIRED_BONUS = 1e6
+
+
+@dataclass
+class AssignmentCosts:
+    """Составляющие матрицы стоимости [SRU, подрайон]"""
+    transit_hours: np.ndarray   # Переход с базы в один конец, часы
+    search_hours: np.ndarray    # Остаток автономности на поиск, часы
+    effort_nm2: np.ndarray      # Усилие в подрайоне, кв. мили
+    gain: np.ndarray            # Прирост POS
+    feasible: np.ndarray        # Пара допустима
+    cost: np.ndarray            # Итоговая стоимость (меньше - лучше)
+
+
+@dataclass
+class SruAssignment:
+    """Решение задачи назначения"""
+    pairs: List[Tuple[int, int]]        # (номер SRU, номер подрайона)
+    costs: AssignmentCosts
+    pos: float = 0.0                    # Суммарный прирост POS
+    sru_ids: List = field(default_factory=list)
+    sub_area_ids: List = field(default_factory=list)
+
+    def by_sru(self) -> Dict:
+        """Подрайоны каждой SRU: {id SRU: [id подрайонов]}"""
+        result = {sru_id: [] for sru_id in self.sru_ids}
+        for sru, sub in self.pairs:
+            result[self.sru_ids[sru]].append(self.sub_area_ids[sub])
+        return result
+
+    def by_sub_area(self) -> Dict:
+        """SRU каждого подрайона: {id подрайона: [id SRU]}"""
+        result = {sub_id: [] for sub_id in self.sub_area_ids}
+        for sru, sub in self.pairs:
+            result[self.sub_area_ids[sub]].append(self.sru_ids[sru])
+        return result
+
+
+def assignment_costs(srus: Sequence[Dict],
+                     sub_areas: Sequence[Dict],
+                     poc: Optional[Sequence[float]] = None,
+                     capacity: Optional[Sequence[int]] = None,
+                     transit_weight: float = 0.0,
+                     routes=None) -> AssignmentCosts:
+    """
+    Матрица стоимости назначения
+
+    Args:
+        srus: SRU: 'sweep_width', 'search_speed', 'endurance' (или
+            'remaining_endurance'), 'transit_speed', база 'base' (lat, lon)
+            или 'lat'/'lon' (без базы переход не учитывается)
+        sub_areas: Подрайоны: 'center' (или 'bounds' / 'track'), 'area_nm2',
+            'poc', необязательно 'min_sweep_width'
+        poc: POC подрайонов (вместо ключей 'poc'; по умолчанию - по площади)
+        capacity: Число подрайонов каждой SRU - ее время поиска делится поровну
+        transit_weight: Штраф за час перехода в единицах POS
+        routes: Граф маршрутов в обход суши (sea_routing.RouteGraph); без
+            него переход - по ортодромии
+
+    Returns:
+        Составляющие и итоговая матрица [SRU, подрайон]
+    """
+    n_sru, n_sub = len(srus), len(sub_areas)
+    area = np.array([float(sub.get('area_nm2', 0.0)) for sub in sub_areas])
+    if poc is None:
+        if n_sub and all('poc' in sub for sub in sub_areas):
+            poc = [sub['poc'] for sub in sub_areas]
+        else:
+            poc = area / area.sum() if area.sum() > 0 else np.zeros(n_sub)
+    poc = np.asarray(poc, dtype=np.float64)
+    if capacity is None:
+        capacity = [sru.get('capacity', 1) for sru in srus]
+    capacity = np.maximum(np.asarray(capacity, dtype=np.float64), 1.0)
+
+    width = np.array([float(sru.get('sweep_width', DEFAULT_SWEEP_WIDTH_NM)) for sru in srus])
+    speed = np.array([float(sru.get('search_speed', DEFAULT_SEARCH_SPEED_KN)) for sru in srus])
+    endurance = np.array([float(sru.get('remaining_endurance', sru.get('endurance', DEFAULT_ENDURANCE_HOURS)))
+                          for sru in srus])
+    transit_speed = np.array([float(sru.get('transit_speed', sru.get('search_speed', DEFAULT_SEARCH_SPEED_KN)))
+                              for sru in srus])
+
+    # Переход с базы: туда и обратно по ортодромии
+    transit = np.zeros((n_sru, n_sub))
+    base = [_sru_base(sru) for sru in srus]
+    located = np.array([point is not None for point in base], dtype=bool)
+    if located.any() and n_sub:
+        base_lat, base_lon = np.array([point for point in base if point is not None]).T
+        centers = np.array([sub_area_center(sub) for sub in sub_areas])
+        if routes is not None:
+            miles = routes.distance_matrix(np.column_stack([base_lat, base_lon]), centers)
+        else:
+            miles = distance_nm(base_lat[:, None], base_lon[:, None], centers[None, :, 0], centers[None, :, 1])
+        # Подрайон без координат - без перехода, недостижимый - недопустим
+        transit[located] = np.nan_to_num(miles, nan=0.0, posinf=np.inf) / np.maximum(transit_speed[located, None], 1e-9)
+    search_hours = (endurance[:, None] - 2 * transit) / capacity[:, None]
+
+    effort = width[:, None] * speed[:, None] * np.maximum(search_hours, 0.0)
+    safe_area = np.where(area > 0, area, 1.0)
+    gain = np.where(area > 0, poc * -np.expm1(-effort / safe_area), 0.0)
+
+    required = np.array([float(sub.get('min_sweep_width', 0.0)) for sub in sub_areas])
+    feasible = (search_hours > 0) & (width[:, None] >= required[None, :])
+    cost = np.where(feasible, -gain + transit_weight * np.where(feasible, transit, 0.0), FORBIDDEN_COST)
+    return AssignmentCosts(transit, search_hours, effort, gain, feasible, cost)
+
+
+def assign_srus(srus: Sequence[Dict],
+                sub_areas: Sequence[Dict],
+                poc: Optional[Sequence[float]] = None,
+                capacity: Optional[Sequence[int]] = None,
+                sub_area_capacity: int = 1,
+                must: Sequence[Tuple] = (),
+                forbid: Sequence[Tuple] = (),
+                transit_weight: float = 0.0,
+                routes=None) -> SruAssignment:
+    """
+    Оптимальное назначение SRU на подрайоны
+
+    Args:
+        srus, sub_areas, poc, transit_weight, routes: См. assignment_costs
+        capacity: Сколько подрайонов может взять каждая SRU (по умолчанию
+            sru['capacity'] или 1)
+        sub_area_capacity: Сколько SRU может работать в одном подрайоне;
+            k-я SRU в подрайоне получает прирост POS с учетом предыдущих
+        must: Обязательные пары (id SRU, id подрайона)
+        forbid: Запрещенные пары (id SRU, id подрайона)
+
+    Returns:
+        Назначение с наибольшим суммарным приростом POS
+    """
+    if capacity is None:
+        capacity = [int(sru.get('capacity', 1)) for sru in srus]
+    capacity = [max(int(c), 1) for c in capacity]
+    costs = assignment_costs(srus, sub_areas, poc, capacity, transit_weight, routes)
+    sru_ids = [sru.get('id', index) for index, sru in enumerate(srus)]
+    sub_ids = [sub.get('id', index) for index, sub in enumerate(sub_areas)]
+
+    allowed = costs.feasible.copy()
+    sru_index = {sru_id: index for index, sru_id in enumerate(sru_ids)}
+    sub_index = {sub_id: index for index, sub_id in enumerate(sub_ids)}
+    for sru_id, sub_id in forbid:
+        allowed[sru_index[sru_id], sub_index[sub_id]] = False
+    required = np.zeros(allowed.shape, dtype=bool)
+    for sru_id, sub_id in must:
+        required[sru_index[sru_id], sub_index[sub_id]] = True
+    if (required & ~allowed).any():
+        raise ValueError("Обязательная пара недопустима")
+    if (required.sum(axis=1) > np.asarray(capacity)).any():
+        raise ValueError("Обязательных подрайонов у SRU больше ее вместимости")
+    if (required.sum(axis=0) > sub_area_capacity).any():
+        raise ValueError("Обязательных SRU в подрайоне больше его вместимости")
+
+    # Повтор строк (вместимость SRU) и столбцов (вместимость подрайона);
+    # k-я SRU в подрайоне получает прирост, как после k таких же SRU: * exp(-k * z / a)
+    rows = np.repeat(np.arange(len(srus)), capacity)
+    slots = max(int(sub_area_capacity), 1)
+    columns = np.tile(np.arange(len(sub_areas)), slots)
+    slot = np.repeat(np.arange(slots), len(sub_areas))
+    area = np.array([float(sub.get('area_nm2', 0.0)) for sub in sub_areas])
+    safe_area = np.where(area > 0, area, 1.0)[columns]
+    gain = costs.gain[rows][:, columns] * np.exp(-slot * costs.effort_nm2[rows][:, columns] / safe_area)
+    cost = np.where(allowed[rows][:, columns],
+                    -gain + transit_weight * np.where(allowed, costs.transit_hours, 0.0)[rows][:, columns],
+                    FORBIDDEN_COST)
+    cost -= REQUIRED_BONUS * (required[rows][:, columns] & (slot == 0))
+
+    row_index, column_index = linear_sum_assignment(cost)
+    chosen = cost[row_index, column_index] < FORBIDDEN_COST
+    row_index, column_index = row_index[chosen], column_index[chosen]
+    pairs = sorted(zip(rows[row_index].tolist(), columns[column_index].tolist()))
+    return SruAssignment(pairs, costs, float(gain[row_index, column_index].sum()), sru_ids, sub_ids)
+
+
+def linear_sum_assignment(cost) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Задача о назначениях минимальной стоимости (прямоугольная матрица)
+
+    Кратчайшие увеличивающие пути с потенциалами: для каждой строки
+    Дейкстра по столбцам, каждый шаг - одна векторная операция по
+    всем столбцам.
+
+    Returns:
+        (строки, столбцы) назначенных пар, строки по возрастанию
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n_rows, n_cols = cost.shape
+    if not np.isfinite(cost).all():
+        raise ValueError("Матрица стоимости должна быть конечной")
+
+    u = np.zeros(n_rows)
+    v = np.zeros(n_cols)
+    col4row = np.full(n_rows, -1, dtype=np.int64)
+    row4col = np.full(n_cols, -1, dtype=np.int64)
+    for current in range(n_rows):
+        shortest = np.full(n_cols, np.inf)
+        path = np.full(n_cols, -1, dtype=np.int64)
+        visited_rows = np.zeros(n_rows, dtype=bool)
+        visited_cols = np.zeros(n_cols, dtype=bool)
+        min_value = 0.0
+        row = current
+        sink = -1
+        while sink < 0:
+            visited_rows[row] = True
+            reduced = min_value + cost[row] - u[row] - v
+            better = ~visited_cols & (reduced < shortest)
+            path[better] = row
+            shortest[better] = reduced[better]
+            candidates = np.where(visited_cols, np.inf, shortest)
+            column = int(np.argmin(candidates))
+            min_value = candidates[column]
+            # При равенстве предпочитается свободный столбец - путь короче
+            free = (candidates == min_value) & (row4col < 0)
+            if free.any():
+                column = int(np.argmax(free))
+            visited_cols[column] = True
+            if row4col[column] < 0:
+                sink = column
+            else:
+                row = int(row4col[column])
+
+        u[current] += min_value
+        others = visited_rows.copy()
+        others[current] = False
+        u[others] += min_value - shortest[col4row[others]]
+        v[visited_cols] -= min_value - shortest[visited_cols]
+
+        column = sink
+        while True:
+            row = int(path[column])
+            row4col[column] = row
+            col4row[row], column = column, int(col4row[row])
+            if row == current:
+                break
+
+    rows = np.arange(n_rows)
+    if transposed:
+        order = np.argsort(col4row)
+        return col4row[order], rows[order]
+    return rows, col4row
+
+
+def sub_area_center(sub_area: Dict) -> Tuple[float, float]:
+    """
+    Центр подрайона (lat, lon)
+
+    Берется 'center', иначе середина вершин 'bounds' или 'track';
+    (nan, nan), если подрайон без геометрии.
+    """
+    if sub_area.get('center') is not None:
+        return float(sub_area['center'][0]), float(sub_area['center'][1])
+    for key in ('bounds', 'track'):
+        if sub_area.get(key):
+            points = np.asarray(sub_area[key], dtype=np.float64)
+            return float(points[:, 0].mean()), float(points[:, 1].mean())
+    return math.nan, math.nan
+
+
+def _sru_base(sru: Dict) -> Optional[Tuple[float, float]]:
+    """База (текущее положение) SRU или None"""
+    if sru.get('base') is not None:
+        return float(sru['base'][0]), float(sru['base'][1])
+    if sru.get('lat') is not None and sru.get('lon') is not None:
+        return float(sru['lat']), float(sru['lon'])
+    return None
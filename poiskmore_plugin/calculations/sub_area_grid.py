@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+Сетка подрайонов, обрезанная по району поиска
+Район переводится в локальную плоскую систему (ENU вокруг центра),
+повернутую так, что строки сетки идут вдоль направления дрейфа. Площадь
+пересечения каждой ячейки с районом (с учетом дыр) считается точно по
+формуле Грина: вклад дают куски ребер района внутри ячейки и часть
+правой стороны ячейки внутри района; последняя берется из накопленных
+сумм пересечений по линиям сетки. Все ячейки обрабатываются одновременно,
+без проверки "точка в полигоне" для каждой ячейки. Плоская площадь
+переводится в площадь на эллипсоиде по точной площади полной ячейки.
+Суша (LandMask) вычитается по подвыборке точек внутри ячейки.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from .geodesy import ring_area_nm2, surface_from_enu, to_enu
+from .ring_utils import shoelace
+
+
+Ring = Sequence[Tuple[float, float]]   # [(lat, lon), ...], как границы SearchArea
+
+# Выступ района за сетку (доля ячейки), который присоединяется к крайним
+# ячейкам, а не образует отдельный ряд узких ячеек. Ребра границ прямые
+# в lat/lon, поэтому стороны прямоугольника района слегка выгнуты в плоскости
+OVERHANG = 0.05
+
+
+@dataclass
+class SubAreaGrid:
+    """Непустые ячейки сетки подрайонов, повернутой вдоль дрейфа"""
+    origin: Tuple[float, float]     # Центр локальной системы (lat, lon)
+    orientation_deg: float          # Направление строк сетки (азимут дрейфа)
+    cell_length_nm: float           # Размер ячейки вдоль orientation_deg
+    cell_width_nm: float            # Размер ячейки поперек
+    x0: float                       # Угол сетки в локальной системе, мили
+    y0: float
+    row: np.ndarray                 # Номер ячейки вдоль дрейфа
+    col: np.ndarray                 # Номер ячейки поперек дрейфа (слева направо)
+    area_nm2: np.ndarray            # Площадь части ячейки внутри района (без суши)
+    cell_area_nm2: np.ndarray       # Площадь полной ячейки
+    land_fraction: np.ndarray       # Доля суши в части ячейки внутри района
+    center_lat: np.ndarray          # Центр тяжести части ячейки внутри района
+    center_lon: np.ndarray
+    ellipsoid: bool = False         # Модель Земли локальной системы
+    shape: Tuple[int, int] = (0, 0)  # Строк и столбцов во всей сетке
+    rings: List[Tuple[np.ndarray, np.ndarray]] = field(default_factory=list)  # Кольца района в плоскости
+
+    @classmethod
+    def from_polygon(cls,
+                     polygon: Ring,
+                     cell_nm: Union[float, Tuple[float, float]],
+                     orientation_deg: float = 0.0,
+                     holes: Sequence[Ring] = (),
+                     land_mask=None,
+                     land_samples: int = 4,
+                     min_coverage: float = 1e-3,
+                     ellipsoid: bool = False) -> 'SubAreaGrid':
+        """
+        Построить сетку подрайонов района поиска
+
+        Args:
+            polygon: Внешняя граница района [(lat, lon), ...]
+            cell_nm: Размер ячейки, мили; пара - (вдоль дрейфа, поперек)
+            orientation_deg: Азимут дрейфа - направление строк сетки
+            holes: Исключаемые области внутри района
+            land_mask: Маска суши (LandMask) или None
+            land_samples: Подвыборка для суши - land_samples x land_samples точек на ячейку
+            min_coverage: Ячейки, покрытые районом меньше чем на эту долю, отбрасываются
+            ellipsoid: Модель Земли локальной системы - та же, в которой построены
+                границы (SearchAreaCalculator строит их на сфере); площади
+                ячеек всегда считаются на эллипсоиде
+
+        Returns:
+            Сетка подрайонов
+        """
+        length, width = (cell_nm, cell_nm) if np.isscalar(cell_nm) else cell_nm
+        length, width = float(length), float(width)
+        if length <= 0 or width <= 0:
+            raise ValueError("Размер ячейки должен быть положительным")
+
+        rings = [np.asarray(ring, dtype=np.float64) for ring in [polygon, *holes]]
+        rings = [ring[:-1] if len(ring) > 1 and np.array_equal(ring[0], ring[-1]) else ring
+                 for ring in rings]
+        if len(rings[0]) < 3:
+            raise ValueError("Район поиска должен содержать не менее трех точек")
+        origin = (float(rings[0][:, 0].mean()), float(rings[0][:, 1].mean()))
+        theta = math.radians(orientation_deg)
+        sin_t, cos_t = math.sin(theta), math.cos(theta)
+
+        def to_plane(lat, lon):
+            east, north, _ = to_enu(lat, lon, origin[0], origin[1], ellipsoid)
+            return east * cos_t - north * sin_t, east * sin_t + north * cos_t
+
+        def to_geo(x, y):
+            east, north = x * cos_t + y * sin_t, -x * sin_t + y * cos_t
+            return surface_from_enu(east, north, origin[0], origin[1], ellipsoid)
+
+        # Ребра колец в плоскости: внешнее - против часовой стрелки, дыры - по ней
+        step = min(length, width) / 4
+        ex0, ey0, ex1, ey1 = [], [], [], []
+        plane_rings = []
+        for index, ring in enumerate(rings):
+            x, y = to_plane(*_densify(ring, step))
+            if index == 0:
+                outer = len(x)
+            if (shoelace(x, y) > 0) != (index == 0):
+                x, y = x[::-1], y[::-1]
+            plane_rings.append((x, y))
+            ex0.append(x)
+            ey0.append(y)
+            ex1.append(np.roll(x, -1))
+            ey1.append(np.roll(y, -1))
+        ex0, ey0, ex1, ey1 = (np.concatenate(a) for a in (ex0, ey0, ex1, ey1))
+
+        # Сетка от левого заднего угла габарита внешней границы
+        x0, y0 = float(ex0[:outer].min()), float(ey0[:outer].min())
+        cols = max(int(math.ceil(np.ptp(ex0[:outer]) / width - OVERHANG)), 1)
+        rows = max(int(math.ceil(np.ptp(ey0[:outer]) / length - OVERHANG)), 1)
+        xs = x0 + width * np.arange(cols + 1)
+        ys = y0 + length * np.arange(rows + 1)
+
+        # Формула Грина для формы (x - x_L) dy и моментов: куски ребер внутри ячеек...
+        # (крайние ячейки неограничены наружу - в них попадает выступ района)
+        px0, py0, px1, py1 = _split_edges(ex0, ey0, ex1, ey1, xs, ys)
+        col = np.clip(np.searchsorted(xs, (px0 + px1) / 2, side='left') - 1, 0, cols - 1)
+        row = np.clip(np.searchsorted(ys, (py0 + py1) / 2, side='right') - 1, 0, rows - 1)
+        cell = row * cols + col
+        a0, a1 = px0 - xs[col], px1 - xs[col]
+        b0, b1 = py0 - ys[row], py1 - ys[row]
+        dy = py1 - py0
+        n_cells = rows * cols
+        area = np.bincount(cell, (a0 + a1) / 2 * dy, n_cells)
+        moment_x = np.bincount(cell, (a0 * a0 + a0 * a1 + a1 * a1) / 6 * dy, n_cells)
+        moment_y = np.bincount(cell, (2 * a0 * b0 + a0 * b1 + a1 * b0 + 2 * a1 * b1) / 6 * dy, n_cells)
+
+        # ...и часть правой стороны ячейки внутри района
+        bands = np.concatenate([[-np.inf], ys[1:-1], [np.inf]])
+        _, inside_length, inside_moment = _line_integrals(ex0, ey0, ex1, ey1, xs[1:], bands)
+        inside_length[-1] = inside_moment[-1] = 0.0   # У последнего столбца нет правой стороны
+        right = np.diff(inside_length, axis=1).T
+        right_moment = np.diff(inside_moment, axis=1).T - ys[:-1, None] * right
+        area = area.reshape(rows, cols) + width * right
+        moment_x = moment_x.reshape(rows, cols) + width ** 2 / 2 * right
+        moment_y = moment_y.reshape(rows, cols) + width * right_moment
+
+        # Переход к площади на эллипсоиде по полным ячейкам
+        corner_x, corner_y = np.meshgrid(xs, ys)
+        corner_lat, corner_lon = to_geo(corner_x, corner_y)
+        cell_area = ring_area_nm2(_cell_corners(corner_lat), _cell_corners(corner_lon))
+        scale = cell_area / (width * length)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            center_x = np.where(area > 0, xs[:-1] + moment_x / area, xs[:-1] + width / 2)
+            center_y = np.where(area > 0, ys[:-1, None] + moment_y / area, ys[:-1, None] + length / 2)
+        area = np.maximum(area, 0.0) * scale
+
+        land_fraction = np.zeros((rows, cols))
+        if land_mask is not None:
+            land_fraction, water_x, water_y = _land_fraction(
+                ex0, ey0, ex1, ey1, xs, ys, land_samples, land_mask, to_geo)
+            # Узкая полоса района могла не попасть ни в одну точку - по ее центру
+            missed = np.isnan(land_fraction)
+            if missed.any():
+                land_fraction[missed] = land_mask.is_land(*to_geo(center_x[missed], center_y[missed]))
+            area *= 1 - land_fraction
+            partial = (land_fraction > 0) & np.isfinite(water_x)
+            center_x = np.where(partial, water_x, center_x)
+            center_y = np.where(partial, water_y, center_y)
+
+        keep = area > min_coverage * cell_area
+        rows_kept, cols_kept = np.nonzero(keep)
+        center_lat, center_lon = to_geo(center_x[keep], center_y[keep])
+        return cls(origin=origin, orientation_deg=float(orientation_deg), ellipsoid=ellipsoid,
+                   cell_length_nm=length, cell_width_nm=width, x0=float(x0), y0=float(y0),
+                   row=rows_kept, col=cols_kept, area_nm2=area[keep],
+                   cell_area_nm2=cell_area[keep], land_fraction=land_fraction[keep],
+                   center_lat=np.asarray(center_lat), center_lon=np.asarray(center_lon),
+                   shape=(rows, cols), rings=plane_rings)
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    @property
+    def coverage(self) -> np.ndarray:
+        """Доля ячейки, занятая районом поиска (без суши); у крайних ячеек - до 1 + OVERHANG"""
+        return self.area_nm2 / self.cell_area_nm2
+
+    @property
+    def total_area_nm2(self) -> float:
+        return float(self.area_nm2.sum())
+
+    def corners(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Углы полных ячеек: lat, lon [ячейка, 4]
+
+        Порядок углов - как в прежней сетке: (начало, левый край),
+        (конец, левый край), (конец, правый край), (начало, правый край)
+        """
+        x = self.x0 + self.cell_width_nm * (self.col[:, None] + np.array([0, 0, 1, 1]))
+        y = self.y0 + self.cell_length_nm * (self.row[:, None] + np.array([0, 1, 1, 0]))
+        return self._to_geo(x, y)
+
+    def _to_geo(self, x, y) -> Tuple[np.ndarray, np.ndarray]:
+        """Точки локальной системы сетки (мили) -> lat, lon"""
+        theta = math.radians(self.orientation_deg)
+        east = x * math.cos(theta) + y * math.sin(theta)
+        north = -x * math.sin(theta) + y * math.cos(theta)
+        return surface_from_enu(east, north, self.origin[0], self.origin[1], self.ellipsoid)
+
+    def clipped_rings(self, k: int) -> List[List[Tuple[float, float]]]:
+        """
+        Часть района внутри ячейки k: внешнее кольцо и дыры [(lat, lon), ...]
+
+        Кольца района обрезаются окном ячейки (Сазерленд-Ходжмен); у крайних
+        ячеек окно неограничено наружу, как и при расчете площади. Вогнутый
+        район, дважды входящий в ячейку, дает одно кольцо с нулевыми перемычками.
+        Суша не вычитается.
+        """
+        rows, cols = self.shape
+        row, col = int(self.row[k]), int(self.col[k])
+        left = self.x0 + self.cell_width_nm * col if col > 0 else -np.inf
+        right = self.x0 + self.cell_width_nm * (col + 1) if col < cols - 1 else np.inf
+        bottom = self.y0 + self.cell_length_nm * row if row > 0 else -np.inf
+        top = self.y0 + self.cell_length_nm * (row + 1) if row < rows - 1 else np.inf
+        clipped = []
+        for index, (x, y) in enumerate(self.rings):
+            x, y = _clip_ring(x, y, (left, bottom), (right, top))
+            if len(x) < 3 or shoelace(x, y) == 0:
+                if index == 0:
+                    return []
+                continue
+            lat, lon = self._to_geo(x, y)
+            clipped.append(list(zip(np.asarray(lat).tolist(), np.asarray(lon).tolist())))
+        return clipped
+
+    def to_sub_areas(self) -> List[Dict]:
+        """
+        Подрайоны в виде словарей SearchArea.sub_areas
+
+        'bounds' - часть района внутри ячейки (с дырами в 'holes'),
+        'cell' - углы полной ячейки
+        """
+        lat, lon = self.corners()
+        sub_areas = []
+        for k in range(len(self)):
+            cell = list(zip(lat[k].tolist(), lon[k].tolist()))
+            rings = self.clipped_rings(k) if self.rings else [cell]
+            sub_areas.append({
+                'id': f"sub_{self.row[k]}_{self.col[k]}",
+                'bounds': rings[0] if rings else cell,
+                'holes': rings[1:],
+                'cell': cell,
+                'center': (float(self.center_lat[k]), float(self.center_lon[k])),
+                'area_nm2': float(self.area_nm2[k]),
+                'cell_area_nm2': float(self.cell_area_nm2[k]),
+                'coverage': float(self.area_nm2[k] / self.cell_area_nm2[k]),
+                'land_fraction': float(self.land_fraction[k]),
+                'orientation': self.orientation_deg,
+            })
+        return sub_areas
+
+
+def _densify(ring: np.ndarray, step_nm: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Точки кольца с ребрами не длиннее step_nm (прямые по lat/lon, как в ring_area_nm2)"""
+    lat, lon = ring[:, 0], ring[:, 1]
+    dlat = np.roll(lat, -1) - lat
+    dlon = np.roll(lon, -1) - lon
+    length = np.hypot(dlat * 60.0, dlon * 60.0 * np.cos(np.radians(lat)))
+    pieces = np.maximum(np.ceil(length / step_nm).astype(np.int64), 1)
+    edge = np.repeat(np.arange(len(lat)), pieces)
+    t = (np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / pieces[edge]
+    return lat[edge] + t * dlat[edge], lon[edge] + t * dlon[edge]
+
+
+def _clip_ring(x: np.ndarray, y: np.ndarray, low, high) -> Tuple[np.ndarray, np.ndarray]:
+    """Обрезать кольцо прямоугольником low..high (Сазерленд-Ходжмен по четырем сторонам)"""
+    for axis, bound, sign in ((0, low[0], 1.0), (0, high[0], -1.0), (1, low[1], 1.0), (1, high[1], -1.0)):
+        if not np.isfinite(bound) or not len(x):
+            continue
+        a = x if axis == 0 else y
+        inside = sign * (a - bound) >= 0
+        following = np.roll(np.arange(len(a)), -1)
+        crossing = inside != inside[following]
+        # Из ребра p -> q: p, если внутри, и точка пересечения, если ребро пересекает сторону
+        counts = inside.astype(np.int64) + crossing
+        start = np.cumsum(counts) - counts
+        out_x = np.empty(counts.sum())
+        out_y = np.empty(counts.sum())
+        out_x[start[inside]] = x[inside]
+        out_y[start[inside]] = y[inside]
+        edge = np.nonzero(crossing)[0]
+        t = (bound - a[edge]) / (a[following[edge]] - a[edge])
+        slot = start[edge] + inside[edge]
+        out_x[slot] = x[edge] + t * (x[following[edge]] - x[edge])
+        out_y[slot] = y[edge] + t * (y[following[edge]] - y[edge])
+        x, y = out_x, out_y
+    return x, y
+
+
+def _split_edges(x0, y0, x1, y1, xs, ys) -> Tuple[np.ndarray, ...]:
+    """Разрезать ребра линиями сетки: каждый кусок лежит в одной ячейке"""
+    params = [np.zeros(len(x0)), np.ones(len(x0))]
+    owners = [np.arange(len(x0))] * 2
+    for lines, a0, a1 in ((xs, x0, x1), (ys, y0, y1)):
+        first = np.searchsorted(lines, np.minimum(a0, a1), side='right')
+        last = np.searchsorted(lines, np.maximum(a0, a1), side='left')
+        counts = np.maximum(last - first, 0)
+        edge = np.repeat(np.arange(len(x0)), counts)
+        line = first[edge] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        params.append((lines[line] - a0[edge]) / (a1[edge] - a0[edge]))
+        owners.append(edge)
+    t = np.concatenate(params)
+    edge = np.concatenate(owners)
+    order = np.lexsort((t, edge))
+    t, edge = t[order], edge[order]
+    same = (edge[1:] == edge[:-1]) & (t[1:] > t[:-1])
+    t0, t1, edge = t[:-1][same], t[1:][same], edge[:-1][same]
+    dx, dy = (x1 - x0)[edge], (y1 - y0)[edge]
+    return x0[edge] + t0 * dx, y0[edge] + t0 * dy, x0[edge] + t1 * dx, y0[edge] + t1 * dy
+
+
+def _line_integrals(x0, y0, x1, y1, xs, ys) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Интегралы индикатора района вдоль вертикальных линий x = xs
+
+    Пересечение ребра с линией в точке c со знаком s (+1 - ребро идет
+    вправо) меняет индикатор на s при движении вверх, поэтому все
+    величины - накопленные суммы по пересечениям ниже точки ys.
+
+    Returns:
+        [линия, точка]: индикатор в точке (1 - внутри), длина части линии
+        внутри района ниже точки и ее первый момент (интеграл y)
+    """
+    toggles = np.zeros((3, len(xs), len(ys) + 1))
+    left0 = x0[:, None] <= xs[None, :]
+    crossing = left0 != (x1[:, None] <= xs[None, :])
+    edge, line = np.nonzero(crossing)
+    if len(edge):
+        t = (xs[line] - x0[edge]) / (x1[edge] - x0[edge])
+        c = y0[edge] + t * (y1[edge] - y0[edge])
+        s = np.where(x1[edge] > x0[edge], 1.0, -1.0)
+        point = np.searchsorted(ys, c, side='right')
+        np.add.at(toggles, (0, line, point), s)
+        np.add.at(toggles, (1, line, point), s * c)
+        np.add.at(toggles, (2, line, point), s * c * c)
+    sums = np.cumsum(toggles, axis=2)[:, :, :len(ys)]
+    indicator = sums[0]
+    # Выше всех пересечений индикатор равен нулю - ys может быть бесконечным
+    outside = sums[0] == 0
+    with np.errstate(invalid='ignore'):
+        length = np.where(outside, 0.0, ys * sums[0]) - sums[1]
+        moment = (np.where(outside, 0.0, ys * ys * sums[0]) - sums[2]) / 2
+    return indicator, length, moment
+
+
+def _cell_corners(values: np.ndarray) -> np.ndarray:
+    """Углы ячеек [строка, столбец, 4] из значений в узлах сетки"""
+    return np.stack([values[:-1, :-1], values[:-1, 1:], values[1:, 1:], values[1:, :-1]], axis=-1)
+
+
+def _land_fraction(x0, y0, x1, y1, xs, ys, samples, land_mask, to_geo):
+    """
+    Доля суши в части ячейки внутри района по подвыборке samples x samples
+
+    Returns:
+        Доля суши [строка, столбец] (NaN, если внутрь района не попала ни
+        одна точка) и центр тяжести водных точек внутри района
+    """
+    rows, cols = len(ys) - 1, len(xs) - 1
+    fine_x = xs[0] + (xs[1] - xs[0]) / samples * (np.arange(cols * samples) + 0.5)
+    fine_y = ys[0] + (ys[1] - ys[0]) / samples * (np.arange(rows * samples) + 0.5)
+    inside = _line_integrals(x0, y0, x1, y1, fine_x, fine_y)[0].T > 0.5
+    grid_x, grid_y = np.meshgrid(fine_x, fine_y)
+    water = ~land_mask.is_land(*to_geo(grid_x, grid_y))
+
+    def per_cell(values):
+        return values.reshape(rows, samples, cols, samples).sum(axis=(1, 3))
+
+    n_inside = per_cell(inside.astype(np.float64))
+    n_water_inside = per_cell((inside & water).astype(np.float64))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fraction = n_water_inside / n_inside
+        weight = (inside & water).astype(np.float64)
+        water_x = per_cell(weight * grid_x) / n_water_inside
+        water_y = per_cell(weight * grid_y) / n_water_inside
+    return 1 - fraction, water_x, water_y
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище траекторий частиц в массивах NumPy
+Положения всех частиц хранятся в одном структурированном массиве
+[время, частица] (lat, lon, ветвь, статус); моменты времени и номера
+частиц - в отдельных одномерных массивах. Срезы по времени и по
+частицам - представления без копирования, новые моменты добавляются
+в конец с удвоением емкости. Сериализация - один .npz (в файл или
+BLOB SQLite) без накладных расходов на строку.
+"""
+
+import io
+import json
+import math
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+# Статусы частицы
+STATUS_ACTIVE = 0      # Дрейфует
+STATUS_STRANDED = 1    # Выброшена на берег
+STATUS_REMOVED = 2     # Исключена из расчета (обнаружена, вне района)
+
+
+def point_dtype(precision=np.float32) -> np.dtype:
+    """Тип записи одной точки траектории"""
+    return np.dtype([('lat', precision), ('lon', precision), ('branch', np.int8), ('status', np.uint8)])
+
+
+class TrajectoryStore:
+    """Траектории облака частиц: массив точек [время, частица]"""
+
+    def __init__(self,
+                 n_particles: int,
+                 capacity: int = 16,
+                 particle_ids: Optional[np.ndarray] = None,
+                 origin: Tuple[float, float] = (math.nan, math.nan),
+                 object_type: str = "",
+                 precision=np.float32):
+        """
+        Args:
+            n_particles: Число частиц
+            capacity: Начальная емкость по времени (растет при добавлении)
+            particle_ids: Номера частиц; по умолчанию 0..n_particles-1
+            origin: Исходная точка дрейфа (lat, lon)
+            object_type: Тип объекта поиска
+            precision: Тип координат (float32 - облака частиц, float64 - расчетные линии)
+        """
+        if particle_ids is None:
+            particle_ids = np.arange(n_particles, dtype=np.int64)
+        self.particle_ids = np.asarray(particle_ids, dtype=np.int64)
+        if len(self.particle_ids) != n_particles:
+            raise ValueError("Число номеров частиц не совпадает с числом частиц")
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.object_type = object_type
+        self._times = np.empty(max(capacity, 1), dtype=np.float64)
+        self._points = np.zeros((max(capacity, 1), n_particles), dtype=point_dtype(precision))
+        self._size = 0
+
+    @classmethod
+    def _wrap(cls, times: np.ndarray, points: np.ndarray, particle_ids: np.ndarray,
+              origin: Tuple[float, float], object_type: str) -> 'TrajectoryStore':
+        """Хранилище поверх готовых массивов (без копирования)"""
+        store = cls.__new__(cls)
+        store.particle_ids = particle_ids
+        store.origin = origin
+        store.object_type = object_type
+        store._times = times
+        store._points = points
+        store._size = len(times)
+        return store
+
+    # --- Размеры и столбцы ---
+
+    def __len__(self) -> int:
+        """Число сохраненных моментов времени"""
+        return self._size
+
+    @property
+    def n_particles(self) -> int:
+        return self._points.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Объем заполненной части, байты"""
+        return self.times.nbytes + self.points.nbytes + self.particle_ids.nbytes
+
+    @property
+    def times(self) -> np.ndarray:
+        """Моменты времени, часы от начала дрейфа"""
+        return self._times[:self._size]
+
+    @property
+    def points(self) -> np.ndarray:
+        """Структурированный массив [время, частица]"""
+        return self._points[:self._size]
+
+    @property
+    def lat(self) -> np.ndarray:
+        return self.points['lat']
+
+    @property
+    def lon(self) -> np.ndarray:
+        return self.points['lon']
+
+    @property
+    def branch(self) -> np.ndarray:
+        return self.points['branch']
+
+    @property
+    def status(self) -> np.ndarray:
+        return self.points['status']
+
+    # --- Заполнение ---
+
+    def append(self,
+               t_hours: float,
+               lat: np.ndarray,
+               lon: np.ndarray,
+               branch: Union[np.ndarray, int] = 0,
+               status: Union[np.ndarray, int] = STATUS_ACTIVE):
+        """
+        Добавить положения всех частиц на момент t_hours
+
+        Args:
+            t_hours: Время, часы (не раньше последнего сохраненного)
+            lat, lon: Координаты частиц
+            branch: Ветвь (-1 левая, +1 правая, 0 - нет)
+            status: Статус частиц (STATUS_*)
+        """
+        if self._size and t_hours < self._times[self._size - 1]:
+            raise ValueError("Моменты времени должны добавляться по возрастанию")
+        if self._size == len(self._times):
+            self._reserve(2 * len(self._times))
+        row = self._points[self._size]
+        row['lat'] = lat
+        row['lon'] = lon
+        row['branch'] = branch
+        row['status'] = status
+        self._times[self._size] = t_hours
+        self._size += 1
+
+    def extend(self,
+               times: np.ndarray,
+               lat: np.ndarray,
+               lon: np.ndarray,
+               branch: Union[np.ndarray, int] = 0,
+               status: Union[np.ndarray, int] = STATUS_ACTIVE):
+        """Добавить несколько моментов сразу (массивы [время, частица])"""
+        times = np.asarray(times, dtype=np.float64)
+        if not len(times):
+            return
+        if np.any(np.diff(times) < 0) or (self._size and times[0] < self._times[self._size - 1]):
+            raise ValueError("Моменты времени должны добавляться по возрастанию")
+        stop = self._size + len(times)
+        if stop > len(self._times):
+            self._reserve(max(stop, 2 * len(self._times)))
+        rows = self._points[self._size:stop]
+        rows['lat'] = lat
+        rows['lon'] = lon
+        rows['branch'] = branch
+        rows['status'] = status
+        self._times[self._size:stop] = times
+        self._size = stop
+
+    def _reserve(self, capacity: int):
+        """Увеличить емкость по времени (единственное место копирования)"""
+        times = np.empty(capacity, dtype=np.float64)
+        points = np.zeros((capacity, self.n_particles), dtype=self._points.dtype)
+        times[:self._size] = self._times[:self._size]
+        points[:self._size] = self._points[:self._size]
+        self._times, self._points = times, points
+
+    # --- Срезы без копирования ---
+
+    def time_index(self, t_hours: float) -> int:
+        """Индекс последнего момента не позже t_hours"""
+        index = int(np.searchsorted(self.times, t_hours + 1e-9, side='right')) - 1
+        if index < 0:
+            raise ValueError(f"Нет положений на {t_hours} ч")
+        return index
+
+    def frame(self, index: int = -1) -> np.ndarray:
+        """Положения всех частиц в момент с индексом index (представление)"""
+        return self.points[index]
+
+    def at(self, t_hours: float) -> np.ndarray:
+        """Положения всех частиц на момент t_hours (последний сохраненный не позже)"""
+        return self.frame(self.time_index(t_hours))
+
+    def track(self, particle: int) -> np.ndarray:
+        """Траектория одной частицы (представление по столбцу)"""
+        return self.points[:, particle]
+
+    def between(self, start_hours: float, end_hours: float) -> 'TrajectoryStore':
+        """Моменты в интервале [start_hours, end_hours] (общая память)"""
+        first = int(np.searchsorted(self.times, start_hours - 1e-9))
+        last = int(np.searchsorted(self.times, end_hours + 1e-9, side='right'))
+        return self._view(slice(first, last), slice(None))
+
+    def particles(self, selection: slice) -> 'TrajectoryStore':
+        """
+        Подмножество частиц
+
+        Срез (slice) дает представление без копирования; массив номеров
+        или маска - копию (так устроена индексация NumPy).
+        """
+        return self._view(slice(None), selection)
+
+    def _view(self, time_selection: slice, particle_selection) -> 'TrajectoryStore':
+        # Емкость представления равна его длине: append в него копирует данные
+        return TrajectoryStore._wrap(self.times[time_selection],
+                                     self.points[time_selection, particle_selection],
+                                     self.particle_ids[particle_selection],
+                                     self.origin, self.object_type)
+
+    # --- Сводки ---
+
+    def active(self, index: int = -1) -> np.ndarray:
+        """Маска дрейфующих частиц в момент index"""
+        return self.frame(index)['status'] == STATUS_ACTIVE
+
+    def set_status(self, index: int, mask: np.ndarray, status: int):
+        """Назначить статус частицам mask с момента index до конца хранилища"""
+        rows = self.points[index:]
+        column = rows['status']
+        column[:, mask] = status
+
+    def centroid(self, active_only: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Средние lat, lon облака по всем моментам времени"""
+        lat = self.lat.astype(np.float64)
+        lon = self.lon.astype(np.float64)
+        if not active_only:
+            return lat.mean(axis=1), lon.mean(axis=1)
+        weight = (self.status == STATUS_ACTIVE).astype(np.float64)
+        count = np.maximum(weight.sum(axis=1), 1.0)
+        return (lat * weight).sum(axis=1) / count, (lon * weight).sum(axis=1) / count
+
+    def to_points(self, particle: int = 0) -> List[Dict]:
+        """
+        Траектория частицы в виде списка словарей (для старого кода)
+
+        Returns:
+            [{'lat', 'lon', 'time_hours', 'distance_nm'}], distance_nm - от
+            исходной точки (местная плоская система, как в DriftCalculator)
+        """
+        track = self.track(particle)
+        origin_lat, origin_lon = self.origin
+        if math.isnan(origin_lat):
+            origin_lat, origin_lon = float(track['lat'][0]), float(track['lon'][0])
+        dy = (track['lat'].astype(np.float64) - origin_lat) * 60.0
+        dx = (track['lon'].astype(np.float64) - origin_lon) * 60.0 * math.cos(math.radians(origin_lat))
+        distance = np.hypot(dx, dy)
+        return [{'lat': float(lat), 'lon': float(lon), 'time_hours': float(t), 'distance_nm': float(d)}
+                for lat, lon, t, d in zip(track['lat'], track['lon'], self.times, distance)]
+
+    def to_geojson(self, step: int = 1, max_particles: Optional[int] = None) -> Dict:
+        """
+        Траектории как FeatureCollection из LineString (для слоя или отчета)
+
+        Args:
+            step: Прореживание по времени
+            max_particles: Не больше стольких частиц (равномерная выборка)
+        """
+        stride = 1
+        if max_particles and self.n_particles > max_particles:
+            stride = int(math.ceil(self.n_particles / max_particles))
+        points = self.points[::step, ::stride]
+        lat = points['lat'].astype(np.float64)
+        lon = points['lon'].astype(np.float64)
+        features = []
+        for column, particle_id in enumerate(self.particle_ids[::stride]):
+            features.append({
+                "type": "Feature",
+                "properties": {
+                    "particle": int(particle_id),
+                    "branch": int(points['branch'][-1, column]) if len(points) else 0,
+                    "status": int(points['status'][-1, column]) if len(points) else STATUS_ACTIVE,
+                    "object_type": self.object_type,
+                },
+                "geometry": {"type": "LineString",
+                             "coordinates": np.column_stack([lon[:, column], lat[:, column]]).tolist()}
+            })
+        return {"type": "FeatureCollection", "features": features}
+
+    # --- Сериализация ---
+
+    def to_bytes(self) -> bytes:
+        """Один .npz в памяти (для BLOB SQLite)"""
+        buffer = io.BytesIO()
+        self.save(buffer)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'TrajectoryStore':
+        return cls.load(io.BytesIO(blob))
+
+    def save(self, target):
+        """Сохранить в .npz (путь или файловый объект)"""
+        meta = json.dumps({"origin": list(self.origin), "object_type": self.object_type},
+                          ensure_ascii=False)
+        np.savez(target, times=self.times, points=np.ascontiguousarray(self.points),
+                 particle_ids=self.particle_ids, meta=np.array(meta))
+
+    @classmethod
+    def load(cls, source) -> 'TrajectoryStore':
+        """Загрузить из .npz (путь или файловый объект)"""
+        with np.load(source, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls._wrap(data["times"], data["points"], data["particle_ids"],
+                             tuple(meta["origin"]), meta["object_type"])
@@ -1,10 +1,39 @@
+import math
+
+import numpy as np
 from qgis.core import QgsPointXY
 
+from ..calculations.sru_assignment import assignment_costs, linear_sum_assignment
+
+
+def calculate_distance(a, b):
+    """Planar distance between two QgsPointXY points (map units)."""
+    return math.hypot(b.x() - a.x(), b.y() - a.y())
+
+
+def assign_sru_by_distance(sru_points, search_areas, capacity=1):
+    """Assign search areas to SRU points with minimum total geodesic transit.
+
+    Points and areas are in geographic coordinates (x = lon, y = lat); the
+    transit cost is the great-circle time from assignment_costs. capacity is
+    the number of areas each SRU may take - one value for all SRUs or one
+    per SRU. Areas beyond the total capacity stay unassigned.
+    """
+    if not sru_points or not search_areas:
+        return []
+    if np.ndim(capacity) == 0:
+        capacity = [capacity] * len(sru_points)
+    capacity = [max(int(c), 0) for c in capacity]
+    if len(capacity) != len(sru_points):
+        raise ValueError("capacity must have one value per SRU")
+    centers = [QgsPointXY(area.centroid().asPoint()) for area in search_areas]
+    srus = [{'base': (point.y(), point.x())} for point in sru_points]
+    sub_areas = [{'center': (center.y(), center.x())} for center in centers]
+    transit = assignment_costs(srus, sub_areas).transit_hours
 
-def assign_sru_by_distance(sru_points, search_areas):
-    """Assign each search area to the nearest SRU point."""
-    assignments = []
-    for area in search_areas:
-        closest_sru = min(sru_points, key=lambda p: p.distance(area.centroid()))
-        assignments.append((area, closest_sru))
-    return assignments
+    slots = np.repeat(np.arange(len(sru_points)), capacity)
+    if not len(slots):
+        return []
+    rows, cols = linear_sum_assignment(transit[slots])
+    chosen = sorted(zip(cols.tolist(), slots[rows].tolist()))
+    return [(search_areas[col], sru_points[sru]) for col, sru in chosen]
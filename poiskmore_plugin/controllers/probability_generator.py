@@ -1,6 +1,27 @@
+import math
+
 import numpy as np
-def generate_probability_grid(area, resolution):
-x = np.linspace(area.xMinimum(), area.xMaximum(), resolution)
-y = np.linspace(area.yMinimum(), area.yMaximum(), resolution)
-grid = np.meshgrid(x, y)
-return grid
\ No newline at end of file
+
+from ..calculations.geodesy import laea_forward
+from ..calculations.poc_grid import PocGrid
+
+
+def generate_probability_grid(area, resolution, lat, lon, weights=None, method='histogram', bandwidth_nm=None):
+    """Build a POC grid of the particle cloud over a lon/lat rectangle.
+
+    ``area`` is a QgsRectangle in EPSG:4326, ``resolution`` the number of
+    cells along the longer side; the shorter side gets proportionally fewer
+    square cells. The grid uses a local equal-area projection centred on the
+    rectangle; see PocGrid for the raster buffer.
+    """
+    if resolution <= 0:
+        raise ValueError("Grid resolution must be positive")
+    corners_lat = [area.yMinimum(), area.yMinimum(), area.yMaximum(), area.yMaximum()]
+    corners_lon = [area.xMinimum(), area.xMaximum(), area.xMinimum(), area.xMaximum()]
+    origin = (area.center().y(), area.center().x())
+    x, y = laea_forward(np.asarray(corners_lat), np.asarray(corners_lon), origin[0], origin[1])
+    width, height = float(np.ptp(x)), float(np.ptp(y))
+    cell_nm = max(width, height) / resolution or 1.0
+    shape = (max(math.ceil(height / cell_nm - 1e-9), 1), max(math.ceil(width / cell_nm - 1e-9), 1))
+    layout = PocGrid.covering(corners_lat, corners_lon, cell_nm=cell_nm, shape=shape, origin=origin)
+    return layout.add_particles(lat, lon, weights, method=method, bandwidth_nm=bandwidth_nm)
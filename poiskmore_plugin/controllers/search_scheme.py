@@ -1,6 +1,21 @@
+from ..calculations.search_patterns import PATTERNS, generate_pattern
+
+
 def generate_search_scheme(mode, params):
-if mode == 'sector':
-return "Sector scheme generated with params: " + str(params)
-if mode == 'expanding_square':
-return "Expanding square scheme generated with params: " + str(params)
-return "Unknown scheme"
\ No newline at end of file
+    """Build a search pattern track with waypoints.
+
+    ``mode`` is one of PATTERNS; ``params`` holds ``track_spacing`` (the
+    radius for a sector search) and, depending on the pattern, ``polygon``
+    (list of (lat, lon)), ``datum`` (lat, lon) or ``track``, plus optional
+    ``direction`` and ``speed_kn``. Other keys are passed to the pattern.
+    Returns the SearchPattern with its waypoints, length and time.
+    """
+    if mode not in PATTERNS:
+        raise ValueError(f"Unknown search pattern: {mode}")
+    options = dict(params)
+    spacing = options.pop('track_spacing', None)
+    if spacing is None:
+        spacing = options.pop('radius', None)
+    if spacing is None:
+        raise ValueError("Track spacing is required")
+    return generate_pattern(mode, spacing, **options)
@@ -1,8 +1,12 @@
-from qgis.core import QgsVectorLayer, QgsFeature, QgsGeometry, QgsProject
 def draw_search_scheme(scheme):
-layer = QgsVectorLayer("LineString?crs=epsg:4326", "Search Scheme", "memory")
-feat = QgsFeature()
-feat.setGeometry(QgsGeometry.fromPolylineXY(scheme))
-layer.dataProvider().addFeature(feat)
-QgsProject.instance().addMapLayer(layer)
-return layer
\ No newline at end of file
+    """Add a search pattern (SearchPattern or list of QgsPointXY) as a line layer."""
+    from qgis.core import QgsFeature, QgsGeometry, QgsPointXY, QgsProject, QgsVectorLayer
+
+    if hasattr(scheme, 'waypoints'):
+        scheme = [QgsPointXY(float(lon), float(lat)) for lat, lon in scheme.waypoints]
+    layer = QgsVectorLayer("LineString?crs=epsg:4326", "Search Scheme", "memory")
+    feat = QgsFeature()
+    feat.setGeometry(QgsGeometry.fromPolylineXY(scheme))
+    layer.dataProvider().addFeature(feat)
+    QgsProject.instance().addMapLayer(layer)
+    return layer
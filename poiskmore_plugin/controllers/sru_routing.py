@@ -1,7 +1,49 @@
-from qgis.core import QgsPointXY
-def calculate_sru_routing(start, end, obstacles):
-route = [start, end]
-for obs in obstacles:
-if obs.intersects(QgsGeometry.fromPolylineXY(route)):
-route.append(QgsPointXY(start.x() + 1, start.y() + 1))
-return route
\ No newline at end of file
+from qgis.core import Qgis, QgsGeometry, QgsMessageLog, QgsPointXY
+
+from ..calculations.sea_routing import RouteGraph, region_graph
+
+
+def obstacle_polygons(obstacles):
+    """Convert QgsGeometry polygons (x = lon, y = lat) to (lon, lat) rings."""
+    polygons = []
+    for geometry in obstacles:
+        parts = geometry.asMultiPolygon() if geometry.isMultipart() else [geometry.asPolygon()]
+        for part in parts:
+            polygons.append([[(point.x(), point.y()) for point in ring] for ring in part])
+    return polygons
+
+
+def calculate_sru_routing(start, end, obstacles, region=None):
+    """Route from start to end around obstacle polygons.
+
+    The visibility graph is cached per region (by default per obstacle set),
+    so repeated queries for the same coastline only run the path search.
+    Returns the route as a list of QgsPointXY. A leg that cannot be routed
+    (an endpoint on land or the target cut off) is reported to the message
+    log and an empty list is returned - never a line across land.
+    """
+    if region is None:
+        region = tuple(geometry.asWkt() for geometry in obstacles)
+    polygons = obstacle_polygons(obstacles)
+    graph = region_graph(region, polygons) if polygons else RouteGraph()
+    try:
+        route = graph.route((start.y(), start.x()), (end.y(), end.x()))
+    except ValueError as error:
+        _log_unroutable(start, end, str(error))
+        return []
+    if route is None:
+        _log_unroutable(start, end, "цель недостижима в обход препятствий")
+        return []
+    return [QgsPointXY(lon, lat) for lat, lon in route.waypoints]
+
+
+def route_geometry(start, end, obstacles, region=None):
+    """Route as a polyline geometry (empty if the leg cannot be routed)."""
+    points = calculate_sru_routing(start, end, obstacles, region)
+    return QgsGeometry.fromPolylineXY(points) if points else QgsGeometry()
+
+
+def _log_unroutable(start, end, reason):
+    QgsMessageLog.logMessage(
+        f"Маршрут SRU ({start.y():.4f}, {start.x():.4f}) - ({end.y():.4f}, {end.x():.4f}) "
+        f"не построен: {reason}", "Поиск-Море", Qgis.Warning)
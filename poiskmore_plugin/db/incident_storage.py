@@ -9,10 +9,12 @@ import xml.etree.ElementTree as ET
 from qgis.core import QgsPointXY  # Для geospatial-валидации
 from qgis.PyQt.QtCore import QObject
 
+from .paths import incidents_db_path
+
 class IncidentStorage(QObject):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.db_path = Path(__file__).parent.parent / 'db' / 'incidents.db'
+        self.db_path = incidents_db_path()
         self.conn = sqlite3.connect(self.db_path)
         self.init_db()
 
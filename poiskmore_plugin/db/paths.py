@@ -0,0 +1,20 @@
+"""
+Пути к файлам БД плагина
+Базы лежат в каталоге data плагина, а не в текущем каталоге процесса QGIS
+"""
+
+import os
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def data_path(name):
+    """Путь к файлу в каталоге data плагина (каталог создается при необходимости)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
+
+
+def incidents_db_path():
+    """БД инцидентов: операции, история поиска"""
+    return data_path('incidents.db')
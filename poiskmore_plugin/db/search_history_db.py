@@ -0,0 +1,104 @@
+"""
+Таблицы истории поиска: априорная сетка POC инцидента и вылеты без обнаружения
+"""
+
+
+def migrate_database_for_search_history(conn):
+    """Добавляет таблицы истории поиска"""
+    create_search_history_tables(conn.cursor())
+    conn.commit()
+
+
+def create_search_history_tables(cursor):
+    """Таблицы истории поиска: априорная сетка POC и вылеты без обнаружения"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS search_history (
+            incident_id INTEGER PRIMARY KEY,
+            grid_json TEXT NOT NULL,                -- Привязка сетки POC
+            prior BLOB NOT NULL,                    -- Априорные значения POC (npz)
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            
+            FOREIGN KEY (incident_id) REFERENCES incidents(id) ON DELETE CASCADE
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS search_sorties (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            incident_id INTEGER NOT NULL,
+            sortie_no INTEGER NOT NULL,             -- Порядковый номер вылета
+            sru_id TEXT,
+            completed_at TEXT,
+            pos REAL,                               -- POS вылета
+            state BLOB NOT NULL,                    -- Ячейки и POD вылета (npz)
+            
+            FOREIGN KEY (incident_id) REFERENCES search_history(incident_id) ON DELETE CASCADE
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_search_sorties_incident 
+        ON search_sorties(incident_id, sortie_no)
+    """)
+
+
+def save_search_prior(conn, incident_id, grid_json, prior):
+    """Сохранить априорную сетку POC инцидента (вылеты удаляются)"""
+    cursor = conn.cursor()
+    create_search_history_tables(cursor)
+    
+    cursor.execute("DELETE FROM search_sorties WHERE incident_id = ?", (incident_id,))
+    cursor.execute("""
+        INSERT OR REPLACE INTO search_history (incident_id, grid_json, prior)
+        VALUES (?, ?, ?)
+    """, (incident_id, grid_json, prior))
+    
+    conn.commit()
+
+
+def append_search_sortie(conn, incident_id, sortie_no, sru_id, completed_at, pos, state):
+    """Дописать вылет к истории поиска инцидента"""
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        INSERT INTO search_sorties (incident_id, sortie_no, sru_id, completed_at, pos, state)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (incident_id, sortie_no, sru_id, completed_at, pos, state))
+    cursor.execute(
+        "UPDATE search_history SET updated_at = CURRENT_TIMESTAMP WHERE incident_id = ?",
+        (incident_id,)
+    )
+    
+    conn.commit()
+
+
+def load_search_history(conn, incident_id):
+    """
+    Загрузить историю поиска инцидента
+
+    Returns:
+        (grid_json, prior_blob, [(sru_id, completed_at, pos, state_blob)]) или None
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'search_history'"
+    )
+    if cursor.fetchone() is None:
+        return None
+    
+    cursor.execute(
+        "SELECT grid_json, prior FROM search_history WHERE incident_id = ?", (incident_id,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    
+    cursor.execute("""
+        SELECT sru_id, completed_at, pos, state
+        FROM search_sorties
+        WHERE incident_id = ?
+        ORDER BY sortie_no
+    """, (incident_id,))
+    
+    return row[0], row[1], cursor.fetchall()
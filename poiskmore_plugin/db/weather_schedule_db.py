@@ -2,6 +2,25 @@
 Миграция БД для добавления таблиц расписания ветра и течений
 """
 
+# Стандартные коэффициенты ливея (IAMSAR Vol.II App.N):
+# (object_type, dwl_slope, dwl_intercept, cwl_slope, cwl_intercept,
+#  sigma_dwl, sigma_cwl, divergence_rate, reference)
+LEEWAY_COEFFICIENTS = [
+    ('Спасательный плот с тентом', 0.0110, 0.0, 0.0060, 0.0, 0.1, 0.1, 0.1, 'IAMSAR Vol.II App.N'),
+    ('Спасательный плот без тента', 0.0160, 0.0, 0.0100, 0.0, 0.15, 0.15, 0.15, 'IAMSAR Vol.II App.N'),
+    ('Человек в спасжилете', 0.0120, 0.0, 0.0050, 0.0, 0.1, 0.1, 0.08, 'IAMSAR Vol.II App.N'),
+    ('Человек без спасжилета', 0.0100, 0.0, 0.0040, 0.0, 0.1, 0.1, 0.05, 'IAMSAR Vol.II App.N'),
+    ('Малое судно <20м', 0.0420, 0.0, 0.0480, 0.0, 0.2, 0.2, 0.2, 'IAMSAR Vol.II App.N'),
+    ('Среднее судно 20-50м', 0.0330, 0.0, 0.0420, 0.0, 0.15, 0.15, 0.15, 'IAMSAR Vol.II App.N'),
+    ('Большое судно >50м', 0.0280, 0.0, 0.0380, 0.0, 0.1, 0.1, 0.1, 'IAMSAR Vol.II App.N'),
+    ('Парусная яхта (киль)', 0.0400, 0.0, 0.0400, 0.0, 0.15, 0.15, 0.15, 'IAMSAR Vol.II App.N'),
+    ('Парусная яхта (дрейф)', 0.0600, 0.0, 0.0800, 0.0, 0.2, 0.2, 0.25, 'IAMSAR Vol.II App.N'),
+    ('Рыболовное судно', 0.0350, 0.0, 0.0450, 0.0, 0.15, 0.15, 0.15, 'IAMSAR Vol.II App.N'),
+    ('Обломки', 0.0150, 0.0, 0.0100, 0.0, 0.2, 0.2, 0.3, 'IAMSAR Vol.II App.N'),
+    ('Морская авиация', 0.0200, 0.0, 0.0200, 0.0, 0.1, 0.1, 0.1, 'IAMSAR Vol.II App.N')
+]
+
+
 def migrate_database_for_weather_schedule(conn):
     """Добавляет таблицы для расписания метеоусловий"""
     
@@ -73,27 +92,12 @@ def migrate_database_for_weather_schedule(conn):
     """)
     
     # Заполняем стандартные коэффициенты из IAMSAR Appendix N
-    leeway_data = [
-        ('Спасательный плот с тентом', 0.0110, 0.0, 0.0060, 0.0, 0.1, 0.1, 0.1, 'IAMSAR Vol.II App.N'),
-        ('Спасательный плот без тента', 0.0160, 0.0, 0.0100, 0.0, 0.15, 0.15, 0.15, 'IAMSAR Vol.II App.N'),
-        ('Человек в спасжилете', 0.0120, 0.0, 0.0050, 0.0, 0.1, 0.1, 0.08, 'IAMSAR Vol.II App.N'),
-        ('Человек без спасжилета', 0.0100, 0.0, 0.0040, 0.0, 0.1, 0.1, 0.05, 'IAMSAR Vol.II App.N'),
-        ('Малое судно <20м', 0.0420, 0.0, 0.0480, 0.0, 0.2, 0.2, 0.2, 'IAMSAR Vol.II App.N'),
-        ('Среднее судно 20-50м', 0.0330, 0.0, 0.0420, 0.0, 0.15, 0.15, 0.15, 'IAMSAR Vol.II App.N'),
-        ('Большое судно >50м', 0.0280, 0.0, 0.0380, 0.0, 0.1, 0.1, 0.1, 'IAMSAR Vol.II App.N'),
-        ('Парусная яхта (киль)', 0.0400, 0.0, 0.0400, 0.0, 0.15, 0.15, 0.15, 'IAMSAR Vol.II App.N'),
-        ('Парусная яхта (дрейф)', 0.0600, 0.0, 0.0800, 0.0, 0.2, 0.2, 0.25, 'IAMSAR Vol.II App.N'),
-        ('Рыболовное судно', 0.0350, 0.0, 0.0450, 0.0, 0.15, 0.15, 0.15, 'IAMSAR Vol.II App.N'),
-        ('Обломки', 0.0150, 0.0, 0.0100, 0.0, 0.2, 0.2, 0.3, 'IAMSAR Vol.II App.N'),
-        ('Морская авиация', 0.0200, 0.0, 0.0200, 0.0, 0.1, 0.1, 0.1, 'IAMSAR Vol.II App.N')
-    ]
-    
     cursor.executemany("""
         INSERT OR REPLACE INTO leeway_coefficients 
         (object_type, dwl_slope, dwl_intercept, cwl_slope, cwl_intercept, 
          sigma_dwl, sigma_cwl, divergence_rate, reference)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, leeway_data)
+    """, LEEWAY_COEFFICIENTS)
     
     # Таблица результатов расчета дрейфа
     cursor.execute("""
@@ -171,10 +175,71 @@ def migrate_database_for_weather_schedule(conn):
         )
     """)
     
+    _create_drift_checkpoints_table(cursor)
+    _add_drift_cache_columns(cursor)
+    
     conn.commit()
     print("✅ База данных обновлена для хранения расписания ветра и течений")
 
 
+# Столбцы кэша результатов в drift_calculations (добавляются к старым БД)
+DRIFT_CACHE_COLUMNS = [
+    ('cache_key', 'TEXT'),                      # Хэш входных данных расчета
+    ('result_json', 'TEXT'),                    # Результат (JSON)
+    ('cache_size', 'INTEGER'),                  # Оценка объема результата, байты
+    ('cache_used_at', 'REAL'),                  # Последнее обращение (unix time)
+]
+
+
+def _add_drift_cache_columns(cursor):
+    """Добавить столбцы кэша в drift_calculations, если их нет"""
+    cursor.execute("PRAGMA table_info(drift_calculations)")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, column_type in DRIFT_CACHE_COLUMNS:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE drift_calculations ADD COLUMN {name} {column_type}")
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_drift_calculations_cache_key 
+        ON drift_calculations(cache_key)
+    """)
+
+
+def _create_drift_checkpoints_table(cursor):
+    """Таблица контрольных точек облака частиц (пересчет с места изменения погоды)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS drift_checkpoints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            calculation_id INTEGER NOT NULL,
+            t_hours REAL NOT NULL,                  -- Время от LKP, часы
+            run_json TEXT NOT NULL,                 -- Параметры расчета (seed, частицы, шаг)
+            state BLOB NOT NULL,                    -- Сжатое состояние частиц (npz)
+            
+            FOREIGN KEY (calculation_id) REFERENCES drift_calculations(id) ON DELETE CASCADE
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_drift_checkpoints_calculation 
+        ON drift_checkpoints(calculation_id, t_hours)
+    """)
+
+
+def ensure_drift_cache_schema(conn):
+    """Подготовить таблицы drift_calculations / drift_track для кэша результатов"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'drift_calculations'"
+    )
+    if cursor.fetchone() is None:
+        migrate_database_for_weather_schedule(conn)
+        return
+    
+    _create_drift_checkpoints_table(cursor)
+    _add_drift_cache_columns(cursor)
+    conn.commit()
+
+
 def save_wind_schedule(conn, incident_id, wind_data):
     """Сохранить расписание ветра"""
     cursor = conn.cursor()
@@ -254,3 +319,79 @@ def load_current_schedule(conn, incident_id):
     """, (incident_id,))
     
     return cursor.fetchall()
+
+
+def load_leeway_coefficients(conn, object_type):
+    """Загрузить коэффициенты ливея для типа объекта"""
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT object_type, dwl_slope, dwl_intercept, cwl_slope, cwl_intercept,
+               sigma_dwl, sigma_cwl, divergence_rate, reference
+        FROM leeway_coefficients
+        WHERE object_type = ?
+    """, (object_type,))
+    
+    return cursor.fetchone()
+
+
+def load_drift_track(conn, calculation_id):
+    """Загрузить траекторию дрейфа расчета (столбцы - как в DriftTrack.to_track_rows)"""
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT t_utc, wind_speed_ms, wind_dir, dwl_kn, cwl_kn, leeway_speed_kn, leeway_dir,
+               current_speed_kn, current_dir, drift_speed_kn, drift_dir,
+               left_lat, left_lon, right_lat, right_lon, divergence_nm
+        FROM drift_track
+        WHERE calculation_id = ?
+        ORDER BY id
+    """, (calculation_id,))
+    
+    return cursor.fetchall()
+
+
+def save_drift_checkpoints(conn, calculation_id, run_json, checkpoints):
+    """
+    Сохранить контрольные точки расчета (заменяя прежние)
+
+    Args:
+        checkpoints: [(t_hours, state_blob)]
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute("DELETE FROM drift_checkpoints WHERE calculation_id = ?", (calculation_id,))
+    cursor.executemany("""
+        INSERT INTO drift_checkpoints (calculation_id, t_hours, run_json, state)
+        VALUES (?, ?, ?, ?)
+    """, [(calculation_id, t_hours, run_json, state) for t_hours, state in checkpoints])
+    
+    conn.commit()
+
+
+def load_drift_checkpoints(conn, calculation_id):
+    """Загрузить контрольные точки расчета: [(t_hours, run_json, state_blob)]"""
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT t_hours, run_json, state
+        FROM drift_checkpoints
+        WHERE calculation_id = ?
+        ORDER BY t_hours
+    """, (calculation_id,))
+    
+    return cursor.fetchall()
+
+
+def latest_drift_checkpoints(conn, incident_id):
+    """Последний расчет инцидента с контрольными точками: calculation_id или None"""
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT MAX(c.calculation_id)
+        FROM drift_checkpoints c
+        JOIN drift_calculations d ON d.id = c.calculation_id
+        WHERE d.incident_id = ?
+    """, (incident_id,))
+    
+    return cursor.fetchone()[0]
@@ -20,6 +20,8 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QColor
 
+from ..db.paths import incidents_db_path
+
 class DialogOperationList(QDialog):
     """Диалог для отображения и управления списком операций"""
     
@@ -115,7 +117,7 @@ class DialogOperationList(QDialog):
     def load_from_database(self):
         """Загрузка операций из базы данных"""
         try:
-            conn = sqlite3.connect('incidents.db')
+            conn = sqlite3.connect(incidents_db_path())
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -251,7 +253,7 @@ class DialogOperationList(QDialog):
             
             # Сохраняем в БД
             try:
-                conn = sqlite3.connect('incidents.db')
+                conn = sqlite3.connect(incidents_db_path())
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -310,7 +312,7 @@ class DialogOperationList(QDialog):
             
             if reply == QMessageBox.Yes:
                 try:
-                    conn = sqlite3.connect('incidents.db')
+                    conn = sqlite3.connect(incidents_db_path())
                     cursor = conn.cursor()
                     
                     cursor.execute(
@@ -28,6 +28,7 @@ from math import cos, sin, radians
 
 # Импортируем диалог расписания погоды
 from .weather_schedule_dialog import WeatherScheduleDialog
+from ..db.paths import incidents_db_path
 
 class RegistrationDialog(QDialog):
     """Диалог регистрации нового аварийного случая"""
@@ -51,7 +52,7 @@ class RegistrationDialog(QDialog):
     def init_database(self):
         """Инициализация подключения к БД"""
         try:
-            self.db_conn = sqlite3.connect('incidents.db')
+            self.db_conn = sqlite3.connect(incidents_db_path())
             self.cursor = self.db_conn.cursor()
             self.cursor.execute('''
                 CREATE TABLE IF NOT EXISTS incidents (
@@ -22,6 +22,9 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, pyqtSignal, QDateTime
 from PyQt5.QtGui import QColor
 
+from ..calculations.search_history import SearchHistory
+from ..db.paths import incidents_db_path
+
 class DialogRepeatSearch(QDialog):
     """Диалог для выбора операции для повторного поиска"""
     
@@ -152,14 +155,14 @@ class DialogRepeatSearch(QDialog):
     def load_operations(self):
         """Загрузка операций из БД"""
         try:
-            conn = sqlite3.connect('incidents.db')
+            conn = sqlite3.connect(incidents_db_path())
             cursor = conn.cursor()
             
             # Загружаем все операции
             cursor.execute('''
                 SELECT case_number, datetime, name, situation_type,
                        coords_lat, coords_lon, num_people, status,
-                       description, help_needed, mskc
+                       description, help_needed, mskc, id
                 FROM incidents
                 ORDER BY datetime DESC
             ''')
@@ -181,6 +184,7 @@ class DialogRepeatSearch(QDialog):
                     'description': row[8] or '',
                     'help_needed': row[9] or '',
                     'mskc': row[10] or '',
+                    'id': row[11],
                     'close_reason': ''  # Нужно добавить в БД
                 }
                 self.all_operations.append(operation)
@@ -358,7 +362,7 @@ class DialogRepeatSearch(QDialog):
             
             # Обновляем в БД
             try:
-                conn = sqlite3.connect('incidents.db')
+                conn = sqlite3.connect(incidents_db_path())
                 cursor = conn.cursor()
                 
                 # Обновляем статус оригинальной операции
@@ -368,13 +372,18 @@ class DialogRepeatSearch(QDialog):
                 )
                 
                 conn.commit()
+                
+                # Поиск продолжается с POC после выполненных вылетов
+                repeat_operation['search_history'] = SearchHistory.load(
+                    conn, self.selected_operation['id']
+                )
                 conn.close()
                 
                 # Передаем операцию
                 self.operation_selected.emit(repeat_operation)
                 self.accept()
                 
-            except sqlite3.Error as e:
+            except (sqlite3.Error, ValueError) as e:
                 QMessageBox.critical(
                     self,
                     "Ошибка",
@@ -9,10 +9,28 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget,
                              QSpinBox, QDoubleSpinBox, QDateTimeEdit, QTabWidget,
                              QComboBox, QMessageBox, QHeaderView)
 from PyQt5.QtCore import Qt, QDateTime, pyqtSignal
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QColor, QFont
+from dataclasses import replace
 from datetime import datetime, timedelta
 import math
 
+import numpy as np
+
+from ..calculations.drift_checkpoints import CheckpointedRun, IncrementalDrift
+from ..calculations.drift_integrator import ENGINE_VERSION, DriftIntegrator, WeatherSchedule, parse_schedule_time
+from ..calculations.geodesy import distance_nm
+from ..calculations.leeway_particles import KNOTS_PER_MS, LeewayCoefficients, LeewayParticleEngine
+from ..calculations.result_cache import CacheKey, get_result_cache
+from ..db.weather_schedule_db import latest_drift_checkpoints
+
+INVALID_ROW_COLOR = QColor(255, 200, 200)  # Подсветка строк с ошибками
+
+# Облако частиц по расписанию: число частиц, интервал контрольных точек
+# (часы) и ошибка исходного места (мили)
+DRIFT_PARTICLES = 5000
+DRIFT_CHECKPOINT_HOURS = 6.0
+DRIFT_INITIAL_ERROR_NM = 1.0
+
 
 class WeatherScheduleDialog(QDialog):
     """Диалог ввода расписания ветра и течений по времени"""
@@ -22,6 +40,7 @@ class WeatherScheduleDialog(QDialog):
     def __init__(self, incident_id=None, parent=None):
         super().__init__(parent)
         self.incident_id = incident_id
+        self.drift_run = None  # Облако частиц с контрольными точками (последний расчет)
         self.setup_ui()
         self.load_existing_data()
         
@@ -339,6 +358,10 @@ class WeatherScheduleDialog(QDialog):
         self.divergence_label.setStyleSheet("color: orange;")
         result_layout.addWidget(self.divergence_label)
         
+        result_layout.addWidget(QLabel("Разброс частиц (90%):"))
+        self.spread_label = QLabel("0.0 мили")
+        result_layout.addWidget(self.spread_label)
+        
         result_layout.addStretch()
         
         layout.addLayout(result_layout)
@@ -556,62 +579,139 @@ class WeatherScheduleDialog(QDialog):
         # Очистка таблицы дрейфа
         self.drift_table.setRowCount(0)
         
-        # Получаем коэффициенты ливея
-        dwl_slope = self.dwl_slope.value()
-        dwl_intercept = self.dwl_intercept.value()
-        cwl_slope = self.cwl_slope.value()
-        cwl_intercept = self.cwl_intercept.value()
-        
-        total_drift_nm = 0.0
-        total_drift_u = 0.0
-        total_drift_v = 0.0
+        wind_data, current_data, invalid = self._collect_schedule_entries()
+        if invalid:
+            rows = "\n".join(f"{name}: строки {', '.join(map(str, numbers))}"
+                              for name, numbers in invalid.items())
+            QMessageBox.warning(self, "Расписание",
+                                "Строки с неверным временем (ДД.ММ ЧЧ:ММ) или числами "
+                                f"подсвечены и пропущены:\n{rows}")
+        if not wind_data:
+            return
         
-        # Для каждого временного интервала
-        for row in range(self.wind_table.rowCount()):
-            try:
-                # Ветер
-                wind_speed_ms = float(self.wind_table.item(row, 2).text())
-                wind_speed_kn = wind_speed_ms * 1.94384  # м/с в узлы
-                
-                # Расчет компонентов ливея
-                dwl = dwl_slope * wind_speed_kn + dwl_intercept
-                cwl = cwl_slope * wind_speed_kn + cwl_intercept  # ± для двух ветвей
-                
-                # Скорость ливея
-                leeway_speed = math.sqrt(dwl**2 + cwl**2)
-                
-                # Течение (упрощенно - берем среднее TWC)
-                twc_speed = 0.5  # узлы (заглушка)
-                
-                # Суммарный дрейф
-                drift_speed = leeway_speed + twc_speed
-                
-                # Добавляем строку в таблицу
-                drift_row = self.drift_table.rowCount()
-                self.drift_table.insertRow(drift_row)
-                
-                time_str = self.wind_table.item(row, 0).text() if self.wind_table.item(row, 0) else ""
-                self.drift_table.setItem(drift_row, 0, QTableWidgetItem(time_str))
-                self.drift_table.setItem(drift_row, 1, QTableWidgetItem(f"{wind_speed_ms:.1f}"))
-                self.drift_table.setItem(drift_row, 2, QTableWidgetItem(f"{dwl:.3f}"))
-                self.drift_table.setItem(drift_row, 3, QTableWidgetItem(f"±{cwl:.3f}"))
-                self.drift_table.setItem(drift_row, 4, QTableWidgetItem(f"{leeway_speed:.2f}"))
-                self.drift_table.setItem(drift_row, 5, QTableWidgetItem(f"{twc_speed:.2f}"))
-                self.drift_table.setItem(drift_row, 6, QTableWidgetItem(f"{drift_speed:.2f}"))
-                
-                # Накапливаем смещение (за 1 час)
-                drift_nm_per_hour = drift_speed * 1.0  # узлы * часы = мили
-                total_drift_nm += drift_nm_per_hour
-                
-            except (ValueError, AttributeError):
-                continue
+        # Коэффициенты ливея из полей диалога
+        coefficients = LeewayCoefficients(
+            self.object_type.currentText(),
+            self.dwl_slope.value(),
+            self.dwl_intercept.value(),
+            self.cwl_slope.value(),
+            self.cwl_intercept.value()
+        )
+        
+        # Интегрирование по расписанию с шагом 10 минут; последнее
+        # наблюдение ветра действует еще час после своего времени
+        schedule = WeatherSchedule.from_entries(wind_data, current_data)
+        wind_hours = schedule.wind.hours
+        duration = float(wind_hours[-1]) + 1.0
+        integrator = DriftIntegrator(schedule, coefficients)
+        
+        # Повторное нажатие при тех же данных берет траекторию из кэша
+        key = CacheKey.build(
+            'schedule_drift', ENGINE_VERSION, (0.0, 0.0), schedule.start_time,
+            coefficients.object_type, incident_id=self.incident_id,
+            wind=wind_data, current=current_data, coefficients=coefficients,
+            duration_hours=duration, time_step_hours=integrator.time_step_hours
+        )
+        track = get_result_cache().get_or_compute(
+            key, lambda: integrator.integrate((0.0, 0.0), duration))
+        
+        # Строки таблицы - в моменты наблюдений ветра
+        distance_nm = track.center_distance_nm
+        for hours in wind_hours:
+            i = int(np.searchsorted(track.hours, hours))
+            drift_row = self.drift_table.rowCount()
+            self.drift_table.insertRow(drift_row)
+            
+            moment = schedule.start_time + timedelta(hours=float(hours))
+            self.drift_table.setItem(drift_row, 0, QTableWidgetItem(moment.strftime("%d.%m %H:%M")))
+            self.drift_table.setItem(drift_row, 1, QTableWidgetItem(f"{track.wind_speed_kn[i] / KNOTS_PER_MS:.1f}"))
+            self.drift_table.setItem(drift_row, 2, QTableWidgetItem(f"{track.dwl_kn[i]:.3f}"))
+            self.drift_table.setItem(drift_row, 3, QTableWidgetItem(f"±{track.cwl_kn[i]:.3f}"))
+            self.drift_table.setItem(drift_row, 4, QTableWidgetItem(f"{track.leeway_speed_kn[i]:.2f}"))
+            self.drift_table.setItem(drift_row, 5, QTableWidgetItem(f"{track.current_speed_kn[i]:.2f}"))
+            self.drift_table.setItem(drift_row, 6, QTableWidgetItem(f"{track.drift_speed_kn[i]:.2f}"))
+            self.drift_table.setItem(drift_row, 7, QTableWidgetItem(f"{track.drift_dir[i]:.0f}"))
+            self.drift_table.setItem(drift_row, 8, QTableWidgetItem(f"{distance_nm[i]:.1f}"))
         
         # Итоговые результаты
-        self.total_drift_label.setText(f"{total_drift_nm:.1f} морских миль")
+        self.total_drift_label.setText(f"{track.total_drift_nm:.1f} морских миль")
+        self.drift_dir_label.setText(f"{track.total_drift_direction:.0f}°")
         
         # Расхождение датумов (из-за ±CWL)
-        divergence = abs(cwl) * self.wind_table.rowCount() * 2  # Упрощенно
-        self.divergence_label.setText(f"{divergence:.1f} мили")
+        self.divergence_label.setText(f"{track.divergence_nm[-1]:.1f} мили")
+        
+        # Облако частиц: после правки расписания пересчитывается только
+        # участок с первого измененного момента
+        cloud = self._drift_particles(key, schedule, coefficients, duration, wind_data, current_data)
+        center_lat, center_lon = float(np.mean(cloud.lat)), float(np.mean(cloud.lon))
+        spread = np.percentile(distance_nm(cloud.lat, cloud.lon, center_lat, center_lon), 90)
+        self.spread_label.setText(f"{spread:.1f} мили")
+    
+    def _drift_particles(self, key, schedule, coefficients, duration, wind_data, current_data):
+        """
+        Облако частиц по расписанию с контрольными точками
+
+        Прежний расчет берется из памяти диалога или из БД (последний расчет
+        инцидента); новые контрольные точки сохраняются рядом со строкой
+        drift_calculations траектории key.
+        """
+        cache = get_result_cache()
+        previous = self.drift_run
+        if previous is None and cache.conn is not None and self.incident_id:
+            calculation_id = latest_drift_checkpoints(cache.conn, self.incident_id)
+            if calculation_id is not None:
+                previous = CheckpointedRun.load(cache.conn, calculation_id)
+        
+        # Разброс ливея - по стандартным коэффициентам типа объекта
+        standard = LeewayCoefficients.default(coefficients.object_type)
+        engine = LeewayParticleEngine(replace(coefficients, sigma_dwl=standard.sigma_dwl,
+                                              sigma_cwl=standard.sigma_cwl,
+                                              divergence_rate=standard.divergence_rate), schedule)
+        run = IncrementalDrift(engine, DRIFT_CHECKPOINT_HOURS).resume(
+            previous, (0.0, 0.0), duration, DRIFT_PARTICLES,
+            {'wind': wind_data, 'current': current_data}, DRIFT_INITIAL_ERROR_NM)
+        
+        calculation_id = cache.calculation_id(key)
+        if calculation_id is not None:
+            run.save(cache.conn, calculation_id)
+        self.drift_run = run
+        return run.cloud
+    
+    def _collect_schedule_entries(self):
+        """
+        Собрать строки таблиц ветра и течений в формате save_*_schedule
+
+        Строки с нераспознанным временем или числами подсвечиваются и
+        пропускаются; их номера возвращаются третьим элементом
+        ({'ветер': [номера], 'течения': [номера]}, нумерация с 1)
+        """
+        invalid = {}
+        wind_data = self._collect_table(self.wind_table, 'speed_ms', invalid.setdefault('ветер', []))
+        current_data = self._collect_table(self.current_table, 'speed_kn', invalid.setdefault('течения', []))
+        return wind_data, current_data, {name: rows for name, rows in invalid.items() if rows}
+    
+    def _collect_table(self, table, speed_key, invalid_rows):
+        """Строки одной таблицы (время, направление, скорость) с проверкой"""
+        entries = []
+        for row in range(table.rowCount()):
+            cells = [table.item(row, column) for column in range(3)]
+            try:
+                entry = {
+                    'time': cells[0].text(),
+                    'direction': float(cells[1].text()),
+                    speed_key: float(cells[2].text())
+                }
+                parse_schedule_time(entry['time'])
+            except (ValueError, AttributeError):
+                invalid_rows.append(row + 1)
+                color = INVALID_ROW_COLOR
+            else:
+                entries.append(entry)
+                color = None  # Исправленная строка - обычный фон
+            for cell in cells:
+                if cell is not None:
+                    cell.setData(Qt.BackgroundRole, color)
+        return entries
     
     def import_from_hydro(self):
         """Импорт данных из модуля Гидрометео"""
@@ -418,29 +418,41 @@ def calculate_pos(poc: float, pod: float) -> float:
 
 def optimal_search_allocation(areas: list, resources: list) -> dict:
     """
-    Упрощенный алгоритм SORAL для распределения ресурсов
+    Распределение SRU по районам с максимальной суммарной POS
     (Search and Rescue Optimal Allocation)
     
+    Экспоненциальная функция обнаружения: SRU с усилием W×V×T в районе
+    площадью A дает POD = 1 - exp(-W×V×T / A). Каждая SRU назначается
+    на район с наибольшим приростом POS с учетом уже назначенных
+    (calculations.effort_allocation.assign_units).
+    
     Args:
-        areas: Список районов с их POC
-        resources: Список доступных SRU с характеристиками
+        areas: Список районов: 'id', 'poc', 'area_nm2'
+        resources: Список доступных SRU: 'id', 'sweep_width', 'search_speed', 'endurance'
     
     Returns:
-        Оптимальное распределение ресурсов по районам
+        Распределение ресурсов по районам: SRU, покрытие, POD и POS района
     """
-    # Здесь должен быть полный алгоритм SORAL
-    # Это упрощенная версия
-    allocation = {}
+    import math
+    from .calculations.effort_allocation import assign_units, sru_effort_nm2
     
-    # Сортируем районы по приоритету (POC)
-    sorted_areas = sorted(areas, key=lambda x: x['poc'], reverse=True)
+    choice = assign_units([area['poc'] for area in areas],
+                          [area.get('area_nm2', 0.0) for area in areas],
+                          resources)
     
-    # Распределяем ресурсы пропорционально POC
-    for area in sorted_areas:
+    allocation = {}
+    for index, area in enumerate(areas):
+        units = [sru for sru, target in zip(resources, choice) if target == index]
+        effort = sum(sru_effort_nm2(sru) for sru in units)
+        area_nm2 = area.get('area_nm2', 0.0)
+        coverage = effort / area_nm2 if area_nm2 > 0 else 0.0
+        pod = 1 - math.exp(-coverage)
         allocation[area['id']] = {
-            'sru': [],
+            'sru': [sru.get('id') for sru in units],
             'pattern': SEARCH_PATTERNS["PS"],  # По умолчанию параллельный
-            'coverage': area['poc']
+            'coverage': coverage,
+            'pod': pod,
+            'pos': area['poc'] * pod
         }
     
     return allocation
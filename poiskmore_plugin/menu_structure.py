@@ -703,7 +703,7 @@ def _on_authorization_success(self, token: str, user_info: dict):
         
         dialog = DatumCalculationDialog(self.operation_data, self.iface.mainWindow())
         if dialog.exec_():
-            datum_points = dialog.get_datum_points()
+            datum_points = self._cached_datum_points(dialog)
             
             # Сохраняем исходные пункты
             self.operation_data['datum_points'] = datum_points
@@ -1185,6 +1185,26 @@ def _on_authorization_success(self, token: str, user_info: dict):
     
     # === МЕТОДЫ ОТОБРАЖЕНИЯ НА КАРТЕ ===
     
+    def _cached_datum_points(self, dialog):
+        """Исходные пункты из диалога; при неизменных параметрах - из кэша результатов"""
+        get_parameters = getattr(dialog, 'get_parameters', None)
+        if get_parameters is None:
+            return dialog.get_datum_points()
+        
+        from .calculations.drift_calculator import ENGINE_VERSION
+        from .calculations.result_cache import CacheKey, get_result_cache
+        
+        params = dict(get_parameters())
+        key = CacheKey.build(
+            'datum', ENGINE_VERSION,
+            params.pop('lkp', (0.0, 0.0)),
+            params.pop('lkp_time', ''),
+            params.pop('object_type', ''),
+            incident_id=self.operation_data.get('id', 0),
+            **params
+        )
+        return get_result_cache().get_or_compute(key, dialog.get_datum_points)
+    
     def _display_datum_points(self, datum_points):
         """Отобразить исходные пункты на карте"""
         from .map.layers_manager import LayersManager
@@ -12,6 +12,7 @@
 """
 
 import os
+import sqlite3
 import sys
 import traceback
 from datetime import datetime
@@ -72,7 +73,27 @@ except ImportError as e:
     DriftCalculator = None
     SearchAreaCalculator = None
 
+try:
+    from .calculations.drift_calculator import ENGINE_VERSION as DRIFT_ENGINE_VERSION
+    from .calculations.result_cache import CacheKey, ResultCache, get_result_cache, set_result_cache
+except ImportError as e:
+    print(f"Предупреждение: кэш результатов не загружен: {e}")
+    ResultCache = None
+
+try:
+    from .alg.alg_probabilities import compute_probability_map, generate_probability_map
+    from .calculations.effort_allocation import allocate
+    from .calculations.search_history import SearchHistory
+except ImportError as e:
+    print(f"Предупреждение: карта вероятностей не загружена: {e}")
+    compute_probability_map = None
+    generate_probability_map = None
+    allocate = None
+    SearchHistory = None
+
 # Импорт модулей БД
+from .db.paths import data_path, incidents_db_path
+
 try:
     from .db.incident_storage import IncidentStorage
     from .db.weather_schedule_db import WeatherScheduleDB
@@ -125,6 +146,11 @@ class PoiskMorePlugin:
     VERSION = "2.0.0"
     PLUGIN_NAME = "Поиск-Море"
     
+    # Карта вероятностей: полуширина сетки, ячейка (мили) и время дрейфа (часы)
+    POC_RADIUS_NM = 10.0
+    POC_CELL_NM = 0.5
+    POC_HOURS = 3
+    
     def __init__(self, iface):
         """
         Инициализация плагина
@@ -145,9 +171,16 @@ class PoiskMorePlugin:
         self.current_search_area = None
         self.sru_list = []
         
+        # История поиска текущего инцидента (POC после вылетов), ее слой
+        # и план вылетов по этой POC
+        self.search_history = None
+        self.poc_layer = None
+        self.search_plan = None
+        
         # Инициализация хранилищ данных
         self.incident_storage = None
         self.weather_db = None
+        self.result_cache = None
         
         # Настройки плагина
         self.settings = QSettings("PoiskMore", "Plugin")
@@ -201,6 +234,15 @@ class PoiskMorePlugin:
                 self.toolbar.addAction(action)
                 self.actions.append(action)
             
+            # Карта POC и вылеты по ней (история поиска инцидента)
+            for text, slot in (("Карта вероятностей (POC)", self.calculate_probability_map),
+                               ("Оптимизация поиска", self.optimize_search_plan),
+                               ("Вылеты по плану выполнены", self.complete_search_plan)):
+                action = QAction(text, self.iface.mainWindow())
+                action.triggered.connect(slot)
+                self.toolbar.addAction(action)
+                self.actions.append(action)
+            
             # Инициализация БД
             self._init_databases()
             
@@ -295,10 +337,210 @@ class PoiskMorePlugin:
         """Открыть диалог повторного поиска"""
         if DialogRepeatSearch:
             dialog = DialogRepeatSearch(self.iface.mainWindow())
+            dialog.operation_selected.connect(self._on_repeat_operation_selected)
             dialog.exec_()
         else:
             self._show_not_implemented("Повторный поиск")
     
+    def _on_repeat_operation_selected(self, operation):
+        """Возобновить поиск: текущий инцидент и POC после выполненных вылетов"""
+        self.current_incident = operation
+        self.search_history = operation.get('search_history')
+        self.search_plan = None
+        if self.search_history is None:
+            QMessageBox.information(
+                self.iface.mainWindow(),
+                "Повторный поиск",
+                f"Поиск по делу №{operation.get('original_case', 'Н/Д')} возобновлен.\n"
+                "История вылетов не найдена - поиск начинается заново."
+            )
+            return
+        
+        self._show_search_history()
+        QMessageBox.information(
+            self.iface.mainWindow(),
+            "Повторный поиск",
+            f"Поиск по делу №{operation.get('original_case', 'Н/Д')} возобновлен.\n"
+            f"Выполнено вылетов: {len(self.search_history.sorties)}, "
+            f"суммарная POS: {self.search_history.cumulative_pos:.1%}"
+        )
+    
+    def record_completed_sortie(self, pod, cells=None, sru_id="", completed_at=""):
+        """
+        Учесть выполненный вылет без обнаружения в истории текущего инцидента
+        
+        Вылет сразу дописывается в БД, слой POC обновляется.
+        
+        Args:
+            pod: POD вылета - по всей сетке истории или в ячейках cells
+            cells: Номера ячеек сетки POC
+            sru_id: Поисковая единица
+            completed_at: Время окончания вылета
+            
+        Returns:
+            Вылет (Sortie) или None, если у инцидента нет истории поиска
+        """
+        if self.search_history is None or not self.current_incident:
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                "История поиска",
+                "Нет истории поиска текущего инцидента - вылет не учтен"
+            )
+            return None
+        
+        completed_at = completed_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        sortie = self.search_history.record(pod, cells, sru_id, completed_at)
+        try:
+            conn = sqlite3.connect(incidents_db_path())
+            try:
+                self.search_history.save_sortie(conn, self.current_incident['id'])
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                "Ошибка БД",
+                f"Вылет учтен, но не сохранен в БД:\n{str(e)}"
+            )
+        self._show_search_history()
+        return sortie
+    
+    def _show_search_history(self):
+        """Показать (заменить) слой POC после выполненных вылетов"""
+        if generate_probability_map is None or self.search_history is None:
+            return
+        if self.poc_layer is not None:
+            try:
+                QgsProject.instance().removeMapLayer(self.poc_layer.id())
+            except RuntimeError:
+                pass  # Слой уже удален пользователем
+        self.poc_layer = generate_probability_map("POC после вылетов", self.search_history.poc)
+    
+    def start_search_history(self, grid):
+        """
+        Начать историю поиска текущего инцидента с априорной сетки POC
+        
+        Априорная сетка сразу сохраняется в БД инцидентов (прежние вылеты
+        инцидента удаляются), чтобы повторный поиск продолжился с нее.
+        
+        Args:
+            grid: Сетка POC (PocGrid) текущего инцидента
+            
+        Returns:
+            История поиска (SearchHistory)
+        """
+        self.search_history = SearchHistory(grid)
+        self.search_plan = None
+        incident_id = (self.current_incident or {}).get('id')
+        if incident_id is None:
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                "История поиска",
+                "Инцидент не сохранен в БД - история поиска не будет сохранена"
+            )
+        else:
+            try:
+                conn = sqlite3.connect(incidents_db_path())
+                try:
+                    self.search_history.save(conn, incident_id)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                QMessageBox.warning(
+                    self.iface.mainWindow(),
+                    "Ошибка БД",
+                    f"История поиска не сохранена в БД:\n{str(e)}"
+                )
+        self._show_search_history()
+        return self.search_history
+    
+    def calculate_probability_map(self):
+        """Карта вероятностей (POC) текущего инцидента - начало истории поиска"""
+        if compute_probability_map is None or SearchHistory is None:
+            self._show_not_implemented("Карта вероятностей",
+                "Модуль карты вероятностей не загружен")
+            return
+        
+        incident = self.current_incident or {}
+        wind = incident.get('wind', {'speed': 15, 'direction': 225})
+        current = incident.get('current', {'speed': 1.5, 'direction': 45})
+        object_type = incident.get('object_type', 'Спасательный плот')
+        if incident.get('coords'):
+            datum = incident['coords']
+        elif incident.get('coords_lat') is not None and incident.get('coords_lon') is not None:
+            datum = (incident['coords_lat'], incident['coords_lon'])
+        else:
+            datum = (43.5833, 39.7167)
+        
+        try:
+            grid = compute_probability_map(
+                datum, self.POC_RADIUS_NM, self.POC_CELL_NM,
+                wind['speed'], wind['direction'], current['speed'], current['direction'],
+                self.POC_HOURS, object_type=object_type
+            )
+        except Exception as e:
+            QMessageBox.critical(
+                self.iface.mainWindow(),
+                "Ошибка расчета",
+                f"Не удалось рассчитать карту вероятностей:\n{str(e)}"
+            )
+            return
+        self.start_search_history(grid)
+    
+    def optimize_search_plan(self):
+        """План вылетов SRU: оптимальное распределение усилий по POC после выполненных вылетов"""
+        if allocate is None or self.search_history is None:
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                "Оптимизация поиска",
+                "Сначала рассчитайте карту вероятностей или выберите повторный поиск"
+            )
+            return None
+        if not self.sru_list:
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                "Оптимизация поиска",
+                "Не заданы поисковые единицы (SRU)"
+            )
+            return None
+        
+        self.search_plan = allocate(self.search_history.poc, self.sru_list)
+        QMessageBox.information(
+            self.iface.mainWindow(),
+            "Оптимизация поиска",
+            f"SRU в плане: {len(self.search_plan.units)}, "
+            f"ожидаемая POS вылетов: {self.search_plan.pos:.1%}"
+        )
+        return self.search_plan
+    
+    def complete_search_plan(self, completed_at=""):
+        """
+        Вылеты по текущему плану выполнены без обнаружения
+        
+        Каждый вылет плана учитывается и сохраняется через record_completed_sortie.
+        
+        Returns:
+            Список учтенных вылетов (Sortie)
+        """
+        if self.search_plan is None:
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                "История поиска",
+                "Нет плана вылетов - выполните оптимизацию поиска"
+            )
+            return []
+        
+        completed_at = completed_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        area = self.search_history.prior.cell_area_nm2
+        sorties = []
+        for unit in self.search_plan.units:
+            pod = -np.expm1(-unit.cell_effort / area)
+            sortie = self.record_completed_sortie(pod, unit.cells, str(unit.sru_id), completed_at)
+            if sortie is not None:
+                sorties.append(sortie)
+        self.search_plan = None
+        return sorties
+    
     def open_operation_list_dialog(self):
         """Открыть список операций"""
         if DialogOperationList:
@@ -310,7 +552,7 @@ class PoiskMorePlugin:
     def open_weather_schedule_dialog(self):
         """Открыть диалог расписания погоды"""
         if WeatherScheduleDialog:
-            dialog = WeatherScheduleDialog(self.iface.mainWindow())
+            dialog = WeatherScheduleDialog((self.current_incident or {}).get('id'), self.iface.mainWindow())
             dialog.exec_()
         else:
             self._show_not_implemented("Расписание погоды")
@@ -335,6 +577,18 @@ class PoiskMorePlugin:
     
     # ========== РАСЧЕТНЫЕ ФУНКЦИИ ==========
     
+    def _get_result_cache(self):
+        """Кэш результатов расчетов с уровнем SQLite в БД плагина"""
+        if self.result_cache is None and ResultCache is not None:
+            try:
+                self.result_cache = ResultCache.open(
+                    data_path('poiskmore.db'))
+                set_result_cache(self.result_cache)
+            except Exception as e:
+                print(f"Кэш результатов в БД недоступен: {e}")
+                self.result_cache = get_result_cache()
+        return self.result_cache
+    
     def calculate_drift(self):
         """Расчет дрейфа и исходных пунктов"""
         try:
@@ -362,15 +616,28 @@ class PoiskMorePlugin:
                 object_type = 'Спасательный плот'
                 initial_pos = (43.5833, 39.7167)
             
-            # Расчет дрейфа
-            result = calc.calculate_total_drift(
-                wind=wind,
-                current=current,
-                object_type=object_type,
-                elapsed_hours=3,
-                initial_position=initial_pos,
-                wave_height=2
-            )
+            # Расчет дрейфа (при неизменных исходных данных - из кэша)
+            def compute():
+                return calc.calculate_total_drift(
+                    wind=wind,
+                    current=current,
+                    object_type=object_type,
+                    elapsed_hours=3,
+                    initial_position=initial_pos,
+                    wave_height=2
+                )
+            
+            cache = self._get_result_cache()
+            if cache is not None:
+                key = CacheKey.build(
+                    'drift', f"{DRIFT_ENGINE_VERSION}:{type(calc).__name__}", initial_pos,
+                    (self.current_incident or {}).get('time', ''), object_type,
+                    incident_id=(self.current_incident or {}).get('id', 0),
+                    wind=wind, current=current, elapsed_hours=3, wave_height=2
+                )
+                result = cache.get_or_compute(key, compute)
+            else:
+                result = compute()
             
             # Создание слоя с результатами
             self._create_drift_layer(result, initial_pos)
@@ -617,9 +884,6 @@ class PoiskMorePlugin:
     def calculate_pod(self):
         self._show_not_implemented("Расчет POD")
     
-    def optimize_search_plan(self):
-        self._show_not_implemented("Оптимизация поиска")
-    
     def show_current_map(self):
         self._show_not_implemented("Карта течений")
     
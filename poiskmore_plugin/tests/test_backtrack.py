@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.backtrack import BacktrackEngine, Sighting, route_prior
+from poiskmore_plugin.calculations.drift_integrator import WeatherSchedule
+from poiskmore_plugin.calculations.leeway_particles import (
+    ConstantForcing,
+    LeewayCoefficients,
+    LeewayParticleEngine,
+)
+
+CURRENT = [{'time': '2024-06-01 00:00', 'direction': 90, 'speed_kn': 0.6}]
+WIND = [
+    {'time': '2024-06-01 00:00', 'direction': 270, 'speed_ms': 12},
+    {'time': '2024-06-01 12:00', 'direction': 330, 'speed_ms': 14},
+    {'time': '2024-06-02 00:00', 'direction': 20, 'speed_ms': 10},
+]
+START = datetime(2024, 6, 1)
+OBJECT = 'Спасательный плот без тента'
+ORIGIN = (60.0, 25.0)
+DISTRESS_HOURS = 6.0
+
+
+def test_backward_drift_retraces_forward_drift():
+    coefficients = LeewayCoefficients(OBJECT, 0.03, 0.0, 0.0, 0.0)
+    forcing = ConstantForcing(15, 240, 0.8, 45)
+    engine = LeewayParticleEngine(coefficients, forcing, time_step_hours=0.25)
+    forward = engine.simulate(ORIGIN, 12, 10, seed=1)
+
+    back = engine.backward(12).simulate((forward.lat[0], forward.lon[0]), 12, 10, seed=2)
+    assert np.allclose(back.lat, ORIGIN[0], atol=1e-3)
+    assert np.allclose(back.lon, ORIGIN[1], atol=1e-3)
+
+
+def make_sightings(schedule, coefficients, elapsed):
+    """Обнаружения "истинного" объекта - одной частицы, начавшей дрейф в DISTRESS_HOURS"""
+    def delayed(t_hours, lat, lon):
+        return schedule(t_hours + DISTRESS_HOURS, lat, lon)
+
+    truth = LeewayParticleEngine(coefficients, delayed, time_step_hours=0.25)
+    cloud = truth.simulate(ORIGIN, float(elapsed[-1]), 1, seed=5, output_hours=elapsed)
+    return [Sighting(float(cloud.track_lat[i, 0]), float(cloud.track_lon[i, 0]),
+                     DISTRESS_HOURS + hours, position_error_nm=0.5)
+            for i, hours in enumerate(elapsed)]
+
+
+def offset_nm(lat, lon):
+    return np.hypot((lat - ORIGIN[0]) * 60, (lon - ORIGIN[1]) * 60 * np.cos(np.radians(ORIGIN[0])))
+
+
+def test_origin_surface_recovers_position_and_time_with_route_prior():
+    schedule = WeatherSchedule.from_entries(WIND, CURRENT, start_time=START)
+    coefficients = LeewayCoefficients.default(OBJECT)
+    sightings = make_sightings(schedule, coefficients, np.array([10.0, 18.0, 26.0, 34.0]))
+
+    # Судно шло на восток 10 узлами и было в ORIGIN в момент бедствия
+    dlon = 10 * 6 / (60 * np.cos(np.radians(ORIGIN[0])))
+    prior = route_prior([(0.0, ORIGIN[0], ORIGIN[1] - dlon), (12.0, ORIGIN[0], ORIGIN[1] + dlon)], 2.0)
+
+    surface = BacktrackEngine(coefficients, schedule).origin_surface(
+        sightings, earliest_hours=0.0, n_particles=8000, prior=prior, seed=11)
+
+    assert surface.probability.shape == (len(surface.times), surface.grid.rows, surface.grid.cols)
+    assert surface.probability.sum() == pytest.approx(1.0)
+    assert surface.times[-1] == pytest.approx(DISTRESS_HOURS + 10.0)
+    lat, lon, hours = surface.most_likely()
+    assert offset_nm(lat, lon) < 3.0
+    assert abs(hours - DISTRESS_HOURS) <= 1.0
+
+
+def test_origin_surface_without_prior_contains_origin():
+    schedule = WeatherSchedule.from_entries(WIND, CURRENT, start_time=START)
+    coefficients = LeewayCoefficients.default(OBJECT)
+    sightings = make_sightings(schedule, coefficients, np.array([10.0, 18.0, 26.0, 34.0]))
+
+    surface = BacktrackEngine(coefficients, schedule).origin_surface(
+        sightings, earliest_hours=0.0, n_particles=8000, seed=11)
+
+    index = int(np.argmin(np.abs(surface.times - DISTRESS_HOURS)))
+    row, col = np.unravel_index(int(np.argmax(surface.probability[index])),
+                                surface.probability[index].shape)
+    lats, lons = surface.cell_centers()
+    assert offset_nm(lats[row], lons[col]) < 3.0
+    assert surface.effective_particles > 100
+
+
+def test_origin_surface_requires_sightings():
+    schedule = WeatherSchedule.from_entries(WIND, CURRENT, start_time=START)
+    engine = BacktrackEngine(LeewayCoefficients.default(OBJECT), schedule)
+    with pytest.raises(ValueError):
+        engine.origin_surface([], earliest_hours=0.0)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.clustering import NOISE, SpatialHash, complete_linkage, dbscan
+from poiskmore_plugin.calculations.geodesy import distance_nm
+from poiskmore_plugin.calculations.search_area_calculator import SearchAreaCalculator
+
+
+def reference_groups(points, max_distance):
+    """Прежний перебор: точка входит в группу, если близка ко всем ее точкам"""
+    groups, used = [], set()
+    for i, point in enumerate(points):
+        if i in used:
+            continue
+        group = [point]
+        used.add(i)
+        for j, other in enumerate(points):
+            if j not in used and all(
+                    float(distance_nm(g['lat'], g['lon'], other['lat'], other['lon'])) <= max_distance
+                    for g in group):
+                group.append(other)
+                used.add(j)
+        groups.append(group)
+    return groups
+
+
+def random_points(n, seed, lat=60.0, lon=20.0, spread=1.0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal([lat, lon], spread, size=(max(n // 8, 1), 2))
+    picked = centers[rng.integers(len(centers), size=n)] + rng.normal(0, spread / 10, size=(n, 2))
+    return [{'lat': float(a), 'lon': float(b), 'drift_speed': 1.0} for a, b in picked]
+
+
+@pytest.mark.parametrize("seed,max_distance", [(0, 5.0), (1, 10.0), (2, 30.0), (3, 0.5)])
+def test_complete_linkage_matches_previous_grouping(seed, max_distance):
+    points = random_points(150, seed)
+    groups = SearchAreaCalculator()._group_points_by_distance(points, max_distance)
+    assert groups == reference_groups(points, max_distance)
+
+
+def test_neighbors_across_date_line_and_pole():
+    lat = np.array([0.0, 0.0, 89.99, 89.99, 10.0])
+    lon = np.array([179.99, -179.99, 0.0, 180.0, 50.0])
+    index = SpatialHash(lat, lon, 2.0)
+    assert index.neighbors(0).tolist() == [0, 1]
+    assert index.neighbors(2).tolist() == [2, 3]
+    assert complete_linkage(lat, lon, 2.0).tolist() == [0, 0, 1, 1, 2]
+
+    pairs = np.concatenate([np.stack(p, axis=1) for p in index.pairs(budget=3)])
+    assert sorted(map(tuple, np.sort(pairs, axis=1).tolist())) == [(0, 1), (2, 3)]
+
+
+def test_dbscan_chains_core_points_and_marks_noise():
+    # Цепочка с шагом 1 миля, отдельная пара и одиночная точка
+    chain = 60 + np.arange(10) / 60.0
+    lat = np.concatenate([chain, [62.0, 62.0 + 0.5 / 60], [64.0]])
+    lon = np.full(len(lat), 20.0)
+
+    labels = dbscan(lat, lon, 1.01, min_samples=3)
+    assert labels[:10].tolist() == [0] * 10     # Концы цепочки - граничные точки
+    assert labels[10:].tolist() == [NOISE] * 3
+    # Полная связь рвет ту же цепочку на куски
+    assert len(set(complete_linkage(lat[:10], lon[:10], 1.01).tolist())) == 5
+
+    groups = SearchAreaCalculator()._group_points_by_distance(
+        [{'lat': a, 'lon': b} for a, b in zip(lat, lon)], 1.01, method='dbscan', min_samples=2)
+    assert [len(g) for g in groups] == [10, 2, 1]
+
+
+def test_dbscan_matches_brute_force_components():
+    points = random_points(400, 7, spread=0.3)
+    lat = np.array([p['lat'] for p in points])
+    lon = np.array([p['lon'] for p in points])
+    eps = 3.0
+    close = distance_nm(lat[:, None], lon[:, None], lat[None, :], lon[None, :]) <= eps
+    core = close.sum(axis=1) >= 4
+
+    labels = dbscan(lat, lon, eps, min_samples=4)
+    assert np.array_equal(labels != NOISE, core | (close[:, core].any(axis=1)))
+    # Ядерные точки в одной группе тогда и только тогда, когда они связаны
+    reach = close[np.ix_(core, core)]
+    for _ in range(len(reach)):
+        grown = reach | (reach.astype(np.int64) @ reach.astype(np.int64) > 0)
+        if np.array_equal(grown, reach):
+            break
+        reach = grown
+    same = labels[core][:, None] == labels[core][None, :]
+    assert np.array_equal(same, reach)
@@ -0,0 +1,82 @@
+import math
+import time
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.coverage_grid import CoverageGrid, detection_probability
+from poiskmore_plugin.calculations.geodesy import laea_inverse
+from poiskmore_plugin.calculations.poc_grid import PocGrid
+from poiskmore_plugin.calculations.search_area_calculator import SearchAreaCalculator
+from poiskmore_plugin.calculations.search_patterns import parallel_sweep
+
+ORIGIN = (70.0, 30.0)
+
+
+def square(cx, cy, half):
+    lat, lon = laea_inverse(cx + np.array([-half, half, half, -half]),
+                            cy + np.array([-half, -half, half, half]), *ORIGIN)
+    return list(zip(lat, lon))
+
+
+def test_straight_track_effort_is_width_times_length():
+    grid = PocGrid.empty(ORIGIN, -10, -10, 0.5, (40, 40))
+    lat, lon = laea_inverse(np.array([-6.1, 6.1]), np.array([0.0, 0.0]), *ORIGIN)
+    coverage = CoverageGrid.for_grid(grid).burn([np.column_stack([lat, lon])], 2.0)
+    assert coverage.effort.sum() == pytest.approx(2.0 * 12.2, rel=1e-3)
+    # Полоса шириной 2 мили покрывает четыре ряда ячеек целиком
+    rows = np.flatnonzero(coverage.coverage.sum(axis=1) > 0)
+    assert len(rows) == 4
+    assert coverage.coverage[rows[0], 25] == pytest.approx(1.0, rel=1e-6)
+
+
+def test_parallel_sweep_gives_uniform_coverage():
+    grid = PocGrid.empty(ORIGIN, -10, -10, 0.5, (40, 40))
+    pattern = parallel_sweep(square(0, 0, 5), 1.0)
+    coverage = CoverageGrid.for_grid(grid).burn([pattern], 1.0)
+    inner = coverage.coverage[12:28, 12:28]
+    np.testing.assert_allclose(inner, 1.0, atol=1e-6)
+    assert coverage.coverage[:8].sum() == 0
+
+
+def test_detection_laws():
+    c = np.array([0.0, 0.5, 1.0, 2.0])
+    np.testing.assert_allclose(detection_probability(c), 1 - np.exp(-c))
+    cube = detection_probability(c, 'inverse_cube')
+    assert cube[2] == pytest.approx(math.erf(math.sqrt(math.pi) / 2))
+    assert (cube[1:] > detection_probability(c[1:])).all()
+    assert float(detection_probability(0.5, 'inverse_cube')) == pytest.approx(cube[1])
+    assert float(detection_probability(0.5)) == pytest.approx(1 - math.exp(-0.5))
+    with pytest.raises(ValueError):
+        detection_probability(c, 'linear')
+
+
+def test_pos_and_plan_integration():
+    rng = np.random.default_rng(0)
+    lat, lon = laea_inverse(rng.normal(0, 3, 50000), rng.normal(0, 3, 50000), *ORIGIN)
+    grid = PocGrid.empty(ORIGIN, -15, -15, 0.5, (60, 60)).add_particles(lat, lon)
+    coverage = CoverageGrid.for_grid(grid).burn([parallel_sweep(square(0, 0, 4), 1.0)], 1.0)
+    inside = grid.values[22:38, 22:38].sum()
+    assert coverage.pos() == pytest.approx(inside * (1 - math.exp(-1)), rel=1e-3)
+    assert coverage.pos(law='inverse_cube') > coverage.pos()
+
+    calculator = SearchAreaCalculator()
+    area = calculator.calculate_from_two_points(
+        {'lat': 70.0, 'lon': 29.95, 'drift_speed': 1.0, 'drift_direction': 45.0},
+        {'lat': 70.02, 'lon': 30.05, 'drift_speed': 1.0, 'drift_direction': 45.0}, 2.0)
+    srus = [{'id': k, 'name': f"SRU {k}", 'sweep_width': 1.0, 'search_speed': 12, 'endurance': 4}
+            for k in range(3)]
+    plan = calculator.optimize_search_pattern(area, srus, poc_grid=grid)
+    assert 0 < plan['achieved_pos'] < 1
+    assert plan['coverage_grid'].coverage.shape == grid.shape
+
+
+def test_hundreds_of_tracks_are_fast():
+    grid = PocGrid.empty(ORIGIN, -125, -125, 0.5, (500, 500))
+    rng = np.random.default_rng(1)
+    patterns = [parallel_sweep(square(cx, cy, 8), 1.5) for cx, cy in rng.uniform(-100, 100, (300, 2))]
+    start = time.perf_counter()
+    coverage = CoverageGrid.for_grid(grid).burn(patterns, 1.5)
+    coverage.pod('inverse_cube')
+    assert time.perf_counter() - start < 1.0
+    assert coverage.effort.sum() == pytest.approx(300 * 11 * 16 * 1.5, rel=0.01)
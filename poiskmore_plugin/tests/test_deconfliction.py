@@ -0,0 +1,119 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.deconfliction import Conflict, Track, find_conflicts
+from poiskmore_plugin.calculations.geodesy import laea_forward, laea_inverse
+from poiskmore_plugin.utils.multi_sru_simulator import conflict_pairs, intersect, simulate_multi_sru
+
+
+def crossing(altitude_a=1000.0, altitude_b=1200.0, **options):
+    """Встречные курсы по параллели 60 с. ш. со сближением в момент 1800 с"""
+    t = np.arange(0, 3601, 60.0)
+    a = Track.from_waypoints('heli', [(60.0, 20.0 + k * 0.01) for k in range(len(t))], t, altitude=altitude_a)
+    b = Track.from_waypoints('plane', [(60.0, 20.6 - k * 0.01) for k in range(len(t))], t,
+                             altitude=altitude_b, **options)
+    return a, b
+
+
+def brute_force(tracks, horizontal_nm=1.0, vertical_ft=500.0, step=0.5):
+    """Пары SRU с нарушением в точках частой выборки времени (эталон)"""
+    start = min(track.times[0] for track in tracks)
+    end = max(track.times[-1] for track in tracks)
+    t = np.arange(start, end, step)
+    states = []
+    for track in tracks:
+        x, y = laea_forward(np.interp(t, track.times, track.lat), np.interp(t, track.times, track.lon),
+                            60.0, 20.3, ellipsoid=False)
+        x[(t < track.times[0]) | (t > track.times[-1])] = np.nan
+        low, high = track.vertical_extent()
+        states.append((x, y, np.interp(t, track.times, low), np.interp(t, track.times, high)))
+    pairs = set()
+    for i in range(len(tracks)):
+        for j in range(i + 1, len(tracks)):
+            xi, yi, li, hi = states[i]
+            xj, yj, lj, hj = states[j]
+            close = np.hypot(xi - xj, yi - yj) < horizontal_nm
+            stacked = np.maximum(lj - hi, li - hj) < vertical_ft
+            if (close & stacked).any():
+                pairs.add((tracks[i].sru_id, tracks[j].sru_id))
+    return pairs
+
+
+def test_head_on_conflict_reports_time_and_position():
+    conflicts = find_conflicts(crossing())
+    assert len(conflicts) == 1
+    conflict = conflicts[0]
+    assert (conflict.sru_a, conflict.sru_b) == ('heli', 'plane')
+    assert conflict.time == pytest.approx(1800.0)
+    assert conflict.start < 1800.0 < conflict.end
+    assert conflict.lat == pytest.approx(60.0) and conflict.lon == pytest.approx(20.3)
+    assert conflict.distance_nm == pytest.approx(0.0, abs=1e-6)
+    assert conflict.vertical_ft == pytest.approx(200.0)
+
+
+def test_altitude_bands_separate_aircraft():
+    assert find_conflicts(crossing(1000.0, 1600.0)) == []
+    assert find_conflicts(crossing(1000.0, 1500.0, band=(1500.0, 2000.0))) == []
+    overlapping = find_conflicts(crossing(1000.0, 0.0, band=(900.0, 1500.0)))
+    assert len(overlapping) == 1 and overlapping[0].vertical_ft < 0
+
+
+def test_datetime_tracks():
+    base = datetime(2026, 3, 1, 10, 0)
+    times = [base + timedelta(minutes=k) for k in range(61)]
+    a, b = crossing()
+    a = Track.from_waypoints('heli', np.column_stack([a.lat, a.lon]), times, altitude=1000.0)
+    b = Track.from_waypoints('plane', np.column_stack([b.lat, b.lon]), times, altitude=1000.0)
+    conflict = find_conflicts([a, b])[0]
+    assert datetime.fromtimestamp(conflict.time) == base + timedelta(minutes=30)
+    with pytest.raises(ValueError):
+        Track('bad', [0.0, 0.0], [60.0, 60.1], [20.0, 20.0])
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(0)
+    tracks = []
+    for k in range(12):
+        t = np.cumsum(rng.uniform(20, 60, 200))
+        lat = 60 + np.cumsum(rng.normal(0, 0.01, 200))
+        lon = 20.3 + np.cumsum(rng.normal(0, 0.02, 200))
+        if k % 3:
+            tracks.append(Track(k, t, lat, lon, altitude=rng.uniform(500, 1500, 200)))
+        else:
+            tracks.append(Track(k, t, lat, lon, band=(800, 1200)))
+    found = {(conflict.sru_a, conflict.sru_b) for conflict in find_conflicts(tracks)}
+    reference = brute_force(tracks)
+    assert reference <= found
+    # Лишние пары - только нарушения короче шага выборки
+    short = [c for c in find_conflicts(tracks) if (c.sru_a, c.sru_b) in found - reference]
+    assert all(c.end - c.start < 0.5 for c in short)
+
+
+def test_fifty_aircraft_with_ten_thousand_waypoints():
+    tracks = []
+    for k in range(50):
+        column, row = divmod(k, 10)
+        leg, line = np.arange(10_000) % 400, np.arange(10_000) // 400
+        x = column * 6.0 + np.where((line + column) % 2 == 0, leg, 399 - leg) * 6.0 / 400
+        y = row * 6.0 + line * 6.0 / 25
+        lat, lon = laea_inverse(x, y, 60.0, 20.0, ellipsoid=False)
+        tracks.append(Track(k, np.arange(10_000) * 2.0, lat, lon, altitude=500.0 + 300.0 * (k % 2)))
+    start = time.perf_counter()
+    conflicts = find_conflicts(tracks)
+    assert time.perf_counter() - start < 3.0
+    assert conflicts
+    # Конфликты - только у SRU соседних районов (300 футов по вертикали мало)
+    pairs = {(c.sru_a, c.sru_b) for c in conflicts}
+    assert all(abs(a - b) in (1, 10) for a, b in pairs)
+
+
+def test_simulate_multi_sru():
+    assert simulate_multi_sru([[(0, 0), (1, 1)], [(2, 2), (3, 3)]]) == []
+    touching = simulate_multi_sru([[(0, 0), (1, 1)], [(1, 1), (2, 2)]])
+    assert all(isinstance(conflict, Conflict) for conflict in touching)
+    assert conflict_pairs(touching) == [(0, 1)]
+    assert intersect([(0, 0), (2, 2)], [(0, 2), (2, 0)])
+    assert conflict_pairs(simulate_multi_sru(list(crossing()))) == [('heli', 'plane')]
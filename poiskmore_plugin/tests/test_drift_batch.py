@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.drift_calculator import DriftCalculator
+
+
+@pytest.fixture
+def scenarios():
+    rng = np.random.default_rng(42)
+    n = 500
+    types = np.array(list(DriftCalculator.LEEWAY_RATES) + ['Неизвестный объект'], dtype=object)
+    return {
+        'wind_speed': rng.uniform(0, 40, n),
+        'wind_direction': rng.uniform(0, 360, n),
+        'current_speed': rng.uniform(0, 3, n),
+        'current_direction': rng.uniform(0, 360, n),
+        'object_types': types[rng.integers(0, len(types), n)],
+        'elapsed_hours': rng.uniform(0, 72, n),
+    }
+
+
+def test_batch_matches_scalar(scenarios):
+    calc = DriftCalculator()
+    batch = calc.calculate_total_drift_batch(**scenarios)
+
+    for i in range(len(scenarios['wind_speed'])):
+        scalar = calc.calculate_total_drift(
+            {'speed': scenarios['wind_speed'][i], 'direction': scenarios['wind_direction'][i]},
+            {'speed': scenarios['current_speed'][i], 'direction': scenarios['current_direction'][i]},
+            scenarios['object_types'][i],
+            scenarios['elapsed_hours'][i],
+        )
+        for branch in ('center', 'left', 'right'):
+            displacement = scalar[branch]['displacement']
+            assert batch[branch]['dx_nm'][i] == pytest.approx(displacement['dx_nm'], rel=1e-12, abs=1e-9)
+            assert batch[branch]['dy_nm'][i] == pytest.approx(displacement['dy_nm'], rel=1e-12, abs=1e-9)
+            assert batch[branch]['distance_nm'][i] == pytest.approx(scalar[branch]['distance_nm'], rel=1e-12)
+            assert batch[branch]['direction'][i] == pytest.approx(displacement['direction'], abs=1e-9)
+        assert batch['divergence_angle'][i] == scalar['divergence_angle']
+        assert batch['leeway_rate'][i] == scalar['leeway_rate']
+
+
+def test_batch_broadcasts_scalars_and_calm():
+    calc = DriftCalculator()
+    result = calc.calculate_total_drift_batch([0.0, 10.0], 90.0, 0.0, 0.0, 'Обломки', 2.0)
+
+    assert result['center']['distance_nm'].shape == (2,)
+    assert result['center']['direction'][0] == 0.0
+    assert result['center']['distance_nm'][0] == 0.0
+    assert result['center']['direction'][1] == pytest.approx(90.0)
+    assert result['left']['direction'][1] == pytest.approx(55.0)
+    assert result['right']['direction'][1] == pytest.approx(125.0)
@@ -0,0 +1,99 @@
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.drift_checkpoints import CheckpointedRun, IncrementalDrift
+from poiskmore_plugin.calculations.drift_integrator import DriftIntegrator, WeatherSchedule
+from poiskmore_plugin.calculations.leeway_particles import LeewayCoefficients, LeewayParticleEngine
+from poiskmore_plugin.calculations.result_cache import CacheKey, ResultCache
+from poiskmore_plugin.db.weather_schedule_db import latest_drift_checkpoints, migrate_database_for_weather_schedule
+
+CURRENT = [{'time': '2024-06-01 00:00', 'direction': 90, 'speed_kn': 0.5}]
+WIND = [
+    {'time': '2024-06-01 00:00', 'direction': 270, 'speed_ms': 10},
+    {'time': '2024-06-01 12:00', 'direction': 300, 'speed_ms': 14},
+    {'time': '2024-06-02 00:00', 'direction': 320, 'speed_ms': 8},
+]
+NEW_WIND = WIND + [{'time': '2024-06-02 06:00', 'direction': 10, 'speed_ms': 18}]
+START = datetime(2024, 6, 1)
+COEFFICIENTS = LeewayCoefficients.default('Спасательный плот без тента')
+
+
+def engine_for(wind):
+    schedule = WeatherSchedule.from_entries(wind, CURRENT, start_time=START)
+    return LeewayParticleEngine(LeewayCoefficients.default('Спасательный плот без тента'), schedule,
+                                time_step_hours=0.5, chunk_size=400)
+
+
+def test_schedule_change_starts_at_previous_observation():
+    old = WeatherSchedule.from_entries(WIND, CURRENT, start_time=START)
+    new = WeatherSchedule.from_entries(NEW_WIND, CURRENT, start_time=START)
+    assert old.first_change_hours(old) is None
+    assert old.first_change_hours(new) == pytest.approx(24.0)
+
+
+def test_redrift_matches_full_recomputation():
+    runner = IncrementalDrift(engine_for(WIND), checkpoint_interval_hours=6)
+    previous = runner.run((60.0, 25.0), 36, 1000, seed=3, initial_error_nm=0.5, output_hours=(30,))
+    assert [cp.t_hours for cp in previous.checkpoints] == [0, 6, 12, 18, 24, 30, 36]
+
+    updated = runner.update_schedule(previous,
+                                     WeatherSchedule.from_entries(WIND, CURRENT, start_time=START),
+                                     WeatherSchedule.from_entries(NEW_WIND, CURRENT, start_time=START))
+    expected = engine_for(NEW_WIND).simulate((60.0, 25.0), 36, 1000, seed=3, initial_error_nm=0.5)
+
+    np.testing.assert_array_equal(updated.cloud.lat, expected.lat)
+    np.testing.assert_array_equal(updated.cloud.lon, expected.lon)
+    np.testing.assert_array_equal(updated.cloud.branch, expected.branch)
+    assert updated.checkpoints[0] is previous.checkpoints[0]
+    assert not np.array_equal(updated.cloud.lat, previous.cloud.lat)
+
+
+def test_checkpoints_round_trip_through_database():
+    conn = sqlite3.connect(':memory:')
+    migrate_database_for_weather_schedule(conn)
+    runner = IncrementalDrift(engine_for(WIND), checkpoint_interval_hours=12)
+    previous = runner.run((60.0, 25.0), 24, 500, seed=8)
+    previous.save(conn, calculation_id=1)
+
+    loaded = CheckpointedRun.load(conn, 1)
+    assert loaded.n_particles == 500 and len(loaded.checkpoints) == 3
+
+    resumed = runner.redrift(loaded, 12)
+    np.testing.assert_array_equal(resumed.cloud.lat, previous.cloud.lat)
+    np.testing.assert_array_equal(resumed.cloud.lon, previous.cloud.lon)
+
+
+def test_resume_reuses_checkpoints_saved_with_cached_track():
+    cache = ResultCache(sqlite3.connect(':memory:'))
+    lkp, weather = (60.0, 25.0), {'wind': WIND, 'current': CURRENT}
+
+    def calculate(wind, previous):
+        schedule = WeatherSchedule.from_entries(wind, CURRENT)
+        key = CacheKey.build('schedule_drift', 'test', lkp, schedule.start_time, 'плот', incident_id=5,
+                             wind=wind)
+        cache.get_or_compute(key, lambda: DriftIntegrator(schedule, COEFFICIENTS).integrate(lkp, 36))
+        engine = LeewayParticleEngine(COEFFICIENTS, schedule, time_step_hours=0.5, chunk_size=400)
+        run = IncrementalDrift(engine, 6).resume(previous, lkp, 36, 1000, dict(weather, wind=wind), 0.5)
+        run.save(cache.conn, cache.calculation_id(key))
+        return run
+
+    first = calculate(WIND, None)
+    assert latest_drift_checkpoints(cache.conn, 5) == cache.calculation_id(
+        CacheKey.build('schedule_drift', 'test', lkp, START, 'плот', incident_id=5, wind=WIND))
+    loaded = CheckpointedRun.load(cache.conn, latest_drift_checkpoints(cache.conn, 5))
+    assert loaded.weather['start_time'] == START.isoformat()
+
+    unchanged = calculate(WIND, loaded)
+    np.testing.assert_array_equal(unchanged.cloud.lat, first.cloud.lat)
+
+    updated = calculate(NEW_WIND, CheckpointedRun.load(cache.conn, latest_drift_checkpoints(cache.conn, 5)))
+    expected = LeewayParticleEngine(COEFFICIENTS, WeatherSchedule.from_entries(NEW_WIND, CURRENT),
+                                    time_step_hours=0.5, chunk_size=400)
+    expected = expected.simulate(lkp, 36, 1000, seed=updated.seed, initial_error_nm=0.5)
+    np.testing.assert_array_equal(updated.cloud.lat, expected.lat)
+    # До первого изменения (24 ч) контрольные точки прежние
+    np.testing.assert_array_equal(updated.checkpoints[4].lat, first.checkpoints[4].lat)
+    assert latest_drift_checkpoints(cache.conn, 6) is None
@@ -0,0 +1,82 @@
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.drift_integrator import (
+    DriftIntegrator,
+    VectorInterpolant,
+    WeatherSchedule,
+    parse_schedule_time,
+    parse_schedule_times,
+)
+from poiskmore_plugin.calculations.leeway_particles import LeewayCoefficients
+from poiskmore_plugin.db.weather_schedule_db import (
+    migrate_database_for_weather_schedule,
+    save_current_schedule,
+    save_wind_schedule,
+)
+
+
+def test_interpolation_is_circular_safe_and_irregular():
+    interp = VectorInterpolant.from_speed_direction([5.0, 0.0, 1.0], [10, 10, 10], [10, 350, 350])
+    speed, direction = interp.speed_direction([0.0, 3.0, 10.0])
+
+    assert direction[0] == pytest.approx(350.0)
+    assert direction[1] == pytest.approx(0.0, abs=1e-9)
+    assert direction[2] == pytest.approx(10.0)
+    assert speed[1] < 10.0
+
+
+def test_parse_schedule_time_formats():
+    assert parse_schedule_time("2025-06-12 10:00:00") == datetime(2025, 6, 12, 10)
+    assert parse_schedule_time("12.06 10:30", year=2025) == datetime(2025, 6, 12, 10, 30)
+    with pytest.raises(ValueError):
+        parse_schedule_time("вчера")
+    assert parse_schedule_time("29.02 06:00", year=2028) == datetime(2028, 2, 29, 6)
+
+
+def test_schedule_times_roll_over_new_year():
+    times = parse_schedule_times(["31.12 18:00", "31.12 23:00", "01.01 04:00", "2026-01-01 06:00"], year=2025)
+    assert times == [datetime(2025, 12, 31, 18), datetime(2025, 12, 31, 23),
+                     datetime(2026, 1, 1, 4), datetime(2026, 1, 1, 6)]
+    schedule = WeatherSchedule.from_entries(
+        [{'time': '31.12 22:00', 'direction': 0, 'speed_ms': 5}, {'time': '01.01 02:00', 'direction': 0, 'speed_ms': 5}],
+        [], year=2025)
+    assert list(schedule.wind.hours) == [0.0, 4.0]
+
+
+def test_constant_schedule_matches_analytic_drift():
+    schedule = WeatherSchedule.from_entries(
+        [{'time': '2025-06-12 00:00', 'direction': 270, 'speed_ms': 10, 'speed_kn': 20}],
+        [{'time': '2025-06-12 00:00', 'direction': 0, 'speed_kn': 0.5}],
+    )
+    coeffs = LeewayCoefficients("test", 0.03, 0.1, 0.02, 0.0)
+    track = DriftIntegrator(schedule, coeffs, time_step_hours=0.25).integrate((0.0, 0.0), 10)
+
+    assert len(track.hours) == 41
+    # Downwind 0.7 уз на восток + течение 0.5 уз на север
+    assert track.total_drift_nm == pytest.approx(np.hypot(7.0, 5.0), rel=1e-6)
+    assert track.divergence_nm[-1] == pytest.approx(2 * 0.4 * 10, rel=1e-6)
+    assert track.drift_speed_kn[0] == pytest.approx(np.hypot(0.7, 0.5))
+
+
+def test_schedule_from_database_runs_outside_dialog():
+    conn = sqlite3.connect(":memory:")
+    migrate_database_for_weather_schedule(conn)
+    save_wind_schedule(conn, 1, [
+        {'time': '2025-06-12 00:00:00', 'direction': 180, 'speed_ms': 8},
+        {'time': '2025-06-12 07:00:00', 'direction': 200, 'speed_ms': 12},
+        {'time': '2025-06-12 03:30:00', 'direction': 190, 'speed_ms': 10},
+    ])
+    save_current_schedule(conn, 1, [{'time': '2025-06-12 00:00:00', 'direction': 45, 'speed_kn': 0.3}])
+
+    schedule = WeatherSchedule.from_database(conn, 1)
+    track = DriftIntegrator(schedule, LeewayCoefficients.default("Обломки")).integrate((60.0, 25.0), 24)
+    rows = track.to_track_rows(calculation_id=1)
+
+    assert schedule.start_time == datetime(2025, 6, 12)
+    assert len(rows) == len(track.hours) == 24 * 6 + 1
+    assert track.center_lat[-1] > 60.0
+    conn.close()
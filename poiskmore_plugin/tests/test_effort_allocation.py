@@ -0,0 +1,108 @@
+import heapq
+import time
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.effort_allocation import (allocate, assign_units, optimal_effort,
+                                                             sru_effort_nm2)
+from poiskmore_plugin.calculations.poc_grid import PocGrid
+from poiskmore_plugin.calculations.search_area_calculator import SearchAreaCalculator
+from poiskmore_plugin.iamsar_constants import optimal_search_allocation
+
+
+def pos(poc, area, effort):
+    return float(np.sum(poc * -np.expm1(-effort / area)))
+
+
+def greedy_quanta(poc, area, total, steps=20000):
+    """Жадное распределение мелкими порциями через кучу (эталон)"""
+    quantum = total / steps
+    effort = np.zeros(len(poc))
+    heap = [(-poc[i] * -np.expm1(-quantum / area[i]), i) for i in range(len(poc))]
+    heapq.heapify(heap)
+    for _ in range(steps):
+        _, i = heapq.heappop(heap)
+        effort[i] += quantum
+        heapq.heappush(heap, (-poc[i] * np.exp(-effort[i] / area[i]) * -np.expm1(-quantum / area[i]), i))
+    return effort
+
+
+def random_srus(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'id': k, 'name': f"SRU {k}", 'sweep_width': rng.uniform(0.5, 3.0),
+             'search_speed': rng.uniform(8, 150), 'endurance': rng.uniform(2, 8)} for k in range(n)]
+
+
+def test_optimal_effort_beats_greedy_quanta():
+    rng = np.random.default_rng(0)
+    poc = rng.random(200) ** 4
+    poc /= poc.sum()
+    area = rng.uniform(1, 3, 200)
+    effort = optimal_effort(poc, area, 150.0)
+    assert effort.sum() == pytest.approx(150.0)
+    assert (effort >= 0).all()
+    assert pos(poc, area, effort) >= pos(poc, area, greedy_quanta(poc, area, 150.0)) - 1e-9
+
+
+def test_units_split_the_allocation():
+    rng = np.random.default_rng(1)
+    poc = rng.random((60, 70)) ** 3
+    poc /= poc.sum()
+    srus = random_srus(7)
+    plan = allocate(poc, srus, cell_area_nm2=0.5)
+    assert sum(unit.pos for unit in plan.units) == pytest.approx(plan.pos)
+    for unit, sru in zip(plan.units, srus):
+        assert unit.cell_effort.sum() == pytest.approx(sru_effort_nm2(sru))
+    combined = np.zeros(poc.size)
+    for unit in plan.units:
+        np.add.at(combined, unit.cells, unit.cell_effort)
+    np.testing.assert_allclose(combined, plan.effort.ravel(), atol=1e-9)
+
+
+def test_prior_effort_counts_towards_pod():
+    lat = 70 + np.random.default_rng(2).normal(0, 0.1, 20000)
+    lon = 30 + np.random.default_rng(3).normal(0, 0.3, 20000)
+    grid = PocGrid.from_particles(lat, lon, cell_nm=1.0)
+    srus = random_srus(3)
+    first = allocate(grid, srus)
+    second = allocate(grid, srus, prior_effort=first.effort)
+    assert second.pos > first.pos
+    # Два вылета вместе не лучше оптимального распределения суммарного усилия
+    both = allocate(grid, srus + random_srus(3))
+    assert second.pos <= both.pos + 1e-9
+
+
+def test_assign_units_prefers_high_poc_per_area():
+    srus = [{'id': 'a', 'sweep_width': 1.0, 'search_speed': 10.0, 'endurance': 5.0}]
+    choice = assign_units([0.5, 0.3, 0.2], [400.0, 50.0, 50.0], srus)
+    assert choice.tolist() == [1]
+    allocation = optimal_search_allocation(
+        [{'id': 'A', 'poc': 0.5, 'area_nm2': 400.0}, {'id': 'B', 'poc': 0.3, 'area_nm2': 50.0}], srus)
+    assert allocation['B']['sru'] == ['a']
+    assert allocation['B']['pos'] == pytest.approx(0.3 * (1 - np.exp(-1.0)))
+    assert allocation['A']['sru'] == []
+
+
+def test_search_pattern_uses_poc():
+    calculator = SearchAreaCalculator()
+    area = calculator.calculate_from_two_points(
+        {'lat': 70.0, 'lon': 30.0, 'drift_speed': 1.0, 'drift_direction': 45.0},
+        {'lat': 70.2, 'lon': 30.5, 'drift_speed': 1.0, 'drift_direction': 45.0}, 6.0)
+    for index, sub in enumerate(area.sub_areas):
+        sub['poc'] = 1.0 if index == len(area.sub_areas) - 1 else 0.0
+    plan = calculator.optimize_search_pattern(area, random_srus(2))
+    assert [a['sub_area']['id'] for a in plan['assignments']] == [area.sub_areas[-1]['id']] * 2
+    assert 0 < plan['probability_of_success'] <= 1
+
+
+def test_large_allocation_is_fast():
+    rng = np.random.default_rng(4)
+    poc = rng.random(100_000) ** 3
+    poc /= poc.sum()
+    srus = random_srus(50)
+    start = time.perf_counter()
+    plan = allocate(poc, srus, cell_area_nm2=0.25)
+    choice = assign_units(poc, np.full(len(poc), 0.25), srus)
+    assert time.perf_counter() - start < 2.0
+    assert len(plan.units) == 50 and (choice >= 0).all()
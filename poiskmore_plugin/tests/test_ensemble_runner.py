@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.ensemble_runner import EnsembleCancelled, EnsembleRunner, GridSpec, _mp_context
+from poiskmore_plugin.calculations.leeway_particles import (
+    ConstantForcing,
+    LeewayCoefficients,
+    LeewayParticleEngine,
+)
+
+
+@pytest.fixture
+def engine():
+    coeffs = LeewayCoefficients.default("Спасательный плот")
+    return LeewayParticleEngine(coeffs, ConstantForcing(15, 200, 0.4, 90),
+                                time_step_hours=1.0, chunk_size=250)
+
+
+def test_result_does_not_depend_on_worker_count(engine):
+    expected = engine.simulate((59.5, 24.0), 10, 1000, seed=11, output_hours=(5,))
+
+    for workers in (1, 2):
+        cloud = EnsembleRunner(engine, max_workers=workers).run(
+            (59.5, 24.0), 10, 1000, seed=11, output_hours=(5,))
+        np.testing.assert_array_equal(cloud.lat, expected.lat)
+        np.testing.assert_array_equal(cloud.lon, expected.lon)
+        np.testing.assert_array_equal(cloud.branch, expected.branch)
+        np.testing.assert_array_equal(cloud.track_lat, expected.track_lat)
+
+
+
+def test_scenario_engines_reach_workers_once(engine):
+    other = LeewayParticleEngine(LeewayCoefficients.default("Человек в воде"),
+                                 ConstantForcing(10, 90, 0.2, 0), time_step_hours=1.0, chunk_size=250)
+    serial = EnsembleRunner(engine, max_workers=1).run_scenarios([engine, other], (59.5, 24.0), 10, 600, seed=5)
+    pooled = EnsembleRunner(engine, max_workers=2).run_scenarios([engine, other], (59.5, 24.0), 10, 600, seed=5)
+    for expected, cloud in zip(serial, pooled):
+        np.testing.assert_array_equal(cloud.lat, expected.lat)
+        assert cloud.object_type == expected.object_type
+    # Копия процесса QGIS через fork небезопасна
+    assert _mp_context().get_start_method() != 'fork'
+
+
+def test_grid_reduction_counts_all_particles(engine):
+    cloud = engine.simulate((59.5, 24.0), 10, 1000, seed=3)
+    grid = GridSpec(cloud.lat.min() - 0.1, cloud.lat.max() + 0.1,
+                    cloud.lon.min() - 0.1, cloud.lon.max() + 0.1, 20, 30)
+
+    counts = EnsembleRunner(engine, max_workers=2).run_grid((59.5, 24.0), 10, 1000, grid, seed=3)
+
+    assert counts.sum() == 1000
+    np.testing.assert_array_equal(counts, grid.histogram(cloud.lat, cloud.lon))
+
+
+def test_progress_and_cancellation(engine):
+    progress = []
+    runner = EnsembleRunner(engine, max_workers=1, progress_callback=lambda d, t: progress.append((d, t)))
+    runner.run((59.5, 24.0), 2, 1000, seed=1)
+    assert progress[0] == (0, 4) and progress[-1] == (4, 4)
+
+    def cancel_after_first(done, total):
+        if done == 1:
+            runner.cancel()
+
+    runner.progress_callback = cancel_after_first
+    with pytest.raises(EnsembleCancelled):
+        runner.run((59.5, 24.0), 2, 1000, seed=1)
@@ -0,0 +1,83 @@
+import pickle
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.field_store import FieldStore
+from poiskmore_plugin.calculations.leeway_particles import (
+    KNOTS_PER_MS,
+    ConstantForcing,
+    LeewayCoefficients,
+    LeewayParticleEngine,
+)
+
+START = datetime(2024, 6, 1, 0, 0)
+
+
+def linear_u(t, lat, lon):
+    return 0.5 * t + 2.0 * (lat - 55.0) - 1.5 * (lon - 20.0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    hours = [0.0, 3.0, 6.0, 12.0]
+    lats = np.linspace(55.0, 60.0, 51)
+    lons = np.linspace(20.0, 30.0, 81)
+    store = FieldStore.create(str(tmp_path / "forecast"), START, hours, lats, lons,
+                              units={"wind": "ms", "current": "kn"})
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+    for index, t in enumerate(hours):
+        store.write_slice("wind", index, linear_u(t, grid_lat, grid_lon), np.full(grid_lat.shape, 3.0))
+        store.write_slice("current", index, np.zeros(grid_lat.shape), np.full(grid_lat.shape, 0.5))
+    return FieldStore(str(tmp_path / "forecast"), tile_size=16)
+
+
+def test_trilinear_sampling_reproduces_linear_field(store):
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(55.0, 60.0, 2000)
+    lon = rng.uniform(20.0, 30.0, 2000)
+    t = rng.uniform(0.0, 12.0, 2000)
+
+    u, v = store.field("wind").sample(t, lat, lon)
+
+    np.testing.assert_allclose(u, linear_u(t, lat, lon) * KNOTS_PER_MS, rtol=1e-5, atol=1e-4)
+    np.testing.assert_allclose(v, 3.0 * KNOTS_PER_MS, rtol=1e-6)
+
+
+def test_only_touched_tiles_are_loaded(store):
+    field = store.field("wind")
+    field.sample(1.0, np.array([56.0, 56.1]), np.array([21.0, 21.2]))
+
+    assert field.loaded_times == {0, 1}
+    assert field.tile_loads == 2
+
+
+def test_forcing_matches_constant_forcing(store):
+    forcing = store.forcing(START + timedelta(hours=2))
+    coeffs = LeewayCoefficients.default("Обломки")
+    lkp = (57.5, 25.0)
+
+    wind_u, wind_v, current_u, current_v = forcing(0.0, np.array([lkp[0]]), np.array([lkp[1]]))
+    np.testing.assert_allclose(current_v, 0.5, rtol=1e-6)
+
+    uniform = LeewayParticleEngine(coeffs, ConstantForcing(0, 0, 0.5, 0), time_step_hours=1.0)
+    gridded = LeewayParticleEngine(coeffs, store.forcing(), time_step_hours=1.0)
+    # Поле ветра линейно, поэтому сравниваем только течение при нулевом ливее
+    gridded.forcing.wind = None
+    expected = uniform.simulate(lkp, 6, 200, seed=5)
+    cloud = gridded.simulate(lkp, 6, 200, seed=5)
+    np.testing.assert_allclose(cloud.lat, expected.lat, rtol=1e-9)
+
+
+def test_pickle_passes_file_path_not_data(store):
+    field = store.field("wind")
+    field.sample(1.0, np.array([56.0]), np.array([21.0]))
+    data = pickle.dumps(store.forcing())
+    assert len(data) < 4096
+
+    forcing = pickle.loads(data)
+    assert isinstance(forcing.wind.u, np.memmap)
+    assert not forcing.wind.loaded_times
+    lat, lon = np.array([57.3, 58.9]), np.array([22.2, 28.4])
+    np.testing.assert_array_equal(forcing.wind.sample(4.0, lat, lon)[0], field.sample(4.0, lat, lon)[0])
@@ -0,0 +1,154 @@
+import math
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations import geodesy
+from poiskmore_plugin.calculations.search_area_calculator import SearchAreaCalculator
+
+# Классический пример Винсенти: Flinders Peak -> Buninyong
+FLINDERS = (-(37 + 57 / 60 + 3.72030 / 3600), 144 + 25 / 60 + 29.52440 / 3600)
+BUNINYONG = (-(37 + 39 / 60 + 10.15610 / 3600), 143 + 55 / 60 + 35.38390 / 3600)
+DISTANCE_NM = 54972.271 / 1852
+AZIMUTH = 306 + 52 / 60 + 5.37 / 3600
+
+
+def scalar_haversine(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return 3440.065 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def test_vincenty_reference_case():
+    distance, azimuth = geodesy.inverse(*FLINDERS, *BUNINYONG)
+    assert distance == pytest.approx(DISTANCE_NM, abs=1e-5)
+    assert azimuth == pytest.approx(AZIMUTH, abs=1e-5)
+
+    lat, lon = geodesy.destination(*FLINDERS, DISTANCE_NM, AZIMUTH, ellipsoid=True)
+    assert lat == pytest.approx(BUNINYONG[0], abs=1e-8)
+    assert lon == pytest.approx(BUNINYONG[1], abs=1e-8)
+
+
+def test_spherical_kernel_matches_scalar_versions():
+    rng = np.random.default_rng(1)
+    lat1, lat2 = rng.uniform(-70, 70, (2, 500))
+    lon1, lon2 = rng.uniform(-180, 180, (2, 500))
+
+    expected = [scalar_haversine(*p) for p in zip(lat1, lon1, lat2, lon2)]
+    np.testing.assert_allclose(geodesy.distance_nm(lat1, lon1, lat2, lon2), expected, rtol=1e-12)
+
+    calc = SearchAreaCalculator()
+    assert calc._calculate_distance((60.0, 25.0), (59.0, 27.0)) == pytest.approx(
+        scalar_haversine(60.0, 25.0, 59.0, 27.0), rel=1e-12)
+
+
+def test_destination_inverts_distance_and_bearing():
+    rng = np.random.default_rng(2)
+    lat = rng.uniform(-60, 60, 200)
+    lon = rng.uniform(-170, 170, 200)
+    distance = rng.uniform(0.1, 500, 200)
+    bearing = rng.uniform(0, 360, 200)
+
+    for ellipsoid in (False, True):
+        lat2, lon2 = geodesy.destination(lat, lon, distance, bearing, ellipsoid=ellipsoid)
+        back, azimuth = geodesy.inverse(lat, lon, lat2, lon2, ellipsoid=ellipsoid)
+        np.testing.assert_allclose(back, distance, rtol=1e-9)
+        np.testing.assert_allclose((azimuth - bearing + 180) % 360 - 180, 0, atol=1e-7)
+
+
+def test_enu_round_trip():
+    lat = np.array([60.5, 59.2, 61.0])
+    lon = np.array([24.0, 26.5, 28.1])
+    for ellipsoid in (False, True):
+        east, north, up = geodesy.to_enu(lat, lon, 60.0, 25.0, ellipsoid=ellipsoid)
+        assert east[1] > 0 and north[1] < 0
+        back_lat, back_lon = geodesy.from_enu(east, north, up, 60.0, 25.0, ellipsoid=ellipsoid)
+        np.testing.assert_allclose(back_lat, lat, atol=1e-10)
+        np.testing.assert_allclose(back_lon, lon, atol=1e-10)
+
+
+def test_ellipsoidal_area_matches_closed_forms():
+    e = math.sqrt(geodesy.WGS84_E2)
+    a = geodesy.WGS84_A_NM
+    earth = 2 * math.pi * a * a * (1 + (1 - geodesy.WGS84_E2) / e * math.atanh(e))
+    octant = geodesy.ring_area_nm2([0, 0, 90, 90], [0, 90, 90, 0])
+    assert octant == pytest.approx(earth / 8, rel=1e-12)
+    assert earth * geodesy.KM_PER_NM ** 2 == pytest.approx(510.0656e6, rel=1e-6)
+
+    # Обход по часовой стрелке - отрицательная площадь со знаком
+    assert geodesy.ring_area_nm2([60, 61, 61, 60], [20, 20, 21, 21], signed=True) < 0
+    # Сферическая модель: площадь пояса 2πR²(sinφ2 - sinφ1) на долю долготы
+    sphere = geodesy.ring_area_nm2([60, 60, 61, 61], [20, 21, 21, 20], ellipsoid=False)
+    expected = geodesy.EARTH_RADIUS_NM ** 2 * math.radians(1) * (math.sin(math.radians(61))
+                                                                 - math.sin(math.radians(60)))
+    assert sphere == pytest.approx(expected, rel=1e-12)
+
+
+def test_area_of_holes_multipolygons_and_batches():
+    outer = [(60, 20), (60, 22), (62, 22), (62, 20)]
+    hole = [(60.5, 20.5), (60.5, 21), (61, 21), (61, 20.5)]
+    whole = geodesy.polygon_area_nm2([outer])
+    assert geodesy.polygon_area_nm2([outer, hole]) == pytest.approx(
+        whole - geodesy.polygon_area_nm2([hole]), rel=1e-12)
+    assert geodesy.multipolygon_area_nm2([[outer, hole], [hole]]) == pytest.approx(whole, rel=1e-12)
+
+    # 10 000 ячеек сетки одним вызовом в сумме дают весь район
+    lat_edges = np.linspace(60, 62, 101)
+    lon_edges = np.linspace(20, 22, 101)
+    lat0, lon0 = np.meshgrid(lat_edges[:-1], lon_edges[:-1], indexing='ij')
+    lat1, lon1 = np.meshgrid(lat_edges[1:], lon_edges[1:], indexing='ij')
+    cells = geodesy.ring_area_nm2(np.stack([lat0, lat0, lat1, lat1], axis=-1),
+                                  np.stack([lon0, lon1, lon1, lon0], axis=-1))
+    assert cells.shape == (100, 100)
+    assert cells.sum() == pytest.approx(whole, rel=1e-10)
+
+    # Кольца разной длины, в том числе с тысячами вершин
+    t = np.linspace(0, 2 * np.pi, 5000, endpoint=False)
+    circle_lat, circle_lon = 70 + np.sin(t), 30 + 3 * np.cos(t)
+    lats = np.concatenate([circle_lat, [60, 60, 62, 62]])
+    lons = np.concatenate([circle_lon, [20, 22, 22, 20]])
+    index = np.repeat([0, 1], [5000, 4])
+    areas = geodesy.rings_area_nm2(lats, lons, index)
+    assert areas[0] == pytest.approx(geodesy.ring_area_nm2(circle_lat, circle_lon), rel=1e-12)
+    assert areas[1] == pytest.approx(whole, rel=1e-12)
+
+
+def test_search_area_uses_ellipsoidal_area():
+    calc = SearchAreaCalculator()
+    square = [(70, 20), (70, 30), (75, 30), (75, 20)]
+    exact = geodesy.polygon_area_nm2([square])
+    assert calc._calculate_polygon_area(square) == pytest.approx(exact, rel=1e-12)
+
+    # Подрайоны обрезаются по району: их сумма - площадь района
+    sub_areas = calc._divide_into_sub_areas(square, 2.0)
+    total = sum(sub['area_nm2'] for sub in sub_areas)
+    assert total == pytest.approx(exact, rel=1e-4)
+
+
+def test_surface_from_enu_inverts_to_enu():
+    lat = np.array([60.5, 61.3, 58.0, 59.9])
+    lon = np.array([20.2, 22.0, 17.0, 19.5])
+    for ellipsoid in (True, False):
+        east, north, _ = geodesy.to_enu(lat, lon, 60, 20, ellipsoid)
+        back_lat, back_lon = geodesy.surface_from_enu(east, north, 60, 20, ellipsoid)
+        np.testing.assert_allclose(back_lat, lat, atol=1e-10)
+        np.testing.assert_allclose(back_lon, lon, atol=1e-10)
+
+
+def test_laea_is_equal_area_and_invertible():
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(55, 80, 500), rng.uniform(0, 60, 500)
+    for ellipsoid in (True, False):
+        x, y = geodesy.laea_forward(lat, lon, 70, 30, ellipsoid)
+        back_lat, back_lon = geodesy.laea_inverse(x, y, 70, 30, ellipsoid)
+        np.testing.assert_allclose(back_lat, lat, atol=1e-8)
+        np.testing.assert_allclose(back_lon, lon, atol=1e-10)
+
+    # Квадрат 100x100 миль в проекции - 10000 кв. миль на эллипсоиде
+    side = np.linspace(-50, 50, 2001)
+    x = np.concatenate([side, np.full_like(side, 50), side[::-1], np.full_like(side, -50)])
+    y = np.concatenate([np.full_like(side, -50), side, np.full_like(side, 50), side[::-1]])
+    ring_lat, ring_lon = geodesy.laea_inverse(x, y, 70, 30)
+    assert geodesy.ring_area_nm2(ring_lat, ring_lon) == pytest.approx(1e4, rel=1e-6)
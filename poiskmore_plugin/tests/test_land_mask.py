@@ -0,0 +1,121 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.drift_calculator import DriftCalculator, DriftVector
+from poiskmore_plugin.calculations.drift_checkpoints import IncrementalDrift
+from poiskmore_plugin.calculations.drift_integrator import DriftIntegrator, WeatherSchedule
+from poiskmore_plugin.calculations.land_mask import LandMask, polygons_from_geojson
+from poiskmore_plugin.calculations.leeway_particles import (
+    ConstantForcing,
+    LeewayCoefficients,
+    LeewayParticleEngine,
+)
+from poiskmore_plugin.calculations.trajectory_store import STATUS_STRANDED
+
+# Остров с озером и треугольный мыс (lon, lat)
+ISLAND = [[20, 59], [21, 59], [21, 60], [20, 60], [20, 59]]
+LAKE = [[20.3, 59.3], [20.6, 59.3], [20.6, 59.6], [20.3, 59.6], [20.3, 59.3]]
+CAPE = [[22, 59], [23.5, 59.2], [22.2, 60.7], [22, 59]]
+GEOJSON = {
+    "type": "FeatureCollection",
+    "features": [{"type": "Feature", "properties": {},
+                  "geometry": {"type": "MultiPolygon", "coordinates": [[ISLAND, LAKE], [CAPE]]}}]
+}
+
+
+def reference_inside(x, y, rings):
+    """Четность пересечений луча вправо по всем кольцам"""
+    inside = np.zeros(len(x), dtype=bool)
+    for ring in rings:
+        ring = np.asarray(ring, dtype=float)
+        for (ax, ay), (bx, by) in zip(ring[:-1], ring[1:]):
+            if ay == by:
+                continue
+            inside ^= ((ay > y) != (by > y)) & (x < (bx - ax) * (y - ay) / (by - ay) + ax)
+    return inside
+
+
+@pytest.mark.parametrize('cell_deg', [0.01, 0.05, 0.13])
+def test_is_land_matches_exact_point_in_polygon(cell_deg):
+    mask = LandMask(polygons_from_geojson(GEOJSON), cell_deg=cell_deg)
+    rng = np.random.default_rng(1)
+    x = rng.uniform(19.5, 24.0, 100_000)
+    y = rng.uniform(58.5, 61.0, 100_000)
+    assert np.array_equal(mask.is_land(y, x), reference_inside(x, y, [ISLAND, LAKE, CAPE]))
+    # Озеро - вода, вне растра - вода
+    assert not mask.is_land(59.45, 20.45)
+    assert mask.is_land(59.2, 20.2)
+    assert not mask.is_land(0.0, 0.0)
+
+
+def test_from_geojson_file(tmp_path):
+    path = tmp_path / 'land.geojson'
+    path.write_text(json.dumps(GEOJSON), encoding='utf-8')
+    mask = LandMask.from_geojson(str(path), cell_deg=0.05)
+    assert mask.is_land(np.array([59.5, 59.5]), np.array([20.1, 19.9])).tolist() == [True, False]
+
+
+def test_particles_strand_on_coast_and_stay():
+    mask = LandMask(polygons_from_geojson(GEOJSON), cell_deg=0.02)
+    # Восточный ветер и течение на запад - к острову
+    engine = LeewayParticleEngine(LeewayCoefficients.default('Обломки'),
+                                  ConstantForcing(20, 90, 1.0, 270), time_step_hours=0.25,
+                                  chunk_size=300, land_mask=mask)
+    cloud = engine.simulate((59.5, 21.3), 24, 1000, seed=2, initial_error_nm=1.0, output_hours=(12, 24))
+
+    stranded = cloud.stranded
+    assert stranded.mean() > 0.9
+    assert not mask.is_land(cloud.lat, cloud.lon).any()
+    # Выброшенные частицы у восточного берега острова
+    assert np.all(np.abs(cloud.lon[stranded] - 21.0) < 0.05)
+    assert np.all((cloud.stranded_hours[stranded] > 0) & (cloud.stranded_hours[stranded] <= 24))
+
+    store = cloud.to_store()
+    late = cloud.stranded_hours <= 12
+    assert np.all(store.status[0, late] == STATUS_STRANDED)
+    assert np.array_equal(store.lat[0, late], store.lat[1, late])
+
+    # Без маски частицы проходят сквозь остров
+    free = LeewayParticleEngine(engine.coefficients, engine.forcing, 0.25, 300)
+    assert free.simulate((59.5, 21.3), 24, 1000, seed=2, initial_error_nm=1.0).lon.mean() < 20.5
+
+
+def test_checkpoint_redrift_keeps_stranding():
+    mask = LandMask(polygons_from_geojson(GEOJSON), cell_deg=0.02)
+    start = datetime(2024, 6, 1)
+    current = [{'time': '2024-06-01 00:00', 'direction': 270, 'speed_kn': 1.0}]
+    wind = [{'time': '2024-06-01 00:00', 'direction': 90, 'speed_ms': 10}]
+    new_wind = wind + [{'time': '2024-06-01 18:00', 'direction': 180, 'speed_ms': 15}]
+    schedule = WeatherSchedule.from_entries(wind, current, start_time=start)
+    engine = LeewayParticleEngine(LeewayCoefficients.default('Обломки'), schedule, 0.5, 250,
+                                  land_mask=mask)
+    runner = IncrementalDrift(engine, checkpoint_interval_hours=6)
+    previous = runner.run((59.5, 21.3), 30, 500, seed=4)
+    updated = runner.update_schedule(previous, schedule,
+                                     WeatherSchedule.from_entries(new_wind, current, start_time=start))
+
+    full = runner.engine.simulate((59.5, 21.3), 30, 500, seed=4)
+    assert runner.engine.land_mask is mask
+    assert np.array_equal(updated.cloud.lat, full.lat)
+    assert np.array_equal(updated.cloud.stranded_hours, full.stranded_hours, equal_nan=True)
+
+
+def test_deterministic_calculators_stop_at_coast():
+    mask = LandMask(polygons_from_geojson(GEOJSON), cell_deg=0.02)
+    line = DriftCalculator(land_mask=mask).calculate_drift_line_store(
+        (59.5, 21.3), DriftVector(direction=270.0, speed=2.0), 24, num_points=24)
+    assert line.status[-1, 0] == STATUS_STRANDED
+    assert 20.99 < line.lon[-1, 0] < 21.1
+
+    schedule = WeatherSchedule.from_entries(
+        [{'time': '2024-06-01 00:00', 'direction': 90, 'speed_ms': 12}],
+        [{'time': '2024-06-01 00:00', 'direction': 270, 'speed_kn': 0.8}],
+        start_time=datetime(2024, 6, 1))
+    track = DriftIntegrator(schedule, LeewayCoefficients.default('Обломки'), land_mask=mask).integrate(
+        (59.5, 21.3), 24)
+    assert 0 < track.left_stranded_hours < 24 and 0 < track.right_stranded_hours < 24
+    assert not mask.is_land(track.left_lat, track.left_lon).any()
+    assert track.datum_points()[0]['lon'] > 21.0
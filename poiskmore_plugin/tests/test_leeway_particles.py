@@ -0,0 +1,57 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.leeway_particles import (
+    ConstantForcing,
+    LeewayCoefficients,
+    LeewayParticleEngine,
+)
+from poiskmore_plugin.db.weather_schedule_db import migrate_database_for_weather_schedule
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    migrate_database_for_weather_schedule(conn)
+    yield conn
+    conn.close()
+
+
+def test_coefficients_from_database(conn):
+    coeffs = LeewayCoefficients.from_database(conn, "Человек в спасжилете")
+    assert coeffs.dwl_slope == pytest.approx(0.012)
+    assert coeffs.sigma_cwl == pytest.approx(0.1)
+
+    fallback = LeewayCoefficients.from_database(conn, "Неизвестный объект")
+    assert fallback.object_type == "Обломки"
+
+
+def test_simulation_is_reproducible_and_chunked():
+    coeffs = LeewayCoefficients.default("Обломки")
+    forcing = ConstantForcing(20, 270, 0.5, 0)
+    engine = LeewayParticleEngine(coeffs, forcing, time_step_hours=1.0, chunk_size=300)
+
+    first = engine.simulate((60.0, 25.0), 12, 1000, seed=7)
+    second = engine.simulate((60.0, 25.0), 12, 1000, seed=7)
+
+    np.testing.assert_array_equal(first.lat, second.lat)
+    np.testing.assert_array_equal(first.lon, second.lon)
+    np.testing.assert_array_equal(first.branch, second.branch)
+
+
+def test_branches_diverge_across_wind_without_jibing():
+    coeffs = LeewayCoefficients("test", 0.03, 0.0, 0.02, 0.0)
+    engine = LeewayParticleEngine(coeffs, ConstantForcing(20, 270), time_step_hours=0.5)
+
+    cloud = engine.simulate((60.0, 25.0), 10, 200, seed=1, output_hours=[0, 5, 10])
+    center, left, right = cloud.datum_points()
+
+    # Ветер с запада: дрейф на восток, левая ветвь севернее правой
+    assert center["lon"] > 25.0
+    assert left["lat"] > 60.0 > right["lat"]
+    assert left["distance_nm"] == pytest.approx(20 * np.hypot(0.03, 0.02) * 10, rel=1e-3)
+    assert left["spread_nm"] == pytest.approx(0.0, abs=1e-6)
+    assert cloud.track_lat.shape == (3, 200)
+    assert np.all(cloud.track_lat[0] == np.float32(60.0))
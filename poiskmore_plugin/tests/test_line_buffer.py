@@ -0,0 +1,90 @@
+import math
+import time
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.geodesy import bearing_deg, destination, distance_nm
+from poiskmore_plugin.calculations.land_mask import LandMask
+from poiskmore_plugin.calculations.line_buffer import buffer_line
+from poiskmore_plugin.calculations.search_area_calculator import SearchAreaCalculator
+
+
+def distance_to_line(lat, lon, line, step=0.02):
+    """Расстояние до ломаной перебором плотно расставленных точек"""
+    samples = []
+    for (lat1, lon1), (lat2, lon2) in zip(line[:-1], line[1:]):
+        length = float(distance_nm(lat1, lon1, lat2, lon2))
+        count = max(int(length / step), 1)
+        samples.append(np.column_stack(destination(lat1, lon1, np.arange(count) * length / count,
+                                                   bearing_deg(lat1, lon1, lat2, lon2))))
+    samples.append(np.asarray(line[-1:], dtype=float))
+    samples = np.concatenate(samples)
+    return np.array([distance_nm(a, b, samples[:, 0], samples[:, 1]).min() for a, b in zip(lat, lon)])
+
+
+def heading_walk(n, seed, step_nm=0.1, turn_deg=3.0):
+    rng = np.random.default_rng(seed)
+    heading = np.radians(np.cumsum(rng.normal(0, turn_deg, n)))
+    lat = 70 + np.cumsum(step_nm / 60 * np.cos(heading))
+    lon = 20 + np.cumsum(step_nm / 60 * np.sin(heading) / math.cos(math.radians(70)))
+    return list(zip(lat, lon))
+
+
+def test_straight_line_areas():
+    line = [(70.0, 30.0), (70.0, 32.0)]
+    length = float(distance_nm(70.0, 30.0, 70.0, 32.0))
+    flat = buffer_line(line, 3.0, cap='flat')
+    rounded = buffer_line(line, 3.0)
+    assert flat.area_nm2() == pytest.approx(2 * 3.0 * length, rel=0.01)
+    assert rounded.area_nm2() == pytest.approx(2 * 3.0 * length + math.pi * 9.0, rel=0.01)
+
+
+def test_mitre_corner_adds_square_tip():
+    line = [(70.0, 30.0), (70.3, 30.0), (70.3, 31.0)]
+    rounded = buffer_line(line, 2.0, cap='flat')
+    mitre = buffer_line(line, 2.0, join='mitre', cap='flat')
+    assert mitre.area_nm2() - rounded.area_nm2() == pytest.approx((1 - math.pi / 4) * 4.0, rel=0.05)
+
+
+@pytest.mark.parametrize("line,distance", [
+    ([(70, 30), (70.5, 31), (70.5, 33), (70, 32), (70.8, 31.5)], 5.0),
+    (heading_walk(300, 1, turn_deg=25.0), 0.5),
+])
+def test_union_matches_distance_to_line(line, distance):
+    buffer = buffer_line(line, distance)
+    assert len(buffer.polygons) == 1
+    mask = LandMask([[ring[:, ::-1] for ring in polygon] for polygon in buffer.polygons], cell_deg=0.05)
+
+    points = np.asarray(line, dtype=float)
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(points[:, 0].min() - distance / 50, points[:, 0].max() + distance / 50, 1500)
+    lon = rng.uniform(points[:, 1].min() - distance / 25, points[:, 1].max() + distance / 25, 1500)
+    expected = distance_to_line(lat, lon, line)
+    certain = np.abs(expected - distance) > 0.01 * distance + 0.03
+    inside = mask.is_land(lat, lon)
+    assert np.array_equal(inside[certain], expected[certain] <= distance)
+
+
+def test_closed_track_leaves_hole():
+    buffer = buffer_line([(70, 30), (70.5, 30), (70.5, 32), (70, 32), (70, 30.05)], 3.0)
+    assert len(buffer.polygons) == 1
+    assert len(buffer.polygons[0]) == 2
+
+
+def test_long_track_is_interactive():
+    line = heading_walk(5000, 2)
+    start = time.perf_counter()
+    buffer = buffer_line(line, 2.0)
+    assert time.perf_counter() - start < 2.0
+    assert buffer.area_nm2() > 0
+
+
+def test_along_line_area_uses_buffer():
+    calculator = SearchAreaCalculator()
+    line = [(70, 30), (70.5, 31), (70.5, 33), (70, 32), (70.8, 31.5)]
+    area = calculator.calculate_along_line(line, 10.0)
+    assert area.area_nm2 == pytest.approx(buffer_line(line, 5.0, cap='flat').area_nm2())
+    # Перекрытие на пересечении считается один раз
+    assert area.area_nm2 < calculator._calculate_line_length(line) * 10.0
+    assert len(area.bounds) > 4
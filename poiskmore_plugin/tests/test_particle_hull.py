@@ -0,0 +1,89 @@
+import time
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.geodesy import distance_nm
+from poiskmore_plugin.calculations.particle_hull import convex_hull, particle_hull, probable_mask
+
+
+def left_of_edges(points, vertices):
+    """Векторные произведения ребер оболочки и точек [ребро, точка]"""
+    a = points[vertices]
+    b = np.roll(a, -1, axis=0)
+    return (b[:, :1] - a[:, :1]) * (points[:, 1] - a[:, 1:]) - (b[:, 1:] - a[:, 1:]) * (points[:, 0] - a[:, :1])
+
+
+def annulus(count, inner_nm=5.0, outer_nm=8.0, seed=0):
+    """Кольцо частиц вокруг 60 с. ш. 20 в. д."""
+    rng = np.random.default_rng(seed)
+    angle = rng.uniform(0, 2 * np.pi, count)
+    radius = np.sqrt(rng.uniform(inner_nm ** 2, outer_nm ** 2, count)) / 60
+    return 60 + radius * np.sin(angle), 20 + radius * np.cos(angle) / np.cos(np.radians(60))
+
+
+def test_convex_hull_contains_points_and_turns_left():
+    rng = np.random.default_rng(0)
+    for k in range(100):
+        points = rng.integers(0, 6, (rng.integers(3, 3000), 2)) + rng.normal(0, 1, 2) * (k % 2)
+        vertices = convex_hull(points)
+        if len(vertices) < 3:
+            continue
+        assert (left_of_edges(points, vertices) >= -1e-9).all()
+        edge = np.diff(points[np.append(vertices, vertices[0])], axis=0)
+        following = np.roll(edge, -1, axis=0)
+        assert (edge[:, 0] * following[:, 1] - edge[:, 1] * following[:, 0] > 0).all()
+
+    square = [[0, 0], [1, 0], [1, 1], [0, 1], [0.5, 0.5], [0, 0], [0.5, 0]]
+    assert list(convex_hull(square)) == [0, 1, 2, 3]
+    assert list(convex_hull([[0, 0], [1, 1], [2, 2], [np.nan, 5]])) == [0, 2]
+    assert list(convex_hull([[3, 4]])) == [0] and len(convex_hull(np.empty((0, 2)))) == 0
+
+
+def test_trimmed_hull_of_million_particles():
+    rng = np.random.default_rng(1)
+    lat, lon = 60 + rng.normal(0, 0.1, 1_000_000), 20 + rng.normal(0, 0.2, 1_000_000)
+    particle_hull(lat[:1000], lon[:1000])
+    start = time.perf_counter()
+    full = particle_hull(lat, lon)
+    assert time.perf_counter() - start < 1.0
+    trimmed = particle_hull(lat, lon, fraction=0.9)
+    assert trimmed.fraction == pytest.approx(0.9, abs=0.01)
+    assert trimmed.area_nm2() < 0.4 * full.area_nm2()
+    # 90% нормального облака - эллипс радиуса 2.15 сигмы
+    assert trimmed.area_nm2() == pytest.approx(np.pi * 2.146 ** 2 * 6 * 6, rel=0.1)
+    mask = probable_mask(lat, lon, fraction=0.9)
+    assert mask.mean() == pytest.approx(0.9, abs=0.01)
+    center = np.hypot((lat - 60) / 0.1, (lon - 20) / 0.2)
+    assert np.median(center[mask]) < np.median(center[~mask])
+
+
+def test_alpha_hull_keeps_hole_and_separates_clusters():
+    lat, lon = annulus(200_000)
+    start = time.perf_counter()
+    hull = particle_hull(lat, lon, alpha_nm=0.5)
+    assert time.perf_counter() - start < 1.0
+    assert len(hull.polygons) == 1 and len(hull.polygons[0]) == 2
+    assert hull.area_nm2() == pytest.approx(np.pi * (8 ** 2 - 5 ** 2), rel=0.12)
+    hole = hull.polygons[0][1]
+    assert distance_nm(hole[:, 0], hole[:, 1], 60.0, 20.0).max() < 5.5
+    assert particle_hull(lat, lon).area_nm2() == pytest.approx(np.pi * 8 ** 2, rel=0.02)
+
+    twin_lat = np.concatenate([lat, lat])
+    twin_lon = np.concatenate([lon, lon + 1.0])
+    assert len(particle_hull(twin_lat, twin_lon, alpha_nm=0.5).polygons) == 2
+    assert len(particle_hull(twin_lat, twin_lon, alpha_nm=20.0).polygons) == 1
+    with pytest.raises(ValueError):
+        particle_hull(lat, lon, alpha_nm=0.0)
+
+
+def test_weights_and_antimeridian():
+    rng = np.random.default_rng(2)
+    lat = rng.normal(0, 0.1, 20_000)
+    lon = np.where(rng.random(20_000) < 0.5, 179.95, -179.95) + rng.normal(0, 0.02, 20_000)
+    shifted = particle_hull(lat, (lon + 360) % 360 - 180)
+    assert particle_hull(lat, lon).area_nm2() == pytest.approx(shifted.area_nm2(), rel=1e-6)
+    weights = np.where(lon > 0, 1.0, 1e-3)
+    heavy = particle_hull(lat, lon, weights=weights, fraction=0.9)
+    assert (heavy.polygons[0][0][:, 1] > 0).all()
+    assert particle_hull([np.nan], [np.nan]).polygons == []
@@ -0,0 +1,80 @@
+import math
+import time
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.geodesy import laea_inverse
+from poiskmore_plugin.calculations.poc_grid import PocGrid
+
+
+def cloud(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 70 + rng.normal(0, 0.2, n), 30 + rng.normal(0, 0.6, n)
+
+
+def test_histogram_counts_particles_per_cell():
+    lat, lon = cloud(20000)
+    grid = PocGrid.from_particles(lat, lon, cell_nm=2.0)
+    assert grid.containment == pytest.approx(1.0)
+    row, col, inside = grid.cell_index(lat, lon)
+    assert inside.all()
+    expected = np.bincount(row * grid.shape[1] + col, minlength=grid.values.size) / len(lat)
+    np.testing.assert_allclose(grid.values.ravel(), expected)
+
+
+def test_weights_and_chunks_accumulate():
+    lat, lon = cloud(10000)
+    weights = np.linspace(0.5, 1.5, len(lat))
+    whole = PocGrid.from_particles(lat, lon, weights, cell_nm=3.0)
+    parts = PocGrid.empty(whole.origin, whole.x0, whole.y0, whole.cell_nm, whole.shape)
+    for chunk in np.array_split(np.arange(len(lat)), 3):
+        parts.add_particles(lat[chunk], lon[chunk], weights[chunk], total_weight=weights.sum())
+    np.testing.assert_allclose(parts.values, whole.values)
+
+
+def test_kde_matches_gaussian_datum():
+    # Облако из одного нормального распределения: ядерная оценка близка к
+    # точной вероятности по ячейкам
+    rng = np.random.default_rng(1)
+    datum = {'lat': 70.0, 'lon': 30.0, 'sigma_nm': 5.0}
+    exact = PocGrid.from_datums([datum], cell_nm=1.0, extent_sigmas=4.0)
+    x = rng.normal(0, 5.0, 200000)
+    y = rng.normal(0, 5.0, 200000)
+    lat, lon = laea_inverse(x, y, 70.0, 30.0)
+    grid = PocGrid.empty(exact.origin, exact.x0, exact.y0, exact.cell_nm, exact.shape)
+    grid.add_particles(lat, lon, method='kde', bandwidth_nm=1.0)
+    assert np.abs(grid.values - exact.values).sum() < 0.05
+    # Пик - плотность нормального распределения на площадь ячейки
+    assert exact.values.max() == pytest.approx(1.0 / (2 * math.pi * 25.0), rel=0.01)
+
+
+def test_datums_are_weighted():
+    datums = [{'lat': 70.0, 'lon': 30.0, 'sigma_nm': 2.0, 'weight': 3.0},
+              {'lat': 70.5, 'lon': 31.0, 'spread_nm': 2.0 * math.sqrt(2), 'weight': 1.0}]
+    grid = PocGrid.from_datums(datums, cell_nm=0.5, extent_sigmas=5.0)
+    assert grid.containment == pytest.approx(1.0, abs=1e-5)
+    first, second = grid.sample([70.0, 70.5], [30.0, 31.0])
+    assert first / second == pytest.approx(3.0, rel=0.02)
+
+
+def test_raster_georeference():
+    lat, lon = cloud(5000)
+    grid = PocGrid.from_particles(lat, lon, shape=(40, 50))
+    raster = grid.raster()
+    assert raster.dtype == np.float32 and raster.flags.c_contiguous
+    assert raster.shape == (40, 50)
+    x0, cell, _, top, _, negative = grid.geotransform()
+    assert negative == -cell
+    assert top - 40 * cell == pytest.approx(grid.y0 * 1852.0)
+    assert '+proj=laea' in grid.proj4()
+    center_lat, _ = grid.cell_centers()
+    assert center_lat[0, 0] > center_lat[-1, 0]
+
+
+def test_million_particles_grid_is_fast():
+    lat, lon = cloud(1_000_000)
+    start = time.perf_counter()
+    grid = PocGrid.from_particles(lat, lon, shape=(500, 500))
+    assert time.perf_counter() - start < 1.0
+    assert grid.containment == pytest.approx(1.0)
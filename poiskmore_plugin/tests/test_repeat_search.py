@@ -0,0 +1,52 @@
+import sqlite3
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+from PyQt5.QtWidgets import QMessageBox
+
+from poiskmore_plugin.db import paths
+from poiskmore_plugin.dialogs.dialog_repeat_search import DialogRepeatSearch
+from poiskmore_plugin.poiskmore_plugin import PoiskMorePlugin
+
+
+@pytest.fixture
+def incidents_db(tmp_path, monkeypatch):
+    """БД инцидентов во временном каталоге data с одной закрытой операцией"""
+    monkeypatch.setattr(paths, 'DATA_DIR', str(tmp_path))
+    for name in ('information', 'warning', 'critical'):
+        monkeypatch.setattr(QMessageBox, name, staticmethod(lambda *args, **kwargs: QMessageBox.Ok))
+    conn = sqlite3.connect(paths.incidents_db_path())
+    conn.execute("""CREATE TABLE incidents (id INTEGER PRIMARY KEY, case_number TEXT, datetime TEXT,
+                    name TEXT, situation_type TEXT, coords_lat REAL, coords_lon REAL,
+                    num_people INTEGER, status TEXT, description TEXT, help_needed TEXT, mskc TEXT)""")
+    conn.execute("""INSERT INTO incidents (id, case_number, datetime, name, status, coords_lat, coords_lon)
+                    VALUES (7, 'ПМ-7', '2026-03-10 00:00:00', 'Плот', 'closed', 60.0, 20.0)""")
+    conn.commit()
+    conn.close()
+
+
+def test_repeat_search_resumes_saved_history(incidents_db):
+    plugin = PoiskMorePlugin(mock.MagicMock())
+    plugin.current_incident = {'id': 7, 'coords': (60.0, 20.0)}
+    plugin.sru_list = [{'id': 'h1', 'sweep_width': 0.5, 'search_speed': 60, 'endurance': 1.0}]
+    plugin.calculate_probability_map()
+    assert plugin.search_history is not None
+    assert plugin.optimize_search_plan() is not None
+    sorties = plugin.complete_search_plan()
+    assert len(sorties) == 1 and 0 < plugin.search_history.cumulative_pos < 1
+
+    dialog = DialogRepeatSearch()
+    selected = []
+    dialog.operation_selected.connect(selected.append)
+    dialog.selected_operation = dialog.all_operations[0]
+    dialog.select()
+    history = selected[0]['search_history']
+    assert history is not None and len(history.sorties) == 1
+    assert history.cumulative_pos == pytest.approx(plugin.search_history.cumulative_pos)
+
+    resumed = PoiskMorePlugin(mock.MagicMock())
+    resumed._on_repeat_operation_selected(selected[0])
+    assert resumed.search_history is not None and resumed.poc_layer is not None
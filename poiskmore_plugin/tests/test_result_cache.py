@@ -0,0 +1,100 @@
+import dataclasses
+import math
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.drift_calculator import DriftCalculator, DriftVector
+from poiskmore_plugin.calculations.drift_integrator import ENGINE_VERSION, DriftIntegrator, WeatherSchedule
+from poiskmore_plugin.calculations.leeway_particles import LeewayCoefficients
+from poiskmore_plugin.calculations.result_cache import CacheKey, ResultCache
+
+WIND = [
+    {'time': '2024-06-01 00:00', 'direction': 270, 'speed_ms': 10},
+    {'time': '2024-06-01 06:00', 'direction': 300, 'speed_ms': 12},
+]
+CURRENT = [{'time': '2024-06-01 00:00', 'direction': 90, 'speed_kn': 0.5}]
+
+
+def schedule_key(wind=WIND):
+    return CacheKey.build('schedule_drift', ENGINE_VERSION, (60.0, 25.0), datetime(2024, 6, 1),
+                          'Обломки', incident_id=7, wind=wind, current=CURRENT, duration_hours=7)
+
+
+def integrate():
+    schedule = WeatherSchedule.from_entries(WIND, CURRENT)
+    return DriftIntegrator(schedule, LeewayCoefficients.default('Обломки')).integrate((60.0, 25.0), 7)
+
+
+def test_key_depends_on_inputs():
+    changed = [dict(WIND[0], speed_ms=11), WIND[1]]
+    assert schedule_key().digest == schedule_key().digest
+    assert schedule_key().digest != schedule_key(changed).digest
+
+
+def test_memory_tier_counts_hits_and_evicts():
+    cache = ResultCache(max_entries=2)
+    calls = []
+    for n in (1, 2, 1, 3, 2):
+        key = CacheKey.build('drift', 'test/1', (0, 0), '', 'Обломки', n=n)
+        cache.get_or_compute(key, lambda: calls.append(n) or {'n': n})
+
+    assert calls == [1, 2, 3, 2]
+    assert cache.stats.memory_hits == 1
+    assert cache.stats.misses == 4
+    assert cache.stats.evictions == 2
+
+
+def test_track_survives_reopen_through_sqlite(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    track = ResultCache.open(path).get_or_compute(schedule_key(), integrate)
+
+    reopened = ResultCache.open(path)
+    cached = reopened.get_or_compute(schedule_key(), pytest.fail)
+
+    assert reopened.stats.db_hits == 1
+    np.testing.assert_allclose(cached.hours, track.hours, atol=1e-9)
+    np.testing.assert_allclose(cached.left_lat, track.left_lat)
+    np.testing.assert_allclose(cached.wind_speed_kn, track.wind_speed_kn, rtol=1e-12)
+    assert cached.total_drift_nm == pytest.approx(track.total_drift_nm)
+
+    row = sqlite3.connect(path).execute(
+        'SELECT incident_id, total_drift_nm FROM drift_calculations').fetchone()
+    assert row == (7, pytest.approx(track.total_drift_nm))
+
+
+def test_sqlite_tier_is_size_bounded():
+    cache = ResultCache(sqlite3.connect(':memory:'), max_db_bytes=100)
+    for n in range(5):
+        cache.put(CacheKey.build('drift', 'test/1', (0, 0), '', 'Обломки', n=n), {'values': [n] * 10})
+
+    count = cache.conn.execute('SELECT COUNT(*) FROM drift_calculations').fetchone()[0]
+    assert count == 2
+
+
+def test_sqlite_tier_returns_same_types_as_memory():
+    conn = sqlite3.connect(':memory:')
+    calc = DriftCalculator()
+    key = CacheKey.build('drift', 'test/1', (60, 25), '', 'Обломки', n=1)
+    result = calc.calculate_total_drift({'speed': 15, 'direction': 225}, {'speed': 1.5, 'direction': 45},
+                                        'Обломки', 3)
+    result['grid'] = np.arange(6, dtype=np.float32).reshape(2, 3)
+    ResultCache(conn).put(key, result)
+
+    cached = ResultCache(conn).get(key)
+    assert cached['center']['drift_vector'] == result['center']['drift_vector']
+    assert isinstance(cached['left']['drift_vector'], DriftVector)
+    assert cached['grid'].dtype == np.float32 and cached['grid'].shape == (2, 3)
+    assert cached['divergence_angle'] == result['divergence_angle']
+
+
+def test_stranding_survives_sqlite(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    track = dataclasses.replace(integrate(), left_stranded_hours=3.5)
+    ResultCache.open(path).put(schedule_key(), track)
+
+    cached = ResultCache.open(path).get(schedule_key())
+    assert cached.left_stranded_hours == 3.5
+    assert math.isnan(cached.right_stranded_hours)
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.geodesy import distance_nm
+from poiskmore_plugin.calculations.land_mask import LandMask
+from poiskmore_plugin.calculations.sea_routing import RouteGraph, region_graph
+from poiskmore_plugin.calculations.sru_assignment import assignment_costs
+
+# Стена с проходом между 60.0 и 60.1 с. ш. (lon, lat)
+WALL_SOUTH = [[20.4, 59.0], [20.6, 59.0], [20.6, 60.0], [20.4, 60.0]]
+WALL_NORTH = [[20.4, 60.1], [20.6, 60.1], [20.6, 61.0], [20.4, 61.0]]
+ICE = [[20.3, 60.0], [20.7, 60.0], [20.7, 60.1], [20.3, 60.1]]
+
+
+def archipelago(seed=0):
+    """Непересекающиеся острова неправильной формы"""
+    rng = np.random.default_rng(seed)
+    polygons = []
+    for i in range(10):
+        for j in range(6):
+            cx, cy = 18.3 + i * 0.6 + rng.uniform(-0.1, 0.1), 59.15 + j * 0.33 + rng.uniform(-0.05, 0.05)
+            angle = np.sort(rng.uniform(0, 2 * np.pi, 20))
+            radius = rng.uniform(0.03, 0.1) * (1 + 0.4 * rng.random(20))
+            polygons.append([np.column_stack([cx + 2 * radius * np.cos(angle), cy + radius * np.sin(angle)])])
+    return polygons
+
+
+def test_route_uses_gap_and_straight_line_when_clear():
+    graph = RouteGraph([[WALL_SOUTH], [WALL_NORTH]])
+    route = graph.route((59.5, 20.0), (59.5, 21.0))
+    lat = np.array([point[0] for point in route.waypoints])
+    assert len(route.waypoints) == 4
+    assert ((lat[1:-1] > 60.0) & (lat[1:-1] < 60.1)).all()
+    assert route.length_nm > distance_nm(59.5, 20.0, 59.5, 21.0)
+    assert graph.route((59.5, 20.0), (59.6, 20.2)).waypoints == [(59.5, 20.0), (59.6, 20.2)]
+    with pytest.raises(ValueError):
+        graph.route((59.5, 20.5), (59.5, 21.0))
+
+
+def test_obstacle_layers_update_incrementally():
+    graph = RouteGraph([[WALL_SOUTH], [WALL_NORTH]])
+    through_gap = graph.route((59.5, 20.0), (59.5, 21.0)).length_nm
+    graph.add_obstacles('ice', [[ICE]])
+    detour = graph.route((59.5, 20.0), (59.5, 21.0))
+    assert min(point[0] for point in detour.waypoints) < 59.0
+    fresh = RouteGraph([[WALL_SOUTH], [WALL_NORTH]])
+    fresh.add_obstacles('ice', [[ICE]])
+    assert fresh.route((59.5, 20.0), (59.5, 21.0)).length_nm == pytest.approx(detour.length_nm)
+    graph.remove_obstacles('ice')
+    assert graph.layers == ['coast']
+    assert graph.route((59.5, 20.0), (59.5, 21.0)).length_nm == pytest.approx(through_gap)
+
+
+def test_archipelago_routes_avoid_land_and_match_matrix():
+    polygons = archipelago()
+    graph = RouteGraph(polygons)
+    mask = LandMask(polygons, cell_deg=0.01)
+    rng = np.random.default_rng(1)
+    points = []
+    while len(points) < 40:
+        point = (rng.uniform(59, 61), rng.uniform(18, 24))
+        if not mask.is_land(*point):
+            points.append(point)
+
+    start = time.perf_counter()
+    routes = [graph.route(points[i], points[i + 20]) for i in range(20)]
+    assert (time.perf_counter() - start) / 20 < 0.05
+    t = np.linspace(0, 1, 500)[:, None]
+    for route in routes:
+        waypoints = np.array(route.waypoints)
+        for a, b in zip(waypoints[:-1], waypoints[1:]):
+            samples = a + (b - a) * t
+            assert not mask.is_land(samples[:, 0], samples[:, 1]).any()
+
+    matrix = graph.distance_matrix(points[:20], points[20:])
+    assert np.diag(matrix) == pytest.approx([route.length_nm for route in routes], rel=1e-3)
+    assert np.isinf(graph.distance_matrix([(59.2, 18.3)], points[:1])).all()
+
+
+def test_region_cache_and_routed_transit():
+    graph = region_graph(('test', 'wall'), [[WALL_SOUTH], [WALL_NORTH]])
+    assert region_graph(('test', 'wall')) is graph
+    with pytest.raises(KeyError):
+        region_graph(('test', 'missing'))
+
+    srus = [{'id': 'boat', 'base': (59.5, 20.0), 'transit_speed': 10.0, 'endurance': 20.0}]
+    subs = [{'id': 'east', 'center': (59.5, 21.0), 'area_nm2': 50.0, 'poc': 1.0}]
+    direct = assignment_costs(srus, subs).transit_hours[0, 0]
+    routed = assignment_costs(srus, subs, routes=graph).transit_hours[0, 0]
+    assert routed > direct
+
+
+def test_layer_update_is_cheaper_than_rebuild():
+    polygons = archipelago()
+    start = time.perf_counter()
+    graph = RouteGraph(polygons)
+    build = time.perf_counter() - start
+    ice = [[[21.0, 59.8], [21.6, 59.8], [21.6, 60.0], [21.0, 60.0]]]
+    start = time.perf_counter()
+    graph.add_obstacles('ice', [ice])
+    assert time.perf_counter() - start < 0.2 * build
+
+    fresh = RouteGraph(polygons)
+    fresh.add_obstacles('ice', [ice])
+    assert len(graph._pairs) == len(fresh._pairs)
+    assert (graph._block > 0).sum() == (fresh._block > 0).sum()
+    points = [(59.9, 20.5), (59.9, 22.2), (59.7, 21.3), (60.1, 21.3)]
+    assert graph.distance_matrix(points, points) == pytest.approx(fresh.distance_matrix(points, points))
+    assert graph.route(points[0], points[1]).length_nm > RouteGraph(polygons).route(points[0], points[1]).length_nm
@@ -0,0 +1,95 @@
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.effort_allocation import allocate
+from poiskmore_plugin.calculations.poc_grid import PocGrid
+from poiskmore_plugin.calculations.search_history import SearchHistory
+from poiskmore_plugin.db.search_history_db import migrate_database_for_search_history
+
+
+def cloud_grid(n=20000, shape=(60, 60), seed=0):
+    rng = np.random.default_rng(seed)
+    return PocGrid.from_particles(70 + rng.normal(0, 0.1, n), 30 + rng.normal(0, 0.3, n),
+                                  shape=shape)
+
+
+def random_sorties(size, count, seed=1):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        start = rng.integers(0, size // 2)
+        cells = np.arange(start, start + size // 3)
+        yield cells, rng.uniform(0.3, 0.9, len(cells))
+
+
+def test_sequential_bayes_update():
+    grid = cloud_grid()
+    history = SearchHistory(grid)
+    expected = grid.values.ravel().copy()
+    not_found = 1.0
+    for cells, pod in random_sorties(grid.values.size, 5):
+        sortie = history.record(pod, cells)
+        pos = float(np.sum(expected[cells] * pod))
+        assert sortie.pos == pytest.approx(pos)
+        expected[cells] *= 1 - pod
+        expected /= 1 - pos
+        not_found *= 1 - pos
+        np.testing.assert_allclose(history.poc.values.ravel(), expected, atol=1e-12)
+    assert history.cumulative_pos == pytest.approx(1 - not_found)
+    assert history.cumulative_pos == pytest.approx(float(np.sum(grid.values * history.cumulative_pod)))
+
+
+def test_allocation_sorties_match_prior_effort():
+    grid = cloud_grid()
+    srus = [{'id': 'a', 'sweep_width': 1.0, 'search_speed': 10, 'endurance': 4},
+            {'id': 'b', 'sweep_width': 2.0, 'search_speed': 12, 'endurance': 3}]
+    plan = allocate(grid, srus)
+    history = SearchHistory(grid)
+    sorties = history.record_allocation(plan)
+    assert [s.sru_id for s in sorties] == ['a', 'b']
+    assert history.cumulative_pos == pytest.approx(plan.pos)
+    np.testing.assert_allclose(history.effort, plan.effort, atol=1e-9)
+    # Следующий план по апостериорной сетке и по априорной с учетом усилия равноценны
+    after = allocate(history.poc, srus)
+    with_prior = allocate(grid, srus, prior_effort=history.effort)
+    assert 1 - (1 - history.cumulative_pos) * (1 - after.pos) == pytest.approx(with_prior.pos)
+
+
+def test_history_round_trip_through_database():
+    conn = sqlite3.connect(':memory:')
+    migrate_database_for_search_history(conn)
+    grid = cloud_grid()
+    history = SearchHistory(grid)
+    for cells, pod in random_sorties(grid.values.size, 3):
+        history.record(pod, cells, sru_id='Ми-8')
+    history.save(conn, incident_id=7)
+    history.record(np.full(grid.shape, 0.2))
+    history.save_sortie(conn, 7)
+
+    loaded = SearchHistory.load(conn, 7)
+    assert len(loaded.sorties) == 4 and loaded.sorties[0].sru_id == 'Ми-8'
+    np.testing.assert_allclose(loaded.poc.values, history.poc.values, rtol=1e-6)
+    assert loaded.cumulative_pos == pytest.approx(history.cumulative_pos, rel=1e-6)
+    assert SearchHistory.load(conn, 8) is None
+    assert SearchHistory.load(sqlite3.connect(':memory:'), 7) is None
+
+
+def test_replay_is_fast():
+    grid = cloud_grid(shape=(500, 500))
+    sorties = [SearchHistory(grid).record(pod, cells)
+               for cells, pod in random_sorties(grid.values.size, 20)]
+    start = time.perf_counter()
+    history = SearchHistory.replay(grid, sorties)
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.2
+    assert 0 < history.cumulative_pos < 1
+
+
+def test_invalid_pod_rejected():
+    history = SearchHistory(cloud_grid())
+    with pytest.raises(ValueError):
+        history.record([1.5], [0])
+    with pytest.raises(ValueError):
+        history.record([0.5], [history.prior.values.size])
@@ -0,0 +1,113 @@
+import time
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.geodesy import bearing_deg, distance_nm
+from poiskmore_plugin.calculations.land_mask import LandMask
+from poiskmore_plugin.calculations.search_area_calculator import SearchAreaCalculator
+from poiskmore_plugin.calculations.search_patterns import (
+    creeping_line,
+    expanding_square,
+    parallel_sweep,
+    sector_search,
+    track_line_search,
+)
+from poiskmore_plugin.controllers.search_scheme import generate_search_scheme
+
+RECT = [(70.0, 30.0), (70.0, 31.0), (70.2, 31.0), (70.2, 30.0)]
+
+
+def test_parallel_sweep_fits_rectangle():
+    pattern = parallel_sweep(RECT, 1.0)
+    legs = pattern.legs()
+    height = float(distance_nm(70.0, 30.5, 70.2, 30.5))
+    assert len(legs) == int(np.ceil(height))
+    # Галсы вдоль длинной (широтной) стороны, на всю ширину подрайона
+    assert bearing_deg(*legs[0]['start'], *legs[0]['end']) == pytest.approx(90, abs=1)
+    assert legs[0]['distance'] == pytest.approx(float(distance_nm(70.2, 30.0, 70.2, 31.0)), rel=0.01)
+    lat = pattern.waypoints[:, 0]
+    assert lat.min() > 70.0 and lat.max() < 70.2
+    assert pattern.time_hours == pytest.approx(pattern.length_nm / pattern.speed_kn)
+
+
+def test_creeping_line_starts_at_csp():
+    pattern = creeping_line(RECT, 1.0, start=(70.2, 31.0))
+    first = pattern.waypoints[0]
+    assert distance_nm(first[0], first[1], 70.2, 31.0) < 1.0
+    assert all(leg['distance'] < 13 for leg in pattern.legs())
+
+
+def test_sweep_stays_in_concave_area():
+    polygon = [(70.0, 30.0), (70.0, 31.5), (70.3, 31.5), (70.3, 31.2),
+               (70.1, 31.2), (70.1, 30.3), (70.3, 30.3), (70.3, 30.0)]
+    pattern = parallel_sweep(polygon, 0.5, direction=90)
+    mask = LandMask([[np.asarray(polygon)[:, ::-1]]], cell_deg=0.05)
+    legs = pattern.legs()
+    mid = np.array([(np.add(leg['start'], leg['end'])) / 2 for leg in legs])
+    assert mask.is_land(mid[:, 0], mid[:, 1]).all()
+    # Прямые, пересекающие вырез, дают по два галса
+    lines = int(np.ceil(float(distance_nm(70.0, 30.0, 70.3, 30.0)) / 0.5))
+    assert len(legs) > lines
+
+
+
+def test_sweep_skips_holes_and_stays_in_clipped_sub_areas():
+    hole = [(70.054, 30.4), (70.146, 30.4), (70.146, 30.6), (70.054, 30.6)]
+    pattern = parallel_sweep(RECT, 0.5, direction=90, holes=[hole])
+    mask = LandMask([[np.asarray(hole)[:, ::-1]]], cell_deg=0.05)
+    mid = np.array([(np.add(leg['start'], leg['end'])) / 2 for leg in pattern.legs()])
+    assert not mask.is_land(mid[:, 0], mid[:, 1]).any()
+    assert len(pattern.legs()) > len(parallel_sweep(RECT, 0.5, direction=90).legs())
+
+    # Галсы подрайонов треугольного района не выходят за район
+    triangle = [(60.0, 20.0), (60.5, 21.5), (61.0, 20.2)]
+    calc = SearchAreaCalculator()
+    area = LandMask([[np.asarray(triangle)[:, ::-1]]], cell_deg=0.01)
+    for sub_area in calc._divide_into_sub_areas(triangle, 2.0, 30):
+        legs = calc._determine_search_pattern(sub_area, {'track_spacing': 2.0})['legs']
+        mid = np.array([(np.add(leg['start'], leg['end'])) / 2 for leg in legs])
+        assert area.is_land(mid[:, 0], mid[:, 1]).all()
+
+def test_expanding_square_leg_lengths():
+    pattern = expanding_square((70.0, 30.0), 1.0, direction=90)
+    lengths = [leg['distance'] for leg in pattern.legs()]
+    np.testing.assert_allclose(lengths, [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 7, 7], rtol=1e-3)
+    covering = expanding_square((70.1, 30.5), 1.0, polygon=RECT)
+    lat, lon = covering.waypoints[:, 0], covering.waypoints[:, 1]
+    assert lat.min() < 70.0 and lat.max() > 70.2 and lon.min() < 30.0 and lon.max() > 31.0
+
+
+def test_sector_returns_through_datum():
+    pattern = sector_search((70.0, 30.0), 2.0, passes=2)
+    assert len(pattern.waypoints) == 19
+    datum = pattern.waypoints[::3]
+    assert distance_nm(datum[:, 0], datum[:, 1], 70.0, 30.0).max() < 1e-6
+    assert pattern.length_nm == pytest.approx(36.0, rel=1e-6)
+
+
+def test_track_line_return():
+    track = [(70.0, 30.0), (70.2, 30.5), (70.2, 31.0)]
+    pattern = track_line_search(track, 1.0, legs=2)
+    assert len(pattern.legs()) == 4
+    assert distance_nm(*pattern.waypoints[0], *pattern.waypoints[-1]) == pytest.approx(1.0, rel=0.01)
+
+
+def test_scheme_controller_and_calculator():
+    scheme = generate_search_scheme('sector', {'radius': 3.0, 'datum': (70.0, 30.0)})
+    assert scheme.length_nm == pytest.approx(27.0, rel=1e-6)
+    calculator = SearchAreaCalculator()
+    area = calculator.calculate_from_two_points(
+        {'lat': 70.0, 'lon': 30.0, 'drift_speed': 1.0, 'drift_direction': 45.0},
+        {'lat': 70.2, 'lon': 30.5, 'drift_speed': 1.0, 'drift_direction': 45.0}, 6.0)
+    srus = [{'id': k, 'name': f"SRU {k}", 'sweep_width': 1.0, 'search_speed': 12, 'endurance': 4}
+            for k in range(40)]
+    start = time.perf_counter()
+    plan = calculator.optimize_search_pattern(area, srus)
+    assert time.perf_counter() - start < 1.0
+    pattern = plan['assignments'][0]['pattern']
+    assert all(leg['start'] is not None and leg['end'] is not None for leg in pattern['legs'])
+    assert pattern['time_hours'] == pytest.approx(pattern['length_nm'] / 12)
+    line = calculator.calculate_along_line([(70, 30), (70.5, 31), (70.5, 33)], 10.0)
+    pattern = calculator.optimize_search_pattern(line, srus[:2])['assignments'][0]['pattern']
+    assert pattern['type'] == 'track_line' and pattern['legs']
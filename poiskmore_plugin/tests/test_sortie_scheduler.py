@@ -0,0 +1,89 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.sortie_scheduler import SortieScheduler, solar_elevation_deg
+from poiskmore_plugin.utils.time_optimizer import optimize_search_time
+
+START = datetime(2026, 3, 10, 0, 0)
+
+
+def sub_areas(count=30, seed=0):
+    """Подрайоны вокруг 60 с. ш. 20 в. д. с POC в сумме 1"""
+    rng = np.random.default_rng(seed)
+    poc = rng.dirichlet(np.ones(count))
+    return [{'id': f's{k}', 'center': (60 + rng.uniform(-0.5, 0.5), 20 + rng.uniform(-1, 1)),
+             'area_nm2': rng.uniform(50, 300), 'poc': poc[k]} for k in range(count)]
+
+
+def fleet():
+    return [{'id': 'h1', 'type': 'helicopter_medium', 'base': (60.2, 19.0)},
+            {'id': 'h2', 'type': 'helicopter_heavy', 'base': (59.8, 21.0)},
+            {'id': 'v1', 'type': 'patrol_boat_large', 'base': (60.0, 20.0), 'daylight_only': False},
+            {'id': 'f1', 'type': 'fixed_wing_maritime', 'base': (61.0, 20.0)}]
+
+
+def posix(moment):
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def test_solar_elevation():
+    solstice = posix(datetime(2026, 6, 21, 12, 0))
+    assert solar_elevation_deg(60.0, 0.0, solstice) == pytest.approx(90 - 60 + 23.44, abs=0.2)
+    assert solar_elevation_deg(80.0, 0.0, posix(datetime(2026, 12, 21, 12, 0))) < 0
+    assert solar_elevation_deg(80.0, 0.0, solstice + 12 * 3600) > 0
+    # Полдень в 20 в. д. наступает раньше на 80 минут
+    hours = np.arange(9.0, 13.0, 1 / 60)
+    elevation = solar_elevation_deg(60.0, 20.0, posix(datetime(2026, 3, 20)) + hours * 3600)
+    assert hours[np.argmax(elevation)] == pytest.approx(12 - 80 / 60, abs=0.15)
+
+
+def test_sorties_respect_daylight_endurance_and_turnaround():
+    scheduler = SortieScheduler(fleet(), sub_areas(), START, horizon_hours=72)
+    plan = scheduler.plan()
+    assert plan.sorties and 0 < plan.pos <= 1
+    assert plan.pos == pytest.approx(sum(sortie.pos for sortie in plan.sorties))
+    centers = {sub['id']: sub['center'] for sub in sub_areas()}
+    for sru_id, sorties in plan.by_sru().items():
+        unit = scheduler.units[scheduler._unit_index[sru_id]]
+        for sortie in sorties:
+            assert (sortie.return_time - sortie.depart).total_seconds() / 3600 <= unit.endurance + 1e-6
+            assert sortie.search_hours <= unit.on_scene + 1e-6
+            assert sortie.search_end <= START + timedelta(hours=72, seconds=1)
+            if unit.daylight_only:
+                lat, lon = centers[sortie.sub_area_id]
+                t = np.linspace(posix(sortie.search_start), posix(sortie.search_end), 20)
+                assert (solar_elevation_deg(lat, lon, t) > -0.9).all()
+        for previous, following in zip(sorties[:-1], sorties[1:]):
+            assert following.depart >= previous.return_time + timedelta(hours=unit.turnaround, seconds=-1)
+    # Судно ищет и ночью
+    assert any(sortie.search_start.hour < 5 for sortie in plan.by_sru()['v1'])
+
+
+def test_crew_duty_limit():
+    srus = [{'id': 'h', 'type': 'helicopter_light', 'base': (60.0, 20.0), 'crew_duty_hours': 6.0,
+             'daylight_only': False}]
+    plan = SortieScheduler(srus, sub_areas(), START, horizon_hours=48).plan()
+    flights = [(posix(sortie.depart), posix(sortie.return_time)) for sortie in plan.sorties]
+    for _, finish in flights:
+        window = sum(max(0.0, min(end, finish) - max(start, finish - 86400)) for start, end in flights)
+        assert window / 3600 <= 6.0 + 1e-6
+    assert sum(end - begin for begin, end in flights) / 3600 <= 12.0 + 1e-6
+
+
+def test_replan_drops_unavailable_sru():
+    scheduler = SortieScheduler(fleet(), sub_areas(60), START, horizon_hours=72)
+    plan = scheduler.plan()
+    now = START + timedelta(hours=12)
+    begin = time.perf_counter()
+    replanned = scheduler.replan(now, {'h1': (now, None)})
+    assert time.perf_counter() - begin < 2.0
+    kept = [sortie for sortie in plan.sorties if sortie.depart < now]
+    assert len(replanned.sorties) >= len(kept)
+    assert all(sortie.return_time <= now for sortie in replanned.by_sru()['h1'])
+    assert all(sortie.depart >= now for sortie in replanned.sorties if sortie.sru_id != 'h1'
+               and sortie not in kept)
+    assert replanned.pos < plan.pos
+    assert optimize_search_time(fleet(), sub_areas(), START, 24).pos < plan.pos
@@ -0,0 +1,89 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.search_area_calculator import SearchAreaCalculator
+from poiskmore_plugin.calculations.sru_assignment import assign_srus, assignment_costs, linear_sum_assignment
+
+
+def brute_force(cost):
+    """Перебор всех назначений (эталон для малых матриц)"""
+    n, m = cost.shape
+    if n <= m:
+        return min(sum(cost[i, p[i]] for i in range(n)) for p in itertools.permutations(range(m), n))
+    return min(sum(cost[p[j], j] for j in range(m)) for p in itertools.permutations(range(n), m))
+
+
+def random_problem(rng, n_sru, n_sub):
+    srus = [{'id': f"sru{k}", 'base': (70 + rng.normal(0, 0.5), 30 + rng.normal(0, 1)),
+             'sweep_width': rng.uniform(0.5, 3), 'search_speed': rng.uniform(8, 120),
+             'endurance': rng.uniform(3, 8), 'transit_speed': rng.uniform(10, 150)} for k in range(n_sru)]
+    subs = [{'id': f"s{j}", 'center': (70 + rng.normal(0, 0.5), 30 + rng.normal(0, 1)),
+             'area_nm2': rng.uniform(20, 200), 'poc': rng.random()} for j in range(n_sub)]
+    return srus, subs
+
+
+def test_linear_sum_assignment_is_optimal():
+    rng = np.random.default_rng(1)
+    for shape in [(4, 4), (3, 6), (6, 3), (5, 7)]:
+        for _ in range(10):
+            cost = rng.random(shape)
+            rows, cols = linear_sum_assignment(cost)
+            assert len(set(rows.tolist())) == len(rows) == min(shape)
+            assert len(set(cols.tolist())) == len(cols)
+            assert cost[rows, cols].sum() == pytest.approx(brute_force(cost))
+
+
+def test_transit_and_endurance_limit_assignment():
+    srus = [{'id': 'near', 'base': (70.0, 30.0), 'endurance': 4.0, 'transit_speed': 10.0},
+            {'id': 'far', 'base': (75.0, 30.0), 'endurance': 4.0, 'transit_speed': 10.0}]
+    subs = [{'id': 'a', 'center': (70.1, 30.0), 'area_nm2': 50.0, 'poc': 0.5},
+            {'id': 'b', 'center': (70.0, 30.3), 'area_nm2': 50.0, 'poc': 0.5}]
+    costs = assignment_costs(srus, subs)
+    assert costs.transit_hours[0, 0] == pytest.approx(0.6, abs=0.01)
+    assert not costs.feasible[1].any()
+    result = assign_srus(srus, subs)
+    assert result.by_sru() == {'near': ['a'], 'far': []}
+    assert result.pos == pytest.approx(costs.gain[0, 0])
+
+
+def test_capacity_must_and_forbid():
+    srus = [{'id': 'x', 'sweep_width': 2.0}, {'id': 'y', 'sweep_width': 0.5}]
+    subs = [{'id': k, 'area_nm2': 100.0, 'poc': p} for k, p in zip('abc', (0.5, 0.3, 0.2))]
+    assert sum(map(len, assign_srus(srus, subs).by_sru().values())) == 2
+    assert len(assign_srus(srus, subs, capacity=[2, 1]).pairs) == 3
+    assert assign_srus(srus, subs, forbid=[('x', 'a')]).by_sru()['x'] == ['b']
+    assert assign_srus(srus, subs, must=[('y', 'a')]).by_sru() == {'x': ['b'], 'y': ['a']}
+    stacked = assign_srus(srus, [dict(subs[0], poc=1.0), dict(subs[1], poc=0.0)], sub_area_capacity=2)
+    assert stacked.by_sub_area() == {'a': ['x', 'y'], 'b': []}
+
+    narrow = [dict(sub, min_sweep_width=1.0) for sub in subs]
+    assert assign_srus(srus, narrow).by_sru()['y'] == []
+    with pytest.raises(ValueError):
+        assign_srus(srus, narrow, must=[('y', 'a')])
+
+
+def test_large_assignment_is_fast():
+    srus, subs = random_problem(np.random.default_rng(3), 100, 1000)
+    start = time.perf_counter()
+    result = assign_srus(srus, subs)
+    assert time.perf_counter() - start < 1.0
+    assert len(result.pairs) == 100
+    assert len({sub for _, sub in result.pairs}) == 100
+
+
+def test_search_pattern_skips_unreachable_sru():
+    calculator = SearchAreaCalculator()
+    area = calculator.calculate_from_two_points(
+        {'lat': 70.0, 'lon': 30.0, 'drift_speed': 1.0, 'drift_direction': 45.0},
+        {'lat': 70.2, 'lon': 30.5, 'drift_speed': 1.0, 'drift_direction': 45.0}, 6.0)
+    srus = [{'id': 'boat', 'name': 'Boat', 'sweep_width': 1.0, 'search_speed': 10.0, 'endurance': 6.0,
+             'lat': 70.1, 'lon': 30.2},
+            {'id': 'remote', 'sweep_width': 1.0, 'search_speed': 10.0, 'endurance': 6.0,
+             'lat': 60.0, 'lon': 30.0}]
+    plan = calculator.optimize_search_pattern(area, srus)
+    assert [a['sru_id'] for a in plan['assignments']] == ['boat']
+    assert 0 < plan['assignments'][0]['transit_hours'] < 3
+    assert 0 < plan['probability_of_success'] <= 1
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations import geodesy
+from poiskmore_plugin.calculations.land_mask import LandMask
+from poiskmore_plugin.calculations.search_area_calculator import SearchAreaCalculator
+from poiskmore_plugin.calculations.sub_area_grid import SubAreaGrid
+
+# Г-образный район с дырой (lat, lon)
+L_SHAPE = [(60, 20), (60, 22), (61, 22), (61, 21), (62, 21), (62, 20)]
+HOLE = [(60.2, 20.2), (60.2, 20.5), (60.5, 20.5), (60.5, 20.2)]
+
+
+def reference_inside(lat, lon, rings):
+    """Четность пересечений луча по долготе по всем кольцам"""
+    inside = np.zeros(lat.shape, dtype=bool)
+    for ring in rings:
+        ring = np.asarray(ring, dtype=np.float64)
+        for (y0, x0), (y1, x1) in zip(ring, np.roll(ring, -1, axis=0)):
+            crosses = (y0 > lat) != (y1 > lat)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                x = x0 + (lat - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= crosses & (lon < x)
+    return inside
+
+
+def test_rotated_rectangle_is_split_into_full_cells():
+    calc = SearchAreaCalculator()
+    bounds = calc._create_rectangle_bounds((60, 20), 10, 20, 30)
+    grid = SubAreaGrid.from_polygon(bounds, 5, 30)
+
+    assert len(grid) == 8
+    assert sorted(zip(grid.row.tolist(), grid.col.tolist())) == [(r, c) for r in range(4) for c in range(2)]
+    # Стороны района прямые в lat/lon и слегка выгнуты относительно сетки
+    np.testing.assert_allclose(grid.coverage, 1.0, atol=0.01)
+    assert grid.total_area_nm2 == pytest.approx(calc._calculate_polygon_area(bounds), rel=1e-4)
+
+    # Строки сетки идут вдоль дрейфа
+    lat, lon = grid.corners()
+    along = geodesy.bearing_deg(lat[:, 0], lon[:, 0], lat[:, 1], lon[:, 1])
+    np.testing.assert_allclose(along, 30, atol=0.5)
+
+
+def test_cells_are_clipped_to_concave_polygon_with_hole():
+    grid = SubAreaGrid.from_polygon(L_SHAPE, 4, 37, holes=[HOLE])
+    exact = geodesy.polygon_area_nm2([L_SHAPE, HOLE])
+    assert grid.total_area_nm2 == pytest.approx(exact, rel=1e-5)
+    assert np.all(grid.coverage <= 1 + 1e-9)
+
+    # Частичные ячейки - сравнение с подсчетом точек внутри ячейки
+    lat, lon = grid.corners()
+    u, v = np.meshgrid((np.arange(100) + 0.5) / 100, (np.arange(100) + 0.5) / 100)
+    partial = np.nonzero((grid.coverage > 0.2) & (grid.coverage < 0.8))[0]
+    assert len(partial) > 10
+    for k in partial:
+        # Билинейная интерполяция углов (0 - начало/лево, 1 - конец, 3 - право)
+        plat = lat[k, 0] + u * (lat[k, 1] - lat[k, 0]) + v * (lat[k, 3] - lat[k, 0])
+        plon = lon[k, 0] + u * (lon[k, 1] - lon[k, 0]) + v * (lon[k, 3] - lon[k, 0])
+        fraction = reference_inside(plat, plon, [L_SHAPE, HOLE]).mean()
+        assert grid.coverage[k] == pytest.approx(fraction, abs=0.02)
+
+    # Центр частичной ячейки - внутри района
+    inside = reference_inside(grid.center_lat, grid.center_lon, [L_SHAPE, HOLE])
+    assert inside[grid.coverage > 0.5].all()
+
+
+def test_land_is_subtracted_from_cells():
+    square = [(60, 20), (60, 22), (61, 22), (61, 20)]
+    land = LandMask([[np.array([[21.03, 59.0], [23.0, 59.0], [23.0, 62.0], [21.03, 62.0]])]], cell_deg=0.05)
+    grid = SubAreaGrid.from_polygon(square, 3, land_mask=land, land_samples=8)
+    water = geodesy.polygon_area_nm2([[(60, 20), (60, 21.03), (61, 21.03), (61, 20)]])
+
+    assert grid.total_area_nm2 == pytest.approx(water, rel=0.01)
+    assert np.all(grid.center_lon < 21.03)
+    assert np.any((grid.land_fraction > 0) & (grid.land_fraction < 1))
+
+
+def test_calculator_sub_areas_follow_area_and_drift():
+    calc = SearchAreaCalculator()
+    triangle = [(60, 20), (60.5, 21.5), (61, 20.2)]
+    area = calc.calculate_manual_area(triangle)
+    total = sum(sub['area_nm2'] for sub in area.sub_areas)
+    assert total == pytest.approx(area.area_nm2, rel=1e-4)
+    assert all(0 < sub['coverage'] <= 1 + 1e-9 for sub in area.sub_areas)
+
+    left = {'lat': 60.0, 'lon': 20.0, 'drift_speed': 1.0, 'drift_direction': 120}
+    right = {'lat': 60.0, 'lon': 20.2, 'drift_speed': 1.0, 'drift_direction': 120}
+    area = calc.calculate_from_two_points(left, right, 10)
+    assert {sub['orientation'] for sub in area.sub_areas} == {120}
+    assert sum(sub['area_nm2'] for sub in area.sub_areas) == pytest.approx(
+        calc._calculate_polygon_area(area.bounds), rel=1e-4)
+
+
+def test_sub_area_bounds_are_clipped_to_area():
+    grid = SubAreaGrid.from_polygon(L_SHAPE, 4, 37, holes=[HOLE])
+    sub_areas = grid.to_sub_areas()
+    areas = [geodesy.polygon_area_nm2([sub['bounds'], *sub['holes']]) for sub in sub_areas]
+    np.testing.assert_allclose(areas, grid.area_nm2, rtol=1e-3, atol=1e-3)
+    assert any(sub['holes'] for sub in sub_areas)
+    # Вершины подрайона не выходят за район
+    lat, lon = np.array([point for sub in sub_areas for point in sub['bounds']]).T
+    assert lat.min() >= 60 - 1e-5 and lat.max() <= 62 + 1e-5
+    assert lon.min() >= 20 - 1e-5 and lon.max() <= 22 + 1e-5
+    assert all(len(sub['cell']) == 4 for sub in sub_areas)
@@ -0,0 +1,101 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from poiskmore_plugin.calculations.drift_calculator import DriftCalculator, DriftVector
+from poiskmore_plugin.calculations.ensemble_runner import GridSpec
+from poiskmore_plugin.calculations.leeway_particles import (
+    ConstantForcing,
+    LeewayCoefficients,
+    LeewayParticleEngine,
+)
+from poiskmore_plugin.calculations.trajectory_store import (
+    STATUS_ACTIVE,
+    STATUS_STRANDED,
+    TrajectoryStore,
+)
+
+
+def filled_store(n_times=40, n_particles=7):
+    store = TrajectoryStore(n_particles, capacity=2, origin=(60.0, 25.0), object_type='Обломки')
+    for i in range(n_times):
+        store.append(i * 0.5, 60.0 + i * 0.01 + np.arange(n_particles) * 1e-3,
+                     25.0 + np.arange(n_particles) * 1e-3, branch=1)
+    return store
+
+
+def test_append_grows_and_slices_share_memory():
+    store = filled_store()
+    assert len(store) == 40 and store.n_particles == 7
+    assert store.times[-1] == pytest.approx(19.5)
+
+    window = store.between(2.0, 4.0)
+    assert list(window.times) == [2.0, 2.5, 3.0, 3.5, 4.0]
+    assert np.shares_memory(window.points, store.points)
+    assert np.shares_memory(store.track(3), store.points)
+    part = store.particles(slice(2, 5))
+    assert np.shares_memory(part.points, store.points)
+    assert list(part.particle_ids) == [2, 3, 4]
+
+    # Добавление в представление не портит исходное хранилище
+    window.append(5.0, np.zeros(7), np.zeros(7))
+    assert len(window) == 6 and store.at(5.0)['lat'][0] == pytest.approx(60.1)
+
+    with pytest.raises(ValueError):
+        store.append(1.0, np.zeros(7), np.zeros(7))
+
+
+def test_status_and_centroid():
+    store = filled_store(n_times=5, n_particles=4)
+    store.set_status(2, np.array([True, False, False, False]), STATUS_STRANDED)
+    assert list(store.status[:, 0]) == [STATUS_ACTIVE] * 2 + [STATUS_STRANDED] * 3
+    assert store.active(-1).sum() == 3
+
+    lat, lon = store.centroid()
+    assert lat[0] == pytest.approx(60.0015, abs=1e-5)
+    assert lat[-1] == pytest.approx(60.04 + 0.002, abs=1e-5)
+
+    counts = GridSpec(59.9, 60.2, 24.9, 25.1, 3, 2).histogram_store(store, active_only=True)
+    assert counts.sum() == 3
+
+
+def test_npz_and_sqlite_blob_roundtrip(tmp_path):
+    store = filled_store()
+    path = tmp_path / 'tracks.npz'
+    store.save(path)
+    loaded = TrajectoryStore.load(path)
+    assert np.array_equal(loaded.points, store.points)
+    assert loaded.origin == store.origin and loaded.object_type == 'Обломки'
+
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE t (data BLOB)')
+    conn.execute('INSERT INTO t VALUES (?)', (store.to_bytes(),))
+    blob, = conn.execute('SELECT data FROM t').fetchone()
+    restored = TrajectoryStore.from_bytes(blob)
+    assert np.array_equal(restored.times, store.times)
+    assert np.array_equal(restored.points, store.points)
+    # Нет накладных расходов на строку: размер BLOB близок к объему массивов
+    assert len(blob) < store.nbytes + 2048
+
+
+def test_particle_cloud_to_store():
+    engine = LeewayParticleEngine(LeewayCoefficients.default('Обломки'),
+                                  ConstantForcing(20, 270, 0.5, 90), time_step_hours=0.5)
+    cloud = engine.simulate((60.0, 25.0), 6, 500, seed=1, output_hours=(2, 4))
+    store = cloud.to_store()
+    assert list(store.times) == [2.0, 4.0, 6.0]
+    assert np.array_equal(store.branch[-1], cloud.branch)
+    assert np.allclose(store.lat[-1], cloud.lat, atol=1e-4)
+    assert np.array_equal(store.lat[0], cloud.track_lat[0])
+    assert len(store.to_geojson(max_particles=50)['features']) == 50
+
+
+def test_drift_line_built_from_store():
+    calc = DriftCalculator()
+    vector = DriftVector(direction=45.0, speed=1.5)
+    points = calc.calculate_drift_line((60.0, 25.0), vector, 6.0, num_points=12)
+    assert len(points) == 13
+    assert points[-1]['time_hours'] == pytest.approx(6.0)
+    assert points[-1]['distance_nm'] == pytest.approx(9.0)
+    assert points[-1]['lat'] == pytest.approx(60.0 + 9.0 * np.cos(np.radians(45)) / 60)
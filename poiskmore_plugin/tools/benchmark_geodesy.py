@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сравнение векторного геодезического ядра с прежними скалярными функциями
+Использование: python -m poiskmore_plugin.tools.benchmark_geodesy [число_точек]
+"""
+
+import math
+import sys
+import time
+
+import numpy as np
+
+from poiskmore_plugin.calculations import geodesy
+
+R_NM = 3440.065
+
+
+def scalar_distance(lat1, lon1, lat2, lon2):
+    """Прежняя формула SearchAreaCalculator._calculate_distance"""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return R_NM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def scalar_destination(lat, lon, distance, bearing):
+    """Прежняя формула _calculate_point_at_distance_and_bearing"""
+    lat1, lon1, theta = math.radians(lat), math.radians(lon), math.radians(bearing)
+    delta = distance / R_NM
+    lat2 = math.asin(math.sin(lat1) * math.cos(delta) + math.cos(lat1) * math.sin(delta) * math.cos(theta))
+    lon2 = lon1 + math.atan2(math.sin(theta) * math.sin(delta) * math.cos(lat1),
+                             math.cos(delta) - math.sin(lat1) * math.sin(lat2))
+    return math.degrees(lat2), math.degrees(lon2)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main(n: int = 100_000):
+    rng = np.random.default_rng(0)
+    lat1, lat2 = rng.uniform(40, 70, (2, n))
+    lon1, lon2 = rng.uniform(0, 60, (2, n))
+    distance = rng.uniform(0, 200, n)
+    bearing = rng.uniform(0, 360, n)
+
+    rows = [
+        ("distance", timed(lambda: [scalar_distance(*p) for p in zip(lat1, lon1, lat2, lon2)]),
+         timed(geodesy.distance_nm, lat1, lon1, lat2, lon2)),
+        ("destination", timed(lambda: [scalar_destination(*p) for p in zip(lat1, lon1, distance, bearing)]),
+         timed(geodesy.destination, lat1, lon1, distance, bearing)),
+        ("distance WGS84", None, timed(geodesy.distance_nm, lat1, lon1, lat2, lon2, True)),
+        ("destination WGS84", None, timed(geodesy.destination, lat1, lon1, distance, bearing, True)),
+        ("to_enu WGS84", None, timed(geodesy.to_enu, lat1, lon1, 55.0, 30.0)),
+    ]
+    print(f"{n} точек")
+    for name, scalar, vector in rows:
+        ratio = f"{scalar / vector:6.1f}x" if scalar else "      -"
+        scalar_text = f"{scalar * 1000:9.1f} мс" if scalar else "          -"
+        print(f"{name:18s} скалярно {scalar_text}  векторно {vector * 1000:8.1f} мс  {ratio}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -1,7 +1,10 @@
 import csv
 import uuid
-import math
 import datetime
+
+from ..calculations.geodesy import KM_PER_NM, distance_nm
+
+
 class AircraftDirectory:
     def __init__(self, csvfile="aircraft_directory.csv"):
         self.csvfile = csvfile
@@ -69,7 +72,7 @@ class AircraftDirectory:
             eta_hr = distance / speed
         else:
             eta_hr = 0
-#         eta = (datetime.datetime.now() + datetime.timedelta(hours=eta_hr)).strftime("%H:%M")
+        eta = (datetime.datetime.now() + datetime.timedelta(hours=eta_hr)).strftime("%H:%M")
         endurance_in_area = endurance - (distance / speed) * 2
         return eta, distance, max(0, endurance_in_area)
     def assign_aircraft_to_search(self, ac_id, tgt_lat, tgt_lon, eta, distance, endurance):
@@ -78,8 +81,4 @@ class AircraftDirectory:
             writer.writerow([ac_id, tgt_lat, tgt_lon, eta, distance, endurance, datetime.datetime.now().isoformat()])
     @staticmethod
     def haversine(lat1, lon1, lat2, lon2):
-        R = 6371
-        phi1, phi2 = math.radians(lat1), math.radians(lat2)
-        dphi, dlambda = math.radians(lat2 - lat1), math.radians(lon2 - lon1)
-#         a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-        return R * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
+        return float(distance_nm(lat1, lon1, lat2, lon2)) * KM_PER_NM
@@ -1,4 +1,60 @@
-# (Доработка: реальная логика intersect) python def intersect(route1, route2):
-# Простая проверка на пересечение линий (можно расширить)
-for p1 in route1: for p2 in route2: if p1 == p2: return True return False
-def simulate_multi_sru(routes): collisions = [] for i, route1 in enumerate(routes): for j, route2 in enumerate(routes[i+1:], start=i+1): if intersect(route1, route2): collisions.append((i, j)) return collisions
+import numpy as np
+
+from ..calculations.deconfliction import (
+    DEFAULT_HORIZONTAL_SEPARATION_NM,
+    DEFAULT_VERTICAL_SEPARATION_FT,
+    Conflict,
+    Track,
+    find_conflicts,
+)
+
+
+def intersect(route1, route2):
+    """Check whether two planar polylines cross or touch."""
+    a = np.asarray(route1, dtype=float).reshape(-1, 2)
+    b = np.asarray(route2, dtype=float).reshape(-1, 2)
+    if len(a) == 1:
+        a = np.vstack([a, a])
+    if len(b) == 1:
+        b = np.vstack([b, b])
+    p, r = a[:-1, None, :], (a[1:] - a[:-1])[:, None, :]
+    q, s = b[None, :-1, :], (b[1:] - b[:-1])[None, :, :]
+
+    def orient(o, d, x):
+        return np.sign(d[..., 0] * (x[..., 1] - o[..., 1]) - d[..., 1] * (x[..., 0] - o[..., 0]))
+
+    d1, d2 = orient(p, r, q), orient(p, r, q + s)
+    d3, d4 = orient(q, s, p), orient(q, s, p + r)
+    # Collinear or touching segments: bounding boxes must overlap
+    overlap = ((np.minimum(p, p + r) <= np.maximum(q, q + s))
+               & (np.minimum(q, q + s) <= np.maximum(p, p + r))).all(axis=-1)
+    return bool(((d1 * d2 <= 0) & (d3 * d4 <= 0) & overlap).any())
+
+
+def simulate_multi_sru(routes,
+                       horizontal_nm=DEFAULT_HORIZONTAL_SEPARATION_NM,
+                       vertical_ft=DEFAULT_VERTICAL_SEPARATION_FT):
+    """Find SRU conflicts as a list of Conflict records.
+
+    Timestamped routes (calculations.deconfliction.Track) are checked in
+    time, space and altitude. Plain point lists have no timing, so any pair
+    of crossing or touching paths gives one Conflict with the route indices
+    as sru_a / sru_b, zero distance and no time, position or altitude (nan).
+    """
+    if routes and all(isinstance(route, Track) for route in routes):
+        return find_conflicts(routes, horizontal_nm, vertical_ft)
+    nan = float('nan')
+    collisions = []
+    for i, route1 in enumerate(routes):
+        for j, route2 in enumerate(routes[i + 1:], start=i + 1):
+            if intersect(route1, route2):
+                collisions.append(Conflict(i, j, nan, nan, nan, nan, nan, 0.0, nan))
+    return collisions
+
+
+def conflict_pairs(conflicts):
+    """Distinct (sru_a, sru_b) pairs of conflicts in order of appearance.
+
+    For plain point routes these are the (i, j) route index pairs.
+    """
+    return list(dict.fromkeys((conflict.sru_a, conflict.sru_b) for conflict in conflicts))
@@ -1,2 +1,12 @@
-python import datetime
-def optimize_search_time(wind_speed, current_speed, sru_count): base_time = datetime.timedelta(hours=2) adjustment = wind_speed * 0.1 + current_speed * 0.15 - sru_count * 0.5 return base_time + datetime.timedelta(hours=adjustment)
+from datetime import datetime, timezone
+
+from ..calculations.sortie_scheduler import SortieScheduler
+
+
+def optimize_search_time(srus, sub_areas, start=None, horizon_hours=24.0, **options):
+    """Plan SRU sorties over the horizon and return the SortiePlan.
+
+    Options are passed to SortieScheduler (poc, routes, sun_elevation_deg).
+    """
+    scheduler = SortieScheduler(srus, sub_areas, start or datetime.now(timezone.utc), horizon_hours, **options)
+    return scheduler.plan()